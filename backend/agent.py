@@ -144,8 +144,13 @@ def build_agent(
     )
 
 
-# Module-level instance for `langgraph dev` / LangGraph Studio.
-agent = build_agent()
+# Module-level instance for `langgraph dev` / LangGraph Studio, built on first
+# access (PEP 562) so importing this module doesn't compile a graph.
+def __getattr__(name: str) -> Any:
+    if name == "agent":
+        graph = globals()["agent"] = build_agent()
+        return graph
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def _pending_interrupt(value: Any) -> dict:
@@ -159,17 +164,27 @@ def _pending_interrupt(value: Any) -> dict:
     return {"tool_requests": requests, "allowed": allowed}
 
 
-async def stream_agent_response(graph, thread_id: str, command_input, config: Optional[dict] = None):
+async def stream_agent_response(
+    graph,
+    thread_id: str,
+    command_input,
+    config: Optional[dict] = None,
+    durability: Optional[str] = None,
+):
     """Run/resume the agent and stream progress, tokens, and a closing state.
 
     ``command_input`` is the initial ``{"messages": [...]}`` (to start) or a
     ``Command(resume=...)`` (to resume after an approval decision).
+    ``durability`` is LangGraph's run option (``sync`` / ``async`` / ``exit``).
     """
     config = config or {"configurable": {"thread_id": thread_id}}
     interrupt_value = None
     try:
         async for mode, data in graph.astream(
-            command_input, config=config, stream_mode=["updates", "messages", "custom"]
+            command_input,
+            config=config,
+            stream_mode=["updates", "messages", "custom"],
+            durability=durability,
         ):
             if mode == "custom":
                 # Guardrail (PII redaction / blocklist) and other progress events.
@@ -199,6 +214,7 @@ async def stream_agent_response(graph, thread_id: str, command_input, config: Op
             "requires_input": bool(state.next),
             "final_response": final,
             "current_step": "awaiting_approval" if state.next else "completed",
+            "next": list(state.next),
         }
         # Surface structured output when the agent was built with a response_format.
         structured = values.get("structured_response")
@@ -9,15 +9,24 @@ so exposing the agent over AG-UI lets it plug into any AG-UI client (e.g.
 SSE endpoints.
 
 This is additive and optional: if ``ag-ui-langgraph`` isn't installed, the app
-still boots and ``mount_agui`` is a no-op.
+still boots and ``mount_agui`` is a no-op. ``mount_agui`` adds thin routes only:
+the adapter is imported, and its agent built, on the first run request, so
+neither importing this module nor mounting the endpoint slows startup.
 """
 
 from __future__ import annotations
 
+import asyncio
 import logging
+from importlib.util import find_spec
+from typing import Any, Optional
 
 from langgraph.checkpoint.memory import MemorySaver
 
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+
 from agent import build_agent
 
 logger = logging.getLogger(__name__)
@@ -25,14 +34,42 @@ logger = logging.getLogger(__name__)
 # The path the AG-UI endpoint is mounted at.
 AGUI_PATH = "/agui"
 
-# Set at import time; ``mount_agui`` reflects whether the adapter is available.
-try:
-    from ag_ui_langgraph import LangGraphAgent, add_langgraph_fastapi_endpoint
+# Whether the adapter is installed; checked without importing it.
+AGUI_AVAILABLE = find_spec("ag_ui_langgraph") is not None
+if not AGUI_AVAILABLE:  # pragma: no cover - only when ag-ui-langgraph is missing
+    logger.info("AG-UI adapter disabled (install 'ag-ui-langgraph')")
+
+
+AGUI_AGENT_NAME = "research_agent"
+
+
+class _LazyAgent:
+    """The AG-UI agent, imported and built on first use."""
+
+    def __init__(self, store=None) -> None:
+        self.store = store
+        self._agent: Optional[Any] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> Any:
+        if self._agent is None:
+            async with self._lock:
+                if self._agent is None:
+                    self._agent = await asyncio.to_thread(self._build)
+                    logger.info("AG-UI agent built on first request")
+        return self._agent
 
-    AGUI_AVAILABLE = True
-except Exception as exc:  # pragma: no cover - only when ag-ui-langgraph is missing
-    logger.info("AG-UI adapter disabled (install 'ag-ui-langgraph'): %s", exc)
-    AGUI_AVAILABLE = False
+    def _build(self) -> Any:
+        from ag_ui_langgraph import LangGraphAgent
+
+        return LangGraphAgent(
+            name=AGUI_AGENT_NAME,
+            description=(
+                "Human-in-the-loop research agent — pauses for approval before "
+                "running tools."
+            ),
+            graph=build_agent(checkpointer=MemorySaver(), store=self.store),
+        )
 
 
 def mount_agui(app, store=None) -> bool:
@@ -40,23 +77,37 @@ def mount_agui(app, store=None) -> bool:
 
     Returns ``True`` when mounted, ``False`` when the adapter isn't installed.
     Uses a dedicated agent instance with its own checkpointer so AG-UI runs are
-    independent of the ``/agent/*`` SSE endpoints.
+    independent of the ``/agent/*`` SSE endpoints. The routes mirror
+    ``ag_ui_langgraph.add_langgraph_fastapi_endpoint``; the agent behind them is
+    built by the first run.
     """
     if not AGUI_AVAILABLE:
         return False
-    try:
-        graph = build_agent(checkpointer=MemorySaver(), store=store)
-        agent = LangGraphAgent(
-            name="research_agent",
-            description=(
-                "Human-in-the-loop research agent — pauses for approval before "
-                "running tools."
-            ),
-            graph=graph,
-        )
-        add_langgraph_fastapi_endpoint(app, agent, path=AGUI_PATH)
-        logger.info("AG-UI endpoint mounted at %s", AGUI_PATH)
-        return True
-    except Exception as exc:  # pragma: no cover - defensive
-        logger.warning("Failed to mount AG-UI endpoint: %s", exc)
-        return False
+    lazy = _LazyAgent(store)
+
+    @app.post(AGUI_PATH)
+    async def agui_run(request: Request):
+        from ag_ui.core import RunAgentInput
+        from ag_ui.encoder import EventEncoder
+        from pydantic import ValidationError
+
+        try:
+            input_data = RunAgentInput.model_validate(await request.json())
+        except ValidationError as exc:
+            raise RequestValidationError(exc.errors()) from exc
+        encoder = EventEncoder(accept=request.headers.get("accept"))
+        # A clone per request: LangGraphAgent keeps per-run state on itself.
+        agent = (await lazy.get()).clone()
+
+        async def event_generator():
+            async for event in agent.run(input_data):
+                yield encoder.encode(event)
+
+        return StreamingResponse(event_generator(), media_type=encoder.get_content_type())
+
+    @app.get(f"{AGUI_PATH}/health")
+    def agui_health():
+        return {"status": "ok", "agent": {"name": AGUI_AGENT_NAME}}
+
+    logger.info("AG-UI endpoint mounted at %s", AGUI_PATH)
+    return True
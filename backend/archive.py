@@ -0,0 +1,675 @@
+"""Streaming thread export / import, for migrations and cold archives.
+
+Moving threads from ``MemorySaver`` to SQLite, from a hot database to cold
+storage, or between shard layouts otherwise means replaying them through the
+graph API. :func:`export_threads` streams threads out of any checkpointer as a
+compact archive, and :func:`import_threads` loads one into any checkpointer:
+
+- **complete** — every checkpoint of every namespace, with parents, metadata
+  and pending writes (so interrupted threads resume after import), plus the
+  long-term-memory store items (``("memories", user_id)``) of the threads'
+  users;
+- **streaming, constant memory** — export reads each thread a page of
+  checkpoints at a time and yields compressed chunks of ~``chunk_bytes``;
+  import decodes frame by frame. Neither holds more than one thread;
+- **bulk, transactional** — into SQLite (single file or shards) rows go in
+  with ``executemany`` and one commit per batch of whole threads, instead of a
+  commit per checkpoint. A thread is never half-imported: a failed batch is
+  rolled back, and other checkpointers are written a thread only once it has
+  been read whole (and delete it if writing fails). A replaced thread is
+  deleted only when its replacement is ready to go in.
+
+Values go through the wrapper layers: offloaded blobs are resolved on export
+and offloaded again on import when the target has ``CHECKPOINT_BLOB_MIN_BYTES``
+set, and the target's serializer (compression) applies.
+
+The archive is a header line (``LGARCHIVE1 <codec>``) followed by one zstd
+(or zlib) stream of length-prefixed msgpack records — ``checkpoint``,
+``store`` and a closing ``end`` record with counts, so a truncated archive is
+detected instead of half-loaded. Admin endpoints ``GET /debug/threads/export``
+and ``POST /debug/threads/import`` expose it over HTTP, and from a shell::
+
+    python -m archive export --db checkpoints.sqlite -o threads.lgarchive
+    python -m archive import --db archive.sqlite --shards 4 threads.lgarchive
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import struct
+import sys
+import zlib
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Optional, Sequence, Union
+
+from langgraph.checkpoint.base import BaseCheckpointSaver, CheckpointTuple
+from langgraph.checkpoint.base import WRITES_IDX_MAP
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.store.base import BaseStore
+
+from checkpointing import CachedSaver, find_layer, unwrap
+from serialization import ZSTD_AVAILABLE
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"LGARCHIVE1"
+_FRAME = struct.Struct(">I")
+_MEMORY_NAMESPACE = "memories"  # see memory._namespace
+# Records are plain msgpack (the checkpointers' own serializer may compress
+# each payload, which the stream codec already does).
+_SERDE = JsonPlusSerializer()
+
+
+class ArchiveError(ValueError):
+    """The archive is malformed, truncated or from an unknown version."""
+
+
+@dataclass
+class ImportReport:
+    threads: int = 0
+    checkpoints: int = 0
+    writes: int = 0
+    store_items: int = 0
+    skipped: list[str] = field(default_factory=list)  # already present, not replaced
+
+    def add(self, counts: dict[str, Any]) -> None:
+        self.threads += 1
+        self.checkpoints += counts["checkpoints"]
+        self.writes += counts["writes"]
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+# --- stream codec -------------------------------------------------------------------
+def _compressor(codec: str) -> Any:
+    if codec == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    return zlib.compressobj(6)
+
+
+def _decompressor(codec: str) -> Any:
+    if codec == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise ArchiveError("Archive is zstd-compressed; install 'zstandard' to read it")
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompressobj()
+    if codec == "zlib":
+        return zlib.decompressobj()
+    raise ArchiveError(f"Unknown archive codec {codec!r}")
+
+
+class _Writer:
+    """Frames records and compresses them into chunks of ~``chunk_bytes`` of input.
+
+    Each chunk ends on a flushed compression block, so a reader can decode (and
+    a truncated archive keeps) everything up to the last whole chunk.
+    """
+
+    def __init__(self, codec: str, chunk_bytes: int) -> None:
+        self.codec = codec
+        self.chunk_bytes = chunk_bytes
+        self._z = _compressor(codec)
+        self._out: list[bytes] = []
+        self._size = 0
+
+    def header(self) -> bytes:
+        return MAGIC + b" " + self.codec.encode() + b"\n"
+
+    def add(self, record: dict[str, Any]) -> Optional[bytes]:
+        _, data = _SERDE.dumps_typed(record)
+        self._out.append(self._z.compress(_FRAME.pack(len(data)) + data))
+        self._size += _FRAME.size + len(data)
+        if self._size < self.chunk_bytes:
+            return None
+        self._out.append(self._z.flush(_block_flush(self.codec)))
+        return self._take()
+
+    def close(self, record: dict[str, Any]) -> bytes:
+        self.add(record)
+        self._out.append(self._z.flush())
+        return self._take()
+
+    def _take(self) -> bytes:
+        chunk = b"".join(self._out)
+        self._out, self._size = [], 0
+        return chunk
+
+
+def _block_flush(codec: str) -> int:
+    if codec == "zstd":
+        import zstandard
+
+        return zstandard.COMPRESSOBJ_FLUSH_BLOCK
+    return zlib.Z_SYNC_FLUSH
+
+
+async def _chunks(source: Union[AsyncIterable[bytes], Iterable[bytes]]) -> AsyncIterator[bytes]:
+    if hasattr(source, "__aiter__"):
+        async for chunk in source:
+            yield chunk
+    else:
+        for chunk in source:
+            yield chunk
+
+
+async def read_records(
+    source: Union[AsyncIterable[bytes], Iterable[bytes]],
+) -> AsyncIterator[dict[str, Any]]:
+    """Decode an archive's records, one frame at a time; the last is ``end``."""
+    head = b""
+    z = None
+    buffer = bytearray()
+    ended = False
+    async for chunk in _chunks(source):
+        if z is None:
+            head += chunk
+            if b"\n" not in head:
+                if len(head) > 64:
+                    raise ArchiveError("Not a thread archive (no header)")
+                continue
+            line, _, chunk = head.partition(b"\n")
+            magic, _, codec = line.partition(b" ")
+            if magic != MAGIC:
+                raise ArchiveError("Not a thread archive (bad header)")
+            z = _decompressor(codec.decode())
+        if not chunk:
+            continue  # a finished zstd stream refuses even empty input
+        buffer += z.decompress(chunk)
+        while len(buffer) >= _FRAME.size:
+            (size,) = _FRAME.unpack_from(buffer)
+            if len(buffer) < _FRAME.size + size:
+                break
+            data = bytes(buffer[_FRAME.size : _FRAME.size + size])
+            del buffer[: _FRAME.size + size]
+            record = _SERDE.loads_typed(("msgpack", data))
+            if ended:
+                raise ArchiveError("Data after the end of the archive")
+            ended = record.get("kind") == "end"
+            yield record
+    if not ended:
+        raise ArchiveError("Archive is truncated (no end record)")
+
+
+# --- export -------------------------------------------------------------------------
+def _is_sqlite(saver: Any) -> bool:
+    return type(saver).__name__ == "AsyncSqliteSaver"
+
+
+async def _sqlite_thread_ids(saver: Any, page: int) -> AsyncIterator[str]:
+    await saver.setup()
+    last = ""
+    while True:
+        async with saver.lock:
+            async with saver.conn.execute(
+                "SELECT DISTINCT thread_id FROM checkpoints WHERE thread_id > ? "
+                "ORDER BY thread_id LIMIT ?",
+                (last, page),
+            ) as cur:
+                ids = [str(row[0]) for row in await cur.fetchall()]
+        for thread_id in ids:
+            yield thread_id
+        if len(ids) < page:
+            return
+        last = ids[-1]
+
+
+async def iter_thread_ids(saver: BaseCheckpointSaver, page: int = 1000) -> AsyncIterator[str]:
+    """Every thread the checkpointer holds (paged on SQLite)."""
+    backing = unwrap(saver)
+    if _is_sqlite(backing):
+        async for thread_id in _sqlite_thread_ids(backing, page):
+            yield thread_id
+    elif type(backing).__name__ == "ShardedSqliteSaver":
+        for shard in backing.shards:
+            async for thread_id in _sqlite_thread_ids(shard.writer, page):
+                yield thread_id
+    elif isinstance(backing, InMemorySaver):
+        ids = [t for t, namespaces in list(backing.storage.items()) if namespaces]
+        spill = getattr(backing, "spill", None)  # bounded_memory: evicted threads too
+        if spill is not None:
+            ids += spill.thread_ids()
+        for thread_id in ids:
+            yield thread_id
+    else:
+        seen: set[str] = set()
+        async for item in saver.alist(None):
+            thread_id = str(item.config["configurable"]["thread_id"])
+            if thread_id not in seen:
+                seen.add(thread_id)
+                yield thread_id
+
+
+async def _history(
+    saver: BaseCheckpointSaver, thread_id: str, page: int
+) -> AsyncIterator[CheckpointTuple]:
+    config = {"configurable": {"thread_id": thread_id}}
+    if isinstance(unwrap(saver), InMemorySaver):
+        async for item in saver.alist(config):
+            yield item
+        return
+    # SQLite holds its connection lock while a listing is open: read a page at
+    # a time so writers aren't blocked while the archive is being consumed.
+    before = None
+    while True:
+        items = [item async for item in saver.alist(config, before=before, limit=page)]
+        for item in items:
+            yield item
+        if len(items) < page:
+            return
+        before = items[-1].config
+
+
+async def _task_paths(saver: BaseCheckpointSaver, item: CheckpointTuple) -> dict[str, str]:
+    """``task_id -> task_path`` of the checkpoint's pending writes.
+
+    ``pending_writes`` leaves the path out, but it orders writes on resume, so
+    it is read from the backing saver's own rows.
+    """
+    if not item.pending_writes:
+        return {}
+    configurable = item.config["configurable"]
+    key = (
+        str(configurable["thread_id"]),
+        configurable.get("checkpoint_ns", ""),
+        configurable["checkpoint_id"],
+    )
+    backing = unwrap(saver)
+    if type(backing).__name__ == "ShardedSqliteSaver":
+        backing = backing.shard(key[0]).writer
+    if _is_sqlite(backing):
+        if not getattr(backing, "_has_task_path", True):
+            return {}
+        async with backing.lock:
+            async with backing.conn.execute(
+                "SELECT DISTINCT task_id, task_path FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                key,
+            ) as cur:
+                return {task_id: task_path for task_id, task_path in await cur.fetchall()}
+    if isinstance(backing, InMemorySaver):
+        stored = backing.writes.get(key, {})
+        return {task_id: task_path for task_id, _c, _v, task_path in list(stored.values())}
+    return {}
+
+
+def _checkpoint_record(
+    item: CheckpointTuple,
+    checkpoint: dict,
+    writes: Sequence[Sequence[Any]],
+    task_paths: dict[str, str],
+) -> dict[str, Any]:
+    configurable = item.config["configurable"]
+    parent = (item.parent_config or {}).get("configurable", {})
+    return {
+        "kind": "checkpoint",
+        "thread_id": str(configurable["thread_id"]),
+        "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+        "parent_checkpoint_id": parent.get("checkpoint_id"),
+        "checkpoint": checkpoint,
+        "metadata": dict(item.metadata or {}),
+        # [task_id, channel, value, task_path]; archives without the path read as "".
+        "writes": [[*write, task_paths.get(write[0], "")] for write in writes],
+    }
+
+
+async def export_threads(
+    saver: BaseCheckpointSaver,
+    *,
+    only: Optional[Iterable[str]] = None,
+    store: Optional[BaseStore] = None,
+    codec: str = "auto",
+    chunk_bytes: int = 1 << 20,
+    page: int = 100,
+) -> AsyncIterator[bytes]:
+    """Stream an archive of the threads in ``only`` (default: every thread).
+
+    With ``store``, the store items of the users those threads belong to
+    (their ``user_id``) are appended.
+    """
+    from blobs import BlobOffloadSaver
+
+    if codec == "auto":
+        codec = "zstd" if ZSTD_AVAILABLE else "zlib"
+    writer = _Writer(codec, chunk_bytes)
+    offload = find_layer(saver, BlobOffloadSaver)
+    counts = {"threads": 0, "checkpoints": 0, "store_items": 0}
+    users: set[str] = set()
+    yield writer.header()
+
+    source = _chunks(only) if only is not None else iter_thread_ids(saver)
+    async for thread_id in source:
+        found = False
+        async for item in _history(saver, thread_id, page):
+            checkpoint, writes = item.checkpoint, item.pending_writes or []
+            if offload is not None:  # history listings leave blob references in place
+                values, writes = await offload.aresolve((checkpoint["channel_values"], writes))
+                checkpoint = {**checkpoint, "channel_values": values}
+            user_id = checkpoint["channel_values"].get("user_id")
+            if user_id:
+                users.add(str(user_id))
+            found = True
+            counts["checkpoints"] += 1
+            task_paths = await _task_paths(saver, item)
+            chunk = writer.add(_checkpoint_record(item, checkpoint, writes, task_paths))
+            if chunk:
+                yield chunk
+        counts["threads"] += found
+
+    if store is not None:
+        for user_id in sorted(users):
+            offset = 0
+            while True:
+                items = await store.asearch(
+                    (_MEMORY_NAMESPACE, user_id), limit=page, offset=offset
+                )
+                for item in items:
+                    counts["store_items"] += 1
+                    record = {
+                        "kind": "store",
+                        "namespace": list(item.namespace),
+                        "key": item.key,
+                        "value": item.value,
+                    }
+                    chunk = writer.add(record)
+                    if chunk:
+                        yield chunk
+                if len(items) < page:
+                    break
+                offset += page
+    yield writer.close({"kind": "end", **counts})
+    logger.info("Exported %(threads)d threads, %(checkpoints)d checkpoints", counts)
+
+
+# --- import -------------------------------------------------------------------------
+class _SaverSink:
+    """Writes through the saver API, a call per checkpoint (any backend).
+
+    A thread's records are held until the thread is read whole, so a bad
+    archive never touches the target, and a thread being replaced is only
+    deleted once its replacement is complete.
+    """
+
+    def __init__(self, saver: BaseCheckpointSaver, report: ImportReport) -> None:
+        self.saver = saver
+        self.report = report
+        self._current: list[dict[str, Any]] = []
+
+    async def add(self, record: dict[str, Any]) -> None:
+        self._current.append(record)
+
+    async def _write(self, record: dict[str, Any]) -> None:
+        config = {
+            "configurable": {
+                "thread_id": record["thread_id"],
+                "checkpoint_ns": record["checkpoint_ns"],
+                "checkpoint_id": record["parent_checkpoint_id"],
+            }
+        }
+        checkpoint = record["checkpoint"]
+        saved = await self.saver.aput(
+            config, checkpoint, record["metadata"], dict(checkpoint["channel_versions"])
+        )
+        for task_id, task_path, writes in _by_task(record["writes"]):
+            await self.saver.aput_writes(saved, writes, task_id, task_path)
+
+    async def end_thread(self, counts: dict[str, Any]) -> None:
+        records, self._current = self._current, []
+        if counts["replace"]:
+            await self.saver.adelete_thread(counts["thread_id"])
+        try:
+            for record in records:
+                await self._write(record)
+        except BaseException:
+            await self.saver.adelete_thread(counts["thread_id"])
+            raise
+        self.report.add(counts)
+
+    async def flush(self) -> None:
+        pass
+
+    async def abort(self, thread_id: str) -> None:
+        self._current = []  # never written: the thread's records were still held
+
+
+class _SqliteSink:
+    """Buffers rows per SQLite writer; one ``executemany`` + commit per batch.
+
+    Rows of the thread being read stay apart until the thread is complete, so
+    a batch only ever holds whole threads.
+    """
+
+    def __init__(self, saver: BaseCheckpointSaver, report: ImportReport, batch_size: int) -> None:
+        self.saver = saver
+        self.report = report
+        self.backing = unwrap(saver)
+        self.batch_size = batch_size
+        self.cache = find_layer(saver, CachedSaver)
+        self._current: list[tuple[Any, tuple, list]] = []
+        # writer -> (writer, checkpoint rows, write rows, threads to delete first)
+        self._batch: dict[int, tuple[Any, list, list, list]] = {}
+        self._batched: list[dict[str, int]] = []
+        self._size = 0
+
+    def _writer(self, thread_id: str) -> Any:
+        if _is_sqlite(self.backing):
+            return self.backing
+        return self.backing.shard(thread_id).writer
+
+    async def add(self, record: dict[str, Any]) -> None:
+        thread_id, ns = record["thread_id"], record["checkpoint_ns"]
+        writer = self._writer(thread_id)
+        checkpoint = record["checkpoint"]
+        row = (
+            thread_id,
+            ns,
+            checkpoint["id"],
+            record["parent_checkpoint_id"],
+            *writer.serde.dumps_typed(checkpoint),
+            json.dumps(record["metadata"], ensure_ascii=False).encode("utf-8", "ignore"),
+        )
+        writes = [
+            (
+                thread_id,
+                ns,
+                checkpoint["id"],
+                task_id,
+                task_path,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                *writer.serde.dumps_typed(value),
+            )
+            for task_id, task_path, task_writes in _by_task(record["writes"])
+            for idx, (channel, value) in enumerate(task_writes)
+        ]
+        self._current.append((writer, row, writes))
+
+    async def end_thread(self, counts: dict[str, Any]) -> None:
+        if counts["replace"]:  # deleted in the transaction that writes the new rows
+            writer = self._writer(counts["thread_id"])
+            self._batch.setdefault(id(writer), (writer, [], [], []))[3].append(
+                (counts["thread_id"],)
+            )
+        for writer, row, writes in self._current:
+            _, rows, all_writes, _ = self._batch.setdefault(id(writer), (writer, [], [], []))
+            rows.append(row)
+            all_writes.extend(writes)
+        self._size += len(self._current)
+        self._current = []
+        self._batched.append(counts)
+        if self._size >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        batch, self._batch, self._size = self._batch, {}, 0
+        batched, self._batched = self._batched, []
+        for writer, rows, writes, replaced in batch.values():
+            await writer.setup()
+            async with writer.lock:
+                try:
+                    for table in ("checkpoints", "writes"):
+                        await writer.conn.executemany(
+                            f"DELETE FROM {table} WHERE thread_id = ?", replaced
+                        )
+                    await writer.conn.executemany(
+                        "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, "
+                        "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                    await writer.conn.executemany(
+                        "INSERT OR REPLACE INTO writes (thread_id, checkpoint_ns, "
+                        "checkpoint_id, task_id, task_path, idx, channel, type, value) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        writes,
+                    )
+                    await writer.conn.commit()
+                except BaseException:
+                    await writer.conn.rollback()
+                    raise
+        for counts in batched:
+            if self.cache is not None:
+                self.cache.invalidate(counts["thread_id"])
+            self.report.add(counts)
+
+    async def abort(self, thread_id: str) -> None:
+        self._current = []  # never written: the thread's rows were still buffered
+
+
+def _by_task(
+    writes: Sequence[Sequence[Any]],
+) -> list[tuple[str, str, list[tuple[str, Any]]]]:
+    """``(task_id, task_path, [(channel, value), ...])`` per task, in archive order."""
+    grouped: dict[str, tuple[str, list[tuple[str, Any]]]] = {}
+    for task_id, channel, value, *path in writes:
+        grouped.setdefault(task_id, (path[0] if path else "", []))[1].append((channel, value))
+    return [(task_id, path, task_writes) for task_id, (path, task_writes) in grouped.items()]
+
+
+async def import_threads(
+    saver: BaseCheckpointSaver,
+    source: Union[AsyncIterable[bytes], Iterable[bytes]],
+    *,
+    store: Optional[BaseStore] = None,
+    replace: bool = False,
+    batch_size: int = 500,
+    bulk: Optional[bool] = None,
+) -> ImportReport:
+    """Load an archive into ``saver`` (and its store items into ``store``).
+
+    Threads that already exist are skipped unless ``replace``: then the old
+    thread is deleted only once the new one has been read whole — in the same
+    transaction as its rows on a bulk import. ``bulk`` (default: whenever possible) writes SQLite rows directly,
+    about ``batch_size`` checkpoints per transaction; it is off when blob
+    offload is enabled, whose tables the rows would bypass. On error the thread
+    being read is rolled back, threads read before it are kept, and the error
+    (:class:`ArchiveError` for a bad archive) propagates.
+    """
+    from blobs import BlobOffloadSaver
+
+    backing = unwrap(saver)
+    if bulk is None:
+        bulk = (
+            _is_sqlite(backing) or type(backing).__name__ == "ShardedSqliteSaver"
+        ) and find_layer(saver, BlobOffloadSaver) is None
+    report = ImportReport()
+    sink: Any = _SqliteSink(saver, report, batch_size) if bulk else _SaverSink(saver, report)
+    counts: Optional[dict[str, Any]] = None  # the thread being read; None if skipped
+
+    async def next_thread(thread_id: Optional[str]) -> None:
+        nonlocal counts
+        if counts is not None:
+            await sink.end_thread(counts)
+        counts = None
+        if thread_id is None:
+            return
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+        exists = await saver.aget_tuple(config) is not None
+        if exists and not replace:
+            report.skipped.append(thread_id)
+            return
+        counts = {"thread_id": thread_id, "checkpoints": 0, "writes": 0, "replace": exists}
+
+    current: Optional[str] = None
+    try:
+        async for record in read_records(source):
+            kind = record.get("kind")
+            if kind == "checkpoint":
+                if record["thread_id"] != current:
+                    current = record["thread_id"]
+                    await next_thread(current)
+                if counts is not None:
+                    await sink.add(record)
+                    counts["checkpoints"] += 1
+                    counts["writes"] += len(record["writes"])
+            elif kind == "store":
+                if store is not None:
+                    await store.aput(tuple(record["namespace"]), record["key"], record["value"])
+                    report.store_items += 1
+            elif kind == "end":
+                await next_thread(None)
+            else:
+                raise ArchiveError(f"Unknown archive record {kind!r}")
+    except BaseException:
+        if counts is not None:
+            await sink.abort(counts["thread_id"])
+        raise
+    finally:
+        await sink.flush()  # threads completed before any error
+    logger.info(
+        "Imported %d threads (%d checkpoints, %d skipped)",
+        report.threads,
+        report.checkpoints,
+        len(report.skipped),
+    )
+    return report
+
+
+# --- command line ---------------------------------------------------------------------
+async def _cli(args: argparse.Namespace) -> None:
+    from checkpointing import open_checkpointer
+
+    os.environ["CHECKPOINT_DB"] = args.db
+    if args.shards:
+        os.environ["CHECKPOINT_SHARDS"] = str(args.shards)
+    async with open_checkpointer() as saver:
+        if args.command == "export":
+            out = open(args.output, "wb") if args.output != "-" else sys.stdout.buffer
+            try:
+                async for chunk in export_threads(saver, only=args.thread or None):
+                    out.write(chunk)
+            finally:
+                if out is not sys.stdout.buffer:
+                    out.close()
+        else:
+            with open(args.archive, "rb") as f:
+                chunks = iter(lambda: f.read(1 << 20), b"")
+                report = await import_threads(saver, chunks, replace=args.replace)
+            print(json.dumps(report.as_dict(), indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="write an archive of a checkpoint database")
+    export.add_argument("--thread", action="append", help="only this thread (repeatable)")
+    export.add_argument("-o", "--output", default="-", help="archive path (default stdout)")
+    load = sub.add_parser("import", help="load an archive into a checkpoint database")
+    load.add_argument("archive")
+    load.add_argument("--replace", action="store_true", help="overwrite existing threads")
+    for command in (export, load):
+        command.add_argument("--db", required=True, help="SQLite checkpoint file")
+        command.add_argument("--shards", type=int, default=0, help="CHECKPOINT_SHARDS")
+    asyncio.run(_cli(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""Performance benchmarks for the backend (offline, mock model).
+
+Each module is runnable on its own and prints a small table (``--json`` for
+machine-readable output), e.g. ``python -m benchmarks.startup``:
+
+- ``startup`` — cold-start cost: module import time, app startup, and the
+  first build of each engine.
+- ``checkpoint_cache`` — SQLite reads and deserialisation time under a
+  ``/get_state`` polling load, with and without ``CachedSaver``.
+- ``blob_offload`` — bytes on disk and dedup ratio of a fork-heavy workload,
+  with and without ``BlobOffloadSaver``.
+- ``durability`` — checkpoint writes, latency and throughput of the workflow
+  under each durability mode (``sync`` / ``async`` / ``exit``).
+- ``workflow_prefetch`` — ``/start`` and first-resume latency of the workflow,
+  memory recalled before the first interrupt vs prefetched behind it.
+- ``memory_store`` — long-term memory recall latency at 1M memories, SQLite
+  FTS5 (BM25) store vs ``InMemoryStore``.
+- ``sharding`` — run throughput and state-read latency of 100+ concurrent
+  threads on one SQLite file vs ``ShardedSqliteSaver``.
+- ``serializer`` — checkpoint size and encode/decode time, default serializer
+  vs ``CompactSerializer`` (zstd / zlib).
+"""
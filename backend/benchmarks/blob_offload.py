@@ -0,0 +1,140 @@
+"""Fork-heavy workload: checkpoint bytes with and without blob offload.
+
+Runs ``threads`` research threads to completion on a fresh
+``AsyncSqliteSaver`` file, then forks each one from every interrupt it paused
+at, once per alternative choice (what users do with ``/history`` + ``/fork``).
+The same workload runs bare and behind ``blobs.BlobOffloadSaver``; the report
+gives bytes on disk (checkpoints + writes + blob table), the blob store's
+deduplication stats, and the time to list every thread's ``/history``:
+
+    python -m benchmarks.blob_offload
+    python -m benchmarks.blob_offload --threads 10 --min-bytes 64 --json
+
+The offline mock model writes short canned texts, so the default threshold
+here (``--min-bytes 128``) is far below the 2 KiB suggested for real models,
+and the byte saving understates what long ``analysis`` / ``final_response``
+texts give; conversely, canned texts repeat across threads, which inflates the
+dedup ratio. Compression is off (``CompactSerializer(None)``) to isolate
+deduplication.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Any
+
+from langgraph.types import Command
+
+os.environ.setdefault("USE_MOCK_LLM", "true")
+
+_CHOICES = ("proceed", "technical", "executive")
+_ALTERNATIVES = ("simplified", "focused", "proceed")
+
+
+async def _table_bytes(conn: Any) -> dict[str, int]:
+    sizes = {}
+    for table, expr in (
+        ("checkpoints", "LENGTH(checkpoint) + LENGTH(metadata)"),
+        ("writes", "LENGTH(value)"),
+        ("checkpoint_blobs", "LENGTH(data)"),
+    ):
+        try:
+            async with conn.execute(f"SELECT COALESCE(SUM({expr}), 0) FROM {table}") as cur:
+                (sizes[table],) = await cur.fetchone()
+        except sqlite3.OperationalError:  # blob table only exists with offload on
+            sizes[table] = 0
+    return sizes
+
+
+async def _run(min_bytes: int, threads: int) -> dict[str, Any]:
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    from blobs import BlobOffloadSaver
+    from graph import build_research_graph
+    from serialization import CompactSerializer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        async with aiosqlite.connect(os.path.join(tmp, "bench.sqlite")) as conn:
+            bare = AsyncSqliteSaver(conn, serde=CompactSerializer(None))
+            saver = BlobOffloadSaver(bare, min_bytes=min_bytes) if min_bytes else bare
+            graph = build_research_graph(checkpointer=saver)
+            configs = [{"configurable": {"thread_id": f"t{i}"}} for i in range(threads)]
+            forks = 0
+            for config in configs:
+                await graph.ainvoke({"user_query": "benchmark", "messages": []}, config)
+                for choice in _CHOICES:
+                    await graph.ainvoke(Command(resume=choice), config)
+                paused = [s async for s in graph.aget_state_history(config) if s.interrupts]
+                for snapshot in paused:
+                    for alternative in _ALTERNATIVES:
+                        await graph.ainvoke(Command(resume=alternative), snapshot.config)
+                        forks += 1
+
+            start = time.perf_counter()
+            for config in configs:
+                [s async for s in graph.aget_state_history(config)]
+            history_ms = (time.perf_counter() - start) * 1000
+            sizes = await _table_bytes(conn)
+            dedup = await saver.store.astats() if min_bytes else None
+    return {
+        "forks": forks,
+        **{f"{table}_bytes": size for table, size in sizes.items()},
+        "total_bytes": sum(sizes.values()),
+        "history_ms": round(history_ms, 2),
+        "dedup": dedup,
+    }
+
+
+def run_benchmark(threads: int = 5, min_bytes: int = 128) -> dict[str, Any]:
+    """Bare vs offloaded results and the relative saving in total bytes."""
+    bare = asyncio.run(_run(0, threads))
+    offloaded = asyncio.run(_run(min_bytes, threads))
+    return {
+        "load": {"threads": threads, "forks": bare["forks"], "min_bytes": min_bytes},
+        "bare": bare,
+        "offloaded": offloaded,
+        "saving": round(1 - offloaded["total_bytes"] / bare["total_bytes"], 3),
+    }
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    load = report["load"]
+    print(
+        f"\n=== Blob offload: {load['threads']} threads, {load['forks']} forks, "
+        f"offload >= {load['min_bytes']} B ==="
+    )
+    keys = ("checkpoints_bytes", "writes_bytes", "checkpoint_blobs_bytes", "total_bytes")
+    print(f"  {'mode':<10} " + " ".join(f"{k:>22}" for k in keys) + f" {'history_ms':>11}")
+    for mode in ("bare", "offloaded"):
+        row = report[mode]
+        cells = " ".join(f"{row[k]:>22}" for k in keys)
+        print(f"  {mode:<10} {cells} {row['history_ms']:>11}")
+    dedup = report["offloaded"]["dedup"]
+    print(
+        f"  saving: {report['saving']:.0%} of bytes; {dedup['references']} references to "
+        f"{dedup['blobs']} distinct blobs (dedup ratio {dedup['dedup_ratio']}x)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=5)
+    parser.add_argument("--min-bytes", type=int, default=128)
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+    report = run_benchmark(args.threads, args.min_bytes)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
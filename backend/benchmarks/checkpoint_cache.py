@@ -0,0 +1,140 @@
+"""Polling load test for ``checkpointing.CachedSaver`` on SQLite.
+
+Simulates what the app does to a durable checkpointer: ``threads`` workflow
+runs are started (each pausing at its first interrupt), then the UI "polls"
+``aget_state`` for every thread ``polls`` times, with a resume on every
+``resume_every``-th poll (the write invalidates the cached entry). The same
+load runs twice against a fresh ``AsyncSqliteSaver`` file — bare, then behind
+the cache — and reports reads that reached SQLite, checkpoint deserialisations
+(count and time) and wall time of the polling phase:
+
+    python -m benchmarks.checkpoint_cache
+    python -m benchmarks.checkpoint_cache --threads 50 --polls 40 --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import CheckpointTuple
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.types import Command
+
+from checkpointing import CachedSaver, DelegatingSaver
+
+os.environ.setdefault("USE_MOCK_LLM", "true")
+
+
+class ReadCounter(DelegatingSaver):
+    """Count ``aget_tuple`` calls that reach the wrapped saver."""
+
+    def __init__(self, inner: Any) -> None:
+        super().__init__(inner)
+        self.reads = 0
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        self.reads += 1
+        return await self.inner.aget_tuple(config)
+
+
+class TimedSerde(JsonPlusSerializer):
+    """The default serializer, timing every ``loads_typed``."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.loads = 0
+        self.load_seconds = 0.0
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        start = time.perf_counter()
+        try:
+            return super().loads_typed(data)
+        finally:
+            self.loads += 1
+            self.load_seconds += time.perf_counter() - start
+
+
+async def _run(cached: bool, threads: int, polls: int, resume_every: int) -> dict[str, Any]:
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    from graph import build_research_graph
+
+    with tempfile.TemporaryDirectory() as tmp:
+        serde = TimedSerde()
+        async with aiosqlite.connect(os.path.join(tmp, "bench.sqlite")) as conn:
+            counter = ReadCounter(AsyncSqliteSaver(conn, serde=serde))
+            saver = CachedSaver(counter, maxsize=max(threads, 1)) if cached else counter
+            graph = build_research_graph(checkpointer=saver)
+            configs = [{"configurable": {"thread_id": f"t{i}"}} for i in range(threads)]
+            for config in configs:
+                await graph.ainvoke({"user_query": "benchmark", "messages": []}, config)
+
+            counter.reads, serde.loads, serde.load_seconds = 0, 0, 0.0
+            start = time.perf_counter()
+            for poll in range(1, polls + 1):
+                for config in configs:
+                    state = await graph.aget_state(config)
+                    if resume_every and poll % resume_every == 0 and state.next:
+                        await graph.ainvoke(Command(resume="proceed"), config)
+            elapsed = time.perf_counter() - start
+    return {
+        "sqlite_reads": counter.reads,
+        "deserialisations": serde.loads,
+        "deserialise_ms": round(serde.load_seconds * 1000, 2),
+        "polling_seconds": round(elapsed, 3),
+    }
+
+
+def run_benchmark(threads: int = 20, polls: int = 25, resume_every: int = 10) -> dict[str, Any]:
+    """Bare vs cached results plus the relative reduction for each measure."""
+    bare = asyncio.run(_run(False, threads, polls, resume_every))
+    cached = asyncio.run(_run(True, threads, polls, resume_every))
+    reduction = {
+        key: round(1 - cached[key] / bare[key], 3) if bare[key] else 0.0 for key in bare
+    }
+    return {
+        "load": {"threads": threads, "polls": polls, "resume_every": resume_every},
+        "bare": bare,
+        "cached": cached,
+        "reduction": reduction,
+    }
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    load = report["load"]
+    print(
+        f"\n=== Checkpoint cache: {load['threads']} threads x {load['polls']} polls "
+        f"(resume every {load['resume_every']}) ==="
+    )
+    print(f"  {'measure':<18} {'bare':>10} {'cached':>10} {'reduction':>10}")
+    for key in report["bare"]:
+        print(
+            f"  {key:<18} {report['bare'][key]:>10} {report['cached'][key]:>10} "
+            f"{report['reduction'][key]:>9.0%}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--polls", type=int, default=25)
+    parser.add_argument("--resume-every", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+    report = run_benchmark(args.threads, args.polls, args.resume_every)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
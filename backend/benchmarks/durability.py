@@ -0,0 +1,125 @@
+"""Checkpoint writes and latency per durability mode (SQLite).
+
+Runs ``threads`` research threads through the workflow — start, then resume
+through all three interrupts, like ``/start`` + ``/resume`` — with
+``concurrency`` of them in flight at once, against a fresh
+``AsyncSqliteSaver`` file, once per LangGraph durability mode
+(``durability.DurabilityPolicy``). Reports checkpoint and write calls (each
+one a SQLite commit), rows left on disk, per-request latency and throughput:
+
+    python -m benchmarks.durability
+    python -m benchmarks.durability --threads 40 --concurrency 8 --json
+
+The mock model answers instantly, so the checkpointer's share of each request
+is much larger here than with a real provider; read the latency columns as an
+upper bound on what coalescing saves.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Any
+
+from langgraph.types import Command
+
+os.environ.setdefault("USE_MOCK_LLM", "true")
+
+_CHOICES = ("proceed", "technical", "executive")
+_MODES = ("sync", "async", "exit")
+
+
+async def _run(mode: str, threads: int, concurrency: int) -> dict[str, Any]:
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    from checkpointing import DelegatingSaver
+    from durability import DurabilityPolicy
+    from graph import build_research_graph
+
+    class Counting(DelegatingSaver):
+        puts = writes = 0
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            self.puts += 1
+            return await self.inner.aput(config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes, task_id, task_path=""):
+            self.writes += 1
+            return await self.inner.aput_writes(config, writes, task_id, task_path)
+
+    policy = DurabilityPolicy(mode)
+    latencies: list[float] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        async with aiosqlite.connect(os.path.join(tmp, "bench.sqlite")) as conn:
+            saver = Counting(AsyncSqliteSaver(conn))
+            graph = build_research_graph(checkpointer=saver)
+            gate = asyncio.Semaphore(concurrency)
+
+            async def timed(value: Any, config: dict) -> None:
+                start = time.perf_counter()
+                await graph.ainvoke(value, config, durability=policy.mode("workflow"))
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            async def thread(i: int) -> None:
+                config = {"configurable": {"thread_id": f"t{i}"}}
+                async with gate:
+                    await timed({"user_query": f"q{i}", "messages": []}, config)
+                    for choice in _CHOICES:
+                        await timed(Command(resume=choice), config)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(thread(i) for i in range(threads)))
+            wall = time.perf_counter() - start
+
+            async with conn.execute("SELECT COUNT(*) FROM checkpoints") as cur:
+                (checkpoint_rows,) = await cur.fetchone()
+            async with conn.execute("SELECT COUNT(*) FROM writes") as cur:
+                (write_rows,) = await cur.fetchone()
+    latencies.sort()
+    return {
+        "put_calls": saver.puts,
+        "put_writes_calls": saver.writes,
+        "checkpoint_rows": checkpoint_rows,
+        "write_rows": write_rows,
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        "requests_per_s": round(len(latencies) / wall, 1),
+    }
+
+
+def run_benchmark(threads: int = 20, concurrency: int = 4) -> dict[str, Any]:
+    """One row per durability mode."""
+    return {mode: asyncio.run(_run(mode, threads, concurrency)) for mode in _MODES}
+
+
+def _print_report(report: dict[str, Any], threads: int, concurrency: int) -> None:
+    print(f"\n=== Durability modes: {threads} threads, {concurrency} concurrent (SQLite) ===")
+    keys = (
+        "put_calls", "put_writes_calls", "checkpoint_rows", "p50_ms", "p95_ms", "requests_per_s"
+    )
+    print(f"  {'mode':<6} " + " ".join(f"{k:>16}" for k in keys))
+    for mode, row in report.items():
+        print(f"  {mode:<6} " + " ".join(f"{row[k]:>16}" for k in keys))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+    report = run_benchmark(args.threads, args.concurrency)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report, args.threads, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Long-term memory recall at scale: SQLite FTS5 store vs ``InMemoryStore``.
+
+Fills each store with ``memories`` notes spread over ``users`` users (``("memories",
+user)`` namespaces, words drawn Zipf-style from a synthetic vocabulary), then
+times ``load_user_memory``-style recalls — ``asearch(namespace, query=..., limit=5)``
+for random users and questions. ``sqlite`` is ``memory_store.SqliteMemoryStore``
+(BM25 over an FTS5 index, on disk); ``sqlite_recent`` is the same store with no
+query; ``in_memory`` is ``InMemoryStore`` without embeddings, which ignores the
+query and scans every namespace for the prefix:
+
+    python -m benchmarks.memory_store
+    python -m benchmarks.memory_store --memories 100000 --users 1000 --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Any
+
+_VOCAB = 20_000
+_BATCH = 5_000
+
+
+def _words(rng: random.Random, n: int) -> list[str]:
+    # Zipf-ish: a few words are everywhere, most are rare.
+    return [f"w{int(rng.paretovariate(1.1)) % _VOCAB}" for _ in range(n)]
+
+
+def _notes(memories: int, users: int):
+    rng = random.Random(11)
+    for i in range(memories):
+        yield f"u{i % users}", f"m{i}", {"text": "Asked about: " + " ".join(_words(rng, 8))}
+
+
+def _fill(store: Any, memories: int, users: int) -> float:
+    from langgraph.store.base import PutOp
+
+    start = time.perf_counter()
+    batch: list[PutOp] = []
+    for user, key, value in _notes(memories, users):
+        batch.append(PutOp(("memories", user), key, value))
+        if len(batch) == _BATCH:
+            store.batch(batch)
+            batch = []
+    if batch:
+        store.batch(batch)
+    return time.perf_counter() - start
+
+
+async def _recall(store: Any, users: int, queries: int, with_query: bool) -> dict[str, float]:
+    rng = random.Random(5)
+    latencies = []
+    hits = 0
+    for _ in range(queries):
+        user = f"u{rng.randrange(users)}"
+        query = "What about " + " ".join(_words(rng, 4)) + "?" if with_query else None
+        start = time.perf_counter()
+        items = await store.asearch(("memories", user), query=query, limit=5)
+        latencies.append(time.perf_counter() - start)
+        hits += bool(items)
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3),
+        "non_empty": round(hits / queries, 3),
+    }
+
+
+def run_benchmark(
+    memories: int = 1_000_000, users: int = 10_000, queries: int = 500, in_memory: bool = True
+) -> dict[str, Any]:
+    from langgraph.store.memory import InMemoryStore
+
+    from memory_store import SqliteMemoryStore
+
+    report: dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "memory.sqlite")
+        store = SqliteMemoryStore(path)
+        fill_s = _fill(store, memories, users)
+        report["sqlite"] = {
+            "fill_per_s": round(memories / fill_s),
+            "db_mb": round(os.path.getsize(path) / 2**20, 1),
+            **asyncio.run(_recall(store, users, queries, True)),
+        }
+        report["sqlite_recent"] = asyncio.run(_recall(store, users, queries, False))
+        store.close()
+    if in_memory:
+        store = InMemoryStore()
+        fill_s = _fill(store, memories, users)
+        report["in_memory"] = {
+            "fill_per_s": round(memories / fill_s),
+            **asyncio.run(_recall(store, users, min(queries, 50), True)),
+        }
+    return report
+
+
+def _print_report(report: dict[str, Any], memories: int, users: int) -> None:
+    print(f"\n=== Memory recall: {memories} memories over {users} users, limit 5 ===")
+    keys = ("fill_per_s", "db_mb", "p50_ms", "p99_ms", "non_empty")
+    print(f"  {'':<14} " + " ".join(f"{k:>11}" for k in keys))
+    for name, row in report.items():
+        print(f"  {name:<14} " + " ".join(f"{row.get(k, '-'):>11}" for k in keys))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--memories", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--no-in-memory", action="store_true", help="skip the InMemoryStore run")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+    report = run_benchmark(args.memories, args.users, args.queries, not args.no_in_memory)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report, args.memories, args.users)
+
+
+if __name__ == "__main__":
+    main()
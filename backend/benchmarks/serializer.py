@@ -0,0 +1,132 @@
+"""Checkpoint size and encode/decode time: default vs compressed serializer.
+
+Builds checkpoints shaped like a long research thread — a ``messages``
+history of ``turns`` human/AI exchanges plus ``research_results``,
+``analysis`` and ``final_response`` text — and serialises each with
+LangGraph's default ``JsonPlusSerializer`` and with
+``serialization.CompactSerializer`` (zstd, and zlib as the fallback codec):
+
+    python -m benchmarks.serializer
+    python -m benchmarks.serializer --turns 10 50 200 --repeat 50 --json
+
+Text is drawn from a fixed vocabulary with a seeded RNG, so it compresses
+roughly like English prose and results are reproducible.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Any, Callable
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from serialization import ZSTD_AVAILABLE, CompactSerializer
+
+_VOCABULARY = (
+    "the of and to in is that for it as with was on be by this are from at or an "
+    "have not which but can were all their has more one its also been other would "
+    "quantum computing model data research results analysis system approach qubit "
+    "error correction algorithm performance network learning training inference "
+    "latency throughput memory cache checkpoint state graph node interrupt human "
+    "review approval summary finding source evidence method experiment baseline"
+).split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_VOCABULARY) for _ in range(words)).capitalize() + "."
+
+
+def research_checkpoint(turns: int, seed: int = 0) -> dict[str, Any]:
+    """A checkpoint holding a ``ResearchState`` with ``turns`` exchanges."""
+    rng = random.Random(seed)
+    messages: list[Any] = []
+    for _ in range(turns):
+        messages.append(HumanMessage(_text(rng, 20)))
+        messages.append(AIMessage(_text(rng, 250)))
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {
+        "messages": messages,
+        "user_query": _text(rng, 12),
+        "research_plan": _text(rng, 80),
+        "research_results": [_text(rng, 150) for _ in range(3)],
+        "sub_queries": [_text(rng, 10) for _ in range(3)],
+        "analysis": _text(rng, 300),
+        "final_response": _text(rng, 400),
+        "current_step": "complete",
+    }
+    return checkpoint
+
+
+def _median_ms(fn: Callable[[], Any], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def _serializers() -> dict[str, Any]:
+    serializers: dict[str, Any] = {"default": JsonPlusSerializer()}
+    if ZSTD_AVAILABLE:
+        serializers["zstd"] = CompactSerializer("zstd")
+    serializers["zlib"] = CompactSerializer("zlib")
+    return serializers
+
+
+def run_benchmark(turns: tuple[int, ...] = (10, 50, 200), repeat: int = 20) -> dict[str, Any]:
+    """Per history length and serializer: bytes, encode and decode time (ms)."""
+    report: dict[str, Any] = {}
+    for n in turns:
+        checkpoint = research_checkpoint(n)
+        rows: dict[str, Any] = {}
+        for name, serde in _serializers().items():
+            typed = serde.dumps_typed(checkpoint)
+            assert serde.loads_typed(typed)["channel_values"]["final_response"]
+            rows[name] = {
+                "bytes": len(typed[1]),
+                "encode_ms": _median_ms(lambda: serde.dumps_typed(checkpoint), repeat),
+                "decode_ms": _median_ms(lambda: serde.loads_typed(typed), repeat),
+            }
+        default = rows["default"]["bytes"]
+        for row in rows.values():
+            row["ratio"] = round(default / row["bytes"], 2)
+        report[f"{n}_turns"] = rows
+    return report
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    print("\n=== Checkpoint serializer: default vs compressed ===")
+    print(
+        f"  {'history':<10} {'serializer':<10} {'bytes':>10} {'ratio':>7} "
+        f"{'encode ms':>10} {'decode ms':>10}"
+    )
+    for history, rows in report.items():
+        for name, row in rows.items():
+            print(
+                f"  {history:<10} {name:<10} {row['bytes']:>10} {row['ratio']:>6}x "
+                f"{row['encode_ms']:>10} {row['decode_ms']:>10}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+    report = run_benchmark(tuple(args.turns), args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Checkpointer throughput with many concurrent threads: one file vs shards.
+
+Starts ``threads`` research threads at once and drives each through all three
+interrupts, while ``pollers`` tasks keep reading the latest checkpoint of
+random threads every 20 ms (UI polling of ``/get_state``). Runs against one
+``AsyncSqliteSaver`` file and against ``sharding.ShardedSqliteSaver`` with
+``shards`` WAL files and a reader pool each, and reports run throughput and
+how long state reads took while the writers were busy:
+
+    python -m benchmarks.sharding
+    python -m benchmarks.sharding --threads 200 --shards 8 --readers 4 --json
+
+Graph execution itself is single-threaded Python on one event loop, so the
+gain comes from the SQLite side: writes to different files and reads on the
+reader connections proceed in parallel instead of queueing on one connection.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+from langgraph.types import Command
+
+os.environ.setdefault("USE_MOCK_LLM", "true")
+
+_CHOICES = ("proceed", "technical", "executive")
+
+
+@asynccontextmanager
+async def _saver(path: str, shards: int, readers: int) -> AsyncIterator[Any]:
+    if shards > 1:
+        from sharding import ShardedSqliteSaver
+
+        async with ShardedSqliteSaver.open(path, shards, readers=readers) as saver:
+            yield saver
+        return
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    async with aiosqlite.connect(path) as conn:
+        saver = AsyncSqliteSaver(conn)
+        await saver.setup()
+        yield saver
+
+
+async def _run(
+    shards: int, readers: int, threads: int, pollers: int, durability: str
+) -> dict[str, Any]:
+    from graph import build_research_graph
+
+    reads: list[float] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        async with _saver(os.path.join(tmp, "bench.sqlite"), shards, readers) as saver:
+            graph = build_research_graph(checkpointer=saver)
+            configs = [{"configurable": {"thread_id": f"t{i}"}} for i in range(threads)]
+            done = asyncio.Event()
+
+            async def thread(config: dict) -> None:
+                start = {"user_query": "benchmark", "messages": []}
+                await graph.ainvoke(start, config, durability=durability)
+                for choice in _CHOICES:
+                    await graph.ainvoke(Command(resume=choice), config, durability=durability)
+
+            async def poll(seed: int) -> None:
+                rng = random.Random(seed)
+                while not done.is_set():
+                    start = time.perf_counter()
+                    await saver.aget_tuple(rng.choice(configs))
+                    reads.append((time.perf_counter() - start) * 1000)
+                    await asyncio.sleep(0.02)  # each poller: ~50 reads/s at most
+
+            polling = [asyncio.create_task(poll(i)) for i in range(pollers)]
+            start = time.perf_counter()
+            await asyncio.gather(*(thread(config) for config in configs))
+            wall = time.perf_counter() - start
+            done.set()
+            await asyncio.gather(*polling)
+    reads.sort()
+    return {
+        "seconds": round(wall, 2),
+        "runs_per_s": round(threads * (1 + len(_CHOICES)) / wall, 1),
+        "reads": len(reads),
+        "read_p50_ms": round(statistics.median(reads), 2) if reads else None,
+        "read_p95_ms": round(reads[int(len(reads) * 0.95) - 1], 2) if reads else None,
+    }
+
+
+def run_benchmark(
+    threads: int = 120,
+    shards: int = 4,
+    readers: int = 2,
+    pollers: int = 8,
+    durability: str = "sync",
+) -> dict[str, Any]:
+    """``single`` file vs ``sharded``, plus the throughput speed-up."""
+    single = asyncio.run(_run(1, 0, threads, pollers, durability))
+    sharded = asyncio.run(_run(shards, readers, threads, pollers, durability))
+    return {
+        "load": {
+            "threads": threads,
+            "shards": shards,
+            "readers": readers,
+            "pollers": pollers,
+            "durability": durability,
+        },
+        "single": single,
+        "sharded": sharded,
+        "speedup": round(sharded["runs_per_s"] / single["runs_per_s"], 2),
+    }
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    load = report["load"]
+    print(
+        f"\n=== {load['threads']} concurrent threads, {load['pollers']} pollers: "
+        f"1 file vs {load['shards']} shards x {load['readers']} readers ==="
+    )
+    keys = ("seconds", "runs_per_s", "reads", "read_p50_ms", "read_p95_ms")
+    print(f"  {'mode':<8} " + " ".join(f"{k:>12}" for k in keys))
+    for mode in ("single", "sharded"):
+        print(f"  {mode:<8} " + " ".join(f"{str(report[mode][k]):>12}" for k in keys))
+    print(f"  throughput: {report['speedup']}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=120)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--pollers", type=int, default=8)
+    parser.add_argument("--durability", default="sync", choices=("sync", "async", "exit"))
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+    report = run_benchmark(
+        args.threads, args.shards, args.readers, args.pollers, args.durability
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
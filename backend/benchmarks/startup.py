@@ -0,0 +1,105 @@
+"""Cold-start benchmark: import time, app startup and first engine builds.
+
+Cold start matters for autoscaling and serverless: a new replica can't take
+traffic until ``main`` is imported and the lifespan has run, and each engine's
+first request additionally pays for compiling its graph (see ``engines.py``).
+Every run happens in a fresh interpreter so nothing is warm:
+
+    python -m benchmarks.startup              # 5 cold runs, median table
+    python -m benchmarks.startup --runs 10 --json
+
+Reported per run (seconds):
+
+- ``import_main`` — ``import main`` (what a worker pays before serving);
+- ``startup`` — the FastAPI lifespan (checkpointer, store, AG-UI mount);
+- ``build_<engine>`` — first compile of each engine, as its first request
+  would trigger it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+def _child() -> dict[str, float]:
+    """One cold measurement (runs in a fresh interpreter)."""
+    os.environ.setdefault("USE_MOCK_LLM", "true")
+    sys.path.insert(0, str(BACKEND))
+    start = time.perf_counter()
+    import main  # noqa: PLC0415 - timing the import is the point
+
+    timings = {"import_main": time.perf_counter() - start}
+
+    async def run() -> None:
+        start = time.perf_counter()
+        async with main.app.router.lifespan_context(main.app):
+            timings["startup"] = time.perf_counter() - start
+            engines = main.app.state.engines
+            for name in ("workflow", "approval", "agent", "deep_agent"):
+                if name in engines:
+                    t0 = time.perf_counter()
+                    await engines.get(name)
+                    timings[f"build_{name}"] = time.perf_counter() - t0
+
+    asyncio.run(run())
+    return timings
+
+
+def run_benchmark(runs: int = 5) -> dict[str, dict[str, float]]:
+    """Median / min / max of ``runs`` cold starts, per measurement."""
+    samples: dict[str, list[float]] = {}
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child"],
+            cwd=BACKEND,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        for key, value in json.loads(out.strip().splitlines()[-1]).items():
+            samples.setdefault(key, []).append(value)
+    return {
+        key: {
+            "median": round(statistics.median(values), 4),
+            "min": round(min(values), 4),
+            "max": round(max(values), 4),
+        }
+        for key, values in samples.items()
+    }
+
+
+def _print_report(report: dict[str, dict[str, float]], runs: int) -> None:
+    print(f"\n=== Cold start ({runs} runs, seconds) ===")
+    print(f"  {'measure':<22} {'median':>8} {'min':>8} {'max':>8}")
+    for key, row in report.items():
+        print(f"  {key:<22} {row['median']:>8.3f} {row['min']:>8.3f} {row['max']:>8.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(_child()))
+        return
+    report = run_benchmark(args.runs)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Time to first interrupt: memory recall before it vs prefetched behind it.
+
+Runs ``threads`` research threads through the workflow like ``/start`` and a
+first ``/resume`` (after ``think_ms`` of a user reading the interrupt). The
+store is semantic, and its embedding model costs ``embed_ms`` per question, as
+a remote provider does. One run in ``cancel_every`` is cancelled at the first
+interrupt. ``serial`` recalls memory in a node before the interrupt
+(``WORKFLOW_PREFETCH=false``). ``prefetch`` recalls it in the background
+while the interrupt waits, and ``query_planner`` awaits the result. Reports
+``/start`` and resume latency, and how many recalls ran to completion (a
+recall behind a cancelled run's interrupt is cancelled if still running):
+
+    python -m benchmarks.workflow_prefetch
+    python -m benchmarks.workflow_prefetch --embed-ms 80 --json
+
+The mock model answers instantly, so the resume column is mostly the recall
+(when it isn't prefetched) and checkpointing.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from typing import Any
+
+from langgraph.types import Command
+
+os.environ.setdefault("USE_MOCK_LLM", "true")
+
+
+def _store(embed_ms: float):
+    from langchain_core.embeddings import Embeddings
+    from langgraph.store.memory import InMemoryStore
+
+    class LatencyEmbeddings(Embeddings):
+        """A remote model stand-in: one round trip per call, counted."""
+
+        queries = 0
+
+        def _vector(self, text):
+            rng = random.Random(text)
+            return [rng.random() for _ in range(32)]
+
+        def embed_documents(self, texts):
+            return [self._vector(t) for t in texts]
+
+        def embed_query(self, text):
+            return self._vector(text)
+
+        async def aembed_documents(self, texts):
+            return self.embed_documents(texts)
+
+        async def aembed_query(self, text):
+            await asyncio.sleep(embed_ms / 1000)
+            LatencyEmbeddings.queries += 1  # only recalls that ran to completion
+            return self.embed_query(text)
+
+    embeddings = LatencyEmbeddings()
+    return InMemoryStore(index={"dims": 32, "embed": embeddings, "fields": ["text"]}), embeddings
+
+
+async def _scenario(
+    prefetch: bool, threads: int, embed_ms: float, think_ms: float, cancel_every: int
+) -> dict:
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    from graph import build_research_graph
+
+    store, embeddings = _store(embed_ms)
+    for user in range(10):
+        for topic in range(5):
+            await store.aput(("memories", f"u{user}"), f"n{topic}", {"text": f"topic {topic}"})
+    graph = build_research_graph(
+        checkpointer=InMemorySaver(), store=store, prefetch_memory=prefetch
+    )
+    starts, resumes = [], []
+    for n in range(threads):
+        config = {"configurable": {"thread_id": f"t{n}"}}
+        state = {
+            "messages": [],
+            "user_query": f"Tell me about topic {n % 5}",
+            "user_id": f"u{n % 10}",
+        }
+        begin = time.perf_counter()
+        await graph.ainvoke(state, config)  # runs to the first interrupt
+        starts.append(time.perf_counter() - begin)
+        await asyncio.sleep(think_ms / 1000)
+        choice = "cancel" if cancel_every and (n + 1) % cancel_every == 0 else "proceed"
+        begin = time.perf_counter()
+        await graph.ainvoke(Command(resume=choice), config)
+        resumes.append(time.perf_counter() - begin)
+    return {
+        "start_p50_ms": round(statistics.median(starts) * 1000, 2),
+        "resume_p50_ms": round(statistics.median(resumes) * 1000, 2),
+        "recalls_completed": embeddings.queries,
+    }
+
+
+def run_benchmark(
+    threads: int = 50, embed_ms: float = 40.0, think_ms: float = 100.0, cancel_every: int = 5
+) -> dict[str, Any]:
+    return {
+        name: asyncio.run(_scenario(prefetch, threads, embed_ms, think_ms, cancel_every))
+        for name, prefetch in (("serial", False), ("prefetch", True))
+    }
+
+
+def _print_report(report: dict[str, Any], threads: int, embed_ms: float) -> None:
+    print(f"\n=== Workflow time to first interrupt: {threads} threads, {embed_ms} ms recall ===")
+    keys = ("start_p50_ms", "resume_p50_ms", "recalls_completed")
+    print(f"  {'':<9} " + " ".join(f"{k:>17}" for k in keys))
+    for name, row in report.items():
+        print(f"  {name:<9} " + " ".join(f"{row[k]:>17}" for k in keys))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--embed-ms", type=float, default=40.0)
+    parser.add_argument("--think-ms", type=float, default=100.0, help="user reading the interrupt")
+    parser.add_argument("--cancel-every", type=int, default=5, help="runs per cancelled run")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+    report = run_benchmark(args.threads, args.embed_ms, args.think_ms, args.cancel_every)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report, args.threads, args.embed_ms)
+
+
+if __name__ == "__main__":
+    main()
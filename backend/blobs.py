@@ -0,0 +1,655 @@
+"""Content-addressed offload of large state values out of checkpoints.
+
+Big text fields — ``analysis``, ``final_response``, research findings, tool
+results inside ``messages``, Deep Agent virtual-filesystem files — are copied
+into every later checkpoint of a thread, and into every fork that shares the
+ancestry. :class:`BlobOffloadSaver` stores each such string once:
+
+- on write, every string of at least ``CHECKPOINT_BLOB_MIN_BYTES`` anywhere in
+  ``channel_values`` (dict / list values, message ``content``) is replaced by a
+  reference (``"\\x00blob:sha256:<hex>"``) and its body goes to a blob table
+  keyed by the hash, so identical values are stored once however many
+  checkpoints, threads or forks hold them. Pending writes (``put_writes`` —
+  each node's output until the next checkpoint) are offloaded the same way,
+  against the checkpoint they belong to;
+- on ``get_tuple`` (running, resuming or forking a thread, ``/get_state``)
+  the references, in the checkpoint and its pending writes, are resolved in
+  one batched read;
+- ``list`` (``/history``) returns checkpoints with the references left in
+  place, so listing history never loads blob bodies. Call :meth:`aresolve`
+  to load them on demand.
+
+Blobs live next to the checkpoints: a ``checkpoint_blobs`` table in the same
+SQLite file (:class:`SqliteBlobStore`) or in each shard's file
+(:class:`ShardedBlobStore`), or a dict for ``MemorySaver``
+(:class:`MemoryBlobStore`). Each checkpoint's references are recorded in
+``checkpoint_blob_refs``; deleting a thread drops its references and
+``retention`` garbage-collects blobs nothing references any more. The memory
+store counts references instead, so a body goes as soon as the last thread
+holding it is deleted or dropped by ``bounded_memory`` eviction.
+
+    CHECKPOINT_BLOB_MIN_BYTES=2048   # offload strings this large (unset/0 = off)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Iterable, Mapping, Optional, Sequence
+
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.serde.types import _DeltaSnapshot
+
+from checkpointing import DelegatingSaver, unwrap
+
+logger = logging.getLogger(__name__)
+
+BLOB_PREFIX = "\x00blob:sha256:"
+
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(BLOB_PREFIX)
+
+
+def _map_strings(value: Any, fn: Callable[[str], str]) -> Any:
+    """Apply ``fn`` to every string in a checkpoint value, rebuilding only what changed."""
+    if isinstance(value, str):
+        return fn(value)
+    if isinstance(value, dict):
+        changed = False
+        out = {}
+        for key, item in value.items():
+            new = _map_strings(item, fn)
+            changed = changed or new is not item
+            out[key] = new
+        return out if changed else value
+    if isinstance(value, (list, tuple)):
+        items = [_map_strings(item, fn) for item in value]
+        if all(new is old for new, old in zip(items, value)):
+            return value
+        return type(value)(items) if isinstance(value, list) else tuple(items)
+    if isinstance(value, BaseMessage):
+        content = _map_strings(value.content, fn)
+        if content is value.content:
+            return value
+        return value.model_copy(update={"content": content})
+    if isinstance(value, _DeltaSnapshot):
+        inner = _map_strings(value.value, fn)
+        return value if inner is value.value else _DeltaSnapshot(inner)
+    return value
+
+
+def offload(value: Any, min_bytes: int) -> tuple[Any, dict[str, str]]:
+    """``value`` with large strings replaced by references, plus ``{hash: body}``."""
+    bodies: dict[str, str] = {}
+
+    def swap(text: str) -> str:
+        if len(text) < min_bytes or is_blob_ref(text):
+            return text
+        digest = hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+        bodies[digest] = text
+        return BLOB_PREFIX + digest
+
+    return _map_strings(value, swap), bodies
+
+
+def references(value: Any) -> set[str]:
+    """Blob hashes referenced anywhere in ``value``."""
+    found: set[str] = set()
+
+    def collect(text: str) -> str:
+        if is_blob_ref(text):
+            found.add(text[len(BLOB_PREFIX) :])
+        return text
+
+    _map_strings(value, collect)
+    return found
+
+
+def restore(value: Any, bodies: Mapping[str, str]) -> Any:
+    """``value`` with every reference found in ``bodies`` replaced by its body."""
+
+    def swap(text: str) -> str:
+        if is_blob_ref(text):
+            return bodies.get(text[len(BLOB_PREFIX) :], text)
+        return text
+
+    return _map_strings(value, swap)
+
+
+class MemoryBlobStore:
+    """Blob table for the in-memory checkpointer, reference-counted."""
+
+    def __init__(self, serde: Any) -> None:
+        self.serde = serde
+        self._blobs: dict[str, tuple[tuple[str, bytes], int]] = {}
+        self._refs: dict[str, dict[tuple[str, str], set[str]]] = defaultdict(dict)
+        self._counts: dict[str, int] = {}  # references per blob
+        self._lock = threading.Lock()
+
+    def _ref(self, refs: set[str], digest: str) -> None:
+        if digest not in refs:
+            refs.add(digest)
+            self._counts[digest] = self._counts.get(digest, 0) + 1
+
+    def _release(self, digest: str) -> None:
+        self._counts[digest] -= 1
+        if not self._counts[digest]:
+            del self._counts[digest]
+            self._blobs.pop(digest, None)
+
+    def put(
+        self, thread_id: str, ns: str, checkpoint_id: str, bodies: Mapping[str, str]
+    ) -> None:
+        with self._lock:
+            refs = self._refs[thread_id].setdefault((ns, checkpoint_id), set())
+            for digest, text in bodies.items():
+                if digest not in self._blobs:
+                    self._blobs[digest] = (self.serde.dumps_typed(text), len(text.encode()))
+                self._ref(refs, digest)
+
+    def get(self, digests: Iterable[str]) -> dict[str, str]:
+        with self._lock:
+            found = {d: self._blobs[d][0] for d in digests if d in self._blobs}
+        return {d: self.serde.loads_typed(typed) for d, typed in found.items()}
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Drop the thread's references, and every body no other thread holds."""
+        with self._lock:
+            for refs in self._refs.pop(thread_id, {}).values():
+                for digest in refs:
+                    self._release(digest)
+
+    def copy_thread(self, source: str, target: str) -> None:
+        with self._lock:
+            for key, refs in list(self._refs.get(source, {}).items()):
+                copied = self._refs[target].setdefault(key, set())
+                for digest in refs:
+                    self._ref(copied, digest)
+
+    def collect(self) -> int:
+        """Delete blobs no checkpoint references; returns how many.
+
+        Bodies are freed by :meth:`delete_thread` as their last reference goes,
+        so this normally finds nothing.
+        """
+        with self._lock:
+            dead = [d for d in self._blobs if d not in self._counts]
+            for digest in dead:
+                del self._blobs[digest]
+            return len(dead)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            refs = [d for refs in self._refs.values() for ds in refs.values() for d in ds]
+            logical = sum(self._blobs[d][1] for d in refs if d in self._blobs)
+            unique = sum(size for _typed, size in self._blobs.values())
+            stored = sum(len(typed[1]) for typed, _size in self._blobs.values())
+            return _stats(len(refs), len(self._blobs), logical, unique, stored)
+
+    async def aput(
+        self, thread_id: str, ns: str, checkpoint_id: str, bodies: Mapping[str, str]
+    ) -> None:
+        self.put(thread_id, ns, checkpoint_id, bodies)
+
+    async def aget(self, digests: Iterable[str]) -> dict[str, str]:
+        return self.get(digests)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+    async def acopy_thread(self, source: str, target: str) -> None:
+        self.copy_thread(source, target)
+
+    async def acollect(self) -> int:
+        return self.collect()
+
+    async def astats(self) -> dict[str, Any]:
+        return self.stats()
+
+
+def _stats(refs: int, blobs: int, logical: int, unique: int, stored: int) -> dict[str, Any]:
+    return {
+        "references": refs,
+        "blobs": blobs,
+        "logical_bytes": logical,  # what the checkpoints would hold inline
+        "unique_bytes": unique,  # distinct bodies, uncompressed
+        "stored_bytes": stored,  # distinct bodies as stored (serde-compressed)
+        "dedup_ratio": round(logical / unique, 2) if unique else 1.0,
+    }
+
+
+class SqliteBlobStore:
+    """Blob tables inside an ``AsyncSqliteSaver``'s database (shares its lock)."""
+
+    def __init__(self, saver: Any) -> None:
+        self.saver = saver
+        self.serde = saver.serde
+        self.is_setup = False
+
+    async def setup(self) -> None:
+        if self.is_setup:
+            return
+        await self.saver.setup()
+        async with self.saver.lock:
+            await self.saver.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+                    hash TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS checkpoint_blob_refs (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL DEFAULT '',
+                    checkpoint_id TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, hash)
+                );
+                CREATE INDEX IF NOT EXISTS checkpoint_blob_refs_hash
+                    ON checkpoint_blob_refs (hash);
+                """
+            )
+            await self.saver.conn.commit()
+        self.is_setup = True
+
+    def _sync(self, coro: Any) -> Any:
+        # Same contract as AsyncSqliteSaver's sync methods: only from other threads.
+        return asyncio.run_coroutine_threadsafe(coro, self.saver.loop).result()
+
+    async def aput(
+        self, thread_id: str, ns: str, checkpoint_id: str, bodies: Mapping[str, str]
+    ) -> None:
+        await self.aput_refs(thread_id, [(ns, checkpoint_id, digest) for digest in bodies], bodies)
+
+    async def aput_refs(
+        self, thread_id: str, refs: Sequence[tuple[str, str, str]], bodies: Mapping[str, str]
+    ) -> None:
+        """Store ``bodies`` and the thread's ``(ns, checkpoint_id, hash)`` references."""
+        await self.setup()
+        rows = []
+        for digest, text in bodies.items():
+            type_, data = self.serde.dumps_typed(text)
+            rows.append((digest, type_, data, len(text.encode("utf-8", "surrogatepass"))))
+        async with self.saver.lock:
+            await self.saver.conn.executemany(
+                "INSERT OR IGNORE INTO checkpoint_blobs (hash, type, data, size) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            await self.saver.conn.executemany(
+                "INSERT OR IGNORE INTO checkpoint_blob_refs "
+                "(thread_id, checkpoint_ns, checkpoint_id, hash) VALUES (?, ?, ?, ?)",
+                [(thread_id, *ref) for ref in refs],
+            )
+            await self.saver.conn.commit()
+
+    async def athread_refs(self, thread_id: str) -> list[tuple[str, str, str]]:
+        """The thread's ``(ns, checkpoint_id, hash)`` references."""
+        await self.setup()
+        async with self.saver.lock:
+            async with self.saver.conn.execute(
+                "SELECT checkpoint_ns, checkpoint_id, hash FROM checkpoint_blob_refs "
+                "WHERE thread_id = ?",
+                (thread_id,),
+            ) as cur:
+                return [tuple(row) for row in await cur.fetchall()]
+
+    async def aget(self, digests: Iterable[str]) -> dict[str, str]:
+        await self.setup()
+        wanted = list(digests)
+        found: dict[str, str] = {}
+        async with self.saver.lock:
+            for start in range(0, len(wanted), 500):
+                chunk = wanted[start : start + 500]
+                async with self.saver.conn.execute(
+                    f"SELECT hash, type, data FROM checkpoint_blobs "
+                    f"WHERE hash IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ) as cur:
+                    rows = await cur.fetchall()
+                found.update({digest: (type_, data) for digest, type_, data in rows})
+        return {digest: self.serde.loads_typed(typed) for digest, typed in found.items()}
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.setup()
+        async with self.saver.lock:
+            await self.saver.conn.execute(
+                "DELETE FROM checkpoint_blob_refs WHERE thread_id = ?", (thread_id,)
+            )
+            await self.saver.conn.commit()
+
+    async def acopy_thread(self, source: str, target: str) -> None:
+        await self.setup()
+        async with self.saver.lock:
+            await self.saver.conn.execute(
+                "INSERT OR IGNORE INTO checkpoint_blob_refs "
+                "SELECT ?, checkpoint_ns, checkpoint_id, hash FROM checkpoint_blob_refs "
+                "WHERE thread_id = ?",
+                (target, source),
+            )
+            await self.saver.conn.commit()
+
+    async def acollect(self) -> int:
+        await self.setup()
+        async with self.saver.lock:
+            cur = await self.saver.conn.execute(
+                "DELETE FROM checkpoint_blobs WHERE hash NOT IN "
+                "(SELECT hash FROM checkpoint_blob_refs)"
+            )
+            await self.saver.conn.commit()
+            return max(cur.rowcount, 0)
+
+    async def astats(self) -> dict[str, Any]:
+        await self.setup()
+        async with self.saver.lock:
+            async with self.saver.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(b.size), 0) FROM checkpoint_blob_refs r "
+                "JOIN checkpoint_blobs b ON b.hash = r.hash"
+            ) as cur:
+                refs, logical = await cur.fetchone()
+            async with self.saver.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) "
+                "FROM checkpoint_blobs"
+            ) as cur:
+                blobs, unique, stored = await cur.fetchone()
+        return _stats(refs, blobs, logical, unique, stored)
+
+    def put(
+        self, thread_id: str, ns: str, checkpoint_id: str, bodies: Mapping[str, str]
+    ) -> None:
+        self._sync(self.aput(thread_id, ns, checkpoint_id, bodies))
+
+    def get(self, digests: Iterable[str]) -> dict[str, str]:
+        return self._sync(self.aget(digests))
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._sync(self.adelete_thread(thread_id))
+
+    def copy_thread(self, source: str, target: str) -> None:
+        self._sync(self.acopy_thread(source, target))
+
+    def collect(self) -> int:
+        return self._sync(self.acollect())
+
+    def stats(self) -> dict[str, Any]:
+        return self._sync(self.astats())
+
+
+class ShardedBlobStore:
+    """A :class:`SqliteBlobStore` per shard of a ``sharding.ShardedSqliteSaver``.
+
+    A thread's blobs and references live in its own shard, so retention and
+    thread deletes stay per file; lookups by hash ask every shard at once,
+    through the shards' read-only connections. Copying a thread into another
+    shard copies the bodies it references along with the references.
+    """
+
+    def __init__(self, saver: Any) -> None:
+        self.saver = saver
+        self.stores = [SqliteBlobStore(shard.writer) for shard in saver.shards]
+        self.serde = self.stores[0].serde
+
+    def _store(self, thread_id: str) -> SqliteBlobStore:
+        return self.stores[self.saver.shards.index(self.saver.shard(thread_id))]
+
+    async def aput(
+        self, thread_id: str, ns: str, checkpoint_id: str, bodies: Mapping[str, str]
+    ) -> None:
+        await self._store(thread_id).aput(thread_id, ns, checkpoint_id, bodies)
+
+    async def aget(self, digests: Iterable[str]) -> dict[str, str]:
+        wanted = list(digests)
+
+        async def lookup(shard: Any, store: SqliteBlobStore) -> dict[str, str]:
+            await store.setup()  # so every shard has the tables its readers query
+            async with shard.reading() as reader:
+                view = SqliteBlobStore(reader)
+                view.is_setup = True
+                return await view.aget(wanted)
+
+        found: dict[str, str] = {}
+        for part in await asyncio.gather(
+            *(lookup(shard, store) for shard, store in zip(self.saver.shards, self.stores))
+        ):
+            found.update(part)
+        return found
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self._store(thread_id).adelete_thread(thread_id)
+
+    async def acopy_thread(self, source: str, target: str) -> None:
+        """Copy ``source``'s references to ``target``, and across shards the bodies too."""
+        store, into = self._store(source), self._store(target)
+        if store is into:
+            await store.acopy_thread(source, target)
+            return
+        refs = await store.athread_refs(source)
+        if refs:
+            bodies = await store.aget({digest for _ns, _cid, digest in refs})
+            await into.aput_refs(target, refs, bodies)
+
+    async def acollect(self) -> int:
+        return sum(await asyncio.gather(*(store.acollect() for store in self.stores)))
+
+    async def astats(self) -> dict[str, Any]:
+        parts = await asyncio.gather(*(store.astats() for store in self.stores))
+        keys = ("references", "blobs", "logical_bytes", "unique_bytes", "stored_bytes")
+        return _stats(*(sum(part[key] for part in parts) for key in keys))
+
+    def _sync(self, coro: Any) -> Any:
+        return self.stores[0]._sync(coro)
+
+    def put(
+        self, thread_id: str, ns: str, checkpoint_id: str, bodies: Mapping[str, str]
+    ) -> None:
+        self._sync(self.aput(thread_id, ns, checkpoint_id, bodies))
+
+    def get(self, digests: Iterable[str]) -> dict[str, str]:
+        return self._sync(self.aget(digests))
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._sync(self.adelete_thread(thread_id))
+
+    def copy_thread(self, source: str, target: str) -> None:
+        self._sync(self.acopy_thread(source, target))
+
+    def collect(self) -> int:
+        return self._sync(self.acollect())
+
+    def stats(self) -> dict[str, Any]:
+        return self._sync(self.astats())
+
+
+def blob_store_for(saver: BaseCheckpointSaver) -> Any:
+    """The blob store matching the backing saver under ``saver``."""
+    backing = unwrap(saver)
+    if type(backing).__name__ == "AsyncSqliteSaver":
+        return SqliteBlobStore(backing)
+    if type(backing).__name__ == "ShardedSqliteSaver":
+        return ShardedBlobStore(backing)
+    return MemoryBlobStore(backing.serde)
+
+
+def _scope(config: RunnableConfig, checkpoint_id: Optional[str] = None) -> tuple[str, str, str]:
+    configurable = config["configurable"]
+    return (
+        str(configurable["thread_id"]),
+        configurable.get("checkpoint_ns", ""),
+        checkpoint_id or configurable["checkpoint_id"],
+    )
+
+
+def _wanted(found: Optional[CheckpointTuple]) -> set[str]:
+    if found is None:
+        return set()
+    return references(found.checkpoint["channel_values"]) | references(found.pending_writes)
+
+
+class BlobOffloadSaver(DelegatingSaver):
+    """Store large strings in checkpoints once, by content hash (module docstring)."""
+
+    def __init__(
+        self, inner: BaseCheckpointSaver, min_bytes: int = 2048, store: Any = None
+    ) -> None:
+        super().__init__(inner)
+        self.min_bytes = min_bytes
+        self.store = store if store is not None else blob_store_for(inner)
+
+    # --- helpers ----------------------------------------------------------------
+    def _split(self, checkpoint: Checkpoint) -> tuple[Checkpoint, dict[str, str]]:
+        values, bodies = offload(checkpoint["channel_values"], self.min_bytes)
+        if not bodies:
+            return checkpoint, bodies
+        return {**checkpoint, "channel_values": values}, bodies
+
+    def _split_writes(
+        self, writes: Sequence[tuple[str, Any]]
+    ) -> tuple[list[tuple[str, Any]], dict[str, str]]:
+        stored: list[tuple[str, Any]] = []
+        bodies: dict[str, str] = {}
+        for channel, value in writes:
+            value, found = offload(value, self.min_bytes)
+            stored.append((channel, value))
+            bodies.update(found)
+        return stored, bodies
+
+    def _restored(
+        self, found: Optional[CheckpointTuple], bodies: Mapping[str, str]
+    ) -> Optional[CheckpointTuple]:
+        if found is None or not bodies:
+            return found
+        checkpoint = {
+            **found.checkpoint,
+            "channel_values": restore(found.checkpoint["channel_values"], bodies),
+        }
+        pending = found.pending_writes and restore(found.pending_writes, bodies)
+        return found._replace(checkpoint=checkpoint, pending_writes=pending)
+
+    def _missing(self, wanted: set[str], bodies: Mapping[str, str]) -> None:
+        missing = wanted - set(bodies)
+        if missing:
+            logger.error(
+                "Checkpoint references %d missing blob(s): %s", len(missing), sorted(missing)[:3]
+            )
+
+    async def aresolve(self, value: Any) -> Any:
+        """Load the blob bodies referenced in ``value`` (e.g. a ``/history`` entry)."""
+        wanted = references(value)
+        if not wanted:
+            return value
+        bodies = await self.store.aget(wanted)
+        self._missing(wanted, bodies)
+        return restore(value, bodies)
+
+    def resolve(self, value: Any) -> Any:
+        wanted = references(value)
+        if not wanted:
+            return value
+        bodies = self.store.get(wanted)
+        self._missing(wanted, bodies)
+        return restore(value, bodies)
+
+    # --- sync -----------------------------------------------------------------
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        found = self.inner.get_tuple(config)
+        wanted = _wanted(found)
+        bodies = self.store.get(wanted) if wanted else {}
+        self._missing(wanted, bodies)
+        return self._restored(found, bodies)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        stored, bodies = self._split(checkpoint)
+        if bodies:  # blobs first: a checkpoint never points at a missing body
+            self.store.put(*_scope(config, checkpoint["id"]), bodies)
+        return self.inner.put(config, stored, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        stored, bodies = self._split_writes(writes)
+        if bodies:
+            self.store.put(*_scope(config), bodies)
+        return self.inner.put_writes(config, stored, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.inner.delete_thread(thread_id)
+        self.store.delete_thread(thread_id)
+
+    def copy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        self.inner.copy_thread(source_thread_id, target_thread_id)
+        self.store.copy_thread(source_thread_id, target_thread_id)
+
+    def get_delta_channel_history(
+        self, *, config: RunnableConfig, channels: Sequence[str]
+    ) -> Mapping[str, Any]:
+        history = self.inner.get_delta_channel_history(config=config, channels=channels)
+        return self.resolve(dict(history))
+
+    # --- async ----------------------------------------------------------------
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        found = await self.inner.aget_tuple(config)
+        wanted = _wanted(found)
+        bodies = await self.store.aget(wanted) if wanted else {}
+        self._missing(wanted, bodies)
+        return self._restored(found, bodies)
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        stored, bodies = self._split(checkpoint)
+        if bodies:
+            await self.store.aput(*_scope(config, checkpoint["id"]), bodies)
+        return await self.inner.aput(config, stored, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        stored, bodies = self._split_writes(writes)
+        if bodies:
+            await self.store.aput(*_scope(config), bodies)
+        return await self.inner.aput_writes(config, stored, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.inner.adelete_thread(thread_id)
+        await self.store.adelete_thread(thread_id)
+
+    async def acopy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        await self.inner.acopy_thread(source_thread_id, target_thread_id)
+        await self.store.acopy_thread(source_thread_id, target_thread_id)
+
+    async def aget_delta_channel_history(
+        self, *, config: RunnableConfig, channels: Sequence[str]
+    ) -> Mapping[str, Any]:
+        history = await self.inner.aget_delta_channel_history(config=config, channels=channels)
+        return await self.aresolve(dict(history))
@@ -0,0 +1,332 @@
+"""A bounded in-memory checkpointer for servers without ``CHECKPOINT_DB``.
+
+``MemorySaver`` keeps every checkpoint of every thread for the life of the
+process. Threads abandoned at an interrupt never finish, so a long-running dev
+or staging server's memory only ever grows. :class:`BoundedMemorySaver` caps
+how many threads stay resident:
+
+- **LRU** — beyond ``CHECKPOINT_MEMORY_MAX_THREADS`` threads, the least
+  recently used thread is evicted;
+- **idle TTL** — threads untouched for ``CHECKPOINT_MEMORY_IDLE_SECONDS`` are
+  evicted (checked on every write, oldest first, and by a periodic sweep —
+  :meth:`BoundedMemorySaver.sweep_idle`, run by ``open_checkpointer`` — so
+  idle threads also go while nothing is written);
+- **spill** — with ``CHECKPOINT_SPILL_PATH`` set, an evicted thread's
+  checkpoints, writes and channel values are written to a local SQLite file
+  (already serialised, so spilling never re-encodes state), and the next read
+  or write of that thread loads it back: a late ``/resume`` still works.
+  Without a spill file, evicted threads are gone.
+
+Resident and spilled thread counts and evictions are exported as
+``checkpoint_memory_threads{state}`` and
+``checkpoint_memory_evictions_total{reason,action}``.
+
+``checkpointing.open_checkpointer`` uses it instead of ``MemorySaver`` when a
+bound is configured:
+
+    CHECKPOINT_MEMORY_MAX_THREADS=1000
+    CHECKPOINT_MEMORY_IDLE_SECONDS=3600
+    CHECKPOINT_SPILL_PATH=.checkpoint-spill.sqlite
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Iterator, Mapping, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+MEMORY_THREADS = REGISTRY.gauge(
+    "checkpoint_memory_threads",
+    "Threads held by the bounded in-memory checkpointer, by state (resident, spilled).",
+    ("state",),
+)
+MEMORY_EVICTIONS = REGISTRY.counter(
+    "checkpoint_memory_evictions_total",
+    "Threads evicted from memory, by reason (lru, idle) and action (spilled, dropped).",
+    ("reason", "action"),
+)
+MEMORY_RESTORES = REGISTRY.counter(
+    "checkpoint_memory_restores_total",
+    "Spilled threads loaded back into memory on access.",
+)
+
+
+class SpillFile:
+    """Evicted threads, one row each, in a local SQLite file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spilled_threads ("
+            "thread_id TEXT PRIMARY KEY, type TEXT NOT NULL, data BLOB NOT NULL, "
+            "spilled_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def put(self, thread_id: str, typed: tuple[str, bytes]) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO spilled_threads VALUES (?, ?, ?, ?)",
+            (thread_id, typed[0], typed[1], time.time()),
+        )
+        self._conn.commit()
+
+    def pop(self, thread_id: str) -> Optional[tuple[str, bytes]]:
+        row = self._conn.execute(
+            "SELECT type, data FROM spilled_threads WHERE thread_id = ?", (thread_id,)
+        ).fetchone()
+        if row is not None:
+            self.delete(thread_id)
+        return row
+
+    def delete(self, thread_id: str) -> None:
+        self._conn.execute("DELETE FROM spilled_threads WHERE thread_id = ?", (thread_id,))
+        self._conn.commit()
+
+    def thread_ids(self) -> list[str]:
+        return [row[0] for row in self._conn.execute("SELECT thread_id FROM spilled_threads")]
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM spilled_threads").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """``InMemorySaver`` with LRU / idle eviction and optional spill-to-disk.
+
+    ``max_threads`` / ``idle_seconds`` of 0 disable that bound. The async
+    methods of ``InMemorySaver`` call the sync ones, so overriding those covers
+    both; spill I/O is a local SQLite read or write of one row.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_threads: int = 0,
+        idle_seconds: float = 0.0,
+        spill_path: Optional[str] = None,
+        serde: Any = None,
+    ) -> None:
+        super().__init__(serde=serde)
+        self.max_threads = max_threads
+        self.idle_seconds = idle_seconds
+        self.spill = SpillFile(spill_path) if spill_path else None
+        self._last_used: OrderedDict[str, float] = OrderedDict()
+        # ``writes`` / ``blobs`` keys per thread, so dumping or dropping a
+        # thread doesn't scan every thread's entries.
+        self._write_keys: defaultdict[str, set[tuple]] = defaultdict(set)
+        self._blob_keys: defaultdict[str, set[tuple]] = defaultdict(set)
+        self._lock = threading.RLock()
+        # Called with each evicted thread_id (``wrap_saver`` points it at the
+        # checkpoint cache, so evicted state doesn't stay resident there).
+        self.on_evict: Optional[Callable[[str], None]] = None
+        # Called with each thread evicted without a spill file to keep it (its
+        # offloaded blobs can go; ``wrap_saver`` points it at the blob store).
+        self.on_drop: Optional[Callable[[str], None]] = None
+        self._report()
+
+    def _report(self) -> None:
+        MEMORY_THREADS.set(len(self._last_used), state="resident")
+        MEMORY_THREADS.set(self.spill.count() if self.spill else 0, state="spilled")
+
+    # --- residency --------------------------------------------------------------
+    def _touch(self, thread_id: str, create: bool = True) -> None:
+        """Mark ``thread_id`` used, loading it back from the spill file if needed.
+
+        Reads (``create=False``) of a thread that doesn't exist don't track it.
+        """
+        with self._lock:
+            if thread_id not in self._last_used:
+                typed = self.spill.pop(thread_id) if self.spill is not None else None
+                if typed is not None:
+                    self._load(thread_id, self.serde.loads_typed(typed))
+                    MEMORY_RESTORES.inc()
+                    logger.info("Restored spilled checkpoint thread %s", thread_id)
+                elif not create:
+                    return
+            self._last_used[thread_id] = time.monotonic()
+            self._last_used.move_to_end(thread_id)
+
+    def _enforce(self) -> None:
+        with self._lock:
+            changed = False
+            if self.idle_seconds:
+                cutoff = time.monotonic() - self.idle_seconds
+                while self._last_used:
+                    thread_id, used = next(iter(self._last_used.items()))
+                    if used > cutoff:
+                        break
+                    self._evict(thread_id, "idle")
+                    changed = True
+            while self.max_threads and len(self._last_used) > self.max_threads:
+                self._evict(next(iter(self._last_used)), "lru")
+                changed = True
+            if changed:
+                self._report()
+            else:
+                MEMORY_THREADS.set(len(self._last_used), state="resident")
+
+    def _evict(self, thread_id: str, reason: str) -> None:
+        self._last_used.pop(thread_id, None)
+        payload = self._dump(thread_id)
+        self._forget(thread_id)
+        action = "dropped"
+        if self.spill is not None and payload["storage"]:
+            self.spill.put(thread_id, self.serde.dumps_typed(payload))
+            action = "spilled"
+        if self.on_evict is not None:
+            self.on_evict(thread_id)
+        if action == "dropped" and self.on_drop is not None:
+            self.on_drop(thread_id)
+        MEMORY_EVICTIONS.inc(reason=reason, action=action)
+        logger.debug("Evicted checkpoint thread %s (%s, %s)", thread_id, reason, action)
+
+    def _dump(self, thread_id: str) -> dict[str, Any]:
+        """Everything stored for ``thread_id``, as msgpack-friendly lists."""
+        storage = [
+            [ns, cid, *checkpoint, *metadata, parent]
+            for ns, checkpoints in self.storage.get(thread_id, {}).items()
+            for cid, (checkpoint, metadata, parent) in checkpoints.items()
+        ]
+        writes = [
+            [*key[1:], task_id, idx, channel, *typed, task_path]  # key[1:] = ns, cid
+            for key in self._write_keys.get(thread_id, ())
+            for (task_id, idx), (_task, channel, typed, task_path) in self.writes.get(
+                key, {}
+            ).items()
+        ]
+        blobs = [
+            [*key[1:], *self.blobs[key]]  # key[1:] = ns, channel, version
+            for key in self._blob_keys.get(thread_id, ())
+            if key in self.blobs
+        ]
+        return {"storage": storage, "writes": writes, "blobs": blobs}
+
+    def _load(self, thread_id: str, payload: Mapping[str, Any]) -> None:
+        for ns, cid, ctype, cdata, mtype, mdata, parent in payload["storage"]:
+            self.storage[thread_id][ns][cid] = ((ctype, cdata), (mtype, mdata), parent)
+        for ns, cid, task_id, idx, channel, vtype, vdata, task_path in payload["writes"]:
+            entry = (task_id, channel, (vtype, vdata), task_path)
+            self.writes[(thread_id, ns, cid)][(task_id, idx)] = entry
+            self._write_keys[thread_id].add((thread_id, ns, cid))
+        for ns, channel, version, vtype, vdata in payload["blobs"]:
+            self.blobs[(thread_id, ns, channel, version)] = (vtype, vdata)
+            self._blob_keys[thread_id].add((thread_id, ns, channel, version))
+
+    def _forget(self, thread_id: str) -> None:
+        """``InMemorySaver.delete_thread`` through the per-thread key index."""
+        self.storage.pop(thread_id, None)
+        for key in self._write_keys.pop(thread_id, ()):
+            self.writes.pop(key, None)
+        for key in self._blob_keys.pop(thread_id, ()):
+            self.blobs.pop(key, None)
+
+    def evict_idle(self) -> None:
+        """Apply the bounds now (they are otherwise checked on each write)."""
+        self._enforce()
+
+    async def sweep_idle(self, interval: Optional[float] = None) -> None:
+        """Call :meth:`evict_idle` every ``interval`` seconds until cancelled.
+
+        Defaults to a quarter of the idle TTL, between 1 and 60 seconds.
+        """
+        interval = interval or min(60.0, max(1.0, self.idle_seconds / 4))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.evict_idle()
+            except Exception:
+                logger.exception("Checkpoint memory sweep failed")
+
+    def close(self) -> None:
+        if self.spill is not None:
+            self.spill.close()
+
+    # --- BaseCheckpointSaver -----------------------------------------------------
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        self._touch(thread_id, create=False)
+        found = super().get_tuple(config)
+        if thread_id not in self._last_used:
+            # InMemorySaver's defaultdict just created an empty entry for it.
+            self.storage.pop(thread_id, None)
+        return found
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        # Without a thread_id this lists resident threads only.
+        if config and config.get("configurable", {}).get("thread_id") is not None:
+            self._touch(config["configurable"]["thread_id"], create=False)
+        return super().list(config, filter=filter, before=before, limit=limit)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        self._touch(thread_id)
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        ns = config["configurable"]["checkpoint_ns"]
+        self._blob_keys[thread_id].update(
+            (thread_id, ns, channel, version) for channel, version in new_versions.items()
+        )
+        self._enforce()
+        return saved
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        self._touch(thread_id)
+        super().put_writes(config, writes, task_id, task_path)
+        if writes:
+            self._write_keys[thread_id].add(
+                (thread_id, configurable.get("checkpoint_ns", ""), configurable["checkpoint_id"])
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._last_used.pop(thread_id, None)
+            self._forget(thread_id)
+            if self.spill is not None:
+                self.spill.delete(thread_id)
+            self._report()
+
+    def get_delta_channel_history(
+        self, *, config: RunnableConfig, channels: Sequence[str]
+    ) -> Mapping[str, Any]:
+        self._touch(config["configurable"]["thread_id"], create=False)
+        return super().get_delta_channel_history(config=config, channels=channels)
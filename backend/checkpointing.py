@@ -0,0 +1,544 @@
+"""Checkpointer construction and composable saver wrappers.
+
+``main.lifespan`` gets its checkpointer from :func:`open_checkpointer`, which
+picks the backing saver from the environment:
+
+- ``CHECKPOINT_DB=checkpoints.sqlite`` → durable ``AsyncSqliteSaver``;
+- ... plus ``CHECKPOINT_SHARDS=K`` → :class:`sharding.ShardedSqliteSaver`,
+  threads spread over K WAL files with a reader pool each;
+- unset → in-memory ``MemorySaver``, or :class:`bounded_memory.BoundedMemorySaver`
+  (LRU / idle eviction, optional spill file) when ``CHECKPOINT_MEMORY_*`` bounds
+  are set.
+
+Either way it serialises with :class:`serialization.CompactSerializer`, which
+compresses large checkpoints (``CHECKPOINT_COMPRESSION``).
+
+The backing saver is then wrapped in layers that each add one concern without
+caring what sits underneath. Every layer derives from :class:`DelegatingSaver`,
+which forwards the whole ``BaseCheckpointSaver`` surface (including the
+``DeltaChannel`` history hooks) to the wrapped saver, so a layer only overrides
+the methods it cares about:
+
+- :class:`blobs.BlobOffloadSaver` — stores large strings once, by content
+  hash, outside the checkpoints (``CHECKPOINT_BLOB_MIN_BYTES``).
+- :class:`InstrumentedSaver` — times reads and writes into ``metrics``.
+- :class:`CachedSaver` — keeps each recently touched thread's latest checkpoint
+  deserialised in a bounded LRU (``CHECKPOINT_CACHE_SIZE``, off by default).
+  Writes from other processes don't invalidate it, so enable it only when
+  each thread is served by one process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Iterator, Mapping, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    copy_checkpoint,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from metrics import CHECKPOINT_DURATION, record_cache
+from serialization import CompactSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class DelegatingSaver(BaseCheckpointSaver):
+    """A checkpointer that forwards every call to ``inner``.
+
+    Subclass and override only what a layer changes. ``serde`` is shared with
+    the inner saver so state written through the wrapper stays readable by the
+    bare saver (and vice versa).
+    """
+
+    def __init__(self, inner: BaseCheckpointSaver) -> None:
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+
+    @property
+    def config_specs(self) -> list:
+        return self.inner.config_specs
+
+    def with_allowlist(self, extra_allowlist: Any) -> "DelegatingSaver":
+        # The inner saver does the (de)serialising, so that is where a strict
+        # msgpack allowlist has to land.
+        clone = copy.copy(self)
+        clone.inner = self.inner.with_allowlist(extra_allowlist)
+        clone.serde = clone.inner.serde
+        return clone
+
+    # --- sync -----------------------------------------------------------------
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.inner.get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        return self.inner.list(config, filter=filter, before=before, limit=limit)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self.inner.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return self.inner.put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        return self.inner.delete_thread(thread_id)
+
+    def delete_for_runs(self, run_ids: Sequence[str]) -> None:
+        return self.inner.delete_for_runs(run_ids)
+
+    def copy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        return self.inner.copy_thread(source_thread_id, target_thread_id)
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        return self.inner.prune(thread_ids, strategy=strategy)
+
+    def get_delta_channel_history(
+        self, *, config: RunnableConfig, channels: Sequence[str]
+    ) -> Mapping[str, Any]:
+        return self.inner.get_delta_channel_history(config=config, channels=channels)
+
+    def get_next_version(self, current: Any, channel: None) -> Any:
+        return self.inner.get_next_version(current, channel)
+
+    # --- async ----------------------------------------------------------------
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await self.inner.aget_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        async for item in self.inner.alist(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await self.inner.aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await self.inner.aput_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await self.inner.adelete_thread(thread_id)
+
+    async def adelete_for_runs(self, run_ids: Sequence[str]) -> None:
+        return await self.inner.adelete_for_runs(run_ids)
+
+    async def acopy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        return await self.inner.acopy_thread(source_thread_id, target_thread_id)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        return await self.inner.aprune(thread_ids, strategy=strategy)
+
+    async def aget_delta_channel_history(
+        self, *, config: RunnableConfig, channels: Sequence[str]
+    ) -> Mapping[str, Any]:
+        return await self.inner.aget_delta_channel_history(config=config, channels=channels)
+
+
+def unwrap(saver: BaseCheckpointSaver) -> BaseCheckpointSaver:
+    """Return the innermost (backing) saver beneath any wrapper layers."""
+    while isinstance(saver, DelegatingSaver):
+        saver = saver.inner
+    return saver
+
+
+def find_layer(saver: BaseCheckpointSaver, layer: type) -> Optional[Any]:
+    """The first wrapper of type ``layer`` in the stack, or None."""
+    while isinstance(saver, DelegatingSaver):
+        if isinstance(saver, layer):
+            return saver
+        saver = saver.inner
+    return None
+
+
+class InstrumentedSaver(DelegatingSaver):
+    """Record checkpoint read / write latency in ``checkpoint_operation_duration_seconds``."""
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        start = time.perf_counter()
+        try:
+            return await self.inner.aget_tuple(config)
+        finally:
+            CHECKPOINT_DURATION.observe(time.perf_counter() - start, op="get")
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        start = time.perf_counter()
+        try:
+            async for item in self.inner.alist(config, filter=filter, before=before, limit=limit):
+                yield item
+        finally:
+            CHECKPOINT_DURATION.observe(time.perf_counter() - start, op="list")
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        start = time.perf_counter()
+        try:
+            return await self.inner.aput(config, checkpoint, metadata, new_versions)
+        finally:
+            CHECKPOINT_DURATION.observe(time.perf_counter() - start, op="put")
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        start = time.perf_counter()
+        try:
+            return await self.inner.aput_writes(config, writes, task_id, task_path)
+        finally:
+            CHECKPOINT_DURATION.observe(time.perf_counter() - start, op="put_writes")
+
+
+def _thread_key(config: RunnableConfig) -> tuple[str, str]:
+    configurable = config.get("configurable", {})
+    return str(configurable.get("thread_id")), configurable.get("checkpoint_ns", "")
+
+
+def _thread_scope(config: RunnableConfig) -> tuple[list[str], str]:
+    thread_id, checkpoint_ns = _thread_key(config)
+    return [thread_id], checkpoint_ns
+
+
+class CachedSaver(DelegatingSaver):
+    """Read-through LRU of each thread's *latest* checkpoint, invalidated on write.
+
+    ``/start``, ``/resume`` and ``/continue`` read a thread's state right after
+    running it, the streamers read it again at the end, and the UI polls
+    ``/get_state`` — each a full read + deserialise on a SQLite-backed saver.
+    This layer answers "latest checkpoint of (thread, namespace)" reads from
+    memory (and reads that name the cached checkpoint id); every write to a
+    thread drops its entry, so the next read goes to the inner saver again.
+
+    Callers get a copy of the cached tuple — the Pregel loop mutates the
+    checkpoint it loads. Writes invalidate both before and after they reach the
+    inner saver, so a read that raced with a write is never cached.
+    Works with any ``BaseCheckpointSaver``, but only sees writes made through
+    this process — disable it when several replicas share one database without
+    sticky routing.
+    """
+
+    def __init__(self, inner: BaseCheckpointSaver, maxsize: int = 256) -> None:
+        super().__init__(inner)
+        self.maxsize = maxsize
+        self._entries: OrderedDict[tuple[str, str], CheckpointTuple] = OrderedDict()
+        # Bumped on every invalidation; a read only fills the cache if no write
+        # happened while it was in flight.
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    # --- cache bookkeeping ------------------------------------------------------
+    def _lookup(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        key = _thread_key(config)
+        wanted = config.get("configurable", {}).get("checkpoint_id")
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None or (wanted and cached.checkpoint["id"] != wanted):
+                return None
+            self._entries.move_to_end(key)
+        return cached._replace(
+            checkpoint=copy_checkpoint(cached.checkpoint),
+            metadata=dict(cached.metadata),
+            pending_writes=list(cached.pending_writes or []),
+        )
+
+    def _fill(self, config: RunnableConfig, epoch: int, found: Optional[CheckpointTuple]) -> None:
+        # Only "latest" reads are cacheable: a read by id may be an old checkpoint.
+        if found is None or config.get("configurable", {}).get("checkpoint_id"):
+            return
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            key = _thread_key(config)
+            self._entries[key] = found._replace(checkpoint=copy_checkpoint(found.checkpoint))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(
+        self, thread_id: Optional[str] = None, checkpoint_ns: Optional[str] = None
+    ) -> None:
+        """Drop cached entries for a thread (one namespace or all), or everything."""
+        with self._lock:
+            self._epoch += 1
+            if thread_id is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == str(thread_id)]:
+                if checkpoint_ns is None or key[1] == checkpoint_ns:
+                    del self._entries[key]
+
+    def _drop(self, thread_ids: Optional[Sequence[str]], checkpoint_ns: Optional[str]) -> None:
+        if thread_ids is None:
+            self.invalidate()
+        for thread_id in thread_ids or ():
+            self.invalidate(thread_id, checkpoint_ns)
+
+    @contextmanager
+    def _writing(
+        self, thread_ids: Optional[Sequence[str]] = None, checkpoint_ns: Optional[str] = None
+    ) -> Iterator[None]:
+        """Invalidate around a write (``thread_ids=None`` → everything).
+
+        Before, so nobody is served the old state once the write may have
+        landed; after, so a read that overlapped the write can't re-fill the
+        cache with what it saw.
+        """
+        self._drop(thread_ids, checkpoint_ns)
+        try:
+            yield
+        finally:
+            self._drop(thread_ids, checkpoint_ns)
+
+    # --- reads --------------------------------------------------------------------
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        cached = self._lookup(config)
+        record_cache("checkpoint", cached is not None)
+        if cached is not None:
+            return cached
+        epoch = self._epoch
+        found = self.inner.get_tuple(config)
+        self._fill(config, epoch, found)
+        return found
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        cached = self._lookup(config)
+        record_cache("checkpoint", cached is not None)
+        if cached is not None:
+            return cached
+        epoch = self._epoch
+        found = await self.inner.aget_tuple(config)
+        self._fill(config, epoch, found)
+        return found
+
+    # --- writes (invalidate) ----------------------------------------------------------
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with self._writing(*_thread_scope(config)):
+            return self.inner.put(config, checkpoint, metadata, new_versions)
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with self._writing(*_thread_scope(config)):
+            return await self.inner.aput(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with self._writing(*_thread_scope(config)):
+            return self.inner.put_writes(config, writes, task_id, task_path)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with self._writing(*_thread_scope(config)):
+            return await self.inner.aput_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._writing([thread_id]):
+            return self.inner.delete_thread(thread_id)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        with self._writing([thread_id]):
+            return await self.inner.adelete_thread(thread_id)
+
+    def delete_for_runs(self, run_ids: Sequence[str]) -> None:
+        with self._writing():
+            return self.inner.delete_for_runs(run_ids)
+
+    async def adelete_for_runs(self, run_ids: Sequence[str]) -> None:
+        with self._writing():
+            return await self.inner.adelete_for_runs(run_ids)
+
+    def copy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        with self._writing([target_thread_id]):
+            return self.inner.copy_thread(source_thread_id, target_thread_id)
+
+    async def acopy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        with self._writing([target_thread_id]):
+            return await self.inner.acopy_thread(source_thread_id, target_thread_id)
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        with self._writing(list(thread_ids)):
+            return self.inner.prune(thread_ids, strategy=strategy)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        with self._writing(list(thread_ids)):
+            return await self.inner.aprune(thread_ids, strategy=strategy)
+
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "").strip() or default)
+    except ValueError:
+        return default
+
+
+def wrap_saver(saver: BaseCheckpointSaver) -> BaseCheckpointSaver:
+    """Apply the configured wrapper layers to a backing saver (innermost first)."""
+    blob_min_bytes = _int_env("CHECKPOINT_BLOB_MIN_BYTES", 0)
+    if blob_min_bytes > 0:
+        from blobs import BlobOffloadSaver
+
+        saver = BlobOffloadSaver(saver, min_bytes=blob_min_bytes)
+        if hasattr(saver.inner, "on_drop"):  # bounded_memory: dropped threads free their blobs
+            saver.inner.on_drop = saver.store.delete_thread
+    cache_size = _int_env("CHECKPOINT_CACHE_SIZE", 0)
+    if cache_size > 0:
+        saver = CachedSaver(saver, maxsize=cache_size)
+        backing = unwrap(saver)
+        if hasattr(backing, "on_evict"):  # bounded_memory: evicted threads leave the cache too
+            backing.on_evict = saver.invalidate
+    return InstrumentedSaver(saver)
+
+
+@asynccontextmanager
+async def open_checkpointer() -> AsyncIterator[BaseCheckpointSaver]:
+    """Open the configured checkpointer for the lifetime of the app.
+
+    Yields the backing saver wrapped in the layers described in the module
+    docstring; connections are closed on exit.
+    """
+    checkpoint_db = os.getenv("CHECKPOINT_DB")
+    # Compresses large checkpoints; still reads uncompressed ones (see serialization).
+    serde = CompactSerializer.from_env()
+    shards = _int_env("CHECKPOINT_SHARDS", 1)
+    if checkpoint_db and shards > 1:
+        from sharding import ShardedSqliteSaver
+
+        readers = max(0, _int_env("CHECKPOINT_SHARD_READERS", 2))
+        async with ShardedSqliteSaver.open(
+            checkpoint_db, shards, readers=readers, serde=serde
+        ) as saver:
+            yield wrap_saver(saver)
+    elif checkpoint_db:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        logger.info("Using durable AsyncSqliteSaver at %s", checkpoint_db)
+        async with aiosqlite.connect(checkpoint_db) as conn:
+            saver = AsyncSqliteSaver(conn, serde=serde)
+            # New files get incremental auto-vacuum so retention (see
+            # retention.py) can hand freed pages back; no-op once tables exist.
+            await saver.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            yield wrap_saver(saver)
+    else:
+        max_threads = _int_env("CHECKPOINT_MEMORY_MAX_THREADS", 0)
+        idle_seconds = _int_env("CHECKPOINT_MEMORY_IDLE_SECONDS", 0)
+        if max_threads > 0 or idle_seconds > 0:
+            from bounded_memory import BoundedMemorySaver
+
+            spill_path = os.getenv("CHECKPOINT_SPILL_PATH") or None
+            logger.info(
+                "Using bounded in-memory saver (max %s threads, idle %ss, spill %s)",
+                max_threads or "∞",
+                idle_seconds or "∞",
+                spill_path or "off",
+            )
+            bounded = BoundedMemorySaver(
+                max_threads=max(0, max_threads),
+                idle_seconds=max(0, idle_seconds),
+                spill_path=spill_path,
+                serde=serde,
+            )
+            # Idle threads are evicted on writes; the sweep covers quiet periods.
+            sweeper = (
+                asyncio.get_running_loop().create_task(
+                    bounded.sweep_idle(), name="checkpoint-memory-sweep"
+                )
+                if idle_seconds > 0
+                else None
+            )
+            try:
+                yield wrap_saver(bounded)
+            finally:
+                if sweeper is not None:
+                    sweeper.cancel()
+                    try:
+                        await sweeper
+                    except asyncio.CancelledError:
+                        pass
+                bounded.close()
+        else:
+            logger.info("Using in-memory MemorySaver (set CHECKPOINT_DB for durability)")
+            yield wrap_saver(MemorySaver(serde=serde))
@@ -0,0 +1,28 @@
+"""Pytest hooks shared by the backend test suite.
+
+Blocking-call budget (test mode of ``loop_monitor``): run the suite with
+``LOOP_BLOCK_BUDGET_MS=250`` and any test during which the app's event loop
+stalled for longer than that fails, with the offending stack in the report.
+"""
+
+import pytest
+
+import loop_monitor
+
+
+@pytest.fixture(autouse=True)
+def _loop_block_budget():
+    budget = loop_monitor.block_budget()
+    if budget is None:
+        yield
+        return
+    mark = loop_monitor.last_seq()
+    yield
+    over = [b for b in loop_monitor.blocks_since(mark) if b.seconds > budget]
+    if over:
+        worst = max(over, key=lambda b: b.seconds)
+        pytest.fail(
+            f"{worst.describe()}, over the {budget * 1000:.0f} ms budget "
+            f"(LOOP_BLOCK_BUDGET_MS):\n{worst.stack or '(stack not captured)'}",
+            pytrace=False,
+        )
@@ -0,0 +1,318 @@
+"""Per-user consolidation of long-term memory notes.
+
+``save_user_memory`` stores a new note under a fresh key on every run, so an
+active user piles up thousands of near-identical "Asked about: ..." notes.
+Recall gets slower and noisier, and storage grows without bound. A
+:class:`MemoryConsolidator` runs in the background and, per user:
+
+- **deduplicates** — a new note whose words overlap an older live note's by at
+  least ``similarity`` (Jaccard) replaces it;
+- **summarises and caps** — beyond ``max_notes`` live notes, the oldest are
+  folded into one ``summary`` memory (key ``summary``) and deleted. The summary
+  keeps the last ``max_topics`` topics and a count of the preferred formats.
+  With ``MEMORY_CONSOLIDATION_LLM=true`` (and a real model) the chat model
+  rewrites it in prose; otherwise it is extracted from the notes.
+
+It is incremental. The notes saved since the last pass arrive through a save
+hook (:func:`memory.add_save_hook`). The live notes are tracked in a small
+state item (``("memory_state", user_id)`` / ``consolidation``), so a pass
+reads one item per user and never rescans their history. A user seen for
+the first time is scanned once, which picks up notes saved before
+consolidation was on. Only plain notes (``{"text": ...}``) are touched; other
+items in the namespace are left alone.
+
+Configured by :meth:`ConsolidationPolicy.from_env`::
+
+    MEMORY_CONSOLIDATION=false            # off
+    MEMORY_MAX_NOTES=200                  # live notes per user (0 = no cap)
+    MEMORY_DEDUP_SIMILARITY=0.8
+    MEMORY_CONSOLIDATION_INTERVAL=30      # seconds between passes
+    MEMORY_CONSOLIDATION_LLM=false
+
+Several workers each consolidate the users whose notes they saved. The state
+item is last-writer-wins, so a user active on two workers at once may keep a
+duplicate until a later pass.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Awaitable, Callable, Optional
+
+from langgraph.store.base import BaseStore, PutOp
+
+import memory
+from memory_store import _words
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CONSOLIDATED = REGISTRY.counter(
+    "memory_consolidation_notes_total",
+    "Memory notes seen by consolidation, by action (kept, deduplicated, folded).",
+    ("action",),
+)
+
+STATE_NAMESPACE = "memory_state"
+STATE_KEY = "consolidation"
+SUMMARY_KEY = "summary"
+# "Asked the agent about: solar panels (preferred format: executive)"
+_NOTE = re.compile(
+    r"^(?:[^:]{1,40}:\s*)?(?P<topic>.*?)(?:\s*\(preferred format: (?P<format>[\w-]+)\))?\s*$",
+    re.S,
+)
+_SCAN_PAGE = 1000
+
+Summarizer = Callable[[str, list[str]], Awaitable[str]]
+
+
+def _int_env(name: str, default: int) -> int:
+    return int(os.getenv(name, "").strip() or default)
+
+
+def _fingerprint(text: str) -> frozenset[str]:
+    return frozenset(_words(text))
+
+
+def _jaccard(a: frozenset[str], b: frozenset[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _parse(text: str) -> tuple[str, Optional[str]]:
+    """The topic and preferred format of a note."""
+    match = _NOTE.match(text)
+    return match["topic"].strip(), match["format"]
+
+
+@dataclass
+class ConsolidationPolicy:
+    max_notes: int = 200  # live notes per user; 0 = no cap
+    similarity: float = 0.8  # Jaccard of note words that makes a duplicate
+    max_topics: int = 30  # topics the summary keeps
+
+    @classmethod
+    def from_env(cls) -> "ConsolidationPolicy":
+        return cls(
+            max_notes=max(_int_env("MEMORY_MAX_NOTES", 200), 0),
+            similarity=float(os.getenv("MEMORY_DEDUP_SIMILARITY", "").strip() or 0.8),
+        )
+
+
+@dataclass
+class ConsolidationReport:
+    users: int = 0
+    kept: int = 0
+    deduplicated: int = 0
+    folded: int = 0
+    seconds: float = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    def merge(self, other: "ConsolidationReport") -> None:
+        for f in fields(self):
+            if f.type == "int":
+                setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+
+
+def summary_text(topics: list[str], formats: dict[str, int]) -> str:
+    """The extracted summary: recent topics, then the formats asked for."""
+    text = "Earlier topics: " + "; ".join(topics) + "." if topics else "Earlier sessions."
+    if formats:
+        ranked = sorted(formats.items(), key=lambda kv: (-kv[1], kv[0]))
+        text += " Preferred formats: " + ", ".join(f"{f} ({n})" for f, n in ranked) + "."
+    return text
+
+
+def llm_summarizer() -> Optional[Summarizer]:
+    """A chat-model summariser, or None on the mock model."""
+    from llm import get_llm, text_of, using_mock_llm
+
+    if using_mock_llm():
+        return None
+
+    async def summarize(previous: str, notes: list[str]) -> str:
+        prompt = (
+            "Merge what we already remember about a user with older notes from "
+            "their sessions into one memory of at most 80 words. Keep topics and "
+            "stated preferences; drop repetition.\n\n"
+            f"Already remembered: {previous or '(nothing)'}\n\nNotes:\n"
+            + "\n".join(f"- {n}" for n in notes)
+        )
+        response = await get_llm(temperature=0).ainvoke(prompt)
+        return text_of(response.content).strip()
+
+    return summarize
+
+
+class MemoryConsolidator:
+    """Consolidate the notes each user saved since the last pass."""
+
+    def __init__(
+        self,
+        store: BaseStore,
+        policy: Optional[ConsolidationPolicy] = None,
+        *,
+        interval: float = 30.0,
+        summarize: Optional[Summarizer] = None,
+    ) -> None:
+        self.store = store
+        self.policy = policy or ConsolidationPolicy()
+        self.interval = interval
+        self.summarize = summarize
+        self.last_report: Optional[ConsolidationReport] = None
+        self._inbox: defaultdict[str, list[tuple[str, str]]] = defaultdict(list)
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_env(cls, store: BaseStore) -> Optional["MemoryConsolidator"]:
+        if os.getenv("MEMORY_CONSOLIDATION", "true").strip().lower() in {
+            "0", "false", "no", "off"
+        }:
+            return None
+        summarize = None
+        if os.getenv("MEMORY_CONSOLIDATION_LLM", "").strip().lower() in {"1", "true", "yes"}:
+            summarize = llm_summarizer()
+        return cls(
+            store,
+            ConsolidationPolicy.from_env(),
+            interval=float(_int_env("MEMORY_CONSOLIDATION_INTERVAL", 30) or 30),
+            summarize=summarize,
+        )
+
+    def saved(self, store: BaseStore, user_id: str, key: str, text: str) -> None:
+        """Save hook: queue a new note for the next pass."""
+        if store is self.store:
+            self._inbox[user_id].append((key, text))
+
+    async def run_once(self) -> ConsolidationReport:
+        async with self._lock:  # background and on-demand passes never overlap
+            start = time.perf_counter()
+            inbox, self._inbox = self._inbox, defaultdict(list)
+            report = ConsolidationReport()
+            for user_id, notes in inbox.items():
+                try:
+                    report.merge(await self.consolidate(user_id, notes))
+                except Exception:
+                    logger.exception("Memory consolidation failed for user %s", user_id)
+            report.seconds = round(time.perf_counter() - start, 4)
+            self.last_report = report
+            return report
+
+    async def consolidate(self, user_id: str, notes: list[tuple[str, str]]) -> ConsolidationReport:
+        """Fold ``notes`` (``(key, text)``, oldest first) into ``user_id``'s memory."""
+        namespace = memory._namespace(user_id)
+        report = ConsolidationReport(users=1)
+        item = await self.store.aget((STATE_NAMESPACE, user_id), STATE_KEY)
+        if item is not None:
+            state = item.value
+        else:
+            state = {"notes": [], "topics": [], "formats": {}}
+            seen = {key for key, _ in notes}
+            notes = [n for n in await self._scan(namespace) if n[0] not in seen] + notes
+        live = [(key, text, _fingerprint(text)) for key, text in state["notes"]]
+        deletes: list[str] = []
+        for key, text in notes:
+            words = _fingerprint(text)
+            for i, (old_key, _, old_words) in enumerate(live):
+                if _jaccard(words, old_words) >= self.policy.similarity:
+                    del live[i]
+                    deletes.append(old_key)
+                    report.deduplicated += 1
+                    break
+            else:
+                report.kept += 1
+            live.append((key, text, words))
+
+        excess = len(live) - self.policy.max_notes if self.policy.max_notes else 0
+        folded, live = (live[:excess], live[excess:]) if excess > 0 else ([], live)
+        ops = [PutOp(namespace, key, None) for key in deletes]
+        if folded:
+            report.folded = len(folded)
+            ops.append(await self._summary(namespace, state, [text for _, text, _ in folded]))
+            ops.extend(PutOp(namespace, key, None) for key, _, _ in folded)
+        state["notes"] = [[key, text] for key, text, _ in live]
+        ops.append(PutOp((STATE_NAMESPACE, user_id), STATE_KEY, state, index=False))
+        await self.store.abatch(ops)
+        for action in ("kept", "deduplicated", "folded"):
+            if getattr(report, action):
+                CONSOLIDATED.inc(getattr(report, action), action=action)
+        return report
+
+    async def _scan(self, namespace: tuple[str, ...]) -> list[tuple[str, str]]:
+        """One-time read of a user's existing plain notes, oldest first."""
+        items, offset = [], 0
+        while True:
+            page = await self.store.asearch(namespace, limit=_SCAN_PAGE, offset=offset)
+            items.extend(page)
+            if len(page) < _SCAN_PAGE:
+                break
+            offset += _SCAN_PAGE
+        items.sort(key=lambda i: i.created_at)
+        return [
+            (i.key, i.value["text"])
+            for i in items
+            if set(i.value) == {"text"} and i.key != SUMMARY_KEY
+        ]
+
+    async def _summary(self, namespace: tuple[str, ...], state: dict, texts: list[str]) -> PutOp:
+        topics: list[str] = state["topics"]
+        formats = Counter(state["formats"])
+        for text in texts:
+            topic, fmt = _parse(text)
+            if topic:
+                if topic in topics:
+                    topics.remove(topic)
+                topics.append(topic)
+            if fmt:
+                formats[fmt] += 1
+        state["topics"] = topics[-self.policy.max_topics :]
+        state["formats"] = dict(formats)
+        text = summary_text(state["topics"], state["formats"])
+        if self.summarize is not None:
+            try:
+                text = await self.summarize(state.get("summary", ""), texts) or text
+            except Exception as exc:
+                logger.warning("LLM memory summary failed (%s); using extraction.", exc)
+        state["summary"] = text
+        return PutOp(namespace, SUMMARY_KEY, {"text": text, "kind": "summary"})
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Memory consolidation pass failed")
+
+    def start(self) -> None:
+        memory.add_save_hook(self.saved)
+        self._task = asyncio.get_running_loop().create_task(
+            self._loop(), name="memory-consolidation"
+        )
+
+    async def stop(self) -> None:
+        """Stop the background task, after a last pass over the queued notes."""
+        memory.remove_save_hook(self.saved)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.run_once()
+        except Exception:
+            logger.exception("Final memory consolidation pass failed")
@@ -18,21 +18,29 @@ answer), but its planning / delegation behaviour only becomes visible with a
 capable provider model — set ``LLM_MODEL`` + an API key to see it plan and
 delegate.
 
+``deepagents`` is heavy to import, so it is only imported when an agent is
+actually built; importing this module (as ``main`` does) stays cheap, and
+:data:`DEEPAGENTS_INSTALLED` tells callers whether a build can succeed.
+
 CLI demo: ``python deep_agent.py "Compare solid-state vs lithium-ion batteries"``
 """
 
 from __future__ import annotations
 
 import logging
-from typing import Any, Optional
-
-from deepagents import SubAgent, create_deep_agent
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Any, Optional
 
 from llm import get_llm, using_mock_llm
 from tools import web_search
 
+if TYPE_CHECKING:
+    from deepagents import SubAgent
+
 logger = logging.getLogger(__name__)
 
+DEEPAGENTS_INSTALLED = find_spec("deepagents") is not None
+
 MAIN_INSTRUCTIONS = (
     "You are a research orchestrator. For any non-trivial question:\n"
     "1. Use `write_todos` to lay out a short research plan.\n"
@@ -44,34 +52,35 @@ MAIN_INSTRUCTIONS = (
     "Keep the main thread concise — push detailed work into subagents."
 )
 
-RESEARCHER = SubAgent(
-    name="researcher",
-    description=(
+# ``SubAgent`` is a TypedDict, so plain dicts need no ``deepagents`` import.
+RESEARCHER: "SubAgent" = {
+    "name": "researcher",
+    "description": (
         "Researches a single focused sub-question. Delegate one sub-topic at a "
         "time; it uses web_search and returns concise, sourced findings."
     ),
-    system_prompt=(
+    "system_prompt": (
         "You are a focused researcher. Use web_search to gather current "
         "information about the given sub-question, then return 2-4 concise, "
         "well-supported findings with sources. Do not answer beyond the "
         "sub-question you were given."
     ),
-    tools=[web_search],
-)
+    "tools": [web_search],
+}
 
-CRITIC = SubAgent(
-    name="critic",
-    description=(
+CRITIC: "SubAgent" = {
+    "name": "critic",
+    "description": (
         "Reviews a draft synthesis for gaps, unsupported claims, and balance. "
         "Delegate the draft; it returns specific, actionable critique."
     ),
-    system_prompt=(
+    "system_prompt": (
         "You are a rigorous critic. Given a draft answer, identify missing "
         "angles, unsupported or overstated claims, and anything that needs a "
         "source. Return a short, specific list of improvements — do not rewrite "
         "the answer yourself."
     ),
-)
+}
 
 
 def deep_agent_available() -> bool:
@@ -86,6 +95,8 @@ def build_deep_agent(checkpointer: Any | None = None, store: Any | None = None):
     interrupt/resume mechanism the other engines use, so
     ``Command(resume={"decisions": [{"type": "approve"}]})`` drives it.
     """
+    from deepagents import create_deep_agent
+
     return create_deep_agent(
         model=get_llm(),
         tools=[web_search],
@@ -97,8 +108,13 @@ def build_deep_agent(checkpointer: Any | None = None, store: Any | None = None):
     )
 
 
-# Module-level instance for `langgraph dev` / LangGraph Studio.
-agent = build_deep_agent()
+# Module-level instance for `langgraph dev` / LangGraph Studio, built on first
+# access (PEP 562) — this is what pulls in ``deepagents``.
+def __getattr__(name: str) -> Any:
+    if name == "agent":
+        graph = globals()["agent"] = build_deep_agent()
+        return graph
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def _demo(question: str) -> None:
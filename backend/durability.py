@@ -0,0 +1,93 @@
+"""When each run's checkpoints are written: a durability policy per engine.
+
+LangGraph checkpoints after every superstep — for the research workflow that
+is recall, planner, each batch of parallel researchers, analyzer, and so on —
+but resuming a thread only ever needs the checkpoint at an ``interrupt()`` or
+at the end of the run. On SQLite every extra checkpoint is a commit (and an
+fsync), so under load that write amplification caps throughput.
+
+LangGraph's ``durability`` run option decides how much of it to pay:
+
+- ``sync``  — each checkpoint is committed before the next step starts;
+- ``async`` — each checkpoint is committed while the next step runs (the
+  LangGraph default);
+- ``exit``  — intermediate checkpoints are coalesced: the run keeps its state in
+  memory and commits one checkpoint (plus its pending writes) when it pauses at
+  an interrupt, finishes, or fails — before the endpoint responds.
+
+With ``exit`` a hard crash mid-run (process killed, power loss) loses the steps
+since the last interrupt, and the thread resumes from that interrupt: every
+step is re-run, none is skipped. ``/history`` also lists only the interrupt and
+final checkpoints, which is all ``/fork`` needs.
+
+:class:`DurabilityPolicy` resolves the mode per engine and endpoint, and
+``main`` passes it as the ``durability`` argument of each run's ``ainvoke`` /
+``astream`` (LangGraph hands it on to subgraphs):
+
+    CHECKPOINT_DURABILITY=async                    # default for every engine
+    CHECKPOINT_DURABILITY_WORKFLOW=exit            # per engine (APPROVAL, AGENT, DEEP_AGENT)
+    CHECKPOINT_DURABILITY_ENDPOINTS=/fork=sync     # per endpoint, comma-separated
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+MODES = ("sync", "async", "exit")
+
+
+def _mode(value: str, source: str) -> Optional[str]:
+    mode = value.strip().lower()
+    if not mode:
+        return None
+    if mode not in MODES:
+        logger.warning("Unknown durability %r in %s; expected one of %s", value, source, MODES)
+        return None
+    return mode
+
+
+class DurabilityPolicy:
+    """Durability mode per engine, with per-endpoint overrides."""
+
+    def __init__(
+        self,
+        default: str = "async",
+        engines: Optional[Mapping[str, str]] = None,
+        endpoints: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        for mode in (default, *(engines or {}).values(), *(endpoints or {}).values()):
+            if mode not in MODES:
+                raise ValueError(f"Unknown durability mode {mode!r}; expected one of {MODES}")
+        self.default = default
+        self.engines = dict(engines or {})
+        self.endpoints = dict(endpoints or {})
+
+    @classmethod
+    def from_env(cls, engines: tuple[str, ...] = ("workflow", "approval", "agent", "deep_agent")):
+        default = _mode(os.getenv("CHECKPOINT_DURABILITY", ""), "CHECKPOINT_DURABILITY") or "async"
+        per_engine = {}
+        for engine in engines:
+            name = f"CHECKPOINT_DURABILITY_{engine.upper()}"
+            mode = _mode(os.getenv(name, ""), name)
+            if mode:
+                per_engine[engine] = mode
+        per_endpoint = {}
+        for item in os.getenv("CHECKPOINT_DURABILITY_ENDPOINTS", "").split(","):
+            endpoint, _, value = item.partition("=")
+            mode = _mode(value, "CHECKPOINT_DURABILITY_ENDPOINTS")
+            if endpoint.strip() and mode:
+                per_endpoint[endpoint.strip()] = mode
+        return cls(default, per_engine, per_endpoint)
+
+    def mode(self, engine: str, endpoint: Optional[str] = None) -> str:
+        """The mode for a run of ``engine`` started from ``endpoint``."""
+        if endpoint in self.endpoints:
+            return self.endpoints[endpoint]
+        return self.engines.get(engine, self.default)
+
+    def as_dict(self) -> dict:
+        return {"default": self.default, "engines": self.engines, "endpoints": self.endpoints}
@@ -0,0 +1,366 @@
+"""Cached, micro-batched embeddings for long-term memory.
+
+Every ``save_user_memory`` embeds its note and every semantic
+``load_user_memory`` embeds its question, one text per model call. Notes repeat
+("Asked the agent about: ..."), so do questions, and concurrent runs each pay a
+round trip for a single text. :class:`CachedEmbeddings` wraps the configured
+LangChain ``Embeddings`` so that:
+
+- **vectors are cached by content hash** — ``blake2b(model, kind, text)`` — in
+  a SQLite file (:class:`SqliteEmbeddingCache`, shared by every worker and kept
+  across restarts) or, without one, a per-process LRU
+  (:class:`MemoryEmbeddingCache`). Documents and queries are keyed apart, as
+  some models embed them differently;
+- **concurrent requests are coalesced** — a text already being embedded is
+  awaited rather than sent again, and documents arriving within
+  ``window`` seconds of each other go to the model as one
+  ``aembed_documents`` call (at most ``max_batch`` texts; a full batch is sent
+  at once). Queries have no batch API, so they are only deduplicated.
+
+Configured from the environment by :meth:`CachedEmbeddings.from_env`::
+
+    EMBEDDING_CACHE_DB=/data/embeddings.sqlite   # default <MEMORY_DB>.embeddings
+    EMBEDDING_CACHE_SIZE=10000                   # vectors kept; 0 = no cache
+    EMBEDDING_BATCH_WINDOW_MS=5                  # how long a document waits for company
+    EMBEDDING_BATCH_MAX=64
+
+Lookups are reported as ``cache_requests_total{cache="embedding"}`` (a hit is a
+model call avoided), model calls as ``memory_embedding_calls_total{kind}`` and
+texts per call as ``memory_embedding_batch_size``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Optional
+
+from langchain_core.embeddings import Embeddings
+
+import metrics
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CALLS = REGISTRY.counter(
+    "memory_embedding_calls_total",
+    "Embedding model calls made for long-term memory, by kind (documents, query).",
+    ("kind",),
+)
+EMBEDDING_BATCH = REGISTRY.histogram(
+    "memory_embedding_batch_size",
+    "Texts sent per embedding model call, by kind.",
+    ("kind",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+_SQL_CHUNK = 500  # keys per IN (...) lookup, well under SQLite's variable limit
+
+
+def _int_env(name: str, default: int) -> int:
+    return int(os.getenv(name, "").strip() or default)
+
+
+def _float_env(name: str, default: float) -> float:
+    return float(os.getenv(name, "").strip() or default)
+
+
+def _encode(vector: Iterable[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _decode(blob: bytes) -> list[float]:
+    return array("f", blob).tolist()
+
+
+class MemoryEmbeddingCache:
+    """Per-process LRU of ``size`` vectors, stored as float32 bytes."""
+
+    blocking = False  # dict lookups: called inline from the event loop
+
+    def __init__(self, size: int = 10_000) -> None:
+        self.size = size
+        self._vectors: OrderedDict[bytes, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def get_many(self, keys: Iterable[bytes]) -> dict[bytes, list[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                blob = self._vectors.get(key)
+                if blob is not None:
+                    self._vectors.move_to_end(key)
+                    found[key] = _decode(blob)
+        return found
+
+    def put_many(self, vectors: dict[bytes, list[float]]) -> None:
+        if self.size <= 0:
+            return
+        with self._lock:
+            for key, vector in vectors.items():
+                self._vectors[key] = _encode(vector)
+                self._vectors.move_to_end(key)
+            while len(self._vectors) > self.size:
+                self._vectors.popitem(last=False)
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteEmbeddingCache:
+    """Vectors in a SQLite file (WAL), oldest dropped beyond ``size``.
+
+    The file can be shared by several workers; each keeps its own connection.
+    Rows are only ever deleted oldest-first, so ids stay contiguous and
+    ``max(id) - min(id) + 1`` counts them from the primary key alone. Once that
+    passes ``size`` by a tenth, one range delete trims back to ``size``.
+    """
+
+    blocking = True  # file I/O, possibly waiting on another worker's write
+
+    def __init__(self, path: str, size: int = 10_000) -> None:
+        self.path = path
+        self.size = size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "id INTEGER PRIMARY KEY, key BLOB NOT NULL UNIQUE, vector BLOB NOT NULL)"
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: Iterable[bytes]) -> dict[bytes, list[float]]:
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQL_CHUNK):
+                chunk = keys[i : i + _SQL_CHUNK]
+                rows = self._conn.execute(
+                    "SELECT key, vector FROM embeddings WHERE key IN "
+                    f"({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                found.update((key, _decode(blob)) for key, blob in rows)
+        return found
+
+    def put_many(self, vectors: dict[bytes, list[float]]) -> None:
+        if self.size <= 0 or not vectors:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, _encode(vector)) for key, vector in vectors.items()],
+                )
+                # Every worker's rows share the id sequence, so this sees them all.
+                low, high = self._conn.execute(
+                    "SELECT min(id), max(id) FROM embeddings"
+                ).fetchone()
+                if high - low + 1 > self.size + self.size // 10:
+                    self._conn.execute("DELETE FROM embeddings WHERE id <= ?", (high - self.size,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """``embeddings`` behind a content-hash cache and a micro-batching window.
+
+    The async methods coalesce work across concurrent callers on one event
+    loop; the sync methods only use the cache. The async methods read and
+    write a SQLite cache in a worker thread (``asyncio.to_thread``), so a
+    slow disk or another worker's write lock never stalls the loop; the
+    in-memory cache is used inline.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        *,
+        model: str = "",
+        cache: "MemoryEmbeddingCache | SqliteEmbeddingCache | None" = None,
+        window: float = 0.005,
+        max_batch: int = 64,
+    ) -> None:
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache if cache is not None else MemoryEmbeddingCache()
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: list[tuple[bytes, str]] = []
+        self._inflight: dict[bytes, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    @classmethod
+    def from_env(cls, model: str, embeddings: Embeddings) -> "CachedEmbeddings":
+        size = _int_env("EMBEDDING_CACHE_SIZE", 10_000)
+        path = os.getenv("EMBEDDING_CACHE_DB", "").strip()
+        memory_db = os.getenv("MEMORY_DB", "").strip()
+        if not path and memory_db:
+            path = memory_db + ".embeddings"
+        if path and size > 0:
+            cache = SqliteEmbeddingCache(path, size)
+        else:
+            cache = MemoryEmbeddingCache(size)
+        return cls(
+            embeddings,
+            model=model,
+            cache=cache,
+            window=max(_float_env("EMBEDDING_BATCH_WINDOW_MS", 5.0), 0.0) / 1000.0,
+            max_batch=_int_env("EMBEDDING_BATCH_MAX", 64),
+        )
+
+    def close(self) -> None:
+        self.cache.close()
+
+    # --- Embeddings -------------------------------------------------------------
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embed("documents", texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed("query", [text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self._aembed("documents", texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self._aembed("query", [text]))[0]
+
+    # --- internals --------------------------------------------------------------
+    def _key(self, kind: str, text: str) -> bytes:
+        data = f"{self.model}\0{kind}\0{text}".encode()
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    @staticmethod
+    def _observe(kind: str, size: int) -> None:
+        EMBEDDING_CALLS.inc(kind=kind)
+        EMBEDDING_BATCH.observe(size, kind=kind)
+
+    def _embed(self, kind: str, texts: list[str]) -> list[list[float]]:
+        keys = [self._key(kind, text) for text in texts]
+        found = self.cache.get_many(set(keys))
+        missing: dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            hit = key in found or key in missing
+            metrics.record_cache("embedding", hit)
+            if not hit:
+                missing[key] = text
+        if missing:
+            batch = list(missing.values())
+            if kind == "query":
+                vectors = [self.embeddings.embed_query(batch[0])]
+            else:
+                vectors = self.embeddings.embed_documents(batch)
+            self._observe(kind, len(batch))
+            fresh = dict(zip(missing, vectors))
+            self.cache.put_many(fresh)
+            found.update(fresh)
+        return [found[key] for key in keys]
+
+    async def _aembed(self, kind: str, texts: list[str]) -> list[list[float]]:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # A new loop (tests, a restarted server): nothing pending carries over.
+            self._loop, self._queue, self._inflight, self._timer = loop, [], {}, None
+        keys = [self._key(kind, text) for text in texts]
+        found = await self._off_loop(self.cache.get_many, set(keys))
+        waiting: dict[bytes, asyncio.Future] = {}
+        for key, text in zip(keys, texts):
+            if key in found or key in waiting:
+                metrics.record_cache("embedding", True)
+                continue
+            future = self._inflight.get(key)
+            metrics.record_cache("embedding", future is not None)
+            waiting[key] = future if future is not None else self._submit(kind, key, text)
+        if waiting:
+            # shield: a cancelled caller must not cancel a batch others await.
+            vectors = await asyncio.gather(*(asyncio.shield(f) for f in waiting.values()))
+            found.update(zip(waiting, vectors))
+        return [found[key] for key in keys]
+
+    async def _off_loop(self, method: Callable[..., Any], *args: Any) -> Any:
+        if self.cache.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def _submit(self, kind: str, key: bytes, text: str) -> asyncio.Future:
+        future = self._loop.create_future()
+        # Mark a failure retrieved even if every caller has gone away.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        if kind == "query":
+            self._spawn(kind, [(key, text)])
+            return future
+        self._queue.append((key, text))
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = self._loop.call_later(self.window, self._flush)
+        return future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._queue = self._queue, []
+        if batch:
+            self._spawn("documents", batch)
+
+    def _spawn(self, kind: str, batch: list[tuple[bytes, str]]) -> None:
+        task = self._loop.create_task(self._call(kind, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _call(self, kind: str, batch: list[tuple[bytes, str]]) -> None:
+        texts = [text for _, text in batch]
+        try:
+            if kind == "query":
+                vectors = [await self.embeddings.aembed_query(texts[0])]
+            else:
+                vectors = await self.embeddings.aembed_documents(texts)
+            self._observe(kind, len(texts))
+            fresh = {key: vector for (key, _), vector in zip(batch, vectors)}
+            await self._off_loop(self.cache.put_many, fresh)
+        except BaseException as exc:
+            for key, _ in batch:
+                future = self._inflight.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+            return
+        for (key, _), vector in zip(batch, vectors):
+            future = self._inflight.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(vector)
+
+
+def build_embeddings(model: str) -> CachedEmbeddings:
+    """``init_embeddings(model)`` (e.g. ``openai:text-embedding-3-small``), cached."""
+    from langchain.embeddings import init_embeddings
+
+    return CachedEmbeddings.from_env(model, init_embeddings(model))
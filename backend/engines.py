@@ -0,0 +1,86 @@
+"""Lazily built graph engines for the FastAPI app.
+
+The app serves four engines (workflow, approval, agent, deep agent), but a
+given deployment often only exercises one or two. Compiling all of them — and
+importing ``deepagents`` — at startup makes cold starts slow, which hurts
+autoscaling and serverless deployments.
+
+``main.lifespan`` therefore only *registers* a factory per engine on an
+:class:`EngineRegistry`; each graph is compiled on its first request (in a
+worker thread, so the event loop keeps serving), instrumented for ``/metrics``,
+and cached for the lifetime of the app. Engines listed in ``ENGINE_PRELOAD``
+are built during startup instead, trading a slower boot for a fast first
+request:
+
+    ENGINE_PRELOAD=workflow,agent   # or "all"; unset = build everything lazily
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class EngineRegistry:
+    """Build each registered engine once, on first use."""
+
+    def __init__(self) -> None:
+        self._factories: dict[str, Callable[[], Any]] = {}
+        self._graphs: dict[str, Any] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self.build_seconds: dict[str, float] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        """Register ``factory`` (returns a compiled graph) under ``name``."""
+        self._factories[name] = factory
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._factories
+
+    @property
+    def built(self) -> list[str]:
+        return list(self._graphs)
+
+    async def get(self, name: str) -> Optional[Any]:
+        """The compiled, instrumented graph for ``name``; None if unavailable.
+
+        Concurrent first requests share one build. A failed build is logged and
+        retried on the next request.
+        """
+        graph = self._graphs.get(name)
+        if graph is not None or name not in self._factories:
+            return graph
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            if name in self._graphs:
+                return self._graphs[name]
+            start = time.perf_counter()
+            try:
+                # Compiling (and the imports it triggers) is synchronous work.
+                built = await asyncio.to_thread(self._factories[name])
+            except Exception:
+                logger.exception("Failed to build the %s engine", name)
+                return None
+            self.build_seconds[name] = time.perf_counter() - start
+            logger.info("Built %s engine in %.2fs", name, self.build_seconds[name])
+            graph = self._graphs[name] = metrics.instrument(built, name)
+            return graph
+
+    async def preload(self, names: Optional[str] = None) -> None:
+        """Build the engines named in ``names`` (default: ``ENGINE_PRELOAD``)."""
+        raw = os.getenv("ENGINE_PRELOAD", "") if names is None else names
+        wanted = [n.strip() for n in raw.split(",") if n.strip()]
+        if "all" in wanted:
+            wanted = list(self._factories)
+        for name in wanted:
+            if name not in self._factories:
+                logger.warning("ENGINE_PRELOAD: unknown engine %r", name)
+                continue
+            await self.get(name)
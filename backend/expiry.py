@@ -0,0 +1,358 @@
+"""Interrupt expiry: what happens to threads nobody comes back to.
+
+A thread paused at ``research_planner_interrupt``, ``research_direction_interrupt``,
+``format_selection_interrupt``, the approval workflow's ``human_review`` or an
+agent's tool approval waits forever by default. With an expiry rule, once the
+interrupt has waited ``after`` seconds the thread is either
+
+- **resumed** with a default answer (``proceed``, ``comprehensive``, rejecting
+  the tool calls, …) — exactly as if the user had sent it; or
+- **expired** — its checkpoints are deleted (releasing the storage, cache and
+  memory they held) and ``/resume`` & co. answer ``410 Gone``.
+
+Deadlines live in one min-heap served by a single background task that sleeps
+until the earliest one, so tens of thousands of paused threads cost a heap
+entry each and nothing while they wait — no per-thread timers, no polling.
+Resuming a thread cancels its deadline (lazily: the stale heap entry is
+skipped when it surfaces), and a thread that pauses again is re-armed for its
+new interrupt.
+
+Rules are per interrupt (``tool_approval`` covers both agent engines)::
+
+    INTERRUPT_EXPIRY_SECONDS=86400                 # any interrupt, default action
+    INTERRUPT_EXPIRY=format_selection_interrupt=600:executive,human_review=3600:expire
+
+``name=seconds[:action]`` — ``action`` is ``expire`` or the resume value
+(``approve``/``reject`` for ``human_review`` and ``tool_approval``); omitted,
+it is :data:`DEFAULT_ACTIONS`. Deadlines are kept in process memory: after a
+restart, threads already paused are only cleaned up by checkpoint retention
+(``CHECKPOINT_TTL_HOURS``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Mapping, Optional, Sequence
+
+from langgraph.types import Command
+
+import metrics
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# What an interrupt does on expiry when its rule doesn't say. Auto-approving a
+# draft would send it unreviewed, so ``human_review`` expires instead.
+DEFAULT_ACTIONS = {
+    "research_planner_interrupt": "proceed",
+    "research_direction_interrupt": "continue",
+    "format_selection_interrupt": "comprehensive",
+    "human_review": "expire",
+    "tool_approval": "reject",
+}
+_AGENT_ENGINES = ("agent", "deep_agent")
+
+EXPIRY_PENDING = REGISTRY.gauge(
+    "interrupt_expiry_pending",
+    "Paused threads with an armed expiry deadline.",
+)
+EXPIRY_FIRED = REGISTRY.counter(
+    "interrupt_expirations_total",
+    "Interrupt deadlines reached, by interrupt and outcome (resumed, expired, stale, failed).",
+    ("interrupt", "outcome"),
+)
+
+
+@dataclass(frozen=True)
+class ExpiryRule:
+    after: float  # seconds the interrupt may wait
+    action: str  # "expire", or the value to resume with
+
+
+@dataclass(frozen=True)
+class Deadline:
+    thread_id: str
+    engine: str
+    interrupt: str
+    rule: ExpiryRule
+
+
+def interrupt_key(engine: str, next_nodes: Sequence[str]) -> Optional[str]:
+    """The rule name for a thread of ``engine`` paused before ``next_nodes``."""
+    if not next_nodes:
+        return None
+    if engine in _AGENT_ENGINES:
+        return "tool_approval"
+    return next_nodes[0]
+
+
+class ExpiryPolicy:
+    """Expiry rule per interrupt name; interrupts without one never expire."""
+
+    def __init__(
+        self, rules: Optional[Mapping[str, ExpiryRule]] = None, default_after: float = 0.0
+    ) -> None:
+        self.rules = dict(rules or {})
+        self.default_after = default_after
+
+    @classmethod
+    def from_env(cls) -> "ExpiryPolicy":
+        try:
+            default_after = max(0.0, float(os.getenv("INTERRUPT_EXPIRY_SECONDS", "") or 0))
+        except ValueError:
+            logger.warning("Ignoring non-numeric INTERRUPT_EXPIRY_SECONDS")
+            default_after = 0.0
+        rules = {}
+        for item in os.getenv("INTERRUPT_EXPIRY", "").split(","):
+            name, _, spec = item.partition("=")
+            seconds, _, action = spec.partition(":")
+            if not name.strip():
+                continue
+            try:
+                after = float(seconds)
+            except ValueError:
+                logger.warning("Ignoring INTERRUPT_EXPIRY entry %r (expected name=seconds)", item)
+                continue
+            if after > 0:
+                rules[name.strip()] = ExpiryRule(after, action.strip() or _default(name.strip()))
+        return cls(rules, default_after)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rules or self.default_after)
+
+    def rule(self, interrupt: str) -> Optional[ExpiryRule]:
+        if interrupt in self.rules:
+            return self.rules[interrupt]
+        if self.default_after:
+            return ExpiryRule(self.default_after, _default(interrupt))
+        return None
+
+    def as_dict(self) -> dict:
+        return {
+            "default_seconds": self.default_after,
+            "rules": {k: {"after": r.after, "action": r.action} for k, r in self.rules.items()},
+        }
+
+
+def _default(interrupt: str) -> str:
+    return DEFAULT_ACTIONS.get(interrupt, "expire")
+
+
+def resume_value(interrupt: str, action: str, pending: Sequence[Any] = ()) -> Any:
+    """The ``Command(resume=...)`` payload a user would send for ``action``.
+
+    ``pending`` are the interrupt values of the paused tasks (for tool
+    approval, one decision is needed per requested tool call).
+    """
+    note = "No response before the interrupt expired."
+    if interrupt == "human_review":
+        value: dict = {"action": action}
+        if action == "reject":
+            value["feedback"] = note
+        return value
+    if interrupt == "tool_approval":
+        count = sum(
+            len(v.get("action_requests", [])) if isinstance(v, dict) else 1 for v in pending
+        )
+        decision = {"type": action, **({"message": note} if action == "reject" else {})}
+        return {"decisions": [dict(decision) for _ in range(max(count, 1))]}
+    return action
+
+
+class ExpiryScheduler:
+    """One heap of deadlines, one task sleeping until the next; see the module docstring.
+
+    ``handler`` does the actual resume or expiry and returns the outcome label
+    plus the nodes the thread is paused before afterwards (re-armed if any); at
+    most ``concurrency`` run at once.
+    """
+
+    def __init__(
+        self,
+        policy: ExpiryPolicy,
+        handler: Callable[[Deadline], Awaitable[tuple[str, Sequence[str]]]],
+        *,
+        concurrency: int = 4,
+        remember_expired: int = 10_000,
+    ) -> None:
+        self.policy = policy
+        self.handler = handler
+        self.remember_expired = remember_expired
+        self._heap: list[tuple[float, int, str]] = []
+        self._pending: dict[str, tuple[int, Deadline]] = {}
+        self._firing: set[str] = set()
+        self._expired: OrderedDict[str, None] = OrderedDict()
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._gate = asyncio.Semaphore(max(1, concurrency))
+        self._task: Optional[asyncio.Task] = None
+        self._running: set[asyncio.Task] = set()
+
+    # --- bookkeeping (called from the request path; O(log n)) --------------------
+    def schedule(self, thread_id: str, engine: str, next_nodes: Sequence[str]) -> bool:
+        """Arm the deadline for a thread that just paused; False if no rule applies."""
+        interrupt = interrupt_key(engine, next_nodes)
+        rule = self.policy.rule(interrupt) if interrupt else None
+        if rule is None:
+            self.cancel(thread_id)
+            return False
+        seq = next(self._seq)
+        due = time.monotonic() + rule.after
+        self._pending[thread_id] = (seq, Deadline(thread_id, engine, interrupt, rule))
+        heapq.heappush(self._heap, (due, seq, thread_id))
+        if self._heap[0][1] == seq:
+            self._wake.set()  # earlier than what the loop is sleeping towards
+        self._compact()
+        EXPIRY_PENDING.set(len(self._pending))
+        return True
+
+    def cancel(self, thread_id: str) -> bool:
+        """Disarm ``thread_id`` (it is being resumed). False while it is auto-resuming."""
+        if thread_id in self._firing:
+            return False
+        if self._pending.pop(thread_id, None) is not None:
+            EXPIRY_PENDING.set(len(self._pending))
+        return True
+
+    def is_expired(self, thread_id: str) -> bool:
+        return thread_id in self._expired
+
+    def _mark_expired(self, thread_id: str) -> None:
+        self._expired[thread_id] = None
+        while len(self._expired) > self.remember_expired:
+            self._expired.popitem(last=False)
+
+    def _compact(self) -> None:
+        # Cancelled entries stay in the heap until they surface; rebuild it if
+        # they come to outnumber the live ones.
+        if len(self._heap) > 2 * len(self._pending) + 64:
+            live = {seq for seq, _ in self._pending.values()}
+            self._heap = [entry for entry in self._heap if entry[1] in live]
+            heapq.heapify(self._heap)
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    # --- the timer ----------------------------------------------------------------
+    def pop_due(self, now: Optional[float] = None) -> list[Deadline]:
+        """Remove and return every deadline at or before ``now``."""
+        now = time.monotonic() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, thread_id = heapq.heappop(self._heap)
+            entry = self._pending.get(thread_id)
+            if entry is None or entry[0] != seq:
+                continue  # cancelled or re-armed since
+            del self._pending[thread_id]
+            due.append(entry[1])
+        if due:
+            EXPIRY_PENDING.set(len(self._pending))
+        return due
+
+    async def fire(self, deadline: Deadline) -> str:
+        self._firing.add(deadline.thread_id)
+        paused_at: Sequence[str] = ()
+        try:
+            async with self._gate:
+                outcome, paused_at = await self.handler(deadline)
+        except Exception:
+            logger.exception("Expiring interrupt of thread %s failed", deadline.thread_id)
+            outcome = "failed"
+        finally:
+            self._firing.discard(deadline.thread_id)
+        if outcome == "expired":
+            self._mark_expired(deadline.thread_id)
+        elif paused_at:
+            self.schedule(deadline.thread_id, deadline.engine, paused_at)
+        EXPIRY_FIRED.inc(interrupt=deadline.interrupt, outcome=outcome)
+        logger.info(
+            "Interrupt %s of thread %s expired after %.0fs: %s",
+            deadline.interrupt,
+            deadline.thread_id,
+            deadline.rule.after,
+            outcome,
+        )
+        return outcome
+
+    async def _loop(self) -> None:
+        while True:
+            self._wake.clear()
+            for deadline in self.pop_due():
+                # Claimed now, not when the task first runs: a request that
+                # resumes the thread in between must see it as auto-resuming.
+                self._firing.add(deadline.thread_id)
+                task = asyncio.get_running_loop().create_task(self.fire(deadline))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._loop(), name="interrupt-expiry")
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._task, *self._running) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+
+def graph_handler(
+    engines: Any, saver: Any, durability: Any
+) -> Callable[[Deadline], Awaitable[tuple[str, Sequence[str]]]]:
+    """The app's expiry handler: resume through the engine, or delete the thread.
+
+    The thread's current state is checked first — a deadline for an interrupt
+    the thread is no longer paused at is ``stale`` and does nothing.
+    """
+
+    async def handle(deadline: Deadline) -> tuple[str, Sequence[str]]:
+        graph = await engines.get(deadline.engine)
+        if graph is None:
+            return "failed", ()
+        config = {"configurable": {"thread_id": deadline.thread_id}}
+        state = await graph.aget_state(config)
+        if interrupt_key(deadline.engine, state.next) != deadline.interrupt:
+            return "stale", ()
+        metrics.INTERRUPTS.resumed(deadline.thread_id, deadline.engine)
+        if deadline.rule.action == "expire":
+            await saver.adelete_thread(deadline.thread_id)
+            return "expired", ()
+        pending = [i.value for task in state.tasks for i in task.interrupts]
+        value = resume_value(deadline.interrupt, deadline.rule.action, pending)
+        await graph.ainvoke(
+            Command(resume=value), config, durability=durability.mode(deadline.engine, "expiry")
+        )
+        after = await graph.aget_state(config)
+        if after.next:
+            metrics.INTERRUPTS.paused(deadline.thread_id)
+        return "resumed", tuple(after.next)
+
+    return handle
+
+
+def from_env(engines: Any, saver: Any, durability: Any) -> Optional[ExpiryScheduler]:
+    """The app's scheduler, or None when no ``INTERRUPT_EXPIRY*`` rule is set."""
+    policy = ExpiryPolicy.from_env()
+    if not policy.enabled:
+        return None
+    try:
+        concurrency = int(os.getenv("INTERRUPT_EXPIRY_CONCURRENCY", "") or 4)
+    except ValueError:
+        concurrency = 4
+    logger.info("Interrupt expiry enabled: %s", policy.as_dict())
+    return ExpiryScheduler(
+        policy, graph_handler(engines, saver, durability), concurrency=concurrency
+    )
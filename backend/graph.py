@@ -12,19 +12,22 @@ configuration via a built-in mock model.
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
 from typing import Annotated, Any, Dict, List, Literal, Optional, TypedDict
 
 from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage
+from langgraph.channels.delta import DeltaChannel
 from langgraph.checkpoint.memory import MemorySaver
-from langgraph.config import get_stream_writer
+from langgraph.config import get_config, get_stream_writer
 from langgraph.graph import END, START, StateGraph
 from langgraph.graph.message import add_messages
 from langgraph.types import Command, RetryPolicy, Send, interrupt
 
 from llm import get_llm, text_of
 from memory import get_active_store, load_user_memory, save_user_memory
+from prefetch import PREFETCH
 from tools import web_search
 
 logger = logging.getLogger(__name__)
@@ -79,6 +82,17 @@ def _max_subqueries() -> Optional[int]:
         return None
 
 
+def _prefetch_memory() -> bool:
+    """Recall memory behind the first interrupt (``WORKFLOW_PREFETCH``, default on).
+
+    Off, the graph recalls memory in its own node before the first interrupt,
+    so ``/start`` waits for the recall.
+    """
+    return os.getenv("WORKFLOW_PREFETCH", "true").strip().lower() not in {
+        "0", "false", "no", "off"
+    }
+
+
 def reset_or_append(existing: List[str], new: List[str]) -> List[str]:
     """Reducer: an empty write resets the list; otherwise append.
 
@@ -114,6 +128,52 @@ class ResearchState(TypedDict):
     user_memory: Optional[str]
 
 
+# --- Delta-encoded checkpoints -----------------------------------------------
+def _delta_snapshot_every() -> int:
+    """Full-snapshot cadence for delta-encoded channels (0 = store full values).
+
+    With ``CHECKPOINT_DELTA_SNAPSHOT_EVERY=N`` the append-only channels below
+    are stored as deltas: a checkpoint keeps only the writes of its superstep,
+    plus a full snapshot of the channel every ``N`` updates, so per-thread
+    storage grows linearly with the conversation instead of quadratically.
+    Reading a checkpoint replays at most ``N`` writes from the nearest snapshot.
+    """
+    try:
+        return max(0, int(os.getenv("CHECKPOINT_DELTA_SNAPSHOT_EVERY", "0") or 0))
+    except ValueError:
+        return 0
+
+
+def _batched(reducer):
+    """Adapt a pairwise reducer to ``DeltaChannel``'s ``(state, writes)`` form.
+
+    Folding the writes one by one makes the result independent of how replay
+    batches them, which ``DeltaChannel`` requires.
+    """
+
+    def fold(state, writes):
+        for write in writes:
+            state = reducer(state, write)
+        return state
+
+    fold.__name__ = f"batched_{reducer.__name__}"
+    return fold
+
+
+# Append-only ``ResearchState`` channels that can be stored as deltas.
+DELTA_CHANNELS = {
+    "messages": _batched(add_messages),
+    "research_results": _batched(reset_or_append),
+}
+
+
+def _use_delta_channels(builder: StateGraph, snapshot_every: int) -> None:
+    for name, reducer in DELTA_CHANNELS.items():
+        channel = DeltaChannel(reducer, list, snapshot_frequency=snapshot_every)
+        channel.key = name
+        builder.channels[name] = channel
+
+
 class SubResearchState(TypedDict):
     """Input state for a single parallel sub-researcher (via Send)."""
 
@@ -135,8 +195,17 @@ def _previous_exchange(messages: List[AnyMessage]) -> tuple[str, str]:
 
 # --- Node 1: Research planning (interrupt) ---------------------------------
 async def research_planner_interrupt(state: ResearchState) -> Dict[str, Any]:
-    """Pause to let the user choose how the research should proceed."""
+    """Pause to let the user choose how the research should proceed.
+
+    Memory not recalled yet is recalled in the background meanwhile (see
+    :func:`_recall`), so the user sees this interrupt without waiting for it.
+    """
     logger.info("Planning research strategy")
+    if state.get("user_memory") is None:
+        key = _memory_key(state)
+        if key is not None:
+            # Idempotent: on resume this node re-runs and finds the task.
+            PREFETCH.start(key, lambda: _load_memory(state))
     messages = state.get("messages", [])
     previous_query, previous_response = _previous_exchange(
         messages + [HumanMessage(content=state["user_query"])]
@@ -188,19 +257,46 @@ def _emit(payload: dict) -> None:
         pass
 
 
-# --- Memory: recall (start) -------------------------------------------------
-async def recall_memory(state: ResearchState) -> Dict[str, Any]:
-    """Load cross-thread memory for this user before planning.
+# --- Memory: recall ----------------------------------------------------------
+async def _load_memory(state: ResearchState) -> str:
+    """Cross-thread memory for this user, searched with the current question.
 
-    The current question is passed as the search ``query`` so a semantic store
-    recalls the *most relevant* memories (and a plain store recalls recent ones).
+    The question is the search ``query`` so a semantic store recalls the
+    *most relevant* memories (and a plain store recalls recent ones).
     """
     memory = await load_user_memory(
         get_active_store(), state.get("user_id"), query=state.get("user_query")
     )
     if memory:
         logger.info("Recalled %d chars of long-term memory", len(memory))
-    return {"user_memory": memory}
+    return memory
+
+
+def _memory_key(state: ResearchState) -> Optional[tuple]:
+    """The prefetch key of this run's recall (None: nothing to recall)."""
+    thread_id = (get_config().get("configurable") or {}).get("thread_id")
+    if not thread_id or not state.get("user_id"):
+        return None
+    return ("memory", thread_id, state["user_id"], state.get("user_query"))
+
+
+async def _recall(state: ResearchState) -> str:
+    """This run's memory: the recall prefetched at the first interrupt, if this
+    process started one, else a recall now."""
+    key = _memory_key(state)
+    task = PREFETCH.take(key) if key is not None else None
+    if task is not None:
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+    return await _load_memory(state)
+
+
+async def recall_memory(state: ResearchState) -> Dict[str, Any]:
+    """Load cross-thread memory before planning (``WORKFLOW_PREFETCH=false``)."""
+    return {"user_memory": await _load_memory(state)}
 
 
 # --- Node 2a: Query planner (Send fan-out via Command) ----------------------
@@ -209,14 +305,19 @@ async def query_planner(
 ) -> Command[Literal["sub_researcher", "handle_cancel"]]:
     """Decompose the question and fan out parallel sub-researchers with ``Send``."""
     user_choice = state.get("user_choice", "proceed")
+    memory = state.get("user_memory")
     if user_choice == "cancel":
+        key = _memory_key(state) if memory is None else None
+        if key is not None:
+            PREFETCH.discard(key)  # the recall is no longer needed
         return Command(goto="handle_cancel")
 
     n = SUBQUERY_COUNT.get(user_choice, 4)
     cap = _max_subqueries()
     if cap is not None:
         n = min(n, cap)
-    memory = state.get("user_memory") or ""
+    if memory is None:
+        memory = await _recall(state)
     mem_section = f"\n\nWhat we already know about this user:\n{memory}" if memory else ""
 
     llm = get_llm()
@@ -264,6 +365,7 @@ async def query_planner(
             "sub_queries": sub_queries,
             "research_plan": f"Parallel research across {len(sub_queries)} sub-questions",
             "current_step": "information_gathering",
+            "user_memory": memory,
         },
     )
 
@@ -276,7 +378,9 @@ async def sub_researcher(state: SubResearchState) -> Dict[str, Any]:
 
     search_context = ""
     try:
-        search_context = web_search.invoke({"query": sub})
+        # ainvoke runs the (sync) tool in an executor, keeping the loop free
+        # for the other sub-researchers and streams.
+        search_context = await web_search.ainvoke({"query": sub})
     except Exception as exc:  # pragma: no cover - best effort
         logger.warning("web_search failed: %s", exc)
 
@@ -528,7 +632,12 @@ async def _response_fallback(state: ResearchState) -> Command:
     )
 
 
-def build_research_graph(checkpointer: Any | None = None, store: Any | None = None):
+def build_research_graph(
+    checkpointer: Any | None = None,
+    store: Any | None = None,
+    delta_snapshot_every: Optional[int] = None,
+    prefetch_memory: Optional[bool] = None,
+):
     """Build and compile the research workflow.
 
     LLM-backed nodes are hardened with LangGraph 1.2 resilience primitives:
@@ -542,6 +651,13 @@ def build_research_graph(checkpointer: Any | None = None, store: Any | None = No
             supplies its own persistence layer.
         store: A LangGraph ``BaseStore`` for cross-thread long-term memory.
             When ``None``, the memory nodes degrade to no-ops.
+        delta_snapshot_every: Store ``messages`` / ``research_results`` as
+            deltas with a full snapshot every N updates (see
+            ``_delta_snapshot_every``); defaults to
+            ``CHECKPOINT_DELTA_SNAPSHOT_EVERY``, 0 = full values.
+        prefetch_memory: Recall memory in the background while the first
+            interrupt waits, and consume it in ``query_planner`` (default
+            ``WORKFLOW_PREFETCH``, on). Off, ``recall_memory`` runs first.
     """
     retry = RetryPolicy(max_attempts=_retry_max_attempts())
     timeout = _node_timeout()
@@ -550,8 +666,12 @@ def build_research_graph(checkpointer: Any | None = None, store: Any | None = No
     if timeout is not None:
         llm_node["timeout"] = timeout
 
+    if prefetch_memory is None:
+        prefetch_memory = _prefetch_memory()
+
     builder = StateGraph(ResearchState)
-    builder.add_node("recall_memory", recall_memory)
+    if not prefetch_memory:
+        builder.add_node("recall_memory", recall_memory)
     builder.add_node("research_planner_interrupt", research_planner_interrupt)
     builder.add_node("query_planner", query_planner, **llm_node)
     builder.add_node("sub_researcher", sub_researcher, **llm_node)
@@ -574,8 +694,11 @@ def build_research_graph(checkpointer: Any | None = None, store: Any | None = No
     )
     builder.add_node("persist_memory", persist_memory)
 
-    builder.add_edge(START, "recall_memory")
-    builder.add_edge("recall_memory", "research_planner_interrupt")
+    if prefetch_memory:
+        builder.add_edge(START, "research_planner_interrupt")
+    else:
+        builder.add_edge(START, "recall_memory")
+        builder.add_edge("recall_memory", "research_planner_interrupt")
     builder.add_edge("research_planner_interrupt", "query_planner")
     # query_planner fans out to parallel sub_researchers (or cancels) via Command.
     builder.add_edge("sub_researcher", "research_direction_interrupt")
@@ -586,12 +709,22 @@ def build_research_graph(checkpointer: Any | None = None, store: Any | None = No
     builder.add_edge("persist_memory", END)
     builder.add_edge("handle_cancel", END)
 
+    if delta_snapshot_every is None:
+        delta_snapshot_every = _delta_snapshot_every()
+    if delta_snapshot_every:
+        _use_delta_channels(builder, delta_snapshot_every)
+
     return builder.compile(checkpointer=checkpointer, store=store)
 
 
-# Module-level graph for `langgraph dev` / LangGraph Studio. The FastAPI app
-# builds its own instance with a durable checkpointer (see main.py).
-research_graph = build_research_graph(checkpointer=MemorySaver())
+# Module-level graph for `langgraph dev` / LangGraph Studio, compiled on first
+# access (PEP 562) so importing this module stays cheap. The FastAPI app builds
+# its own instance with a durable checkpointer (see main.py).
+def __getattr__(name: str) -> Any:
+    if name == "research_graph":
+        graph = globals()["research_graph"] = build_research_graph(checkpointer=MemorySaver())
+        return graph
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # Nodes whose LLM output should be streamed to the client as the final answer.
@@ -599,7 +732,11 @@ STREAMING_NODES = {"response_generator"}
 
 
 async def stream_research_response(
-    graph, thread_id: str, user_choice: str, config: Optional[dict] = None
+    graph,
+    thread_id: str,
+    user_choice: str,
+    config: Optional[dict] = None,
+    durability: Optional[str] = None,
 ):
     """Resume the workflow and stream everything the client needs.
 
@@ -609,7 +746,8 @@ async def stream_research_response(
     - a closing ``state`` event with the next interrupt / final answer.
 
     ``config`` can point at a past ``checkpoint_id`` to resume from there
-    (time-travel / fork).
+    (time-travel / fork). ``durability`` is LangGraph's run option (``sync`` /
+    ``async`` / ``exit``).
     """
     logger.info("Streaming research for thread=%s choice=%s", thread_id, user_choice)
     config = config or {"configurable": {"thread_id": thread_id}}
@@ -620,6 +758,7 @@ async def stream_research_response(
             Command(resume=user_choice),
             config=config,
             stream_mode=["custom", "messages", "updates"],
+            durability=durability,
         ):
             if mode == "custom":
                 event = data if isinstance(data, dict) else {"message": str(data)}
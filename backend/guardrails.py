@@ -26,6 +26,7 @@ PII/detoxification service inside ``_redact``.
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
 import re
@@ -63,6 +64,25 @@ def _redact(text: str) -> tuple[str, int]:
     return text, count
 
 
+# Above this many characters of history, the async path redacts in a worker
+# thread so a long conversation doesn't stall the event loop.
+_OFFLOAD_CHARS = 20_000
+
+
+def _redact_messages(messages: list[BaseMessage]) -> tuple[list[BaseMessage], int]:
+    """Redact every string message; returns the new list and the span count."""
+    redacted_count = 0
+    new_messages: list[BaseMessage] = []
+    for msg in messages:
+        if isinstance(msg.content, str):
+            cleaned, n = _redact(msg.content)
+            if n:
+                redacted_count += n
+                msg = msg.model_copy(update={"content": cleaned})
+        new_messages.append(msg)
+    return new_messages, redacted_count
+
+
 def _emit(payload: dict) -> None:
     """Best-effort custom stream event (no-op outside a streaming run)."""
     try:
@@ -128,15 +148,7 @@ class GuardrailMiddleware(AgentMiddleware):
 
         # 2) PII redaction — mask before the model sees it (state is untouched).
         if self.redact_pii:
-            redacted_count = 0
-            new_messages: list[BaseMessage] = []
-            for msg in messages:
-                if isinstance(msg.content, str):
-                    cleaned, n = _redact(msg.content)
-                    if n:
-                        redacted_count += n
-                        msg = msg.model_copy(update={"content": cleaned})
-                new_messages.append(msg)
+            new_messages, redacted_count = _redact_messages(messages)
             if redacted_count:
                 logger.info("Guardrail redacted %d PII span(s)", redacted_count)
                 _emit(
@@ -170,15 +182,13 @@ class GuardrailMiddleware(AgentMiddleware):
             )
 
         if self.redact_pii:
-            redacted_count = 0
-            new_messages: list[BaseMessage] = []
-            for msg in messages:
-                if isinstance(msg.content, str):
-                    cleaned, n = _redact(msg.content)
-                    if n:
-                        redacted_count += n
-                        msg = msg.model_copy(update={"content": cleaned})
-                new_messages.append(msg)
+            size = sum(len(m.content) for m in messages if isinstance(m.content, str))
+            if size > _OFFLOAD_CHARS:
+                new_messages, redacted_count = await asyncio.to_thread(
+                    _redact_messages, messages
+                )
+            else:
+                new_messages, redacted_count = _redact_messages(messages)
             if redacted_count:
                 logger.info("Guardrail redacted %d PII span(s)", redacted_count)
                 _emit(
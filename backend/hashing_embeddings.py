@@ -0,0 +1,101 @@
+"""Offline embeddings: signed feature hashing of character n-grams.
+
+Semantic memory needs an embeddings model, and every provider behind
+``EMBEDDINGS_MODEL`` is a network service, so air-gapped staging and CI could
+never exercise the semantic path. :class:`HashingEmbeddings` is a LangChain
+``Embeddings`` that needs no model and no network:
+
+- each text is lower-cased and padded with spaces, and its character 3-, 4-
+  and 5-grams (over UTF-8 bytes) are hashed into ``dims`` buckets with a
+  random sign (the "hashing trick"), so ``battery`` and ``batteries`` share
+  most of their features;
+- counts are dampened (``sign * log1p(|count|)``) and each vector is L2
+  normalised, so a dot product is a cosine similarity.
+
+It is deterministic: the same text gives the same vector in every process,
+on every machine, unlike Python's salted ``hash``. It is vectorised with
+NumPy over the whole batch, with no Python loop per n-gram. It measures
+lexical overlap rather than meaning, which is what offline tests and
+benchmarks need. It is selected with ``EMBEDDINGS_MODEL=hashing`` (dimensions
+from ``EMBEDDING_DIMS``, default :data:`DEFAULT_DIMS`) and needs NumPy.
+"""
+
+from __future__ import annotations
+
+from importlib.util import find_spec
+from typing import Sequence
+
+from langchain_core.embeddings import Embeddings
+
+NUMPY_AVAILABLE = find_spec("numpy") is not None
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+MODEL_NAME = "hashing"
+DEFAULT_DIMS = 512
+NGRAMS = (3, 4, 5)
+_PRIME = 1_000_003
+
+
+def _mix(h: "np.ndarray") -> "np.ndarray":
+    """splitmix64's finaliser: spread the polynomial hash over all 64 bits."""
+    h = h ^ (h >> np.uint64(30))
+    h = h * np.uint64(0xBF58476D1CE4E5B9)
+    h = h ^ (h >> np.uint64(27))
+    h = h * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic, L2-normalised hashed character n-gram vectors."""
+
+    def __init__(self, dims: int = DEFAULT_DIMS, ngrams: Sequence[int] = NGRAMS) -> None:
+        if not NUMPY_AVAILABLE:
+            raise ImportError("HashingEmbeddings needs numpy (pip install numpy)")
+        self.dims = dims
+        self.ngrams = tuple(ngrams)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.vectors(texts).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.vectors([text])[0].tolist()
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return self.embed_query(text)
+
+    def vectors(self, texts: Sequence[str]) -> "np.ndarray":
+        """The ``(len(texts), dims)`` float32 matrix of ``texts``."""
+        out = np.zeros((len(texts), self.dims), np.float32)
+        if not texts:
+            return out
+        # One byte buffer for the batch; each text padded with a space.
+        encoded = [b" " + t.lower().encode() + b" " for t in texts]
+        lengths = np.fromiter((len(e) for e in encoded), np.int64, len(encoded))
+        data = np.frombuffer(b"".join(encoded), np.uint8).astype(np.uint64)
+        owner = np.repeat(np.arange(len(texts)), lengths)
+        limit = np.cumsum(lengths)[owner]  # where each byte's text ends
+        starts = np.arange(len(data))
+        h = np.zeros(len(data), np.uint64)
+        slots, signs = [], []
+        with np.errstate(over="ignore"):  # uint64 arithmetic wraps, as intended
+            # The n-gram hash extends the (n-1)-gram's: h = h * P + next byte.
+            for n in range(1, max(self.ngrams) + 1):
+                fits = starts + n <= limit[starts]
+                starts, h = starts[fits], h[fits]
+                h = h * np.uint64(_PRIME) + data[starts + n - 1]
+                if n in self.ngrams:
+                    mixed = _mix(h ^ np.uint64(n << 56))
+                    bucket = (mixed % np.uint64(self.dims)).astype(np.int64)
+                    slots.append(owner[starts] * self.dims + bucket)
+                    signs.append(np.where(mixed >> np.uint64(63), -1.0, 1.0))
+        counts = np.bincount(
+            np.concatenate(slots), weights=np.concatenate(signs), minlength=out.size
+        )
+        out[:] = (np.sign(counts) * np.log1p(np.abs(counts))).reshape(out.shape)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
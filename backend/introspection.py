@@ -0,0 +1,259 @@
+"""Where does the memory go? Checkpoint, store and heap introspection.
+
+``MemorySaver``, ``InMemoryStore`` and ``add_messages`` histories all grow
+without bound, so after a day of traffic the useful questions are *which
+threads* and *which users* hold the bytes, and *which code* allocated what
+since last time. ``GET /debug/memory`` (admin-only, see ``main.py``) answers
+them with:
+
+- :func:`checkpoint_usage` — per-thread checkpoint count and serialised size
+  (checkpoints + channel blobs + pending writes), top-N by size, plus
+  deduplication stats when large values are offloaded (``blobs.py``);
+- :func:`store_usage` — item counts per store namespace, rolled up per user for
+  the ``("memories", user_id)`` namespaces;
+- :class:`HeapTracker` — ``tracemalloc`` snapshot diffs between two calls;
+- :func:`process_memory` — resident set size of the process.
+
+Sizes are the bytes the checkpointer actually stores (serialised), which is a
+good proxy for — but not identical to — the Python objects' footprint.
+
+    TRACEMALLOC_FRAMES=1   # stack depth recorded per allocation once tracing
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import tracemalloc
+from collections import Counter, defaultdict
+from typing import Any, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.store.base import BaseStore
+from langgraph.store.memory import InMemoryStore
+
+from blobs import BlobOffloadSaver
+from checkpointing import find_layer, unwrap
+from memory_store import SqliteMemoryStore
+from recall_cache import RecallCacheStore
+from write_behind import WriteBehindStore
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None  # type: ignore[assignment]
+
+_MEMORY_NAMESPACE = "memories"  # see memory._namespace
+
+
+def _typed_len(typed: Any) -> int:
+    """Byte length of a serde ``(type, bytes)`` pair (0 for anything else)."""
+    if isinstance(typed, tuple) and len(typed) == 2 and isinstance(typed[1], (bytes, bytearray)):
+        return len(typed[1])
+    return 0
+
+
+def _summarise(rows: dict[str, dict[str, int]], top: int) -> dict[str, Any]:
+    for row in rows.values():
+        row["bytes"] = row["checkpoint_bytes"] + row["blob_bytes"] + row["write_bytes"]
+    ranked = sorted(rows.items(), key=lambda kv: kv[1]["bytes"], reverse=True)[:top]
+    return {
+        "threads": len(rows),
+        "checkpoints": sum(r["checkpoints"] for r in rows.values()),
+        "bytes": sum(r["bytes"] for r in rows.values()),
+        "top_threads": [{"thread_id": tid, **row} for tid, row in ranked],
+    }
+
+
+def _new_row() -> dict[str, int]:
+    return {"checkpoints": 0, "checkpoint_bytes": 0, "blob_bytes": 0, "write_bytes": 0}
+
+
+def _memory_saver_rows(saver: InMemorySaver) -> dict[str, dict[str, int]]:
+    rows: dict[str, dict[str, int]] = defaultdict(_new_row)
+    for thread_id, namespaces in list(saver.storage.items()):
+        row = rows[thread_id]
+        for checkpoints in list(namespaces.values()):
+            for checkpoint, metadata, _parent in list(checkpoints.values()):
+                row["checkpoints"] += 1
+                row["checkpoint_bytes"] += _typed_len(checkpoint) + _typed_len(metadata)
+    for (thread_id, _ns, _channel, _version), blob in list(saver.blobs.items()):
+        rows[thread_id]["blob_bytes"] += _typed_len(blob)
+    for (thread_id, _ns, _cid), writes in list(saver.writes.items()):
+        rows[thread_id]["write_bytes"] += sum(_typed_len(w[2]) for w in list(writes.values()))
+    return rows
+
+
+async def _sqlite_rows(saver: Any) -> dict[str, dict[str, int]]:
+    rows: dict[str, dict[str, int]] = defaultdict(_new_row)
+    await saver.setup()
+    async with saver.lock:
+        async with saver.conn.execute(
+            "SELECT thread_id, COUNT(*), SUM(LENGTH(checkpoint) + LENGTH(metadata)) "
+            "FROM checkpoints GROUP BY thread_id"
+        ) as cur:
+            async for thread_id, count, size in cur:
+                rows[str(thread_id)]["checkpoints"] = int(count)
+                rows[str(thread_id)]["checkpoint_bytes"] = int(size or 0)
+        async with saver.conn.execute(
+            "SELECT thread_id, SUM(LENGTH(value)) FROM writes GROUP BY thread_id"
+        ) as cur:
+            async for thread_id, size in cur:
+                rows[str(thread_id)]["write_bytes"] = int(size or 0)
+    return rows
+
+
+async def _generic_rows(saver: BaseCheckpointSaver) -> dict[str, dict[str, int]]:
+    # Any other backend: re-serialise what ``alist`` returns (slower, but exact
+    # with respect to the saver's serde).
+    rows: dict[str, dict[str, int]] = defaultdict(_new_row)
+    async for item in saver.alist(None):
+        row = rows[str(item.config["configurable"]["thread_id"])]
+        row["checkpoints"] += 1
+        row["checkpoint_bytes"] += _typed_len(saver.serde.dumps_typed(item.checkpoint))
+        row["write_bytes"] += sum(
+            _typed_len(saver.serde.dumps_typed(w[2])) for w in item.pending_writes or []
+        )
+    return rows
+
+
+async def checkpoint_usage(saver: BaseCheckpointSaver, top: int = 20) -> dict[str, Any]:
+    """Checkpoint count and serialised bytes per thread, largest ``top`` first."""
+    backing = unwrap(saver)
+    if isinstance(backing, InMemorySaver):
+        rows = _memory_saver_rows(backing)
+        backend = "memory"
+    elif type(backing).__name__ == "AsyncSqliteSaver":
+        rows = await _sqlite_rows(backing)
+        backend = "sqlite"
+    elif type(backing).__name__ == "ShardedSqliteSaver":
+        rows = {}  # a thread lives in exactly one shard
+        for shard in backing.shards:
+            rows.update(await _sqlite_rows(shard.writer))
+        backend = f"sqlite ({len(backing.shards)} shards)"
+    else:
+        rows = await _generic_rows(saver)
+        backend = type(backing).__name__
+    usage = {"backend": backend, **_summarise(rows, top)}
+    offload = find_layer(saver, BlobOffloadSaver)
+    if offload is not None:
+        # Bodies stored once in the blob table, outside the per-thread sizes above.
+        usage["offloaded_blobs"] = await offload.store.astats()
+    return usage
+
+
+async def store_usage(store: Optional[BaseStore], top: int = 20) -> dict[str, Any]:
+    """Item counts per namespace, plus per-user counts for long-term memories."""
+    if store is None:
+        return {"namespaces": 0, "items": 0, "top_namespaces": [], "top_users": []}
+    if isinstance(store, WriteBehindStore):
+        await store.flush()
+        store = store.store
+    if isinstance(store, RecallCacheStore):
+        store = store.store
+    counts: Counter[tuple[str, ...]] = Counter()
+    if isinstance(store, InMemoryStore):
+        for namespace, items in list(store._data.items()):
+            if items:
+                counts[namespace] = len(items)
+    elif isinstance(store, SqliteMemoryStore):
+        counts.update(await store.anamespace_counts())
+    else:  # an unknown store: page through every item
+        namespaces = await store.alist_namespaces(limit=100_000)
+        for namespace in namespaces:
+            offset, page = 0, 1000
+            while True:
+                items = await store.asearch(namespace, limit=page, offset=offset)
+                counts[namespace] += len(items)
+                if len(items) < page:
+                    break
+                offset += page
+    users = Counter(
+        {ns[1]: n for ns, n in counts.items() if len(ns) >= 2 and ns[0] == _MEMORY_NAMESPACE}
+    )
+    return {
+        "namespaces": len(counts),
+        "items": sum(counts.values()),
+        "top_namespaces": [
+            {"namespace": list(ns), "items": n} for ns, n in counts.most_common(top)
+        ],
+        "top_users": [{"user_id": u, "items": n} for u, n in users.most_common(top)],
+    }
+
+
+def process_memory() -> dict[str, Any]:
+    """Current and peak resident set size of this process, in bytes."""
+    rss = None
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) * 1024
+                    break
+    except OSError:  # not Linux
+        pass
+    peak = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux, bytes on macOS.
+        peak = peak if sys.platform == "darwin" else peak * 1024
+    return {"rss_bytes": rss, "peak_rss_bytes": peak}
+
+
+class HeapTracker:
+    """``tracemalloc`` snapshots, diffed against the previous call.
+
+    Tracing costs CPU and memory, so it only starts on request and can be
+    stopped again; the first call after starting has nothing to diff against.
+    """
+
+    def __init__(self) -> None:
+        self._previous: Optional[tracemalloc.Snapshot] = None
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            frames = int(os.getenv("TRACEMALLOC_FRAMES", "1") or 1)
+            tracemalloc.start(max(1, frames))
+            self._previous = None
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+        self._previous = None
+
+    def diff(self, top: int = 20) -> dict[str, Any]:
+        """Snapshot now; report the biggest growth since the previous snapshot."""
+        if not tracemalloc.is_tracing():
+            return {"tracing": False}
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+        current, peak = tracemalloc.get_traced_memory()
+        previous, self._previous = self._previous, snapshot
+        result: dict[str, Any] = {
+            "tracing": True,
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "baseline": previous is None,
+        }
+        if previous is None:
+            stats = snapshot.statistics("lineno")[:top]
+            result["top"] = [
+                {"location": str(s.traceback), "size_bytes": s.size, "count": s.count}
+                for s in stats
+            ]
+        else:
+            stats = snapshot.compare_to(previous, "lineno")[:top]
+            result["top"] = [
+                {
+                    "location": str(s.traceback),
+                    "size_bytes": s.size,
+                    "size_diff_bytes": s.size_diff,
+                    "count_diff": s.count_diff,
+                }
+                for s in stats
+            ]
+        return result
+
+
+HEAP = HeapTracker()
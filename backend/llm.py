@@ -214,6 +214,13 @@ def using_mock_llm() -> bool:
     return not has_model and not has_key
 
 
+# Initialised models by (model, provider, params). ``init_chat_model`` imports
+# the provider package and builds an HTTP client — synchronous work that would
+# otherwise run on the event loop inside every node call. Chat models are
+# stateless, so one instance per configuration is shared.
+_MODEL_CACHE: dict[tuple[str, str | None, str], BaseChatModel] = {}
+
+
 def get_llm(**overrides: Any) -> BaseChatModel:
     """Return a chat model based on environment configuration.
 
@@ -232,8 +239,12 @@ def get_llm(**overrides: Any) -> BaseChatModel:
     params: dict[str, Any] = {"temperature": float(os.getenv("LLM_TEMPERATURE", "0.7"))}
     params.update(overrides)
 
+    key = (model, provider, repr(sorted(params.items())))
+    if key in _MODEL_CACHE:
+        return _MODEL_CACHE[key]
     try:
-        return init_chat_model(model, model_provider=provider, **params)
+        llm = _MODEL_CACHE[key] = init_chat_model(model, model_provider=provider, **params)
+        return llm
     except Exception as exc:  # pragma: no cover - defensive fallback
         logger.warning(
             "Failed to initialise model '%s' (%s); falling back to MockChatModel.",
@@ -0,0 +1,228 @@
+"""Event-loop lag monitor and blocking-call detector.
+
+Every SSE stream, graph run and checkpoint write shares one asyncio event loop,
+so a single synchronous call inside a node (a blocking HTTP request, a regex
+over a huge history, a cold model import) stalls *every* concurrent stream.
+
+:class:`LoopMonitor` makes that visible:
+
+- a **lag probe** — a task that sleeps ``LOOP_LAG_INTERVAL_MS`` and measures
+  how late it woke up — feeds the ``event_loop_lag_seconds`` histogram (and the
+  ``event_loop_lag_last_seconds`` gauge) continuously;
+- a **watchdog thread** notices when the probe's heartbeat goes stale for longer
+  than ``LOOP_BLOCK_THRESHOLD_MS``, grabs the loop thread's stack while it is
+  still blocked, and logs it together with the graph node that was running.
+  It reads only code and line numbers from that stack (the loop owns its
+  frames' locals); the node is the running node (``metrics.running_nodes``)
+  whose function is on the stack. Each stall also increments
+  ``event_loop_blocks_total{engine,node}``.
+
+``main.lifespan`` runs it for the lifetime of the app via :func:`monitoring`.
+
+Test mode: with ``LOOP_BLOCK_BUDGET_MS`` set, ``conftest.py`` fails any test
+during which the loop was blocked for longer than the budget, printing the
+offending stack — so a sync call sneaking into an async path breaks CI rather
+than production.
+
+    LOOP_MONITOR=true              # set false to disable
+    LOOP_LAG_INTERVAL_MS=100       # probe period
+    LOOP_BLOCK_THRESHOLD_MS=250    # stall length logged as a blocking call
+    LOOP_BLOCK_BUDGET_MS=          # test mode budget (unset = off)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from types import FrameType
+from typing import AsyncIterator, Optional
+
+from metrics import LOOP_BLOCKS, LOOP_LAG, LOOP_LAG_LAST, running_nodes
+
+logger = logging.getLogger(__name__)
+
+# Recent stalls across every monitor in the process (newest last). Test mode
+# reads it to attribute blocking to the test that caused it.
+_seq = itertools.count(1)
+_RECENT: deque["Block"] = deque(maxlen=256)
+
+
+@dataclass(frozen=True)
+class Block:
+    """One stall of the event loop longer than the threshold."""
+
+    seq: int
+    seconds: float
+    engine: Optional[str]
+    node: Optional[str]
+    stack: str
+
+    def describe(self) -> str:
+        where = f"{self.engine}/{self.node}" if self.node else "outside any graph node"
+        return f"event loop blocked for {self.seconds * 1000:.0f} ms ({where})"
+
+
+def _float_env(name: str, default: Optional[float]) -> Optional[float]:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        return default
+    return value if value > 0 else default
+
+
+def block_budget() -> Optional[float]:
+    """Test-mode budget in seconds (``LOOP_BLOCK_BUDGET_MS``), or None when off."""
+    budget = _float_env("LOOP_BLOCK_BUDGET_MS", None)
+    return budget / 1000.0 if budget else None
+
+
+def last_seq() -> int:
+    """Sequence number of the newest recorded stall (0 if none)."""
+    return _RECENT[-1].seq if _RECENT else 0
+
+
+def blocks_since(seq: int) -> list[Block]:
+    """Stalls recorded after ``seq`` (see :func:`last_seq`)."""
+    return [b for b in _RECENT if b.seq > seq]
+
+
+def node_at(
+    frame: Optional[FrameType], running: list[tuple[str, str]]
+) -> tuple[Optional[str], Optional[str]]:
+    """``(engine, node)`` of the innermost ``running`` node on ``frame``'s stack.
+
+    Safe from another thread: only code objects are read, never locals. A node
+    matches a frame whose function has its name (nodes are usually named after
+    their function); failing that, a lone running node is the one.
+    """
+    while frame is not None:
+        name = frame.f_code.co_name
+        for engine, node in reversed(running):
+            if node == name:
+                return engine, node
+        frame = frame.f_back
+    return running[0] if len(running) == 1 else (None, None)
+
+
+class LoopMonitor:
+    """Lag probe + watchdog for one event loop (see module docstring)."""
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._beat = 0.0
+        self._probe: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # Stack captured by the watchdog for the stall in progress.
+        self._captured: Optional[tuple[Optional[str], Optional[str], str]] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["LoopMonitor"]:
+        if os.getenv("LOOP_MONITOR", "true").strip().lower() in {"0", "false", "no", "off"}:
+            return None
+        return cls(
+            interval=(_float_env("LOOP_LAG_INTERVAL_MS", 100.0) or 100.0) / 1000.0,
+            threshold=(_float_env("LOOP_BLOCK_THRESHOLD_MS", 250.0) or 250.0) / 1000.0,
+        )
+
+    # --- lifecycle --------------------------------------------------------------
+    def start(self) -> None:
+        """Start probing the running loop (call from a coroutine on that loop)."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._probe = self._loop.create_task(self._run_probe(), name="loop-monitor")
+        self._watchdog = threading.Thread(
+            target=self._run_watchdog, name="loop-monitor-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._probe is not None:
+            self._probe.cancel()
+            try:
+                await self._probe
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
+
+    # --- probe (on the loop) ------------------------------------------------------
+    async def _run_probe(self) -> None:
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._beat - self.interval)
+            LOOP_LAG.observe(lag)
+            LOOP_LAG_LAST.set(lag)
+            captured, self._captured = self._captured, None
+            if lag >= self.threshold:
+                self._record(lag, captured)
+
+    def _record(
+        self, lag: float, captured: Optional[tuple[Optional[str], Optional[str], str]]
+    ) -> None:
+        engine, node, stack = captured or (None, None, "")
+        block = Block(next(_seq), lag, engine, node, stack)
+        _RECENT.append(block)
+        LOOP_BLOCKS.inc(engine=engine or "none", node=node or "none")
+        logger.warning("%s", block.describe())
+
+    # --- watchdog (own thread) ----------------------------------------------------
+    def _run_watchdog(self) -> None:
+        poll = min(self.interval, self.threshold) / 2
+        while not self._stop.wait(poll):
+            stalled = time.monotonic() - self._beat - self.interval
+            if stalled < self.threshold or self._captured is not None:
+                continue
+            self._captured = self._capture()
+            engine, node, stack = self._captured
+            where = f"in node {engine}/{node}" if node else "outside any graph node"
+            logger.warning(
+                "Event loop blocked for >%.0f ms %s; loop thread stack:\n%s",
+                stalled * 1000,
+                where,
+                stack,
+            )
+
+    def _capture(self) -> tuple[Optional[str], Optional[str], str]:
+        frame = sys._current_frames().get(self._loop_thread or 0)
+        if frame is None:  # pragma: no cover - loop thread gone
+            return None, None, ""
+        stack = "".join(traceback.format_stack(frame, limit=40))
+        try:
+            engine, node = node_at(frame, running_nodes())
+        except Exception:  # pragma: no cover - frame unwound mid-walk
+            engine, node = None, None
+        return engine, node, stack
+
+
+@asynccontextmanager
+async def monitoring() -> AsyncIterator[Optional[LoopMonitor]]:
+    """Run a :class:`LoopMonitor` on the current loop for the block's duration."""
+    monitor = LoopMonitor.from_env()
+    if monitor is None:
+        yield None
+        return
+    monitor.start()
+    try:
+        yield monitor
+    finally:
+        await monitor.stop()
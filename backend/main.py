@@ -1,19 +1,25 @@
 """FastAPI server exposing the LangGraph human-in-the-loop research workflow.
 
-The graph is compiled at startup with a checkpointer chosen from the
-environment:
+Each engine's graph is compiled on first use (see ``engines.py``) with a
+checkpointer chosen from the environment (see ``checkpointing.open_checkpointer``):
 
 - ``CHECKPOINT_DB=checkpoints.sqlite`` → durable, resumable state via
   ``AsyncSqliteSaver`` (survives server restarts — LangGraph's durable
   execution feature).
 - unset → in-memory state via ``MemorySaver`` (great for local dev).
 
+Every graph is instrumented for the Prometheus-style ``/metrics`` endpoint
+(see ``metrics.py``), and the event loop is watched for blocking calls (see
+``loop_monitor.py``).
+
 No secrets are hardcoded here; configure everything through environment
 variables (see ``.env.example``).
 """
 
 from __future__ import annotations
 
+import asyncio
+import hmac
 import json
 import logging
 import os
@@ -21,14 +27,22 @@ import uuid
 from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.types import Command
 
+import archive
+import expiry
+import introspection
+import loop_monitor
+import metrics
+import profiling
+import recall_cache
+import write_behind
+
 from agent import (
     agent_middleware_summary,
     build_agent,
@@ -37,31 +51,32 @@ from agent import (
 )
 from agui import AGUI_AVAILABLE, AGUI_PATH, mount_agui
 from approval_workflow import build_approval_graph
+from checkpointing import open_checkpointer
+from consolidation import MemoryConsolidator
+from deep_agent import DEEPAGENTS_INSTALLED, build_deep_agent, deep_agent_available
+from durability import DurabilityPolicy
+from engines import EngineRegistry
 from graph import build_research_graph, resilience_config, stream_research_response
 from guardrails import GuardrailMiddleware
 from llm import using_mock_llm
 from mcp_tools import load_mcp_tools
 from memory import build_store, load_user_memory, save_user_memory
+from retention import RetentionWorker
+from search_backends import get_backend
 
 load_dotenv()
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 logger = logging.getLogger(__name__)
 
-# The Deep Agent engine needs the optional ``deepagents`` package. Import it
-# gracefully so the app still boots (with the engine disabled) if it's absent.
-try:
-    from deep_agent import build_deep_agent, deep_agent_available
-
-    DEEP_AGENT_ENABLED = True
-except Exception as exc:  # pragma: no cover - only when deepagents is missing
-    logger.warning("Deep Agent engine disabled (install 'deepagents'): %s", exc)
-    DEEP_AGENT_ENABLED = False
+# The Deep Agent engine needs the optional ``deepagents`` package; it is only
+# imported when the engine is first built, and the app still boots (with the
+# engine disabled) if it's absent.
+DEEP_AGENT_ENABLED = DEEPAGENTS_INSTALLED
+if not DEEP_AGENT_ENABLED:  # pragma: no cover - only when deepagents is missing
+    logger.warning("Deep Agent engine disabled (install 'deepagents')")
 
-    def deep_agent_available() -> bool:
-        return False
 
-
-def _capabilities(store, mcp_tools) -> dict:
+def _capabilities(store, mcp_tools, search_backend=None) -> dict:
     """Describe which optional features are active, for the UI to display."""
     guardrail = GuardrailMiddleware.from_env()
     return {
@@ -76,6 +91,7 @@ def _capabilities(store, mcp_tools) -> dict:
         },
         "structured_output": structured_output_enabled(),
         "semantic_memory": getattr(store, "index_config", None) is not None,
+        "search_backend": getattr(search_backend, "name", None),
         "mcp": {
             "enabled": bool(mcp_tools),
             "tools": [getattr(t, "name", "tool") for t in mcp_tools],
@@ -85,10 +101,10 @@ def _capabilities(store, mcp_tools) -> dict:
         "agui": {"enabled": AGUI_AVAILABLE, "path": AGUI_PATH if AGUI_AVAILABLE else None},
         "deep_agent": {
             "installed": DEEP_AGENT_ENABLED,
-            "available": deep_agent_available(),
+            "available": DEEP_AGENT_ENABLED and deep_agent_available(),
             "reason": (
                 None
-                if deep_agent_available()
+                if DEEP_AGENT_ENABLED and deep_agent_available()
                 else "Deep Agent engine needs the 'deepagents' package."
                 if not DEEP_AGENT_ENABLED
                 else "Deep Agent plans and delegates to subagents — set LLM_MODEL "
@@ -104,45 +120,87 @@ async def lifespan(app: FastAPI):
     # Cross-thread long-term memory, with semantic search when embeddings are
     # configured (see memory.build_store). Swap for a Postgres store in prod.
     store = build_store()
+    # Recalls are cached per user until their memory is written; the cache sits
+    # under the write-behind queue, so it is invalidated when writes land.
+    store = recall_cache.from_env(store)
+    # Memory writes are queued and written in batches off the request path.
+    store = write_behind.from_env(store)
     app.state.store = store
 
     # Optional MCP tools — empty unless MCP_SERVERS is configured (see mcp_tools).
     mcp_tools = await load_mcp_tools()
 
-    app.state.capabilities = _capabilities(store, mcp_tools)
+    # The web_search backend (see search_backends). A local corpus is indexed
+    # here, incrementally, rather than on the first search.
+    search_backend = await asyncio.to_thread(get_backend)
+
+    app.state.capabilities = _capabilities(store, mcp_tools, search_backend)
 
     def _build_agent(saver):
         return build_agent(checkpointer=saver, store=store, extra_tools=mcp_tools)
 
-    checkpoint_db = os.getenv("CHECKPOINT_DB")
-    if checkpoint_db:
-        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
-
-        logger.info("Using durable AsyncSqliteSaver at %s", checkpoint_db)
-        async with AsyncSqliteSaver.from_conn_string(checkpoint_db) as saver:
-            app.state.graph = build_research_graph(checkpointer=saver, store=store)
-            app.state.approval_graph = build_approval_graph(checkpointer=saver)
-            app.state.agent_graph = _build_agent(saver)
-            if DEEP_AGENT_ENABLED:
-                app.state.deep_agent = build_deep_agent(checkpointer=saver, store=store)
-            yield
-    else:
-        logger.info("Using in-memory MemorySaver (set CHECKPOINT_DB for durability)")
-        saver = MemorySaver()
-        app.state.graph = build_research_graph(checkpointer=saver, store=store)
-        app.state.approval_graph = build_approval_graph(checkpointer=saver)
-        app.state.agent_graph = _build_agent(saver)
+    async with open_checkpointer() as saver:
+        app.state.checkpointer = saver
+        # How often each engine's runs commit checkpoints (see durability).
+        app.state.durability = DurabilityPolicy.from_env()
+        # Engines compile on first use (or at startup via ENGINE_PRELOAD).
+        engines = EngineRegistry()
+        engines.register(
+            "workflow", lambda: build_research_graph(checkpointer=saver, store=store)
+        )
+        engines.register("approval", lambda: build_approval_graph(checkpointer=saver))
+        engines.register("agent", lambda: _build_agent(saver))
         if DEEP_AGENT_ENABLED:
-            app.state.deep_agent = build_deep_agent(checkpointer=saver, store=store)
-        yield
+            engines.register(
+                "deep_agent", lambda: build_deep_agent(checkpointer=saver, store=store)
+            )
+        app.state.engines = engines
+        await engines.preload()
+
+        # Expose the agent over the AG-UI protocol at /agui (no-op if not
+        # installed), so any AG-UI client (e.g. CopilotKit) can drive it —
+        # including the approval pause. Mounted once per process.
+        if not getattr(app.state, "agui_mounted", False):
+            app.state.agui_mounted = mount_agui(app, store)
+
+        # Background pruning/TTL for the SQLite checkpointer (see retention);
+        # None unless CHECKPOINT_KEEP_LAST / CHECKPOINT_TTL_HOURS is set.
+        app.state.retention = RetentionWorker.from_env(saver)
+        if app.state.retention is not None:
+            app.state.retention.start()
+
+        # Auto-resume / expire threads left at an interrupt (see expiry); None
+        # unless INTERRUPT_EXPIRY or INTERRUPT_EXPIRY_SECONDS is set.
+        app.state.expiry = expiry.from_env(engines, saver, app.state.durability)
+        if app.state.expiry is not None:
+            app.state.expiry.start()
+
+        # Per-user dedup / summary / cap of memory notes (see consolidation);
+        # None when MEMORY_CONSOLIDATION=false.
+        app.state.consolidation = MemoryConsolidator.from_env(store)
+        if app.state.consolidation is not None:
+            app.state.consolidation.start()
+
+        # Event-loop lag probe + blocking-call watchdog (see loop_monitor).
+        try:
+            async with loop_monitor.monitoring():
+                yield
+        finally:
+            if app.state.expiry is not None:
+                await app.state.expiry.stop()
+            if app.state.retention is not None:
+                await app.state.retention.stop()
+            if app.state.consolidation is not None:
+                await app.state.consolidation.stop()
+            if isinstance(store, write_behind.WriteBehindStore):
+                await store.stop()  # write out queued memory writes
+            # File-backed stores (MEMORY_DB) hold a connection; InMemoryStore doesn't.
+            if hasattr(store, "close"):
+                store.close()
 
 
 app = FastAPI(title="LangGraph Interrupt Workflow Template", lifespan=lifespan)
 
-# Expose the agent over the AG-UI protocol at /agui (no-op if not installed), so
-# any AG-UI client (e.g. CopilotKit) can drive it — including the approval pause.
-mount_agui(app)
-
 _allowed_origins = os.getenv("CORS_ORIGINS", "*").split(",")
 app.add_middleware(
     CORSMiddleware,
@@ -211,23 +269,203 @@ def _interrupt_info(result) -> tuple[bool, str | None]:
     return False, None
 
 
+def _run_config(request: Request, engine: str, endpoint: str, thread_id: str, **configurable):
+    """Config for a run of ``engine`` from ``endpoint``, and its durability mode.
+
+    The mode goes to ``ainvoke`` / ``astream`` as their ``durability`` argument.
+    """
+    config = {"configurable": {"thread_id": thread_id, **configurable}}
+    return config, request.app.state.durability.mode(engine, endpoint)
+
+
+async def _engine(request: Request, name: str, detail: str | None = None):
+    """The compiled graph for engine ``name`` (built on first use), or 503."""
+    graph = await request.app.state.engines.get(name)
+    if graph is None:
+        raise HTTPException(
+            status_code=503, detail=detail or f"The {name} engine is not available."
+        )
+    return graph
+
+
+def _note_interrupt(thread_id: str, paused: bool, engine: str, next_nodes=()) -> None:
+    """Start the interrupt-wait clock (``/metrics``) and expiry deadline of a paused thread."""
+    if paused:
+        metrics.INTERRUPTS.paused(thread_id)
+        scheduler = getattr(app.state, "expiry", None)
+        if scheduler is not None:
+            scheduler.schedule(thread_id, engine, next_nodes)
+
+
+def _note_resume(thread_id: str, engine: str) -> None:
+    """Stop the wait clock and disarm expiry for a thread about to be resumed.
+
+    410 if the thread's interrupt already expired; 409 while it is being
+    auto-resumed (see ``expiry``).
+    """
+    scheduler = getattr(app.state, "expiry", None)
+    if scheduler is not None:
+        if scheduler.is_expired(thread_id):
+            raise HTTPException(status_code=410, detail="This thread's interrupt expired.")
+        if not scheduler.cancel(thread_id):
+            raise HTTPException(
+                status_code=409, detail="This thread's interrupt is being resumed on expiry."
+            )
+    metrics.INTERRUPTS.resumed(thread_id, engine)
+
+
+def _require_admin(request: Request) -> None:
+    """Gate ``/debug/*`` endpoints behind ``ADMIN_TOKEN``.
+
+    Unset → the endpoints don't exist (404). Otherwise the caller must send
+    ``Authorization: Bearer <token>`` (or ``X-Admin-Token``).
+    """
+    expected = os.getenv("ADMIN_TOKEN", "").strip()
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = request.headers.get("x-admin-token", "")
+    auth = request.headers.get("authorization", "")
+    if auth.lower().startswith("bearer "):
+        supplied = auth[7:].strip()
+    if not hmac.compare_digest(supplied.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text-format metrics (node latency, LLM usage, SSE, checkpoints)."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/capabilities")
 async def capabilities(request: Request):
     """Report which optional features are active (guardrails, MCP, etc.)."""
     return getattr(request.app.state, "capabilities", {})
 
 
+# --- Admin diagnostics (ADMIN_TOKEN) ----------------------------------------
+@app.get("/debug/profile")
+async def debug_profile(
+    request: Request, seconds: float = 5.0, top: int = 25, format: str = "json"
+):
+    """Sample the live process (threads + asyncio tasks) for ``seconds``.
+
+    ``format=collapsed`` returns flamegraph-ready collapsed stacks as plain
+    text; the default JSON adds a top-N function table.
+    """
+    _require_admin(request)
+    try:
+        result = await profiling.profile(seconds, top=top)
+    except profiling.ProfilerBusy as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    if format == "collapsed":
+        return PlainTextResponse(result["collapsed"])
+    return result
+
+
+@app.get("/debug/memory")
+async def debug_memory(request: Request, top: int = 20, tracemalloc: str | None = None):
+    """Where memory goes: top threads by checkpoint size, store items per user.
+
+    ``tracemalloc=start`` begins allocation tracing (baseline snapshot), later
+    calls return the growth since the previous call, ``tracemalloc=stop`` ends
+    it. Tracing is off unless started here.
+    """
+    _require_admin(request)
+    if tracemalloc == "start":
+        introspection.HEAP.start()
+    elif tracemalloc == "stop":
+        introspection.HEAP.stop()
+    state = request.app.state
+    return {
+        "process": introspection.process_memory(),
+        "checkpoints": await introspection.checkpoint_usage(state.checkpointer, top=top),
+        "store": await introspection.store_usage(getattr(state, "store", None), top=top),
+        # Snapshotting walks every traced allocation; keep it off the loop.
+        "tracemalloc": await asyncio.to_thread(introspection.HEAP.diff, top),
+    }
+
+
+@app.post("/debug/retention")
+async def debug_retention(request: Request):
+    """Run a checkpoint retention pass now and return its report.
+
+    409 unless retention is configured (SQLite checkpointer plus
+    ``CHECKPOINT_KEEP_LAST`` and/or ``CHECKPOINT_TTL_HOURS``).
+    """
+    _require_admin(request)
+    worker = getattr(request.app.state, "retention", None)
+    if worker is None:
+        raise HTTPException(
+            status_code=409,
+            detail="Checkpoint retention is not configured (needs CHECKPOINT_DB "
+            "and CHECKPOINT_KEEP_LAST or CHECKPOINT_TTL_HOURS).",
+        )
+    report = await worker.run_once()
+    return report.as_dict()
+
+
+@app.post("/debug/memory/consolidate")
+async def debug_consolidate_memory(request: Request):
+    """Run a memory consolidation pass now and return its report.
+
+    409 when consolidation is off (``MEMORY_CONSOLIDATION=false``).
+    """
+    _require_admin(request)
+    worker = getattr(request.app.state, "consolidation", None)
+    if worker is None:
+        raise HTTPException(status_code=409, detail="Memory consolidation is disabled.")
+    report = await worker.run_once()
+    return report.as_dict()
+
+
+@app.get("/debug/threads/export")
+async def debug_export_threads(request: Request, thread_id: list[str] | None = Query(None)):
+    """Stream an archive of the given threads (default: all), see ``archive``."""
+    _require_admin(request)
+    state = request.app.state
+    chunks = archive.export_threads(
+        state.checkpointer, only=thread_id, store=getattr(state, "store", None)
+    )
+    return StreamingResponse(
+        chunks,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": 'attachment; filename="threads.lgarchive"'},
+    )
+
+
+@app.post("/debug/threads/import")
+async def debug_import_threads(request: Request, replace: bool = False):
+    """Load an archive (the request body, streamed) into this server's checkpointer.
+
+    Existing threads are skipped unless ``replace=true``; 400 on a malformed
+    or truncated archive (threads before the damage are kept).
+    """
+    _require_admin(request)
+    state = request.app.state
+    try:
+        report = await archive.import_threads(
+            state.checkpointer,
+            request.stream(),
+            store=getattr(state, "store", None),
+            replace=replace,
+        )
+    except archive.ArchiveError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return report.as_dict()
+
+
 @app.post("/start")
 async def start_chat(chat_input: ChatInput, request: Request):
     """Start a new research conversation."""
-    graph = request.app.state.graph
+    graph = await _engine(request, "workflow")
     thread_id = str(uuid.uuid4())
-    config = {"configurable": {"thread_id": thread_id}}
+    config, durability = _run_config(request, "workflow", "/start", thread_id)
 
     initial_state = {
         "messages": [],
@@ -246,9 +484,10 @@ async def start_chat(chat_input: ChatInput, request: Request):
     }
 
     try:
-        result = await graph.ainvoke(initial_state, config)
+        result = await graph.ainvoke(initial_state, config, durability=durability)
         state = await graph.aget_state(config)
         is_interrupted, interrupt_message = _interrupt_info(result)
+        _note_interrupt(thread_id, is_interrupted, "workflow", state.next)
         return {
             "thread_id": thread_id,
             "state": state.values,
@@ -264,7 +503,7 @@ async def start_chat(chat_input: ChatInput, request: Request):
 @app.get("/get_state/{thread_id}")
 async def get_research_state(thread_id: str, request: Request):
     """Get the current state of a conversation."""
-    graph = request.app.state.graph
+    graph = await _engine(request, "workflow")
     config = {"configurable": {"thread_id": thread_id}}
     try:
         state = await graph.aget_state(config)
@@ -288,12 +527,14 @@ async def get_research_state(thread_id: str, request: Request):
 @app.post("/resume")
 async def resume_research(data: ResumeInput, request: Request):
     """Resume an interrupted conversation with the user's choice."""
-    graph = request.app.state.graph
-    config = {"configurable": {"thread_id": data.thread_id}}
+    graph = await _engine(request, "workflow")
+    config, durability = _run_config(request, "workflow", "/resume", data.thread_id)
+    _note_resume(data.thread_id, "workflow")
     try:
-        result = await graph.ainvoke(Command(resume=data.choice), config)
+        result = await graph.ainvoke(Command(resume=data.choice), config, durability=durability)
         state = await graph.aget_state(config)
         is_interrupted, interrupt_message = _interrupt_info(result)
+        _note_interrupt(data.thread_id, is_interrupted, "workflow", state.next)
         return {
             "state": state.values,
             "next": state.next,
@@ -309,8 +550,8 @@ async def resume_research(data: ResumeInput, request: Request):
 @app.post("/continue")
 async def continue_conversation(data: ContinueInput, request: Request):
     """Continue a finished conversation with a follow-up question."""
-    graph = request.app.state.graph
-    config = {"configurable": {"thread_id": data.thread_id}}
+    graph = await _engine(request, "workflow")
+    config, durability = _run_config(request, "workflow", "/continue", data.thread_id)
     try:
         current_state = await graph.aget_state(config)
         if not current_state.values:
@@ -331,9 +572,10 @@ async def continue_conversation(data: ContinueInput, request: Request):
             "user_memory": None,
         }
 
-        result = await graph.ainvoke(follow_up_state, config)
+        result = await graph.ainvoke(follow_up_state, config, durability=durability)
         state = await graph.aget_state(config)
         is_interrupted, interrupt_message = _interrupt_info(result)
+        _note_interrupt(data.thread_id, is_interrupted, "workflow", state.next)
         return {
             "state": state.values,
             "next": state.next,
@@ -367,9 +609,9 @@ def _approval_payload(state, result) -> dict:
 @app.post("/approval/start")
 async def approval_start(data: ApprovalStart, request: Request):
     """Draft content for a task and pause for human review."""
-    graph = request.app.state.approval_graph
+    graph = await _engine(request, "approval")
     thread_id = str(uuid.uuid4())
-    config = {"configurable": {"thread_id": thread_id}}
+    config, durability = _run_config(request, "approval", "/approval/start", thread_id)
 
     initial_state = {
         "messages": [],
@@ -382,8 +624,9 @@ async def approval_start(data: ApprovalStart, request: Request):
         "final_output": "",
     }
     try:
-        result = await graph.ainvoke(initial_state, config)
+        result = await graph.ainvoke(initial_state, config, durability=durability)
         state = await graph.aget_state(config)
+        _note_interrupt(thread_id, _interrupt_info(result)[0], "approval", state.next)
         return {"thread_id": thread_id, **_approval_payload(state, result)}
     except Exception as exc:
         logger.exception("Error starting approval workflow")
@@ -393,8 +636,8 @@ async def approval_start(data: ApprovalStart, request: Request):
 @app.post("/approval/decide")
 async def approval_decide(data: ApprovalDecision, request: Request):
     """Resume the approval workflow with approve / edit / reject."""
-    graph = request.app.state.approval_graph
-    config = {"configurable": {"thread_id": data.thread_id}}
+    graph = await _engine(request, "approval")
+    config, durability = _run_config(request, "approval", "/approval/decide", data.thread_id)
 
     action = data.action.lower()
     resume_value: dict = {"action": action}
@@ -403,9 +646,11 @@ async def approval_decide(data: ApprovalDecision, request: Request):
     elif action == "reject":
         resume_value["feedback"] = data.feedback or ""
 
+    _note_resume(data.thread_id, "approval")
     try:
-        result = await graph.ainvoke(Command(resume=resume_value), config)
+        result = await graph.ainvoke(Command(resume=resume_value), config, durability=durability)
         state = await graph.aget_state(config)
+        _note_interrupt(data.thread_id, _interrupt_info(result)[0], "approval", state.next)
         return _approval_payload(state, result)
     except Exception as exc:
         logger.exception("Error deciding approval workflow")
@@ -413,10 +658,24 @@ async def approval_decide(data: ApprovalDecision, request: Request):
 
 
 def _stream_response(
-    graph, thread_id: str, choice: str, config: dict | None = None
+    graph,
+    thread_id: str,
+    choice: str,
+    config: dict | None = None,
+    durability: str | None = None,
+    endpoint: str = "/stream",
 ) -> StreamingResponse:
+    _note_resume(thread_id, "workflow")
+    meter = metrics.SSEMeter(endpoint)
+
     async def generate_stream():
-        async for chunk in stream_research_response(graph, thread_id, choice, config):
+        run = stream_research_response(graph, thread_id, choice, config, durability)
+        async for chunk in run:
+            meter.frame(chunk)
+            if chunk.get("type") == "state":
+                _note_interrupt(
+                    thread_id, chunk.get("requires_input", False), "workflow", chunk.get("next", ())
+                )
             yield f"data: {json.dumps(chunk)}\n\n"
         yield f"data: {json.dumps({'type': 'done', 'content': '', 'done': True})}\n\n"
 
@@ -430,19 +689,30 @@ def _stream_response(
 @app.post("/stream")
 async def stream_research(data: ResumeInput, request: Request):
     """Resume and stream progress + the final response (SSE)."""
-    return _stream_response(request.app.state.graph, data.thread_id, data.choice)
+    graph = await _engine(request, "workflow")
+    config, durability = _run_config(request, "workflow", "/stream", data.thread_id)
+    return _stream_response(graph, data.thread_id, data.choice, config, durability)
 
 
 @app.get("/stream")
 async def stream_research_get(thread_id: str, choice: str, request: Request):
     """Resume and stream via GET (for EventSource)."""
-    return _stream_response(request.app.state.graph, thread_id, choice)
+    graph = await _engine(request, "workflow")
+    config, durability = _run_config(request, "workflow", "/stream", thread_id)
+    return _stream_response(graph, thread_id, choice, config, durability)
 
 
 # --- Agent engine (create_agent + HITL middleware) --------------------------
-def _sse(generator) -> StreamingResponse:
+def _sse(generator, endpoint: str, thread_id: str, engine: str) -> StreamingResponse:
+    meter = metrics.SSEMeter(endpoint)
+
     async def body():
         async for chunk in generator:
+            meter.frame(chunk)
+            if chunk.get("type") == "state":
+                _note_interrupt(
+                    thread_id, chunk.get("requires_input", False), engine, chunk.get("next", ())
+                )
             yield f"data: {json.dumps(chunk)}\n\n"
 
     return StreamingResponse(
@@ -455,11 +725,11 @@ def _sse(generator) -> StreamingResponse:
 @app.post("/agent/start")
 async def agent_start(data: AgentStart, request: Request):
     """Start (or continue) an agentic run; streams progress, tokens, approvals."""
-    graph = request.app.state.agent_graph
+    graph = await _engine(request, "agent")
     store = request.app.state.store
     is_new = not data.thread_id
     thread_id = data.thread_id or str(uuid.uuid4())
-    config = {"configurable": {"thread_id": thread_id}}
+    config, durability = _run_config(request, "agent", "/agent/start", thread_id)
 
     from langchain_core.messages import HumanMessage, SystemMessage
 
@@ -474,23 +744,32 @@ async def agent_start(data: AgentStart, request: Request):
     async def gen():
         yield {"type": "thread", "thread_id": thread_id}
         final_seen = ""
-        async for ev in stream_agent_response(graph, thread_id, {"messages": messages}, config):
+        run = stream_agent_response(
+            graph, thread_id, {"messages": messages}, config, durability
+        )
+        async for ev in run:
             if ev.get("type") == "state" and not ev.get("requires_input"):
                 final_seen = ev.get("final_response", "")
             yield ev
         if final_seen:
             await save_user_memory(store, data.user_id, f"Asked the agent about: {data.message[:120]}")
 
-    return _sse(gen())
+    return _sse(gen(), "/agent/start", thread_id, "agent")
 
 
 @app.post("/agent/decide")
 async def agent_decide(data: AgentDecision, request: Request):
     """Resume the agent with approve / edit / reject / respond decisions."""
-    graph = request.app.state.agent_graph
-    config = {"configurable": {"thread_id": data.thread_id}}
+    graph = await _engine(request, "agent")
+    config, durability = _run_config(request, "agent", "/agent/decide", data.thread_id)
     command = Command(resume={"decisions": data.decisions})
-    return _sse(stream_agent_response(graph, data.thread_id, command, config))
+    _note_resume(data.thread_id, "agent")
+    return _sse(
+        stream_agent_response(graph, data.thread_id, command, config, durability),
+        "/agent/decide",
+        data.thread_id,
+        "agent",
+    )
 
 
 # --- Deep Agent engine (planning + subagents + HITL) ------------------------
@@ -502,16 +781,15 @@ async def deep_start(data: AgentStart, request: Request):
     handler. The Deep Agent plans, delegates to subagents, and pauses for tool
     approval — most visible with a real provider model.
     """
-    graph = getattr(request.app.state, "deep_agent", None)
-    if graph is None:
-        raise HTTPException(
-            status_code=503,
-            detail="Deep Agent engine is not available (install 'deepagents').",
-        )
+    graph = await _engine(
+        request,
+        "deep_agent",
+        detail="Deep Agent engine is not available (install 'deepagents').",
+    )
     store = request.app.state.store
     is_new = not data.thread_id
     thread_id = data.thread_id or str(uuid.uuid4())
-    config = {"configurable": {"thread_id": thread_id}}
+    config, durability = _run_config(request, "deep_agent", "/deep/start", thread_id)
 
     from langchain_core.messages import HumanMessage, SystemMessage
 
@@ -525,7 +803,10 @@ async def deep_start(data: AgentStart, request: Request):
     async def gen():
         yield {"type": "thread", "thread_id": thread_id}
         final_seen = ""
-        async for ev in stream_agent_response(graph, thread_id, {"messages": messages}, config):
+        run = stream_agent_response(
+            graph, thread_id, {"messages": messages}, config, durability
+        )
+        async for ev in run:
             if ev.get("type") == "state" and not ev.get("requires_input"):
                 final_seen = ev.get("final_response", "")
             yield ev
@@ -534,25 +815,29 @@ async def deep_start(data: AgentStart, request: Request):
                 store, data.user_id, f"Asked the deep agent about: {data.message[:120]}"
             )
 
-    return _sse(gen())
+    return _sse(gen(), "/deep/start", thread_id, "deep_agent")
 
 
 @app.post("/deep/decide")
 async def deep_decide(data: AgentDecision, request: Request):
     """Resume the Deep Agent with approve / edit / reject / respond decisions."""
-    graph = getattr(request.app.state, "deep_agent", None)
-    if graph is None:
-        raise HTTPException(status_code=503, detail="Deep Agent engine is not available.")
-    config = {"configurable": {"thread_id": data.thread_id}}
+    graph = await _engine(request, "deep_agent", detail="Deep Agent engine is not available.")
+    config, durability = _run_config(request, "deep_agent", "/deep/decide", data.thread_id)
     command = Command(resume={"decisions": data.decisions})
-    return _sse(stream_agent_response(graph, data.thread_id, command, config))
+    _note_resume(data.thread_id, "deep_agent")
+    return _sse(
+        stream_agent_response(graph, data.thread_id, command, config, durability),
+        "/deep/decide",
+        data.thread_id,
+        "deep_agent",
+    )
 
 
 # --- Time travel (checkpoint history + fork) --------------------------------
 @app.get("/history/{thread_id}")
 async def get_history(thread_id: str, request: Request):
     """List the checkpoints for a thread so a user can rewind / fork."""
-    graph = request.app.state.graph
+    graph = await _engine(request, "workflow")
     config = {"configurable": {"thread_id": thread_id}}
     try:
         checkpoints = []
@@ -581,13 +866,13 @@ async def fork_from_checkpoint(data: ForkInput, request: Request):
     Streams the forked run just like ``/stream``. The new run branches off the
     chosen checkpoint without losing the original history.
     """
-    config = {
-        "configurable": {
-            "thread_id": data.thread_id,
-            "checkpoint_id": data.checkpoint_id,
-        }
-    }
-    return _stream_response(request.app.state.graph, data.thread_id, data.choice, config)
+    config, durability = _run_config(
+        request, "workflow", "/fork", data.thread_id, checkpoint_id=data.checkpoint_id
+    )
+    graph = await _engine(request, "workflow")
+    return _stream_response(
+        graph, data.thread_id, data.choice, config, durability, endpoint="/fork"
+    )
 
 
 if __name__ == "__main__":
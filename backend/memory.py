@@ -14,7 +14,7 @@ from __future__ import annotations
 import logging
 import os
 import uuid
-from typing import Optional
+from typing import Callable, Optional
 
 from langgraph.store.base import BaseStore
 from langgraph.store.memory import InMemoryStore
@@ -26,31 +26,88 @@ logger = logging.getLogger(__name__)
 _DEFAULT_EMBEDDING_DIMS = 1536
 
 
+# Called as ``hook(store, user_id, key, text)`` after each note is saved
+# (``consolidation`` registers one).
+SaveHook = Callable[[BaseStore, str, str, str], None]
+_save_hooks: list[SaveHook] = []
+
+
 def _namespace(user_id: str) -> tuple[str, str]:
     return ("memories", user_id)
 
 
+def add_save_hook(hook: SaveHook) -> None:
+    _save_hooks.append(hook)
+
+
+def remove_save_hook(hook: SaveHook) -> None:
+    if hook in _save_hooks:
+        _save_hooks.remove(hook)
+
+
 def build_store() -> BaseStore:
     """Create the long-term memory store, with semantic search when possible.
 
     If ``EMBEDDINGS_MODEL`` is set (e.g. ``openai:text-embedding-3-small``) and
     the matching provider credentials are available, the store is built with a
     vector index so :func:`load_user_memory` can recall the *most relevant*
-    memories for the current question. Otherwise it falls back to a plain store
-    (recency-ordered recall) so the zero-config demo still works offline.
-
-    Swap ``InMemoryStore`` for a Postgres-backed store in production.
+    memories for the current question. Embeddings go through
+    ``embedding_cache.CachedEmbeddings``, so repeated texts are not
+    re-embedded. ``EMBEDDINGS_MODEL=hashing`` needs no provider: it uses the
+    offline ``hashing_embeddings.HashingEmbeddings``. Otherwise it falls back
+    to a plain store (recency-ordered recall) so the zero-config demo still
+    works offline.
+
+    If ``MEMORY_DB`` is set, memories live in that SQLite file instead and are
+    recalled by BM25 full-text relevance (see ``memory_store``) — durable and
+    offline — or, with ``EMBEDDINGS_MODEL`` too, semantically from a
+    memory-mapped vector index beside it. Swap in a Postgres-backed store for
+    multi-host production.
     """
+    from vector_index import NUMPY_AVAILABLE, VectorMemoryStore
+
     embeddings_model = os.getenv("EMBEDDINGS_MODEL", "").strip()
+    index = None
     if embeddings_model:
+        from embedding_cache import build_embeddings
+        from hashing_embeddings import DEFAULT_DIMS, MODEL_NAME, HashingEmbeddings
+
+        hashing = embeddings_model == MODEL_NAME
+        default_dims = DEFAULT_DIMS if hashing else _DEFAULT_EMBEDDING_DIMS
+        dims = int(os.getenv("EMBEDDING_DIMS", "").strip() or default_dims)
         try:
-            dims = int(os.getenv("EMBEDDING_DIMS", _DEFAULT_EMBEDDING_DIMS))
-            # ``embed`` accepts a provider string; LangGraph resolves it via
-            # ``init_embeddings`` and only indexes the "text" field.
-            store = InMemoryStore(
-                index={"dims": dims, "embed": embeddings_model, "fields": ["text"]}
+            # ``hashing`` is computed locally; providers are cached and
+            # micro-batched (see ``embedding_cache``). Only "text" is indexed.
+            embed = HashingEmbeddings(dims) if hashing else build_embeddings(embeddings_model)
+        except Exception as exc:
+            logger.warning(
+                "Could not load embeddings %s (%s); no semantic recall.", embeddings_model, exc
+            )
+        else:
+            index = {"dims": dims, "embed": embed, "fields": ["text"]}
+    memory_db = os.getenv("MEMORY_DB", "").strip()
+    if memory_db:
+        from memory_store import SqliteMemoryStore
+
+        if index and not NUMPY_AVAILABLE:
+            logger.warning("Semantic recall with MEMORY_DB needs numpy; using full-text recall.")
+            index = None
+        try:
+            return SqliteMemoryStore(memory_db, index=index)
+        except Exception as exc:
+            if not index:
+                raise
+            logger.warning("Could not enable semantic memory (%s); using full-text recall.", exc)
+            return SqliteMemoryStore(memory_db)
+    if index:
+        try:
+            # Vectorised index (contiguous NumPy matrices) when NumPy is there;
+            # otherwise InMemoryStore's own per-item similarity.
+            store_cls = VectorMemoryStore if NUMPY_AVAILABLE else InMemoryStore
+            store = store_cls(index=index)
+            logger.info(
+                "Semantic memory enabled (embeddings=%s, dims=%d)", embeddings_model, index["dims"]
             )
-            logger.info("Semantic memory enabled (embeddings=%s, dims=%d)", embeddings_model, dims)
             return store
         except Exception as exc:  # pragma: no cover - defensive
             logger.warning(
@@ -79,8 +136,9 @@ async def load_user_memory(
     """Return a short bulleted summary of what we remember about the user.
 
     When the store has a vector index and ``query`` is provided, results are the
-    memories most *semantically relevant* to the query. Otherwise the store
-    returns the most recent memories.
+    memories most *semantically relevant* to the query; with the SQLite store
+    (``MEMORY_DB``) they are the best BM25 matches. Otherwise the store returns
+    the most recent memories.
     """
     if not store or not user_id:
         return ""
@@ -99,7 +157,11 @@ async def save_user_memory(
     """Persist a single memory note for the user."""
     if not store or not user_id or not text:
         return
+    key = str(uuid.uuid4())
     try:
-        await store.aput(_namespace(user_id), str(uuid.uuid4()), {"text": text})
+        await store.aput(_namespace(user_id), key, {"text": text})
     except Exception as exc:  # pragma: no cover - defensive
         logger.warning("Memory save failed: %s", exc)
+        return
+    for hook in _save_hooks:
+        hook(store, user_id, key, text)
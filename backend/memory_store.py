@@ -0,0 +1,406 @@
+"""Durable long-term memory: a SQLite ``BaseStore`` with FTS5 (BM25) recall.
+
+``InMemoryStore`` forgets every user on restart, and without an embeddings
+model it can only hand back the most recent memories. :class:`SqliteMemoryStore`
+keeps items in one SQLite file and indexes their ``text`` field with FTS5, so
+``asearch(namespace, query=...)`` returns the memories most *relevant* to the
+question, ranked by BM25 — persistent, and with no model or network involved.
+``memory.build_store`` uses it when ``MEMORY_DB`` is set.
+
+Layout:
+
+- ``store_items`` — one row per (namespace, key) with the JSON value, the
+  indexed terms, and timestamps. Namespaces are stored joined by ``\\x1f`` so
+  a namespace prefix is a range scan.
+- ``store_fts`` — an external-content FTS5 table over ``store_items.terms``,
+  kept in sync by triggers. Each indexed word is prefixed with a short hash of
+  the item's namespace (``battery`` in ``("memories", "ada")`` is indexed as
+  ``n3f…battery``), so every namespace has its own term space: a recall inside
+  one user's memories reads only that user's postings, and BM25's document
+  frequencies are per user. With one shared term space, ``bm25()`` counts each
+  query word's documents across *all* users on every query, which dominates
+  recall time once the store holds millions of notes.
+
+Queries are split into words, stop words dropped, and OR-ed; a query with no
+usable words (or no query) lists the namespace newest first. A search under a
+shorter prefix (e.g. ``("memories",)``) ORs the query across the namespaces
+under it, so it is slower the more namespaces there are. ``filter`` is applied
+in Python after the SQL, as ``InMemoryStore`` does. TTLs are not supported.
+Calls run on one connection behind a lock; the async methods run them in a
+worker thread so a large recall never blocks the event loop.
+
+With an embeddings ``index`` (``MEMORY_DB`` plus ``EMBEDDINGS_MODEL``), queries
+are answered from a memory-mapped ``vector_index`` next to the database instead;
+the FTS index is still kept, so dropping the embeddings model falls back to BM25.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from langchain_core.embeddings import Embeddings
+from langgraph.store.base import (
+    BaseStore,
+    GetOp,
+    IndexConfig,
+    Item,
+    ListNamespacesOp,
+    Op,
+    PutOp,
+    Result,
+    SearchItem,
+    SearchOp,
+    ensure_embeddings,
+    get_text_at_path,
+    tokenize_path,
+)
+from langgraph.store.memory import _compare_values, _does_match
+
+from vector_index import search_items
+
+logger = logging.getLogger(__name__)
+
+_SEP = "\x1f"
+# Upper bound of a namespace range: the character after the separator.
+_SEP_END = chr(ord(_SEP) + 1)
+# Words that match nearly every note; dropped from both the index and queries.
+_STOP_WORDS = frozenset(
+    "a about an and are as at be by can do for from how i in is it me my of on or "
+    "that the this to was what when where which who why with you your".split()
+)
+# The runs of letters and digits FTS5's unicode61 tokenizer keeps as one token.
+_WORD = re.compile(r"[^\W_]+")
+_MAX_TERMS = 32
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS store_items ("
+    "id INTEGER PRIMARY KEY, namespace TEXT NOT NULL, key TEXT NOT NULL, "
+    "value TEXT NOT NULL, terms TEXT, "
+    "created_at REAL NOT NULL, updated_at REAL NOT NULL, UNIQUE (namespace, key))",
+    "CREATE INDEX IF NOT EXISTS store_items_recent ON store_items (namespace, updated_at)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS store_fts USING fts5("
+    "terms, content='store_items', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS store_items_ai AFTER INSERT ON store_items BEGIN "
+    "INSERT INTO store_fts(rowid, terms) VALUES (new.id, new.terms); END",
+    "CREATE TRIGGER IF NOT EXISTS store_items_ad AFTER DELETE ON store_items BEGIN "
+    "INSERT INTO store_fts(store_fts, rowid, terms) VALUES ('delete', old.id, old.terms); END",
+    "CREATE TRIGGER IF NOT EXISTS store_items_au AFTER UPDATE ON store_items BEGIN "
+    "INSERT INTO store_fts(store_fts, rowid, terms) VALUES ('delete', old.id, old.terms); "
+    "INSERT INTO store_fts(rowid, terms) VALUES (new.id, new.terms); END",
+)
+
+_COLUMNS = "i.namespace, i.key, i.value, i.created_at, i.updated_at"
+
+
+def _words(text: str) -> list[str]:
+    """The non-stop words of ``text``, lower-cased, in order."""
+    return [w for w in _WORD.findall(text.lower()) if w not in _STOP_WORDS]
+
+
+def _scope(namespace: str) -> str:
+    """The term prefix of a (joined) namespace: ``n`` + 10 hex digits."""
+    return "n" + hashlib.blake2b(namespace.encode(), digest_size=5).hexdigest()
+
+
+def fts_query(text: str, namespaces: Iterable[str]) -> Optional[str]:
+    """An FTS5 OR-query of the words of ``text`` inside ``namespaces``, or None."""
+    words = list(dict.fromkeys(_words(text)))[:_MAX_TERMS]
+    if not words:
+        return None
+    return " OR ".join(f'"{_scope(ns)}{w}"' for ns in namespaces for w in words)
+
+
+def _ts(value: float) -> datetime:
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+def _regroup(documents: dict[int, list[str]], vectors: list) -> dict[int, list]:
+    """Split a flat list of embeddings back into per-put lists."""
+    grouped, start = {}, 0
+    for i, texts in documents.items():
+        grouped[i] = vectors[start : start + len(texts)]
+        start += len(texts)
+    return grouped
+
+
+async def _nothing() -> list:
+    return []
+
+
+class SqliteMemoryStore(BaseStore):
+    """A ``BaseStore`` in one SQLite file, with BM25 search over ``fields``.
+
+    ``fields`` are the value paths indexed by default (``PutOp.index`` overrides
+    them per item, ``False`` skips indexing), as with ``IndexConfig``.
+
+    With an ``index`` config (``dims`` / ``embed`` / ``fields``, as for
+    ``InMemoryStore``) the fields are also embedded into a
+    ``vector_index.VectorIndexSet`` in ``<path>.vectors/`` (memory-mapped, so
+    workers on one host share it), and searches with a query are semantic.
+    Vector changes are applied after the SQLite batch commits, so a failed batch
+    changes neither. Items stored while no index was configured have no vectors
+    until they are re-put.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        fields: Iterable[str] = ("text",),
+        index: Optional[IndexConfig] = None,
+    ) -> None:
+        self.path = path
+        self.index_config = dict(index) if index else None
+        self.embeddings: Optional[Embeddings] = None
+        self.vectors = None
+        if index:
+            from vector_index import VectorIndexSet
+
+            self.embeddings = ensure_embeddings(index.get("embed"))
+            fields = index.get("fields") or fields
+            self.vectors = VectorIndexSet(index["dims"], directory=path + ".vectors")
+        self.fields = [(f, tokenize_path(f)) for f in fields]
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+        logger.info(
+            "Using SQLite long-term memory store at %s (%s recall)",
+            path,
+            "semantic" if self.vectors is not None else "FTS5",
+        )
+
+    # -- BaseStore -------------------------------------------------------------
+
+    def batch(self, ops: Iterable[Op]) -> list[Result]:
+        ops = list(ops)
+        documents, queries = self._to_embed(ops)
+        embedded, query_vectors = {}, {}
+        if self.embeddings is not None:
+            flat = [t for texts in documents.values() for t in texts]
+            vectors = self.embeddings.embed_documents(flat) if flat else []
+            embedded = _regroup(documents, vectors)
+            query_vectors = {q: self.embeddings.embed_query(q) for q in queries}
+        return self._run(ops, embedded, query_vectors)
+
+    async def abatch(self, ops: Iterable[Op]) -> list[Result]:
+        ops = list(ops)
+        documents, queries = self._to_embed(ops)
+        embedded, query_vectors = {}, {}
+        if self.embeddings is not None:
+            flat = [t for texts in documents.values() for t in texts]
+            vectors, *found = await asyncio.gather(
+                self.embeddings.aembed_documents(flat) if flat else _nothing(),
+                *(self.embeddings.aembed_query(q) for q in queries),
+            )
+            embedded = _regroup(documents, vectors)
+            query_vectors = dict(zip(queries, found))
+        return await asyncio.to_thread(self._run, ops, embedded, query_vectors)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def namespace_counts(self) -> dict[tuple[str, ...], int]:
+        """Items per namespace, counted from the namespace index (values unread)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT namespace, count(*) FROM store_items GROUP BY namespace"
+            ).fetchall()
+        return {tuple(namespace.split(_SEP)): n for namespace, n in rows}
+
+    async def anamespace_counts(self) -> dict[tuple[str, ...], int]:
+        return await asyncio.to_thread(self.namespace_counts)
+
+    # -- operations --------------------------------------------------------------
+
+    def _to_embed(self, ops: list[Op]) -> tuple[dict[int, list[str]], list[str]]:
+        """Texts to embed per put (by position in ``ops``), and distinct queries."""
+        if self.vectors is None:
+            return {}, []
+        documents = {
+            i: texts
+            for i, op in enumerate(ops)
+            if isinstance(op, PutOp) and op.value is not None and (texts := self._texts(op))
+        }
+        queries = [op.query for op in ops if isinstance(op, SearchOp) and op.query]
+        return documents, list(dict.fromkeys(queries))
+
+    def _run(
+        self,
+        ops: list[Op],
+        embedded: dict[int, list[list[float]]],
+        query_vectors: dict[str, list[float]],
+    ) -> list[Result]:
+        results: list[Result] = []
+        # Vector changes per namespace, applied once the SQLite batch commits.
+        changes: dict[tuple[str, ...], list] = {}
+        with self._lock:
+            try:
+                for i, op in enumerate(ops):
+                    if isinstance(op, GetOp):
+                        results.append(self._get(op))
+                    elif isinstance(op, SearchOp):
+                        results.append(self._search(op, query_vectors.get(op.query or "")))
+                    elif isinstance(op, PutOp):
+                        self._put(op)
+                        if self.vectors is not None:
+                            changes.setdefault(op.namespace, []).append((op.key, embedded.get(i) or None))
+                        results.append(None)
+                    elif isinstance(op, ListNamespacesOp):
+                        results.append(self._list_namespaces(op))
+                    else:
+                        raise ValueError(f"Unknown operation type: {type(op)}")
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+            for namespace, entries in changes.items():
+                self.vectors.update(namespace, entries)
+        return results
+
+    def _item(self, row: tuple, score: Optional[float] = None, search: bool = False) -> Item:
+        namespace, key, value, created_at, updated_at = row[:5]
+        fields = dict(
+            namespace=tuple(namespace.split(_SEP)),
+            key=key,
+            value=json.loads(value),
+            created_at=_ts(created_at),
+            updated_at=_ts(updated_at),
+        )
+        if search:
+            return SearchItem(**fields, score=score)
+        return Item(**fields)
+
+    def _lookup(self, namespace: tuple[str, ...], key: str) -> Optional[Item]:
+        return self._get(GetOp(namespace, key))
+
+    def _get(self, op: GetOp) -> Optional[Item]:
+        row = self._conn.execute(
+            f"SELECT {_COLUMNS} FROM store_items i WHERE namespace = ? AND key = ?",
+            (_SEP.join(op.namespace), op.key),
+        ).fetchone()
+        return self._item(row) if row else None
+
+    def _texts(self, op: PutOp) -> list[str]:
+        """The texts of ``op``'s indexed fields."""
+        if op.index is False:
+            return []
+        paths = self.fields if op.index is None else [(f, tokenize_path(f)) for f in op.index]
+        return [text for _, path in paths for text in get_text_at_path(op.value, path)]
+
+    def _terms(self, op: PutOp, namespace: str) -> Optional[str]:
+        """The namespace-scoped words to index for ``op``, or None."""
+        scope = _scope(namespace)
+        terms = [scope + word for text in self._texts(op) for word in _words(text)]
+        return " ".join(terms) if terms else None
+
+    def _put(self, op: PutOp) -> None:
+        namespace = _SEP.join(op.namespace)
+        if op.value is None:
+            self._conn.execute(
+                "DELETE FROM store_items WHERE namespace = ? AND key = ?", (namespace, op.key)
+            )
+            return
+        now = time.time()
+        self._conn.execute(
+            "INSERT INTO store_items "
+            "(namespace, key, value, terms, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (namespace, key) DO UPDATE SET "
+            "value = excluded.value, terms = excluded.terms, updated_at = excluded.updated_at",
+            (namespace, op.key, json.dumps(op.value), self._terms(op, namespace), now, now),
+        )
+
+    def _namespaces(self, prefix: tuple[str, ...]) -> list[str]:
+        """The namespaces at or under ``prefix``.
+
+        A skip scan over the ``(namespace, key)`` index — one seek per
+        namespace — rather than ``SELECT DISTINCT``, which reads every item.
+        """
+        joined = _SEP.join(prefix)
+        found: list[str] = []
+        row = self._conn.execute(
+            "SELECT MIN(namespace) FROM store_items WHERE namespace >= ?", (joined,)
+        ).fetchone()
+        while row[0] is not None:
+            namespace = row[0]
+            if prefix and namespace != joined and not namespace.startswith(joined + _SEP):
+                if namespace >= joined + _SEP_END:
+                    break
+            else:
+                found.append(namespace)
+            row = self._conn.execute(
+                "SELECT MIN(namespace) FROM store_items WHERE namespace > ?", (namespace,)
+            ).fetchone()
+        return found
+
+    def _search(self, op: SearchOp, query_vector: Optional[list[float]] = None) -> list[SearchItem]:
+        prefix = op.namespace_prefix
+        # With a filter, the page is cut after filtering in Python.
+        limit, offset = (-1, 0) if op.filter else (op.limit, op.offset)
+        where, args = "", ()
+        if prefix:
+            joined = _SEP.join(prefix)
+            where = "WHERE namespace = ? OR (namespace >= ? AND namespace < ?)"
+            args = (joined, joined + _SEP, joined + _SEP_END)
+        match = None
+        if op.query and (query_vector is not None or _words(op.query)):
+            namespaces = self._namespaces(prefix)
+            if not namespaces:
+                return []
+            if query_vector is not None:
+                return search_items(
+                    self.vectors,
+                    [tuple(ns.split(_SEP)) for ns in namespaces],
+                    query_vector,
+                    op,
+                    self._lookup,
+                )
+            match = fts_query(op.query, namespaces)
+        if match is not None:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS}, -bm25(store_fts) AS score "
+                "FROM store_fts JOIN store_items i ON i.id = store_fts.rowid "
+                "WHERE store_fts MATCH ? ORDER BY score DESC LIMIT ? OFFSET ?",
+                (match, limit, offset),
+            ).fetchall()
+        else:
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS}, NULL FROM store_items i {where} "
+                "ORDER BY updated_at DESC, id DESC LIMIT ? OFFSET ?",
+                (*args, limit, offset),
+            ).fetchall()
+        items = [self._item(row, row[5], search=True) for row in rows]
+        if op.filter:
+            items = [
+                item
+                for item in items
+                if all(_compare_values(item.value.get(k), v) for k, v in op.filter.items())
+            ][op.offset : op.offset + op.limit]
+        return items
+
+    def _list_namespaces(self, op: ListNamespacesOp) -> list[tuple[str, ...]]:
+        namespaces = [
+            tuple(row[0].split(_SEP))
+            for row in self._conn.execute("SELECT DISTINCT namespace FROM store_items")
+        ]
+        if op.match_conditions:
+            namespaces = [
+                ns for ns in namespaces if all(_does_match(c, ns) for c in op.match_conditions)
+            ]
+        if op.max_depth is not None:
+            namespaces = list({ns[: op.max_depth] for ns in namespaces})
+        return sorted(namespaces)[op.offset : op.offset + op.limit]
@@ -0,0 +1,465 @@
+"""Prometheus-style metrics — dependency-free, exposed at ``GET /metrics``.
+
+Production tuning needs numbers: how long each graph node takes, how soon the
+first token reaches the browser, how long humans leave an interrupt waiting,
+and how slow the checkpointer is. This module keeps a tiny in-process registry
+of counters, gauges and histograms and renders it in the Prometheus text
+exposition format (``text/plain; version=0.0.4``), so any Prometheus-compatible
+scraper can collect it. No ``prometheus_client`` (or any network dependency)
+is required.
+
+Metrics are fed by three hooks:
+
+- :class:`MetricsCallbackHandler` — attached to every compiled graph via
+  :func:`instrument`; times each graph node, counts LLM calls / token usage,
+  and tracks in-flight runs per engine.
+- the SSE helpers in ``main.py`` — count frames by type and observe time to
+  first token via :class:`SSEMeter`.
+- ``checkpointing.InstrumentedSaver`` — times checkpoint reads and writes.
+- ``loop_monitor.LoopMonitor`` — event-loop lag and blocking stalls.
+
+Caches elsewhere in the app report hits and misses through
+:func:`record_cache`, which feeds the ``cache_requests_total`` counter.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from typing import Any, Iterable, Optional, Sequence
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets (seconds) covering sub-millisecond checkpoint reads through
+# multi-second LLM calls.
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+# Humans answer interrupts on a much longer timescale.
+WAIT_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 3600.0, 14400.0, 86400.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class: a named metric family with a fixed set of label names."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self) -> Iterable[str]:  # pragma: no cover - overridden
+        return ()
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """A value that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram (``_bucket`` / ``_sum`` / ``_count``)."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def count(self, **labels: Any) -> float:
+        row = self._values.get(self._key(labels))
+        return row[-1] if row else 0.0
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, row in items:
+            for bound, n in zip(self.buckets, row):
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {_format_value(n)}"
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {_format_value(row[-1])}"
+            plain = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{plain} {_format_value(row[-2])}"
+            yield f"{self.name}_count{plain} {_format_value(row[-1])}"
+
+
+class Registry:
+    """A collection of metric families rendered together."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        """Render every metric family in Prometheus text format."""
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- Metric families ----------------------------------------------------------
+NODE_DURATION = REGISTRY.histogram(
+    "graph_node_duration_seconds",
+    "Wall-clock time spent in each graph node.",
+    ("engine", "node"),
+)
+RUNS_IN_FLIGHT = REGISTRY.gauge(
+    "graph_runs_in_flight", "Graph runs currently executing.", ("engine",)
+)
+RUNS_TOTAL = REGISTRY.counter(
+    "graph_runs_total", "Graph runs started, by outcome.", ("engine", "status")
+)
+LLM_CALLS = REGISTRY.counter(
+    "llm_calls_total", "Chat model calls, by outcome.", ("engine", "status")
+)
+LLM_DURATION = REGISTRY.histogram(
+    "llm_call_duration_seconds", "Latency of chat model calls.", ("engine",)
+)
+LLM_TOKENS = REGISTRY.counter(
+    "llm_tokens_total",
+    "Tokens reported by the provider's usage metadata.",
+    ("engine", "kind"),
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests_total", "Cache lookups, by cache and result.", ("cache", "result")
+)
+SSE_FRAMES = REGISTRY.counter(
+    "sse_frames_total", "Server-sent event frames emitted.", ("endpoint", "type")
+)
+SSE_FIRST_TOKEN = REGISTRY.histogram(
+    "sse_time_to_first_token_seconds",
+    "Time from an SSE request to its first streamed content token.",
+    ("endpoint",),
+)
+INTERRUPT_WAIT = REGISTRY.histogram(
+    "interrupt_wait_seconds",
+    "Time a thread spent paused at an interrupt before being resumed.",
+    ("engine",),
+    buckets=WAIT_BUCKETS,
+)
+CHECKPOINT_DURATION = REGISTRY.histogram(
+    "checkpoint_operation_duration_seconds",
+    "Checkpointer read / write latency.",
+    ("op",),
+)
+LOOP_LAG = REGISTRY.histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop woke a periodic probe (time the loop was busy).",
+)
+LOOP_LAG_LAST = REGISTRY.gauge(
+    "event_loop_lag_last_seconds", "Most recent event-loop lag probe result."
+)
+LOOP_BLOCKS = REGISTRY.counter(
+    "event_loop_blocks_total",
+    "Event-loop stalls longer than LOOP_BLOCK_THRESHOLD_MS, by the node that caused them.",
+    ("engine", "node"),
+)
+
+
+def render() -> str:
+    """Render the default registry (the ``/metrics`` response body)."""
+    return REGISTRY.render()
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Record a cache lookup; hit rate = hit / (hit + miss)."""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+# --- Graph hook ---------------------------------------------------------------
+# Graph nodes running right now, across engines: run id -> (engine, node). The
+# loop monitor's watchdog reads it from its own thread, hence the lock.
+_RUNNING_NODES: dict[UUID, tuple[str, str]] = {}
+_RUNNING_LOCK = threading.Lock()
+
+
+def running_nodes() -> list[tuple[str, str]]:
+    """``(engine, node)`` of every graph node running now, oldest first."""
+    with _RUNNING_LOCK:
+        return list(_RUNNING_NODES.values())
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """LangChain callback that feeds node, run and LLM metrics for one engine.
+
+    Node timings come from the chain runs LangGraph opens for each node (their
+    metadata carries ``langgraph_node``); the root chain run marks a graph run
+    in flight. The handler is cheap and stateless apart from start times, so it
+    runs inline on the event loop.
+    """
+
+    run_inline = True
+    raise_error = False
+
+    def __init__(self, engine: str) -> None:
+        super().__init__()
+        self.engine = engine
+        self._nodes: dict[UUID, tuple[str, float]] = {}
+        self._roots: dict[UUID, float] = {}
+        self._llm: dict[UUID, float] = {}
+
+    # Chains: graph runs and nodes.
+    def on_chain_start(
+        self,
+        serialized: Optional[dict[str, Any]],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        now = time.perf_counter()
+        if parent_run_id is None:
+            self._roots[run_id] = now
+            RUNS_IN_FLIGHT.inc(engine=self.engine)
+            return
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self._nodes[run_id] = (node, now)
+            with _RUNNING_LOCK:
+                _RUNNING_NODES[run_id] = (self.engine, node)
+
+    def _end_chain(self, run_id: UUID, status: str) -> None:
+        if run_id in self._roots:
+            self._roots.pop(run_id)
+            RUNS_IN_FLIGHT.dec(engine=self.engine)
+            RUNS_TOTAL.inc(engine=self.engine, status=status)
+            return
+        entry = self._nodes.pop(run_id, None)
+        if entry is not None:
+            with _RUNNING_LOCK:
+                _RUNNING_NODES.pop(run_id, None)
+            node, start = entry
+            NODE_DURATION.observe(time.perf_counter() - start, engine=self.engine, node=node)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_chain(run_id, "ok")
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        # An interrupt surfaces as GraphInterrupt inside the node; the root run
+        # itself still ends cleanly, so only genuine failures count as errors.
+        self._end_chain(run_id, "error")
+
+    # Chat models.
+    def on_chat_model_start(
+        self, serialized: Optional[dict[str, Any]], messages: Any, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._llm[run_id] = time.perf_counter()
+
+    def on_llm_start(
+        self, serialized: Optional[dict[str, Any]], prompts: Any, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._llm[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        start = self._llm.pop(run_id, None)
+        LLM_CALLS.inc(engine=self.engine, status="ok")
+        if start is not None:
+            LLM_DURATION.observe(time.perf_counter() - start, engine=self.engine)
+        for kind, count in _token_usage(response).items():
+            LLM_TOKENS.inc(count, engine=self.engine, kind=kind)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._llm.pop(run_id, None)
+        LLM_CALLS.inc(engine=self.engine, status="error")
+
+
+def _token_usage(response: Any) -> dict[str, int]:
+    """Extract input/output token counts from an ``LLMResult`` (best effort)."""
+    usage: dict[str, int] = {}
+    for generations in getattr(response, "generations", None) or []:
+        for generation in generations:
+            meta = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if meta:
+                usage["input"] = usage.get("input", 0) + int(meta.get("input_tokens") or 0)
+                usage["output"] = usage.get("output", 0) + int(meta.get("output_tokens") or 0)
+    if not usage:
+        token_usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        if token_usage:
+            usage["input"] = int(token_usage.get("prompt_tokens", 0) or 0)
+            usage["output"] = int(token_usage.get("completion_tokens", 0) or 0)
+    return usage
+
+
+def instrument(graph: Any, engine: str) -> Any:
+    """Return ``graph`` with a :class:`MetricsCallbackHandler` bound to it.
+
+    ``with_config`` returns a copy of the compiled graph, so checkpointer, store
+    and every ``aget_state`` / ``astream`` call keep working unchanged.
+    """
+    return graph.with_config(callbacks=[MetricsCallbackHandler(engine)])
+
+
+# --- SSE hook -----------------------------------------------------------------
+class SSEMeter:
+    """Count frames and time-to-first-token for one server-sent event stream."""
+
+    def __init__(self, endpoint: str) -> None:
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self._first_token = False
+
+    def frame(self, event: dict) -> None:
+        kind = str(event.get("type", "message"))
+        SSE_FRAMES.inc(endpoint=self.endpoint, type=kind)
+        if kind == "content" and not self._first_token:
+            self._first_token = True
+            SSE_FIRST_TOKEN.observe(time.perf_counter() - self.started, endpoint=self.endpoint)
+
+
+# --- Interrupt wait tracking ----------------------------------------------------
+class InterruptClock:
+    """Remember when threads paused so the resume can observe the wait time.
+
+    Bounded so abandoned threads can't grow it forever (oldest entries drop).
+    """
+
+    def __init__(self, max_threads: int = 10_000) -> None:
+        self.max_threads = max_threads
+        self._paused: dict[str, float] = {}
+
+    def paused(self, thread_id: str) -> None:
+        self._paused.pop(thread_id, None)
+        self._paused[thread_id] = time.monotonic()
+        while len(self._paused) > self.max_threads:
+            self._paused.pop(next(iter(self._paused)))
+
+    def resumed(self, thread_id: str, engine: str) -> None:
+        started = self._paused.pop(thread_id, None)
+        if started is not None:
+            INTERRUPT_WAIT.observe(time.monotonic() - started, engine=engine)
+
+
+INTERRUPTS = InterruptClock()
@@ -0,0 +1,97 @@
+"""Background prefetch of work a graph needs after its next interrupt.
+
+A workflow run used to recall the user's memory before its first interrupt,
+so ``/start`` waited for a store search (and, when semantic, an embedding
+call) before the user saw anything, and a cancelled run wasted it. A
+:class:`Prefetcher` lets a node start that work as a background task just
+before it interrupts, and a later node await the result:
+
+- ``start(key, factory)`` runs ``factory()`` as a task unless one is already
+  running or done for ``key``. A node re-executed on resume calls it again
+  harmlessly;
+- ``take(key)`` hands the task over (and forgets it). It returns None when
+  nothing was prefetched, e.g. the run resumed on another worker or after a
+  restart, and the caller then does the work inline;
+- ``discard(key)`` cancels work that is no longer needed (a cancelled run).
+
+Keys should hold everything the result depends on (thread, user, query), so a
+follow-up question or a fork from an earlier checkpoint never picks up another
+run's result. Tasks belong to the event loop that started them. Prefetches
+nobody takes (abandoned threads) are dropped after ``ttl`` seconds or beyond
+``max_entries``. Outcomes are counted in ``workflow_prefetch_total``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from metrics import REGISTRY
+
+PREFETCHES = REGISTRY.counter(
+    "workflow_prefetch_total",
+    "Background prefetches by outcome (used, missed, discarded, expired).",
+    ("name", "result"),
+)
+
+
+def _name(key: Hashable) -> str:
+    return str(key[0]) if isinstance(key, tuple) and key else "prefetch"
+
+
+class Prefetcher:
+    """Keyed background tasks, started before an interrupt and taken after it."""
+
+    def __init__(self, *, max_entries: int = 10_000, ttl: float = 600.0) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._tasks: OrderedDict[Hashable, tuple[float, asyncio.Task]] = OrderedDict()
+
+    def start(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> None:
+        """Start ``factory()`` in the background for ``key``, unless already started."""
+        self._expire()
+        entry = self._tasks.get(key)
+        if entry is not None and entry[1].get_loop() is asyncio.get_running_loop():
+            return
+        if entry is not None:
+            self._drop(key, "expired")
+        task = asyncio.ensure_future(factory())
+        self._tasks[key] = (time.monotonic() + self.ttl, task)
+        while len(self._tasks) > self.max_entries:
+            self._drop(next(iter(self._tasks)), "expired")
+
+    def take(self, key: Hashable) -> Optional[asyncio.Task]:
+        """The task started for ``key``, or None if the caller must do the work."""
+        entry = self._tasks.pop(key, None)
+        if entry is None or entry[1].get_loop() is not asyncio.get_running_loop():
+            PREFETCHES.inc(name=_name(key), result="missed")
+            return None
+        PREFETCHES.inc(name=_name(key), result="used")
+        return entry[1]
+
+    def discard(self, key: Hashable) -> None:
+        """Cancel and forget the work started for ``key``, if any."""
+        if key in self._tasks:
+            self._drop(key, "discarded")
+
+    def _drop(self, key: Hashable, result: str) -> None:
+        _, task = self._tasks.pop(key)
+        if not task.done() and task.get_loop() is asyncio.get_running_loop():
+            task.cancel()
+        elif task.done() and not task.cancelled():
+            task.exception()  # retrieved, so it is never reported as unhandled
+        PREFETCHES.inc(name=_name(key), result=result)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._tasks:
+            key, (expires, _) = next(iter(self._tasks.items()))
+            if expires > now:
+                break
+            self._drop(key, "expired")
+
+
+# The process-wide prefetcher the workflow uses (see ``graph``).
+PREFETCH = Prefetcher()
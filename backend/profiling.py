@@ -0,0 +1,185 @@
+"""On-demand sampling CPU profiler for the running server.
+
+``GET /debug/profile?seconds=N`` (admin-only, see ``main.py``) samples the live
+process for ``N`` seconds and returns:
+
+- **collapsed stacks** — one ``frame;frame;frame count`` line per distinct
+  stack, the input format of ``flamegraph.pl``, speedscope and friends;
+- a **top-N table** — functions ranked by *self* samples (on-CPU at the leaf)
+  with *total* samples (anywhere on the stack) alongside.
+
+Each tick captures every thread's stack via ``sys._current_frames()`` *and* the
+await chain of every pending asyncio task on the server's event loop, so time
+spent inside graph runs shows up under the coroutine that is waiting on it (the
+``task:<name>`` roots) as well as under the thread that executes it. Task
+chains are snapshotted on the loop itself (asyncio's task set is not
+thread-safe); a tick where the loop is too busy to answer within the interval
+records thread stacks only, and the busy loop shows up in its thread's stack.
+
+It is safe to leave enabled: the sampler thread only exists while a profile is
+being taken, so idle overhead is zero; only one profile runs at a time; and the
+duration is capped by ``PROFILE_MAX_SECONDS``.
+
+    PROFILE_MAX_SECONDS=60     # longest profile a caller may request
+    PROFILE_INTERVAL_MS=10     # sampling interval (100 Hz)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from types import FrameType
+from typing import Any, Optional
+
+# Only one profile at a time (checked and set on the event loop, so no lock).
+_running = False
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a profile is requested while another is still running."""
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        value = float(os.getenv(name, "").strip() or default)
+        return value if value > 0 else default
+    except ValueError:
+        return default
+
+
+def max_seconds() -> float:
+    return _float_env("PROFILE_MAX_SECONDS", 60.0)
+
+
+def _label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _thread_stack(frame: Optional[FrameType]) -> list[str]:
+    """Frame labels for one thread, outermost first."""
+    stack: list[str] = []
+    while frame is not None:
+        stack.append(_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class SamplingProfiler:
+    """Periodically snapshot thread and asyncio task stacks from a side thread."""
+
+    def __init__(
+        self, loop: Optional[asyncio.AbstractEventLoop] = None, interval: Optional[float] = None
+    ) -> None:
+        self.loop = loop
+        self.interval = interval or _float_env("PROFILE_INTERVAL_MS", 10.0) / 1000.0
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self.samples = 0
+        self._snapshot: Optional[Future] = None
+
+    def _sample(self, own_ident: int) -> None:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = _thread_stack(frame)
+            if stack:
+                self.stacks[(f"thread:{names.get(ident, ident)}", *stack)] += 1
+        if self.loop is None:
+            return
+        # At most one snapshot queued, so a blocked loop doesn't pile them up.
+        if self._snapshot is None or self._snapshot.done():
+            self._snapshot = Future()
+            try:
+                self.loop.call_soon_threadsafe(self._task_stacks, self._snapshot)
+            except RuntimeError:  # pragma: no cover - loop closed mid-profile
+                return
+        try:
+            stacks = self._snapshot.result(timeout=self.interval)
+        except Exception:  # still queued behind a busy loop (or failed)
+            return
+        self._snapshot = None
+        self.stacks.update(stacks)
+
+    def _task_stacks(self, future: Future) -> None:
+        """Await chains of the loop's pending tasks (runs on the loop)."""
+        stacks = []
+        try:
+            for task in asyncio.all_tasks(self.loop):
+                frames = task.get_stack()
+                if frames and not task.done():
+                    stacks.append((f"task:{task.get_name()}", *(_label(f) for f in frames)))
+        except Exception as exc:  # pragma: no cover - defensive
+            future.set_exception(exc)
+        else:
+            future.set_result(stacks)
+
+    def run(self, seconds: float) -> None:
+        """Sample for ``seconds`` (blocking; call from a worker thread)."""
+        own = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self._sample(own)
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def collapsed(self) -> str:
+        """Collapsed-stack text (``a;b;c N`` per line), flamegraph-compatible."""
+        return "\n".join(
+            f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common()
+        )
+
+    def top(self, n: int = 25) -> list[dict[str, Any]]:
+        """Top ``n`` functions by self samples, with total samples alongside."""
+        own: Counter[str] = Counter()
+        total: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack[1:]  # drop the thread:/task: root
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for label in set(frames):
+                total[label] += count
+        grand = sum(self.stacks.values()) or 1
+        ranked = sorted(total, key=lambda f: (own[f], total[f]), reverse=True)[:n]
+        return [
+            {
+                "function": label,
+                "self": own[label],
+                "total": total[label],
+                "self_pct": round(100.0 * own[label] / grand, 2),
+                "total_pct": round(100.0 * total[label] / grand, 2),
+            }
+            for label in ranked
+        ]
+
+
+async def profile(seconds: float, top: int = 25) -> dict[str, Any]:
+    """Profile the running process for ``seconds`` (capped) and summarise it.
+
+    Raises :class:`ProfilerBusy` if another profile is already running.
+    """
+    global _running
+    if _running:
+        raise ProfilerBusy("A profile is already running; try again shortly.")
+    _running = True
+    try:
+        seconds = max(0.05, min(float(seconds), max_seconds()))
+        profiler = SamplingProfiler(loop=asyncio.get_running_loop())
+        started = time.perf_counter()
+        await asyncio.to_thread(profiler.run, seconds)
+        return {
+            "seconds": round(time.perf_counter() - started, 3),
+            "samples": profiler.samples,
+            "interval_ms": round(profiler.interval * 1000, 3),
+            "top": profiler.top(top),
+            "collapsed": profiler.collapsed(),
+        }
+    finally:
+        _running = False
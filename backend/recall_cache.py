@@ -0,0 +1,223 @@
+"""Recall cache for long-term memory: skip repeated searches of unchanged memory.
+
+``load_user_memory`` searches the store on every ``/agent/start`` and
+``/deep/start`` and in every workflow run. In semantic mode
+it also embeds the question each time, even when the user's memories haven't
+changed since their request a few seconds ago. :class:`RecallCacheStore` wraps
+the store and caches those searches:
+
+- **keyed per user** — by ``(namespace, normalised query, limit)``, where the
+  namespace is ``("memories", user_id)``. The query is lower-cased with its
+  whitespace collapsed, so "Solar  panels" and "solar panels" share an entry;
+- **invalidated on write** — any put (or delete) under a user's namespace that
+  goes through the store drops that user's entries. While a search of a
+  namespace is in flight, the namespace has a generation that a write bumps
+  before and after it reaches the store, so a search that overlapped a write
+  never caches what it read;
+- **bounded** — at most ``size`` entries (least recently used go first), each
+  kept for at most ``ttl`` seconds.
+
+Only first pages (``offset=0``) of unfiltered searches under ``roots`` (by
+default ``"memories"``) are cached; everything else goes straight through.
+Writes made by other processes to a shared ``MEMORY_DB`` don't invalidate this
+process's entries, so ``ttl`` bounds how stale a recall can be there. Lookups
+are counted in ``cache_requests_total{cache="recall"}``. Configured by
+:func:`from_env`::
+
+    MEMORY_RECALL_CACHE_SIZE=10000   # entries; 0 = off
+    MEMORY_RECALL_CACHE_TTL=30       # seconds
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from collections import OrderedDict, defaultdict
+from typing import Iterable, Optional
+
+from langgraph.store.base import BaseStore, Op, PutOp, Result, SearchOp
+
+import metrics
+from metrics import REGISTRY
+
+RECALL_INVALIDATIONS = REGISTRY.counter(
+    "memory_recall_cache_invalidations_total",
+    "Writes that dropped a namespace's cached memory recalls.",
+)
+
+_Key = tuple[tuple[str, ...], Optional[str], int]
+
+
+def _int_env(name: str, default: int) -> int:
+    return int(os.getenv(name, "").strip() or default)
+
+
+def normalise_query(query: Optional[str]) -> Optional[str]:
+    return " ".join(query.lower().split()) if query else None
+
+
+class RecallCacheStore(BaseStore):
+    """Cache ``store``'s memory searches until the namespace is written."""
+
+    def __init__(
+        self,
+        store: BaseStore,
+        *,
+        size: int = 10_000,
+        ttl: float = 30.0,
+        roots: Iterable[str] = ("memories",),
+    ) -> None:
+        self.store = store
+        self.size = max(1, size)
+        self.ttl = ttl
+        self.roots = frozenset(roots)
+        # Mirrors the wrapped store (``/capabilities`` reads it).
+        self.index_config = getattr(store, "index_config", None)
+        self._entries: OrderedDict[_Key, tuple[float, list]] = OrderedDict()
+        self._keys: defaultdict[tuple[str, ...], set[_Key]] = defaultdict(set)
+        # Only for namespaces with a cacheable search in flight (dropped after).
+        self._reading: dict[tuple[str, ...], int] = {}
+        self._generations: dict[tuple[str, ...], int] = {}
+
+    @property
+    def entries(self) -> int:
+        return len(self._entries)
+
+    # --- BaseStore ----------------------------------------------------------------
+    def batch(self, ops: Iterable[Op]) -> list[Result]:
+        ops = list(ops)
+        results, misses, written, seen = self._lookup(ops)
+        try:
+            try:
+                fetched = self.store.batch([ops[i] for i in misses]) if misses else []
+            finally:
+                self._invalidate(written)
+            return self._fill(ops, results, misses, fetched, seen)
+        finally:
+            self._release(seen)
+
+    async def abatch(self, ops: Iterable[Op]) -> list[Result]:
+        ops = list(ops)
+        results, misses, written, seen = self._lookup(ops)
+        try:
+            try:
+                fetched = await self.store.abatch([ops[i] for i in misses]) if misses else []
+            finally:
+                self._invalidate(written)
+            return self._fill(ops, results, misses, fetched, seen)
+        finally:
+            self._release(seen)
+
+    def close(self) -> None:
+        close = getattr(self.store, "close", None)
+        if close is not None:
+            close()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys.clear()
+
+    # --- cache ------------------------------------------------------------------------
+    def _key(self, op: Op) -> Optional[_Key]:
+        if (
+            isinstance(op, SearchOp)
+            and op.offset == 0
+            and not op.filter
+            and len(op.namespace_prefix) >= 2
+            and op.namespace_prefix[0] in self.roots
+        ):
+            return (op.namespace_prefix, normalise_query(op.query), op.limit)
+        return None
+
+    def _lookup(self, ops: list[Op]) -> tuple[list[Result], list[int], set, dict]:
+        """Cached results, the indexes of the ops to run, the namespaces written,
+        and the generation of each namespace a cacheable miss reads."""
+        written = {op.namespace for op in ops if isinstance(op, PutOp)}
+        self._invalidate(written)
+        results: list[Result] = [None] * len(ops)
+        misses: list[int] = []
+        seen: dict[tuple[str, ...], int] = {}
+        now = time.monotonic()
+        for i, op in enumerate(ops):
+            key = self._key(op)
+            entry = self._entries.get(key) if key is not None else None
+            if entry is not None and entry[0] <= now:
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                results[i] = list(entry[1])
+            else:
+                misses.append(i)
+                if key is not None and not written and key[0] not in seen:
+                    # A batch that writes may read either side of its own
+                    # writes, so its searches are never cached.
+                    seen[key[0]] = self._acquire(key[0])
+            if key is not None:
+                metrics.record_cache("recall", entry is not None)
+        return results, misses, written, seen
+
+    def _fill(
+        self,
+        ops: list[Op],
+        results: list[Result],
+        misses: list[int],
+        fetched: list[Result],
+        seen: dict[tuple[str, ...], int],
+    ) -> list[Result]:
+        for i, result in zip(misses, fetched):
+            results[i] = result
+            key = self._key(ops[i])
+            # Cached only if no write to the namespace overlapped the search.
+            if key is not None and key[0] in seen and seen[key[0]] == self._generations[key[0]]:
+                self._put(key, result)
+        return results
+
+    def _put(self, key: _Key, items: list) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, list(items))
+        self._entries.move_to_end(key)
+        self._keys[key[0]].add(key)
+        while len(self._entries) > self.size:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: _Key) -> None:
+        self._entries.pop(key, None)
+        keys = self._keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys[key[0]]
+
+    def _acquire(self, namespace: tuple[str, ...]) -> int:
+        """Start a search of ``namespace``; returns its generation."""
+        self._reading[namespace] = self._reading.get(namespace, 0) + 1
+        return self._generations.setdefault(namespace, 0)
+
+    def _release(self, seen: dict[tuple[str, ...], int]) -> None:
+        for namespace in seen:
+            self._reading[namespace] -= 1
+            if not self._reading[namespace]:
+                del self._reading[namespace]
+                del self._generations[namespace]
+
+    def _invalidate(self, namespaces: set[tuple[str, ...]]) -> None:
+        for namespace in namespaces:
+            # A write under ("memories", "u1", ...) changes searches of every
+            # prefix of it, e.g. ("memories", "u1").
+            for end in range(2, len(namespace) + 1):
+                prefix = namespace[:end]
+                if prefix in self._generations:
+                    self._generations[prefix] += 1
+                keys = self._keys.pop(prefix, ())
+                for key in keys:
+                    self._entries.pop(key, None)
+                if keys:
+                    RECALL_INVALIDATIONS.inc()
+
+
+def from_env(store: BaseStore) -> BaseStore:
+    """``store`` behind a :class:`RecallCacheStore`, unless ``MEMORY_RECALL_CACHE_SIZE=0``."""
+    size = _int_env("MEMORY_RECALL_CACHE_SIZE", 10_000)
+    if size <= 0:
+        return store
+    return RecallCacheStore(store, size=size, ttl=float(_int_env("MEMORY_RECALL_CACHE_TTL", 30)))
@@ -0,0 +1,411 @@
+"""Checkpoint retention, pruning and compaction for the SQLite checkpointer.
+
+With ``CHECKPOINT_DB`` set, LangGraph keeps every superstep of every thread —
+each ``Send`` sub-researcher write, every fork — forever, so the file (and the
+cost of reading it) grows without bound. :class:`RetentionPolicy` bounds it:
+
+- **keep the last N** checkpoints of each thread (and namespace);
+- **always keep interrupt checkpoints** — the ones a run paused at, which
+  ``/history`` lists and ``/fork`` resumes from — plus the pending writes
+  stored against every kept checkpoint, and, for delta-encoded channels
+  (``CHECKPOINT_DELTA_SNAPSHOT_EVERY``), the ancestors back to the nearest
+  snapshot that a kept checkpoint is rebuilt from;
+- **expire idle threads** whose newest checkpoint is older than a TTL (the
+  whole thread goes, through the saver stack so caches are invalidated);
+- **collect offloaded blobs** (``blobs.py``) that no remaining checkpoint
+  references.
+
+With ``CHECKPOINT_SHARDS`` (``sharding.py``) each shard file gets its own pass
+(:class:`ShardedRetention`), run concurrently; a thread and its blobs always
+live in one shard.
+
+:class:`RetentionWorker` runs a pass every ``CHECKPOINT_RETENTION_INTERVAL``
+seconds as a background task of ``main.lifespan`` (and on demand via the
+admin-only ``POST /debug/retention``). Each pass ends with
+``PRAGMA incremental_vacuum`` so freed pages go back to the filesystem, and
+reports what it deleted and the bytes reclaimed (also exported as metrics).
+Files created by this app already use incremental auto-vacuum; an older file
+keeps reusing its freed pages internally unless ``CHECKPOINT_RETENTION_VACUUM``
+allows the first pass to convert it with one full ``VACUUM`` (which rewrites
+the file under the saver's lock — run it off-peak).
+
+Retention is off unless a policy is configured:
+
+    CHECKPOINT_KEEP_LAST=20              # checkpoints kept per thread (0 = all)
+    CHECKPOINT_TTL_HOURS=168             # delete threads idle this long (0 = never)
+    CHECKPOINT_RETENTION_INTERVAL=3600   # seconds between background passes
+    CHECKPOINT_RETENTION_VACUUM=false    # convert an older file with one VACUUM
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+
+from checkpointing import unwrap
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DELETED = REGISTRY.counter(
+    "checkpoint_retention_deleted_total",
+    "Rows removed by checkpoint retention, by kind (checkpoint, write, thread, blob).",
+    ("kind",),
+)
+RETENTION_RECLAIMED = REGISTRY.counter(
+    "checkpoint_retention_reclaimed_bytes_total",
+    "Bytes returned to the filesystem by incremental vacuum after retention passes.",
+)
+
+_INTERRUPT_CHANNEL = "__interrupt__"  # langgraph.constants.INTERRUPT
+_DELTA_COUNTERS = "counters_since_delta_snapshot"  # checkpoint metadata key
+# 100 ns intervals between the Gregorian epoch (UUID time) and the Unix epoch.
+_GREGORIAN_OFFSET = 0x01B21DD213814000
+
+
+def checkpoint_time(checkpoint_id: str) -> Optional[float]:
+    """Unix time encoded in a LangGraph checkpoint id (a UUIDv6), if any."""
+    try:
+        value = uuid.UUID(checkpoint_id).int
+    except (ValueError, TypeError, AttributeError):
+        return None
+    ticks = ((value >> 96) << 28) | (((value >> 80) & 0xFFFF) << 12) | ((value >> 64) & 0x0FFF)
+    return (ticks - _GREGORIAN_OFFSET) / 1e7
+
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return max(0, int(float(os.getenv(name, "").strip() or default)))
+    except ValueError:
+        return default
+
+
+@dataclass
+class RetentionPolicy:
+    keep_last: int = 0  # 0 = keep every checkpoint
+    ttl_seconds: float = 0.0  # 0 = threads never expire
+    vacuum: bool = False  # allow one full VACUUM to enable incremental auto-vacuum
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        return cls(
+            keep_last=_int_env("CHECKPOINT_KEEP_LAST", 0),
+            ttl_seconds=_int_env("CHECKPOINT_TTL_HOURS", 0) * 3600.0,
+            vacuum=os.getenv("CHECKPOINT_RETENTION_VACUUM", "").strip().lower()
+            in ("1", "true", "yes", "on"),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.keep_last or self.ttl_seconds)
+
+
+@dataclass
+class RetentionReport:
+    threads_scanned: int = 0
+    threads_expired: int = 0
+    checkpoints_deleted: int = 0
+    writes_deleted: int = 0
+    blobs_deleted: int = 0
+    bytes_reclaimed: int = 0
+    seconds: float = 0.0
+    expired: list[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        data["expired"] = data["expired"][:50]  # keep reports small
+        return data
+
+    def merge(self, other: "RetentionReport") -> None:
+        """Add another pass's counts (``seconds`` is the longest of the two)."""
+        for f in fields(self):
+            if f.type == "int":
+                setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+        self.seconds = max(self.seconds, other.seconds)
+        self.expired.extend(other.expired)
+
+
+class SqliteRetention:
+    """Apply a :class:`RetentionPolicy` to an ``AsyncSqliteSaver``'s database.
+
+    ``saver`` is the app's full saver stack: whole-thread deletes go through it
+    (so caching layers see them); row-level pruning runs on the backing
+    connection under the saver's own lock. ``backing`` overrides which
+    ``AsyncSqliteSaver`` that is (one shard of a ``ShardedSqliteSaver``).
+    """
+
+    def __init__(
+        self, saver: BaseCheckpointSaver, policy: RetentionPolicy, backing: Any = None
+    ) -> None:
+        self.saver = saver
+        self.backing: Any = backing if backing is not None else unwrap(saver)
+        self.policy = policy
+        self._compaction_checked = False
+        self._blob_refs = False  # blobs.SqliteBlobStore tables present
+
+    @staticmethod
+    def supports(saver: BaseCheckpointSaver) -> bool:
+        return type(unwrap(saver)).__name__ in ("AsyncSqliteSaver", "ShardedSqliteSaver")
+
+    @classmethod
+    def for_saver(cls, saver: BaseCheckpointSaver, policy: RetentionPolicy) -> Any:
+        """A retention for ``saver``: one pass per shard if it is sharded."""
+        backing = unwrap(saver)
+        if type(backing).__name__ == "ShardedSqliteSaver":
+            return ShardedRetention(
+                [cls(saver, policy, backing=shard.writer) for shard in backing.shards]
+            )
+        return cls(saver, policy)
+
+    async def _fetch(self, sql: str, params: tuple = ()) -> list[tuple]:
+        async with self.backing.conn.execute(sql, params) as cur:
+            return list(await cur.fetchall())
+
+    async def _page_stats(self) -> tuple[int, int]:
+        (page_size,), = await self._fetch("PRAGMA page_size")
+        (page_count,), = await self._fetch("PRAGMA page_count")
+        return int(page_size), int(page_count)
+
+    async def _ensure_incremental_vacuum(self) -> None:
+        """Switch the file to ``auto_vacuum=INCREMENTAL`` (one-off full VACUUM).
+
+        Only with ``policy.vacuum``; otherwise an older file is left as it is.
+        """
+        if self._compaction_checked:
+            return
+        self._compaction_checked = True
+        async with self.backing.lock:
+            (mode,), = await self._fetch("PRAGMA auto_vacuum")
+            if int(mode) != 2 and not self.policy.vacuum:
+                logger.info(
+                    "Checkpoint DB predates incremental auto-vacuum: freed pages are "
+                    "reused, not returned (set CHECKPOINT_RETENTION_VACUUM=true to convert)"
+                )
+            elif int(mode) != 2:
+                logger.info("Enabling incremental auto-vacuum on the checkpoint DB (one VACUUM)")
+                await self.backing.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                await self.backing.conn.commit()
+                await self.backing.conn.execute("VACUUM")
+
+    async def _delta_ancestors(self, thread_id: str, ns: str, kept: set[str]) -> set[str]:
+        """Ancestors that kept checkpoints need to rebuild their delta channels.
+
+        A checkpoint of a ``DeltaChannel`` (``CHECKPOINT_DELTA_SNAPSHOT_EVERY``)
+        stores no value for the channel; it is replayed from the writes of its
+        ancestors back to the nearest full snapshot. The metadata's
+        ``counters_since_delta_snapshot`` names the channels still owed a
+        snapshot, so the walk stops at the first ancestor that no longer lists
+        them.
+        """
+        parents: dict[str, Optional[str]] = {}
+        pending: dict[str, set[str]] = {}
+        for cid, parent, metadata in await self._fetch(
+            "SELECT checkpoint_id, parent_checkpoint_id, metadata FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, ns),
+        ):
+            parents[cid] = parent
+            try:
+                counters = (json.loads(metadata) or {}).get(_DELTA_COUNTERS) or {}
+            except (TypeError, ValueError, AttributeError):
+                counters = {}
+            pending[cid] = set(counters)
+        needed: set[str] = set()
+        for cid in kept:
+            owed = set(pending.get(cid, ()))
+            cursor = parents.get(cid)
+            while owed and cursor in parents:
+                needed.add(cursor)
+                owed &= pending[cursor]
+                cursor = parents[cursor]
+        return needed
+
+    async def _prune_thread(self, thread_id: str, report: RetentionReport) -> None:
+        keep = self.policy.keep_last
+        async with self.backing.lock:
+            namespaces = await self._fetch(
+                "SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id = ?", (thread_id,)
+            )
+            for (ns,) in namespaces:
+                ids = [
+                    row[0]
+                    for row in await self._fetch(
+                        "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? "
+                        "AND checkpoint_ns = ? ORDER BY checkpoint_id DESC",
+                        (thread_id, ns),
+                    )
+                ]
+                if len(ids) <= keep:
+                    continue
+                interrupts = {
+                    row[0]
+                    for row in await self._fetch(
+                        "SELECT DISTINCT checkpoint_id FROM writes WHERE thread_id = ? "
+                        "AND checkpoint_ns = ? AND channel = ?",
+                        (thread_id, ns, _INTERRUPT_CHANNEL),
+                    )
+                }
+                kept = set(ids[:keep]) | interrupts
+                kept |= await self._delta_ancestors(thread_id, ns, kept)
+                doomed = [cid for cid in ids[keep:] if cid not in kept]
+                for start in range(0, len(doomed), 500):
+                    chunk = doomed[start : start + 500]
+                    marks = ",".join("?" * len(chunk))
+                    cur = await self.backing.conn.execute(
+                        f"DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+                        f"AND checkpoint_id IN ({marks})",
+                        (thread_id, ns, *chunk),
+                    )
+                    report.writes_deleted += max(cur.rowcount, 0)
+                    cur = await self.backing.conn.execute(
+                        f"DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                        f"AND checkpoint_id IN ({marks})",
+                        (thread_id, ns, *chunk),
+                    )
+                    report.checkpoints_deleted += max(cur.rowcount, 0)
+                    if self._blob_refs:
+                        await self.backing.conn.execute(
+                            f"DELETE FROM checkpoint_blob_refs WHERE thread_id = ? "
+                            f"AND checkpoint_ns = ? AND checkpoint_id IN ({marks})",
+                            (thread_id, ns, *chunk),
+                        )
+            await self.backing.conn.commit()
+
+    async def run_once(self, now: Optional[float] = None) -> RetentionReport:
+        """One retention pass over every thread; returns what it did."""
+        report = RetentionReport()
+        if not self.policy.enabled:
+            return report
+        started = time.perf_counter()
+        await self.backing.setup()
+        await self._ensure_incremental_vacuum()
+        now = time.time() if now is None else now
+
+        async with self.backing.lock:
+            self._blob_refs = bool(
+                await self._fetch(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                    "AND name = 'checkpoint_blob_refs'"
+                )
+            )
+            threads = await self._fetch(
+                "SELECT thread_id, MAX(checkpoint_id) FROM checkpoints GROUP BY thread_id"
+            )
+            page_size, pages_before = await self._page_stats()
+
+        for thread_id, newest in threads:
+            report.threads_scanned += 1
+            last_active = checkpoint_time(newest)
+            if (
+                self.policy.ttl_seconds
+                and last_active is not None
+                and now - last_active > self.policy.ttl_seconds
+            ):
+                await self.saver.adelete_thread(thread_id)
+                report.threads_expired += 1
+                report.expired.append(thread_id)
+            elif self.policy.keep_last:
+                await self._prune_thread(thread_id, report)
+            await asyncio.sleep(0)  # let requests interleave on big databases
+
+        async with self.backing.lock:
+            if self._blob_refs:  # offloaded bodies no checkpoint points at any more
+                cur = await self.backing.conn.execute(
+                    "DELETE FROM checkpoint_blobs WHERE hash NOT IN "
+                    "(SELECT hash FROM checkpoint_blob_refs)"
+                )
+                report.blobs_deleted = max(cur.rowcount, 0)
+                await self.backing.conn.commit()
+            await self.backing.conn.execute("PRAGMA incremental_vacuum")
+            await self.backing.conn.commit()
+            _, pages_after = await self._page_stats()
+        report.bytes_reclaimed = max(0, pages_before - pages_after) * page_size
+        report.seconds = round(time.perf_counter() - started, 3)
+
+        RETENTION_DELETED.inc(report.checkpoints_deleted, kind="checkpoint")
+        RETENTION_DELETED.inc(report.writes_deleted, kind="write")
+        RETENTION_DELETED.inc(report.threads_expired, kind="thread")
+        RETENTION_DELETED.inc(report.blobs_deleted, kind="blob")
+        RETENTION_RECLAIMED.inc(report.bytes_reclaimed)
+        logger.info(
+            "Checkpoint retention: %d threads, %d expired, %d checkpoints + %d writes "
+            "deleted, %d bytes reclaimed in %.2fs",
+            report.threads_scanned,
+            report.threads_expired,
+            report.checkpoints_deleted,
+            report.writes_deleted,
+            report.bytes_reclaimed,
+            report.seconds,
+        )
+        return report
+
+
+class ShardedRetention:
+    """Run one :class:`SqliteRetention` per shard concurrently; merge the reports."""
+
+    def __init__(self, parts: list[SqliteRetention]) -> None:
+        self.parts = parts
+
+    async def run_once(self, now: Optional[float] = None) -> RetentionReport:
+        report = RetentionReport()
+        for part in await asyncio.gather(*(p.run_once(now) for p in self.parts)):
+            report.merge(part)
+        return report
+
+
+class RetentionWorker:
+    """Run :meth:`SqliteRetention.run_once` periodically as a background task."""
+
+    def __init__(self, retention: Any, interval: float) -> None:
+        self.retention = retention
+        self.interval = interval
+        self.last_report: Optional[RetentionReport] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_env(cls, saver: BaseCheckpointSaver) -> Optional["RetentionWorker"]:
+        policy = RetentionPolicy.from_env()
+        if not policy.enabled:
+            return None
+        if not SqliteRetention.supports(saver):
+            logger.info("Checkpoint retention needs the SQLite checkpointer (CHECKPOINT_DB)")
+            return None
+        interval = float(_int_env("CHECKPOINT_RETENTION_INTERVAL", 3600) or 3600)
+        return cls(SqliteRetention.for_saver(saver, policy), interval)
+
+    async def run_once(self) -> RetentionReport:
+        async with self._lock:  # background and on-demand passes never overlap
+            self.last_report = await self.retention.run_once()
+            return self.last_report
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Checkpoint retention pass failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(
+            self._loop(), name="checkpoint-retention"
+        )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,361 @@
+"""Pluggable backends for the ``web_search`` tool, including an offline corpus.
+
+``tools.web_search`` used to be Tavily (network) or a fixed mock string, so
+retrieval could not be load-tested offline and internal documents could not be
+served. It now asks a :class:`SearchBackend` for the top results and formats
+them. The backend is picked by :func:`get_backend` from ``SEARCH_BACKEND``:
+
+- ``tavily`` — Tavily web search (``TAVILY_API_KEY``, ``langchain-tavily``);
+- ``local`` — :class:`LocalCorpusBackend`, BM25 over a directory of documents
+  (``SEARCH_CORPUS_DIR``), with no network;
+- ``mock`` — the deterministic sample results.
+
+Unset, it is ``tavily`` with a key, else ``local`` with a corpus, else
+``mock``. All three engines call the same tool, so they all use it.
+
+:class:`LocalCorpusBackend` indexes ``.md`` / ``.markdown`` / ``.txt`` files
+(split into passages at headings and blank lines) and ``.jsonl`` files (one
+document per line: ``title``, ``text`` / ``content`` / ``body``, ``url``) into
+a SQLite FTS5 index on disk, ``<SEARCH_CORPUS_DIR>.search.sqlite`` unless
+``SEARCH_INDEX_DB`` says otherwise. Updates are incremental: files are matched
+by size and modification time, and only new, changed or removed files touch
+the index. The directory is re-scanned at most every
+``SEARCH_CORPUS_REFRESH_SECONDS`` (default 30; ``0`` = at startup only),
+before a search. One search claims the re-scan; searches that arrive during
+it use the index as it stands rather than walking the directory again. Results are ranked by BM25, title matches weighted up, with a
+snippet around the matched words.
+"""
+
+from __future__ import annotations
+
+import abc
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from memory_store import _words
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DURATION = REGISTRY.histogram(
+    "web_search_duration_seconds",
+    "web_search latency by backend.",
+    ("backend",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+TEXT_SUFFIXES = (".md", ".markdown", ".txt")
+JSONL_SUFFIX = ".jsonl"
+_PASSAGE_CHARS = 1200  # paragraphs are merged into passages up to this size
+_MAX_TERMS = 32
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS files ("
+    "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS passages ("
+    "id INTEGER PRIMARY KEY, path TEXT NOT NULL, title TEXT NOT NULL, "
+    "url TEXT NOT NULL, body TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS passages_path ON passages (path)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS passages_fts USING fts5("
+    "title, body, content='passages', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS passages_ai AFTER INSERT ON passages BEGIN "
+    "INSERT INTO passages_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS passages_ad AFTER DELETE ON passages BEGIN "
+    "INSERT INTO passages_fts(passages_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); END",
+)
+
+
+def _int_env(name: str, default: int) -> int:
+    return int(os.getenv(name, "").strip() or default)
+
+
+@dataclass
+class SearchResult:
+    title: str
+    snippet: str
+    url: str = ""
+    score: float = 0.0
+
+
+@dataclass
+class IndexReport:
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    passages: int = 0
+    seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class SearchBackend(abc.ABC):
+    """Where ``web_search`` gets its results."""
+
+    name = "base"
+
+    @property
+    def key(self) -> str:
+        """Which results the backend serves (``search_cache`` keys them by it)."""
+        return self.name
+
+    @abc.abstractmethod
+    def search(self, query: str, k: int = 5) -> list[SearchResult]:
+        """The top ``k`` results for ``query``, best first."""
+
+    def close(self) -> None:
+        pass
+
+
+class MockSearchBackend(SearchBackend):
+    """Deterministic sample results, so the template runs offline."""
+
+    name = "mock"
+
+    def search(self, query: str, k: int = 5) -> list[SearchResult]:
+        return [
+            SearchResult(f"Overview of '{query}'", "a concise, relevant summary of the topic."),
+            SearchResult("Key points", "the most important facts a reader should know."),
+        ][:k]
+
+
+class TavilySearchBackend(SearchBackend):
+    """Live web search through Tavily (needs ``langchain-tavily`` and a key)."""
+
+    name = "tavily"
+
+    def search(self, query: str, k: int = 5) -> list[SearchResult]:
+        from langchain_tavily import TavilySearch
+
+        response = TavilySearch(max_results=k).invoke({"query": query})
+        results = response.get("results", []) if isinstance(response, dict) else []
+        return [
+            SearchResult(
+                item.get("title", "Result"),
+                item.get("content", ""),
+                item.get("url", ""),
+                float(item.get("score") or 0.0),
+            )
+            for item in results
+        ]
+
+
+def format_results(results: list[SearchResult]) -> str:
+    """The tool's text: title, snippet and url of each result."""
+    return "\n\n".join(
+        "\n  ".join(part for part in (f"- {r.title}", r.snippet, r.url) if part) for r in results
+    )
+
+
+def _chunks(paragraphs: list[str]) -> Iterator[str]:
+    """Paragraphs merged into passages of about ``_PASSAGE_CHARS``."""
+    chunk = ""
+    for paragraph in paragraphs:
+        if chunk and len(chunk) + len(paragraph) > _PASSAGE_CHARS:
+            yield chunk
+            chunk = ""
+        chunk = f"{chunk}\n\n{paragraph}" if chunk else paragraph
+    if chunk:
+        yield chunk
+
+
+def _paragraphs(text: str) -> list[str]:
+    return [p.strip() for p in text.replace("\r\n", "\n").split("\n\n") if p.strip()]
+
+
+def _text_passages(text: str, default_title: str) -> Iterator[tuple[str, str]]:
+    """``(title, body)`` passages of a text / markdown file, split at headings."""
+    title, section = default_title, []
+    for line in text.replace("\r\n", "\n").split("\n"):
+        if line.startswith("#") and line.lstrip("#").startswith(" "):  # "## Heading"
+            yield from ((title, chunk) for chunk in _chunks(_paragraphs("\n".join(section))))
+            title, section = line.lstrip("#").strip() or default_title, []
+        else:
+            section.append(line)
+    yield from ((title, chunk) for chunk in _chunks(_paragraphs("\n".join(section))))
+
+
+def parse_document(path: str, relpath: str) -> list[tuple[str, str, str]]:
+    """The ``(title, url, body)`` passages of the file at ``path``."""
+    stem = os.path.splitext(os.path.basename(relpath))[0]
+    with open(path, encoding="utf-8", errors="replace") as f:
+        if not relpath.endswith(JSONL_SUFFIX):
+            return [(title, relpath, body) for title, body in _text_passages(f.read(), stem)]
+        passages = []
+        for n, line in enumerate(f, 1):
+            try:
+                doc = json.loads(line) if line.strip() else None
+            except json.JSONDecodeError:
+                logger.warning("Skipping bad JSON at %s:%d", relpath, n)
+                continue
+            if not isinstance(doc, dict):
+                continue
+            text = doc.get("text") or doc.get("content") or doc.get("body") or ""
+            title = str(doc.get("title") or f"{stem} #{n}")
+            url = str(doc.get("url") or f"{relpath}#{n}")
+            passages.extend((title, url, chunk) for chunk in _chunks(_paragraphs(str(text))))
+        return passages
+
+
+class LocalCorpusBackend(SearchBackend):
+    """BM25 search over a directory of documents, indexed incrementally on disk."""
+
+    name = "local"
+
+    def __init__(
+        self,
+        corpus_dir: str,
+        index_path: Optional[str] = None,
+        *,
+        refresh_interval: float = 30.0,
+    ) -> None:
+        self.corpus_dir = os.path.abspath(corpus_dir)
+        self.index_path = index_path or self.corpus_dir.rstrip(os.sep) + ".search.sqlite"
+        self.refresh_interval = refresh_interval
+        self.last_report: Optional[IndexReport] = None
+        self._refreshed_at = 0.0
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()  # one scan at a time
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+        self.refresh()
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}:{self.index_path}"
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        """``relpath -> (size, mtime_ns)`` of the corpus's documents."""
+        found = {}
+        for root, dirs, files in os.walk(self.corpus_dir):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in files:
+                if name.startswith(".") or not name.endswith((*TEXT_SUFFIXES, JSONL_SUFFIX)):
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                relpath = os.path.relpath(path, self.corpus_dir).replace(os.sep, "/")
+                found[relpath] = (stat.st_size, stat.st_mtime_ns)
+        return found
+
+    def refresh(self) -> IndexReport:
+        """Bring the index up to date with the directory; only changed files are read."""
+        with self._refreshing:
+            return self._refresh()
+
+    def _stale(self) -> bool:
+        return bool(self.refresh_interval) and (
+            time.monotonic() - self._refreshed_at >= self.refresh_interval
+        )
+
+    def _refresh(self) -> IndexReport:
+        start = time.perf_counter()
+        report = IndexReport()
+        found = self._scan()
+        with self._lock:
+            rows = self._conn.execute("SELECT path, size, mtime_ns FROM files")
+            indexed = {path: (size, mtime) for path, size, mtime in rows}
+            try:
+                for relpath in indexed.keys() - found.keys():
+                    self._conn.execute("DELETE FROM passages WHERE path = ?", (relpath,))
+                    self._conn.execute("DELETE FROM files WHERE path = ?", (relpath,))
+                    report.removed += 1
+                for relpath, (size, mtime) in found.items():
+                    if indexed.get(relpath) == (size, mtime):
+                        continue
+                    try:
+                        passages = parse_document(os.path.join(self.corpus_dir, relpath), relpath)
+                    except OSError as exc:  # removed or unreadable since the scan
+                        logger.warning("Could not index %s: %s", relpath, exc)
+                        continue
+                    if relpath in indexed:
+                        self._conn.execute("DELETE FROM passages WHERE path = ?", (relpath,))
+                        report.updated += 1
+                    else:
+                        report.added += 1
+                    self._conn.executemany(
+                        "INSERT INTO passages (path, title, url, body) VALUES (?, ?, ?, ?)",
+                        [(relpath, title, url, body) for title, url, body in passages],
+                    )
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO files (path, size, mtime_ns) VALUES (?, ?, ?)",
+                        (relpath, size, mtime),
+                    )
+                    report.passages += len(passages)
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._refreshed_at = time.monotonic()
+        report.seconds = round(time.perf_counter() - start, 4)
+        if report.added or report.updated or report.removed:
+            logger.info("Search index %s updated: %s", self.index_path, report.as_dict())
+        self.last_report = report
+        return report
+
+    def search(self, query: str, k: int = 5) -> list[SearchResult]:
+        # The first search to find the index stale re-scans; the rest don't wait for it.
+        if self._stale() and self._refreshing.acquire(blocking=False):
+            try:
+                if self._stale():  # not just refreshed by the search before
+                    self._refresh()
+            finally:
+                self._refreshing.release()
+        words = list(dict.fromkeys(_words(query)))[:_MAX_TERMS]
+        if not words:
+            return []
+        match = " OR ".join(f'"{w}"' for w in words)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.title, p.url, snippet(passages_fts, 1, '', '', '…', 32), "
+                "bm25(passages_fts, 4.0, 1.0) AS score "
+                "FROM passages_fts JOIN passages p ON p.id = passages_fts.rowid "
+                "WHERE passages_fts MATCH ? ORDER BY score LIMIT ?",
+                (match, k),
+            ).fetchall()
+        # bm25() is lower for better matches; results carry it negated.
+        return [SearchResult(title, snippet, url, -score) for title, url, snippet, score in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+@lru_cache(maxsize=None)
+def _local_backend(corpus_dir: str, index_path: str, refresh: int) -> LocalCorpusBackend:
+    return LocalCorpusBackend(corpus_dir, index_path or None, refresh_interval=refresh)
+
+
+def get_backend() -> SearchBackend:
+    """The backend ``SEARCH_BACKEND`` (or the environment) selects; see the module docs."""
+    name = os.getenv("SEARCH_BACKEND", "").strip().lower()
+    corpus_dir = os.getenv("SEARCH_CORPUS_DIR", "").strip()
+    if not name:
+        name = "tavily" if os.getenv("TAVILY_API_KEY") else "local" if corpus_dir else "mock"
+    if name == "tavily":
+        return TavilySearchBackend()
+    if name == "local":
+        if not corpus_dir:
+            raise ValueError("SEARCH_BACKEND=local needs SEARCH_CORPUS_DIR")
+        # One index connection per corpus, shared by every search in the process.
+        return _local_backend(
+            corpus_dir,
+            os.getenv("SEARCH_INDEX_DB", "").strip(),
+            _int_env("SEARCH_CORPUS_REFRESH_SECONDS", 30),
+        )
+    if name == "mock":
+        return MockSearchBackend()
+    raise ValueError(f"Unknown SEARCH_BACKEND {name!r} (tavily, local or mock)")
@@ -0,0 +1,273 @@
+"""Persistent cache for ``web_search`` results, with stale-while-revalidate.
+
+``web_search`` asks its backend every time, even for a query it answered a
+minute ago: the workflow's ``sub_researcher`` repeats topics across users, and
+the agent repeats a search after an edit or reject at its interrupt.
+:class:`SearchCache` keeps results in SQLite and answers repeats from there:
+
+- **keyed by backend and query** — ``(backend.key, normalised query, k)``:
+  the backend's name (and index, for the ``local`` corpus), and the query
+  lower-cased with its whitespace collapsed;
+- **fresh for ``ttl`` seconds** — served straight from the cache;
+- **stale for ``stale`` seconds more** — still served at once, while one
+  background refresh replaces it (stale-while-revalidate). A failed refresh
+  keeps the stale result;
+- **singleflight** — concurrent misses for one key make one backend call, and
+  the other callers wait for its result rather than searching again;
+- **bounded** — every ``size // 10`` writes (by this process), the oldest
+  results beyond ``size`` are dropped, so the file holds about ``size``.
+
+The file can be shared by several workers, and results survive restarts.
+Singleflight is per process. Failed searches are not cached. Mock results are
+never cached. For the ``local`` corpus, ``ttl`` bounds how long an edited
+document can go unseen. Configured by :func:`from_env`::
+
+    SEARCH_CACHE_DB=/data/search-cache.sqlite   # default <MEMORY_DB>.search, else in memory
+    SEARCH_CACHE_SIZE=10000                     # results kept; 0 = off
+    SEARCH_CACHE_TTL=3600                       # seconds served fresh
+    SEARCH_CACHE_STALE=3600                     # seconds more served while refreshing
+
+Lookups are counted in ``cache_requests_total{cache="search"}`` (a hit is a
+backend call avoided, including a wait on an in-flight search). The backend
+time each hit saved (what the cached or in-flight search took) is summed in
+``web_search_cache_saved_seconds_total``.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict
+from functools import lru_cache
+from typing import Callable, Optional
+
+import metrics
+from metrics import REGISTRY
+from recall_cache import normalise_query
+from search_backends import SearchBackend, SearchResult
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_SAVED = REGISTRY.counter(
+    "web_search_cache_saved_seconds_total",
+    "Backend search time avoided by web_search cache hits.",
+    ("backend",),
+)
+SEARCH_CACHE_REVALIDATIONS = REGISTRY.counter(
+    "web_search_cache_revalidations_total",
+    "Background refreshes of stale cached searches, by result (ok, failed).",
+    ("result",),
+)
+
+_Key = tuple[str, str, int]
+
+
+def _int_env(name: str, default: int) -> int:
+    return int(os.getenv(name, "").strip() or default)
+
+
+class SearchCache:
+    """Search results in SQLite, fresh for ``ttl`` seconds and stale for ``stale`` more."""
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        *,
+        size: int = 10_000,
+        ttl: float = 3600.0,
+        stale: float = 3600.0,
+        workers: int = 4,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.size = max(1, size)
+        self._trim_every = max(1, self.size // 10)
+        self._puts = 0
+        self.ttl = ttl
+        self.stale = stale
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "backend TEXT NOT NULL, query TEXT NOT NULL, k INTEGER NOT NULL, "
+            "results TEXT NOT NULL, seconds REAL NOT NULL, fetched_at REAL NOT NULL, "
+            "PRIMARY KEY (backend, query, k))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_age ON results (fetched_at)")
+        self._inflight: dict[_Key, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max(1, workers), thread_name_prefix="search-cache")
+
+    @property
+    def entries(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM results").fetchone()[0]
+
+    def search(self, backend: SearchBackend, query: str, k: int = 5) -> list[SearchResult]:
+        """``backend.search(query, k)``, from the cache when it can be."""
+        key = (backend.key, normalise_query(query) or "", k)
+        cached = self._get(key)
+        if cached is not None:
+            results, seconds, age = cached
+            if age < self.ttl + self.stale:
+                metrics.record_cache("search", True)
+                SEARCH_CACHE_SAVED.inc(seconds, backend=backend.name)
+                if age >= self.ttl:
+                    self._revalidate(backend, query, key)
+                return results
+        future, leader = self._join(key)
+        metrics.record_cache("search", not leader)
+        if leader:
+            self._fetch(backend, query, key, future)
+        results, seconds = future.result()
+        if not leader:
+            SEARCH_CACHE_SAVED.inc(seconds, backend=backend.name)
+        return results
+
+    def close(self) -> None:
+        """Wait for background refreshes, then close the file."""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
+
+    # --- internals ----------------------------------------------------------------
+    def _join(self, key: _Key) -> tuple[Future, bool]:
+        """The in-flight search for ``key``, and whether the caller must run it."""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = self._inflight[key] = Future()
+            return future, True
+
+    def _fetch(self, backend: SearchBackend, query: str, key: _Key, future: Future) -> None:
+        """Run the search; ``future`` gets ``(results, seconds)`` for the callers waiting."""
+        start = time.perf_counter()
+        try:
+            results = backend.search(query, k=key[2])
+        except BaseException as exc:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            future.set_exception(exc)
+            return
+        seconds = time.perf_counter() - start
+        try:
+            self._put(key, results, seconds)
+        except sqlite3.Error as exc:  # a full disk or a locked file: still answer
+            logger.warning("Could not cache search results in %s: %s", self.path, exc)
+        # Cached first, so a search that misses the in-flight entry finds the row.
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+        future.set_result((results, seconds))
+
+    def _revalidate(self, backend: SearchBackend, query: str, key: _Key) -> None:
+        future, leader = self._join(key)
+        if not leader:
+            return
+        try:
+            self._executor.submit(self._refresh, backend, query, key, future)
+        except RuntimeError:  # closed: the stale result stays until the next miss
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            future.cancel()
+
+    def _refresh(self, backend: SearchBackend, query: str, key: _Key, future: Future) -> None:
+        self._fetch(backend, query, key, future)
+        exc = future.exception()
+        if exc is not None:
+            logger.warning("Refreshing cached %s search failed: %s", backend.name, exc)
+        SEARCH_CACHE_REVALIDATIONS.inc(result="failed" if exc else "ok")
+
+    def _get(self, key: _Key) -> Optional[tuple[list[SearchResult], float, float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT results, seconds, fetched_at FROM results "
+                "WHERE backend = ? AND query = ? AND k = ?",
+                key,
+            ).fetchone()
+        if row is None:
+            return None
+        results = [SearchResult(**item) for item in json.loads(row[0])]
+        return results, row[1], self._clock() - row[2]
+
+    def _put(self, key: _Key, results: list[SearchResult], seconds: float) -> None:
+        data = json.dumps([asdict(result) for result in results])
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results "
+                "(backend, query, k, results, seconds, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, data, seconds, self._clock()),
+            )
+            self._puts += 1
+            if self._puts % self._trim_every == 0:
+                self._trim()
+
+    def _trim(self) -> None:
+        """Drop the oldest results beyond ``size``; other workers write too, so count."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            count = self._conn.execute("SELECT count(*) FROM results").fetchone()[0]
+            if count > self.size:
+                self._conn.execute(
+                    "DELETE FROM results WHERE rowid IN "
+                    "(SELECT rowid FROM results ORDER BY fetched_at LIMIT ?)",
+                    (count - self.size,),
+                )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+
+class CachedSearchBackend(SearchBackend):
+    """``backend`` answered through a :class:`SearchCache`."""
+
+    def __init__(self, backend: SearchBackend, cache: SearchCache) -> None:
+        self.backend = backend
+        self.cache = cache
+        self.name = backend.name
+
+    @property
+    def key(self) -> str:
+        return self.backend.key
+
+    def search(self, query: str, k: int = 5) -> list[SearchResult]:
+        return self.cache.search(self.backend, query, k)
+
+    def close(self) -> None:
+        self.backend.close()
+
+
+@lru_cache(maxsize=None)
+def _cache(path: str, size: int, ttl: int, stale: int) -> SearchCache:
+    return SearchCache(path, size=size, ttl=float(ttl), stale=float(stale))
+
+
+def from_env(backend: SearchBackend) -> SearchBackend:
+    """``backend`` behind the process's :class:`SearchCache`, unless ``SEARCH_CACHE_SIZE=0``."""
+    size = _int_env("SEARCH_CACHE_SIZE", 10_000)
+    if size <= 0 or backend.name == "mock":
+        return backend
+    path = os.getenv("SEARCH_CACHE_DB", "").strip()
+    memory_db = os.getenv("MEMORY_DB", "").strip()
+    if not path:
+        path = memory_db + ".search" if memory_db else ":memory:"
+    return CachedSearchBackend(
+        backend,
+        _cache(
+            path,
+            size,
+            _int_env("SEARCH_CACHE_TTL", 3600),
+            _int_env("SEARCH_CACHE_STALE", 3600),
+        ),
+    )
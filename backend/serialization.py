@@ -0,0 +1,169 @@
+"""Compressed checkpoint serializer.
+
+Every superstep checkpoints the full ``ResearchState`` — the ``messages``
+history, ``research_results``, ``analysis`` and ``final_response`` text — and
+on long threads those bytes dominate disk usage and checkpointer I/O.
+
+:class:`CompactSerializer` keeps LangGraph's default encoding (msgpack via
+``JsonPlusSerializer``, already a compact binary format) and compresses any
+payload of at least ``CHECKPOINT_COMPRESS_MIN_BYTES`` with zstd (or zlib when
+``zstandard`` isn't installed). The codec is recorded in the type tag
+(``msgpack.zstd``), so:
+
+- payloads written before compression was enabled (plain ``msgpack``) still
+  load — the serializer is backward compatible with existing checkpoints;
+- small payloads (most channel writes) skip compression and its CPU cost;
+- it subclasses ``JsonPlusSerializer``, so savers' strict msgpack allowlists
+  keep working.
+
+``checkpointing.open_checkpointer`` builds the savers with it:
+
+    CHECKPOINT_COMPRESSION=auto         # zstd if installed, else zlib; or zstd|zlib|none
+    CHECKPOINT_COMPRESS_MIN_BYTES=1024  # smaller payloads are stored as-is
+    CHECKPOINT_COMPRESS_LEVEL=          # codec level (default: zstd 3, zlib 6)
+
+Set ``CHECKPOINT_COMPRESSION=none`` before rolling back to a release without
+this serializer: older code can't read compressed checkpoints.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import zlib
+from importlib.util import find_spec
+from typing import Any, Optional
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+logger = logging.getLogger(__name__)
+
+ZSTD_AVAILABLE = find_spec("zstandard") is not None
+_SUFFIXES = (".zstd", ".zlib")
+
+
+def _int_env(name: str, default: Optional[int]) -> Optional[int]:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        logger.warning("Invalid %s %r; using the default", name, raw)
+        return default
+
+
+class _Zstd:
+    """zstd codec; compressor objects aren't thread-safe, so one per thread."""
+
+    name = "zstd"
+
+    def __init__(self, level: int) -> None:
+        import zstandard
+
+        self._zstd = zstandard
+        self.level = level
+        self._local = threading.local()
+
+    def _get(self, attr: str, factory: Any) -> Any:
+        obj = getattr(self._local, attr, None)
+        if obj is None:
+            obj = factory()
+            setattr(self._local, attr, obj)
+        return obj
+
+    def compress(self, data: bytes) -> bytes:
+        return self._get("c", lambda: self._zstd.ZstdCompressor(level=self.level)).compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._get("d", self._zstd.ZstdDecompressor).decompress(data)
+
+
+class _Zlib:
+    name = "zlib"
+
+    def __init__(self, level: int) -> None:
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+def _codec(name: str, level: Optional[int] = None) -> Any:
+    if name == "zstd":
+        return _Zstd(3 if level is None else level)
+    if name == "zlib":
+        return _Zlib(6 if level is None else level)
+    raise ValueError(f"Unknown checkpoint compression codec {name!r}")
+
+
+class CompactSerializer(JsonPlusSerializer):
+    """``JsonPlusSerializer`` that compresses payloads above a size threshold.
+
+    ``codec`` is ``"zstd"``, ``"zlib"`` or ``None`` (never compress — but still
+    read compressed payloads). Reading never depends on ``codec``: the type tag
+    says how each payload was written.
+    """
+
+    def __init__(
+        self,
+        codec: Optional[str] = "zstd" if ZSTD_AVAILABLE else "zlib",
+        *,
+        min_bytes: int = 1024,
+        level: Optional[int] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.codec = codec
+        self.min_bytes = min_bytes
+        self._writer = _codec(codec, level) if codec else None
+        self._readers: dict[str, Any] = {}
+
+    @classmethod
+    def from_env(cls) -> "CompactSerializer":
+        raw = os.getenv("CHECKPOINT_COMPRESSION", "auto").strip().lower() or "auto"
+        if raw == "auto":
+            codec: Optional[str] = "zstd" if ZSTD_AVAILABLE else "zlib"
+        elif raw in {"none", "off", "false", "0"}:
+            codec = None
+        elif raw == "zstd" and not ZSTD_AVAILABLE:
+            logger.warning("CHECKPOINT_COMPRESSION=zstd but zstandard isn't installed; using zlib")
+            codec = "zlib"
+        elif raw in {"zstd", "zlib"}:
+            codec = raw
+        else:
+            logger.warning("Unknown CHECKPOINT_COMPRESSION %r; using zlib", raw)
+            codec = "zlib"
+        min_bytes = _int_env("CHECKPOINT_COMPRESS_MIN_BYTES", 1024)
+        level = _int_env("CHECKPOINT_COMPRESS_LEVEL", None)
+        return cls(codec, min_bytes=max(0, min_bytes), level=level)
+
+    def _reader(self, name: str) -> Any:
+        reader = self._readers.get(name)
+        if reader is None:
+            if self._writer is not None and self._writer.name == name:
+                reader = self._writer
+            else:
+                reader = _codec(name)  # raises ImportError if zstandard is missing
+            self._readers[name] = reader
+        return reader
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = super().dumps_typed(obj)
+        if self._writer is None or len(data) < self.min_bytes:
+            return type_, data
+        packed = self._writer.compress(data)
+        if len(packed) >= len(data):  # incompressible (e.g. already-compressed bytes)
+            return type_, data
+        return f"{type_}.{self._writer.name}", packed
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.endswith(_SUFFIXES):
+            type_, name = type_.rsplit(".", 1)
+            payload = self._reader(name).decompress(payload)
+        return super().loads_typed((type_, payload))
@@ -0,0 +1,291 @@
+"""SQLite checkpoints sharded across files, with a reader pool per shard.
+
+A single ``AsyncSqliteSaver`` is one connection and one file for every engine
+and thread: concurrent runs queue on its lock to write, and ``/get_state``
+polls queue behind them. :class:`ShardedSqliteSaver` spreads threads over
+``CHECKPOINT_SHARDS`` files by a stable hash of ``thread_id``:
+
+- each shard has one writer connection (an ``AsyncSqliteSaver``, so the
+  file layout is unchanged), so writes from threads on different shards run in
+  parallel;
+- files use WAL, and each shard keeps ``CHECKPOINT_SHARD_READERS`` read-only
+  connections for ``get_tuple`` / ``list`` / delta-channel history. Reads
+  never wait for a write in progress, only for a free reader;
+- a thread lives entirely in one shard, so every per-thread operation (and
+  retention, blob offload and ``/debug/memory``, which work shard by shard)
+  touches one file.
+
+``CHECKPOINT_DB=checkpoints.sqlite`` with ``CHECKPOINT_SHARDS=4`` uses
+``checkpoints.0.sqlite`` … ``checkpoints.3.sqlite``. The hash depends on the
+shard count, so changing it (or switching from the unsharded file) starts
+threads afresh; existing checkpoints are not migrated.
+
+    CHECKPOINT_SHARDS=4          # unset/1 = one file, no reader pool
+    CHECKPOINT_SHARD_READERS=2   # read-only connections per shard
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import zlib
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Iterator, Mapping, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def shard_paths(path: str, shards: int) -> list[str]:
+    """``checkpoints.sqlite`` → ``checkpoints.0.sqlite``, ``checkpoints.1.sqlite``, …"""
+    root, ext = os.path.splitext(path)
+    return [f"{root}.{i}{ext or '.sqlite'}" for i in range(shards)]
+
+
+def shard_index(thread_id: str, shards: int) -> int:
+    # crc32 rather than hash(): stable across processes and restarts.
+    return zlib.crc32(str(thread_id).encode()) % shards
+
+
+class SqliteShard:
+    """One shard file: a writer saver plus a pool of read-only savers."""
+
+    def __init__(self, path: str, writer: Any, readers: Sequence[Any]) -> None:
+        self.path = path
+        self.writer = writer
+        self.readers = list(readers)
+        self._free: asyncio.Queue = asyncio.Queue()
+        for reader in self.readers:
+            self._free.put_nowait(reader)
+
+    @asynccontextmanager
+    async def reading(self) -> AsyncIterator[Any]:
+        """A free reader (the writer if the shard has no pool)."""
+        if not self.readers:
+            yield self.writer
+            return
+        reader = await self._free.get()
+        try:
+            yield reader
+        finally:
+            self._free.put_nowait(reader)
+
+
+class ShardedSqliteSaver(BaseCheckpointSaver):
+    """Route each thread to one :class:`SqliteShard`; see the module docstring.
+
+    Build it with :meth:`open`. Sync methods go to the shard's writer (they
+    have the same threading contract as ``AsyncSqliteSaver``'s).
+    """
+
+    def __init__(self, shards: Sequence[SqliteShard], *, serde: Any = None) -> None:
+        super().__init__(serde=serde if serde is not None else shards[0].writer.serde)
+        self.shards = list(shards)
+
+    @classmethod
+    @asynccontextmanager
+    async def open(
+        cls, path: str, shards: int, *, readers: int = 2, serde: Any = None
+    ) -> AsyncIterator["ShardedSqliteSaver"]:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        async with AsyncExitStack() as stack:
+            built = []
+            for shard_path in shard_paths(path, shards):
+                conn = await stack.enter_async_context(aiosqlite.connect(shard_path))
+                writer = AsyncSqliteSaver(conn, serde=serde)
+                # Same as the unsharded file (see retention.py); no-op once
+                # tables exist. setup() then switches the file to WAL.
+                await conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                await writer.setup()
+                pool = []
+                for _ in range(readers):
+                    rconn = await stack.enter_async_context(
+                        aiosqlite.connect(f"file:{shard_path}?mode=ro", uri=True)
+                    )
+                    reader = AsyncSqliteSaver(rconn, serde=writer.serde)
+                    reader.is_setup = True  # the writer created the tables
+                    pool.append(reader)
+                built.append(SqliteShard(shard_path, writer, pool))
+            logger.info(
+                "Using %d SQLite checkpoint shards (%s), %d readers each",
+                shards,
+                ", ".join(s.path for s in built),
+                readers,
+            )
+            yield cls(built, serde=serde)
+
+    def shard(self, thread_id: str) -> SqliteShard:
+        return self.shards[shard_index(thread_id, len(self.shards))]
+
+    def _for(self, config: RunnableConfig) -> SqliteShard:
+        return self.shard(config["configurable"]["thread_id"])
+
+    # --- sync -----------------------------------------------------------------
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self._for(config).writer.get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        if config and config.get("configurable", {}).get("thread_id") is not None:
+            yield from self._for(config).writer.list(
+                config, filter=filter, before=before, limit=limit
+            )
+            return
+        items = [
+            item
+            for shard in self.shards
+            for item in shard.writer.list(config, filter=filter, before=before, limit=limit)
+        ]
+        yield from _newest_first(items, limit)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self._for(config).writer.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return self._for(config).writer.put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        return self.shard(thread_id).writer.delete_thread(thread_id)
+
+    def copy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        writer = self.shard(source_thread_id).writer
+        asyncio.run_coroutine_threadsafe(
+            self.acopy_thread(source_thread_id, target_thread_id), writer.loop
+        ).result()
+
+    def get_delta_channel_history(
+        self, *, config: RunnableConfig, channels: Sequence[str]
+    ) -> Mapping[str, Any]:
+        return self._for(config).writer.get_delta_channel_history(
+            config=config, channels=channels
+        )
+
+    def get_next_version(self, current: Any, channel: None) -> Any:
+        return self.shards[0].writer.get_next_version(current, channel)
+
+    # --- async ----------------------------------------------------------------
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        async with self._for(config).reading() as reader:
+            return await reader.aget_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        if config and config.get("configurable", {}).get("thread_id") is not None:
+            async with self._for(config).reading() as reader:
+                async for item in reader.alist(config, filter=filter, before=before, limit=limit):
+                    yield item
+            return
+
+        async def scan(shard: SqliteShard) -> list[CheckpointTuple]:
+            async with shard.reading() as reader:
+                return [
+                    item
+                    async for item in reader.alist(
+                        config, filter=filter, before=before, limit=limit
+                    )
+                ]
+
+        per_shard = await asyncio.gather(*(scan(shard) for shard in self.shards))
+        for item in _newest_first([i for items in per_shard for i in items], limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await self._for(config).writer.aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await self._for(config).writer.aput_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await self.shard(thread_id).writer.adelete_thread(thread_id)
+
+    async def acopy_thread(self, source_thread_id: str, target_thread_id: str) -> None:
+        """Copy a thread's checkpoints and writes into ``target_thread_id``'s shard.
+
+        Rows are copied as stored (both shards share the serializer), in one
+        transaction on the target.
+        """
+        source = self.shard(source_thread_id).writer
+        target = self.shard(target_thread_id).writer
+        await source.setup()
+        await target.setup()
+        copied = []
+        async with source.lock:
+            for table in ("checkpoints", "writes"):
+                async with source.conn.execute(
+                    f"SELECT * FROM {table} WHERE thread_id = ?", (source_thread_id,)
+                ) as cur:
+                    columns = [d[0] for d in cur.description]
+                    rows = await cur.fetchall()
+                at = columns.index("thread_id")
+                rows = [(*row[:at], target_thread_id, *row[at + 1 :]) for row in rows]
+                copied.append((table, columns, rows))
+        async with target.lock:
+            try:
+                for table, columns, rows in copied:
+                    await target.conn.executemany(
+                        f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                        f"VALUES ({', '.join('?' * len(columns))})",
+                        rows,
+                    )
+                await target.conn.commit()
+            except BaseException:
+                await target.conn.rollback()
+                raise
+
+    async def aget_delta_channel_history(
+        self, *, config: RunnableConfig, channels: Sequence[str]
+    ) -> Mapping[str, Any]:
+        async with self._for(config).reading() as reader:
+            return await reader.aget_delta_channel_history(config=config, channels=channels)
+
+
+def _newest_first(items: list[CheckpointTuple], limit: Optional[int]) -> list[CheckpointTuple]:
+    items.sort(key=lambda item: item.config["configurable"]["checkpoint_id"], reverse=True)
+    return items[:limit] if limit is not None else items
@@ -0,0 +1,73 @@
+"""Smoke tests for the benchmark scripts (offline, mock model, tiny sizes)."""
+
+import os
+
+os.environ.setdefault("USE_MOCK_LLM", "true")
+
+from benchmarks import startup
+
+
+def test_startup_benchmark_reports_cold_start():
+    report = startup.run_benchmark(runs=1)
+    assert {"import_main", "startup", "build_workflow", "build_agent"} <= set(report)
+    assert all(row["median"] > 0 for row in report.values())
+
+
+def test_checkpoint_cache_benchmark_cuts_sqlite_reads():
+    from benchmarks import checkpoint_cache
+
+    report = checkpoint_cache.run_benchmark(threads=3, polls=4, resume_every=2)
+    assert report["cached"]["sqlite_reads"] < report["bare"]["sqlite_reads"]
+    assert report["cached"]["deserialisations"] < report["bare"]["deserialisations"]
+
+
+def test_serializer_benchmark_shrinks_long_threads():
+    from benchmarks import serializer
+
+    report = serializer.run_benchmark(turns=(20,), repeat=2)
+    rows = report["20_turns"]
+    assert rows["zlib"]["bytes"] * 2 < rows["default"]["bytes"]
+    assert all(row["decode_ms"] > 0 for row in rows.values())
+
+
+def test_blob_offload_benchmark_deduplicates_forks():
+    from benchmarks import blob_offload
+
+    report = blob_offload.run_benchmark(threads=1, min_bytes=128)
+    dedup = report["offloaded"]["dedup"]
+    assert dedup["references"] > dedup["blobs"] > 0
+    assert report["offloaded"]["checkpoints_bytes"] < report["bare"]["checkpoints_bytes"]
+
+
+def test_durability_benchmark_coalesces_writes_in_exit_mode():
+    from benchmarks import durability
+
+    report = durability.run_benchmark(threads=2, concurrency=2)
+    # exit mode: one checkpoint per request (three interrupts + completion).
+    assert report["exit"]["checkpoint_rows"] == 2 * 4
+    assert report["exit"]["put_calls"] < report["sync"]["put_calls"]
+    assert report["exit"]["put_writes_calls"] < report["async"]["put_writes_calls"]
+
+
+def test_sharding_benchmark_serves_reads_during_writes():
+    from benchmarks import sharding
+
+    report = sharding.run_benchmark(threads=8, shards=2, readers=1, pollers=2)
+    assert report["single"]["runs_per_s"] > 0 and report["sharded"]["runs_per_s"] > 0
+    assert report["sharded"]["reads"] > 0
+
+
+def test_memory_store_benchmark_recalls_for_every_query():
+    from benchmarks import memory_store
+
+    report = memory_store.run_benchmark(memories=2000, users=20, queries=20)
+    assert report["sqlite"]["non_empty"] == report["sqlite_recent"]["non_empty"] == 1.0
+    assert report["sqlite"]["p50_ms"] > 0
+
+
+def test_workflow_prefetch_benchmark_takes_recall_off_start():
+    from benchmarks import workflow_prefetch
+
+    report = workflow_prefetch.run_benchmark(threads=4, embed_ms=30, think_ms=40, cancel_every=0)
+    assert report["prefetch"]["start_p50_ms"] < report["serial"]["start_p50_ms"]
+    assert report["prefetch"]["recalls_completed"] == report["serial"]["recalls_completed"] == 4
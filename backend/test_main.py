@@ -16,7 +16,7 @@ from main import app
 
 @pytest.fixture()
 def client():
-    # `with` triggers the FastAPI lifespan so app.state.graph is built.
+    # `with` triggers the FastAPI lifespan (checkpointer, store, engine registry).
     with TestClient(app) as test_client:
         yield test_client
 
@@ -51,6 +51,7 @@ def test_capabilities_reports_active_features(client):
     assert caps["guardrails"]["redact_pii"] is True
     assert caps["structured_output"] is False
     assert caps["semantic_memory"] is False
+    assert caps["search_backend"] == "mock"
     assert caps["mcp"]["enabled"] is False
     assert caps["mcp"]["tools"] == []
     # Deep Agent engine is reported (installed, but "unavailable" on the mock model).
@@ -140,11 +141,72 @@ def test_cross_session_memory(client):
     t1 = client.post("/start", json={"message": "batteries", "user_id": user}).json()["thread_id"]
     for choice in ["proceed", "technical", "executive"]:
         _sse(client, "POST", "/stream", json={"thread_id": t1, "choice": choice})
-    # Session 2: a brand-new thread for the same user recalls prior memory.
+    # Session 2: a brand-new thread for the same user recalls prior memory,
+    # in the background while the first interrupt waits.
     start2 = client.post("/start", json={"message": "solar panels", "user_id": user}).json()
-    assert start2["state"].get("user_memory")
+    t2 = start2["thread_id"]
+    _sse(client, "POST", "/stream", json={"thread_id": t2, "choice": "proceed"})
+    assert client.get(f"/get_state/{t2}").json()["state"].get("user_memory")
 
 
+def test_workflow_recalls_memory_behind_the_first_interrupt():
+    import asyncio
+
+    from langgraph.checkpoint.memory import InMemorySaver
+    from langgraph.store.memory import InMemoryStore
+    from langgraph.types import Command
+
+    from graph import build_research_graph
+    from prefetch import PREFETCHES
+
+    class GatedStore(InMemoryStore):
+        """Searches wait until the test opens the gate."""
+
+        async def abatch(self, ops):
+            ops = list(ops)
+            if any(type(op).__name__ == "SearchOp" for op in ops):
+                self.searching.set()
+                await self.gate.wait()
+            return await super().abatch(ops)
+
+    used = PREFETCHES.value(name="memory", result="used")
+    discarded = PREFETCHES.value(name="memory", result="discarded")
+
+    async def scenario():
+        store = GatedStore()
+        store.gate, store.searching = asyncio.Event(), asyncio.Event()
+        await store.aput(("memories", "ada"), "n1", {"text": "Asked about: batteries"})
+        graph = build_research_graph(checkpointer=InMemorySaver(), store=store)
+        assert "recall_memory" not in graph.nodes
+
+        def run(thread_id):
+            return {"configurable": {"thread_id": thread_id}}
+
+        state = {"messages": [], "user_query": "solar", "user_id": "ada"}
+        # The first interrupt doesn't wait for the (blocked) recall...
+        result = await asyncio.wait_for(graph.ainvoke(state, run("t1")), 5)
+        assert result["__interrupt__"] and result.get("user_memory") is None
+        await asyncio.wait_for(store.searching.wait(), 5)
+        # ...a cancelled run drops its recall...
+        await asyncio.wait_for(graph.ainvoke(state, run("t2")), 5)
+        await graph.ainvoke(Command(resume="cancel"), run("t2"))
+        # ...and query_planner awaits the one started at the interrupt.
+        store.gate.set()
+        await graph.ainvoke(Command(resume="proceed"), run("t1"))
+        recalled = (await graph.aget_state(run("t1"))).values["user_memory"]
+        assert recalled == "- Asked about: batteries"
+
+        # WORKFLOW_PREFETCH=false: recalled in a node before the interrupt.
+        serial = build_research_graph(
+            checkpointer=InMemorySaver(), store=store, prefetch_memory=False
+        )
+        result = await serial.ainvoke(state, run("t3"))
+        assert result["__interrupt__"] and result["user_memory"] == recalled
+
+    asyncio.run(scenario())
+    assert PREFETCHES.value(name="memory", result="used") - used == 1
+    assert PREFETCHES.value(name="memory", result="discarded") - discarded == 1
+
 # --- Feature C: time travel (history + fork) --------------------------------
 def test_history_and_fork(client):
     thread_id = client.post("/start", json={"message": "quantum"}).json()["thread_id"]
@@ -310,6 +372,165 @@ def test_mcp_tools_empty_when_unconfigured():
     assert asyncio.run(load_mcp_tools()) == []
 
 
+# --- Search backends (web_search) ---------------------------------------------
+def test_local_corpus_search_indexes_incrementally(tmp_path, monkeypatch):
+    import json
+    import os
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    from search_backends import LocalCorpusBackend, get_backend
+    from tools import web_search
+
+    corpus = tmp_path / "corpus"
+    (corpus / "guides").mkdir(parents=True)
+    (corpus / "guides" / "batteries.md").write_text(
+        "# Battery recycling\n\nLithium cells are shredded and the metals recovered.\n\n"
+        "## Safety\n\nDischarge packs before transport."
+    )
+    (corpus / "solar.txt").write_text("Solar panels convert sunlight into electricity.")
+    (corpus / "faq.jsonl").write_text(
+        json.dumps({"title": "Heat pumps", "text": "Heat pumps move heat.", "url": "https://x/hp"})
+        + "\nnot json\n"
+    )
+    (corpus / "notes.csv").write_text("ignored")
+
+    backend = LocalCorpusBackend(str(corpus), refresh_interval=0)
+    assert backend.last_report.added == 3 and backend.last_report.passages == 4
+    top = backend.search("how are lithium batteries recycled?", k=2)[0]
+    assert (top.title, top.url) == ("Battery recycling", "guides/batteries.md")
+    assert "Lithium" in top.snippet and top.score > 0
+    assert backend.search("heat pump")[0].url == "https://x/hp"
+    assert backend.search("the of and") == []  # stop words only
+
+    # Only the changed and removed files touch the index.
+    (corpus / "solar.txt").write_text("Solar panels and inverters convert sunlight.")
+    os.utime(corpus / "solar.txt", ns=(1, 1))
+    (corpus / "faq.jsonl").unlink()
+    report = backend.refresh()
+    assert (report.added, report.updated, report.removed) == (0, 1, 1)
+    assert backend.search("heat pump") == []
+    assert "inverters" in backend.search("inverters")[0].snippet
+    assert backend.refresh().passages == 0  # nothing changed
+    backend.close()
+
+    # Reopened, the on-disk index is already current.
+    reopened = LocalCorpusBackend(str(corpus), refresh_interval=0)
+    assert reopened.last_report.added == 0 and reopened.search("sunlight")
+    reopened.close()
+
+    # Once stale, one search re-scans; the others search the index as it stands.
+    shared = LocalCorpusBackend(str(corpus), refresh_interval=60)
+    shared._refreshed_at = 0.0
+    scans, gate, scanning = [], threading.Event(), threading.Event()
+    scan = shared._scan
+
+    def gated_scan():
+        scans.append(1)
+        scanning.set()
+        gate.wait(5)
+        return scan()
+
+    shared._scan = gated_scan
+    with ThreadPoolExecutor(4) as pool:
+        first = pool.submit(shared.search, "sunlight")
+        assert scanning.wait(5)
+        assert all(pool.map(lambda _: shared.search("sunlight"), range(3)))
+        gate.set()
+        assert first.result()
+    assert len(scans) == 1 and not shared._stale()
+    shared.close()
+
+    # The same web_search tool every engine uses.
+    monkeypatch.setenv("SEARCH_CORPUS_DIR", str(corpus))
+    monkeypatch.delenv("TAVILY_API_KEY", raising=False)
+    assert get_backend().name == "local"
+    text = web_search.invoke({"query": "battery safety transport"})
+    assert text.startswith("- Safety") and "guides/batteries.md" in text
+    monkeypatch.setenv("SEARCH_BACKEND", "mock")
+    assert "Overview of 'solar'" in web_search.invoke({"query": "solar"})
+
+
+def test_search_cache_dedups_and_revalidates_in_background(tmp_path, monkeypatch):
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    from metrics import CACHE_REQUESTS
+    from search_backends import MockSearchBackend, SearchBackend, SearchResult
+    from search_cache import SEARCH_CACHE_REVALIDATIONS, SEARCH_CACHE_SAVED, SearchCache, from_env
+
+    class SlowBackend(SearchBackend):
+        name = "slow"
+
+        def __init__(self):
+            self.calls, self.fail = 0, False
+            self._lock = threading.Lock()
+
+        def search(self, query, k=5):
+            time.sleep(0.05)
+            with self._lock:
+                self.calls += 1
+                calls = self.calls
+            if self.fail:
+                raise RuntimeError("backend down")
+            return [SearchResult(f"{query} #{calls}", "snippet", "https://x")]
+
+    backend = SlowBackend()
+    path = str(tmp_path / "search.sqlite")
+    cache = SearchCache(path, ttl=60, stale=0)
+    hits = CACHE_REQUESTS.value(cache="search", result="hit")
+    saved = SEARCH_CACHE_SAVED.value(backend="slow")
+    assert cache.search(backend, "Solar panels")[0].title == "Solar panels #1"
+    assert cache.search(backend, "  solar   PANELS ")[0].title == "Solar panels #1"
+    assert backend.calls == 1 and cache.entries == 1
+    assert SEARCH_CACHE_SAVED.value(backend="slow") - saved >= 0.05
+
+    # Concurrent misses for one query make one backend call (singleflight);
+    # the callers that waited on it saved its time too.
+    saved = SEARCH_CACHE_SAVED.value(backend="slow")
+    with ThreadPoolExecutor(8) as pool:
+        titles = set(pool.map(lambda _: cache.search(backend, "wind")[0].title, range(8)))
+    assert titles == {"wind #2"} and backend.calls == 2
+    assert CACHE_REQUESTS.value(cache="search", result="hit") - hits == 8
+    assert SEARCH_CACHE_SAVED.value(backend="slow") - saved >= 7 * 0.05
+
+    # Failures are raised to every waiter and never cached.
+    backend.fail = True
+    with pytest.raises(RuntimeError):
+        cache.search(backend, "hydro")
+    backend.fail = False
+    cache.close()
+
+    # Reopened with the results stale: served at once, refreshed in the background.
+    stale = SearchCache(path, ttl=0, stale=60)
+    refreshed = SEARCH_CACHE_REVALIDATIONS.value(result="ok")
+    start = time.perf_counter()
+    assert stale.search(backend, "solar panels")[0].title == "Solar panels #1"
+    assert time.perf_counter() - start < 0.05
+    stale.close()  # waits for the refresh
+    assert SEARCH_CACHE_REVALIDATIONS.value(result="ok") - refreshed == 1
+    fresh = SearchCache(path, ttl=60)
+    assert fresh.search(backend, "solar panels")[0].title == "solar panels #4"
+    assert fresh.entries == 2
+    fresh.close()
+
+    # Trimmed to size every size // 10 writes, oldest first.
+    clock = iter(range(1000))
+    small = SearchCache(size=20, ttl=60, clock=lambda: next(clock))
+    for n in range(25):
+        small._put(("slow", f"q{n}", 5), [], 0.0)
+    assert small.entries == 21
+    assert small._get(("slow", "q3", 5)) is None and small._get(("slow", "q4", 5))
+    small.close()
+
+    # Mock results are never cached; SEARCH_CACHE_SIZE=0 turns the cache off.
+    assert isinstance(from_env(MockSearchBackend()), MockSearchBackend)
+    assert from_env(backend).key == "slow"
+    monkeypatch.setenv("SEARCH_CACHE_SIZE", "0")
+    assert from_env(backend) is backend
+
+
 # --- Semantic memory store --------------------------------------------------
 def test_build_store_plain_offline():
     from langgraph.store.memory import InMemoryStore
@@ -322,6 +543,487 @@ def test_build_store_plain_offline():
     assert getattr(store, "index_config", None) is None
 
 
+def test_hashing_embeddings_give_offline_semantic_memory(tmp_path, monkeypatch):
+    import asyncio
+    import subprocess
+    import sys
+
+    import numpy as np
+
+    from hashing_embeddings import HashingEmbeddings
+    from memory import build_store, load_user_memory, save_user_memory
+    from memory_store import SqliteMemoryStore
+    from vector_index import VectorMemoryStore
+
+    notes = ["Asked about: lithium battery recycling", "Asked about: solar panel efficiency"]
+    vectors = np.array(HashingEmbeddings().embed_documents(notes + ["", "batteries"]))
+    assert vectors.shape == (4, 512)
+    assert np.allclose(np.linalg.norm(vectors[[0, 1, 3]], axis=1), 1.0) and not vectors[2].any()
+    assert vectors[3] @ vectors[0] > vectors[3] @ vectors[1]  # "batteries" ~ "battery"
+    # Same vector in another process (str hashes are salted per process; these aren't).
+    code = "from hashing_embeddings import HashingEmbeddings as H; print(H(16).embed_query('sun'))"
+    other = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONHASHSEED": "7"},
+    )
+    assert other.stdout.strip() == str(HashingEmbeddings(16).embed_query("sun"))
+
+    monkeypatch.setenv("EMBEDDINGS_MODEL", "hashing")
+    store = build_store()
+    assert isinstance(store, VectorMemoryStore) and store.index_config["dims"] == 512
+    monkeypatch.setenv("MEMORY_DB", str(tmp_path / "memory.sqlite"))
+    durable = build_store()
+    assert isinstance(durable, SqliteMemoryStore) and durable.vectors is not None
+
+    async def recall(store):
+        for note in notes:
+            await save_user_memory(store, "ada", note)
+        return await load_user_memory(store, "ada", limit=1, query="How are batteries recycled?")
+
+    for s in (store, durable):
+        assert asyncio.run(recall(s)) == f"- {notes[0]}"
+    durable.close()
+
+
+def test_sqlite_memory_store_recalls_by_relevance_and_persists(tmp_path, monkeypatch):
+    import asyncio
+
+    from memory import build_store, load_user_memory, save_user_memory
+    from memory_store import SqliteMemoryStore
+
+    monkeypatch.setenv("MEMORY_DB", str(tmp_path / "memory.sqlite"))
+    notes = [
+        "Asked about: lithium battery recycling",
+        "Prefers executive summaries",
+        "Asked about: solar panel efficiency",
+        "Asked about: batteries for grid storage",
+    ]
+
+    async def scenario():
+        store = build_store()
+        assert isinstance(store, SqliteMemoryStore)
+        for note in notes:
+            await save_user_memory(store, "ada", note)
+        await save_user_memory(store, "bob", "Asked about: battery chemistry")
+        await store.aput(("memories", "ada"), "pref", {"text": "Likes tables", "kind": "pref"})
+        await store.aput(("memories", "ada"), "pref", {"text": "Likes charts", "kind": "pref"})
+
+        recalled = await load_user_memory(store, "ada", query="How do batteries work?")
+        # Porter stemming matches "battery" / "batteries" (the shorter note ranks
+        # first under BM25); bob's note stays out.
+        assert recalled.splitlines() == [
+            "- Asked about: lithium battery recycling",
+            "- Asked about: batteries for grid storage",
+        ]
+        # No query (or only stop words) → newest first; upserts don't duplicate.
+        recent = await store.asearch(("memories", "ada"), query="what is it", limit=2)
+        assert [i.value["text"] for i in recent] == ["Likes charts", notes[-1]]
+        pref = await store.asearch(("memories",), filter={"kind": "pref"})
+        assert [(i.namespace, i.key) for i in pref] == [(("memories", "ada"), "pref")]
+        assert await store.alist_namespaces(prefix=("memories",)) == [
+            ("memories", "ada"),
+            ("memories", "bob"),
+        ]
+        await store.adelete(("memories", "ada"), "pref")
+        store.close()
+
+        reopened = build_store()
+        hits = await reopened.asearch(("memories", "ada"), query="solar", limit=5)
+        assert [i.value["text"] for i in hits] == [notes[2]]
+        assert hits[0].score > 0
+        assert await reopened.aget(("memories", "ada"), "pref") is None
+        assert len(await reopened.asearch(("memories", "ada"), limit=10)) == len(notes)
+
+        # /debug/memory counts from the namespace index, without reading items.
+        from introspection import store_usage
+
+        monkeypatch.setattr(reopened, "asearch", None)
+        usage = await store_usage(reopened)
+        assert usage["items"] == len(notes) + 1
+        assert usage["top_users"][0] == {"user_id": "ada", "items": len(notes)}
+        reopened.close()
+
+    asyncio.run(scenario())
+
+
+def test_memory_db_survives_an_app_restart(tmp_path, monkeypatch):
+    monkeypatch.setenv("MEMORY_DB", str(tmp_path / "memory.sqlite"))
+    user = "restart-user"
+    with TestClient(app) as first:
+        t1 = first.post("/start", json={"message": "batteries", "user_id": user}).json()
+        for choice in ["proceed", "technical", "executive"]:
+            _sse(first, "POST", "/stream", json={"thread_id": t1["thread_id"], "choice": choice})
+    with TestClient(app) as second:
+        t2 = second.post("/start", json={"message": "batteries again", "user_id": user}).json()
+        _sse(second, "POST", "/stream", json={"thread_id": t2["thread_id"], "choice": "proceed"})
+        state = second.get(f"/get_state/{t2['thread_id']}").json()["state"]
+        assert "batteries" in state.get("user_memory", "")
+
+
+def _word_embeddings():
+    from langchain_core.embeddings import Embeddings
+
+    class WordEmbeddings(Embeddings):
+        """Bag of words over a tiny vocabulary: semantic ranking, offline."""
+
+        vocab = ("battery", "solar", "wind", "chart", "table", "grid")
+
+        def _embed(self, text):
+            text = text.lower()
+            return [float(text.count(word)) for word in self.vocab]
+
+        def embed_documents(self, texts):
+            return [self._embed(t) for t in texts]
+
+        def embed_query(self, text):
+            return self._embed(text)
+
+    return WordEmbeddings()
+
+
+def test_vector_index_matches_brute_force_through_tombstones_and_compaction():
+    import numpy as np
+
+    from vector_index import VECTOR_COMPACTIONS, VectorIndex
+
+    rng = np.random.default_rng(3)
+    index = VectorIndex(8, min_compact=8)
+    current = {}
+    before = VECTOR_COMPACTIONS.value()
+    for i in range(60):
+        current[f"k{i}"] = rng.normal(size=(1, 8))
+        index.add(f"k{i}", current[f"k{i}"])
+    for i in range(0, 30, 3):  # re-put: old rows become tombstones
+        current[f"k{i}"] = rng.normal(size=(1, 8))
+        index.add(f"k{i}", current[f"k{i}"])
+    for i in range(1, 30, 3):
+        del current[f"k{i}"]
+        index.remove(f"k{i}")
+    assert VECTOR_COMPACTIONS.value() > before
+    assert len(index) == len(current) and index.dead <= 0.25 * index._size
+
+    query = rng.normal(size=8).astype(np.float32)
+    query /= np.linalg.norm(query)
+    expected = sorted(
+        current,
+        key=lambda k: -float(current[k][0] @ query / np.linalg.norm(current[k][0])),
+    )[:5]
+    assert [key for key, _ in index.search(query, 5)] == expected
+
+
+def test_vector_index_file_is_shared_and_survives_compaction(tmp_path):
+    import numpy as np
+
+    from vector_index import VectorIndex
+
+    path = str(tmp_path / "ns")
+    writer = VectorIndex(3, path=path, min_compact=2)
+    reader = VectorIndex(3, path=path)  # e.g. another worker
+    writer.add("a", [[1, 0, 0]])
+    writer.add("b", [[0, 1, 0]])
+    assert [k for k, _ in reader.search(np.array([0, 1, 0], np.float32), 1)] == ["b"]
+    assert isinstance(reader._matrix, np.memmap)
+
+    writer.add("b", [[0, 0, 1]])
+    writer.add("c", [[0, 1, 0]])
+    writer.remove("a")  # 2 dead of 4 rows → compacted into fresh files
+    assert writer.dead == 0
+    query = np.array([0, 1, 0], np.float32)
+    assert [k for k, _ in reader.search(query, 3)] == ["c", "b"]
+    assert [k for k, _ in VectorIndex(3, path=path).search(query, 3)] == ["c", "b"]
+
+
+def test_semantic_stores_recall_from_the_vector_index(tmp_path):
+    import asyncio
+
+    from memory_store import SqliteMemoryStore
+    from vector_index import VectorMemoryStore
+
+    index = {"dims": 6, "embed": _word_embeddings(), "fields": ["text"]}
+    notes = {
+        "n1": "Asked about: battery chemistry",
+        "n2": "Asked about: solar farms",
+        "n3": "Likes a table over a chart",
+        "n4": "Asked about: wind and the grid",
+    }
+
+    async def check(store):
+        for key, text in notes.items():
+            await store.aput(("memories", "ada"), key, {"text": text, "n": int(key[1])})
+        await store.aput(("memories", "bob"), "x", {"text": "solar battery"})
+        hits = await store.asearch(("memories", "ada"), query="solar panels", limit=2)
+        assert hits[0].key == "n2" and hits[0].score > 0.99
+        hits = await store.asearch(("memories",), query="solar", limit=2)
+        assert [(h.namespace[1], h.key) for h in hits] == [("ada", "n2"), ("bob", "x")]
+        hits = await store.asearch(("memories", "ada"), query="grid", filter={"n": {"$lt": 4}})
+        assert "n4" not in [h.key for h in hits]
+        await store.adelete(("memories", "ada"), "n2")
+        hits = await store.asearch(("memories", "ada"), query="solar", limit=1)
+        assert hits and hits[0].key != "n2"
+
+    asyncio.run(check(VectorMemoryStore(index=index)))
+    path = str(tmp_path / "memory.sqlite")
+    store = SqliteMemoryStore(path, index=index)
+    asyncio.run(check(store))
+    store.close()
+    reopened = SqliteMemoryStore(path, index=index)
+    hits = reopened.search(("memories", "ada"), query="battery", limit=1)
+    assert hits[0].key == "n1"
+    reopened.close()
+
+
+def test_cached_embeddings_coalesce_concurrent_texts_and_persist(tmp_path):
+    import asyncio
+
+    from embedding_cache import EMBEDDING_CALLS, CachedEmbeddings, SqliteEmbeddingCache
+    from metrics import CACHE_REQUESTS
+
+    inner = _word_embeddings()
+    calls = []
+    embed_documents = inner.embed_documents
+    inner.embed_documents = lambda texts: calls.append(list(texts)) or embed_documents(texts)
+    path = str(tmp_path / "embeddings.sqlite")
+    cached = CachedEmbeddings(inner, model="words", cache=SqliteEmbeddingCache(path), window=0.01)
+    hits = CACHE_REQUESTS.value(cache="embedding", result="hit")
+    notes = ["solar farms", "battery chemistry", "solar farms", "wind grid"]
+
+    async def save_concurrently(embeddings):
+        return await asyncio.gather(*(embeddings.aembed_documents([n]) for n in notes))
+
+    vectors = asyncio.run(save_concurrently(cached))
+    # One model call for the window; the repeated note rode along with the first.
+    assert calls == [["solar farms", "battery chemistry", "wind grid"]]
+    assert vectors[0] == vectors[2] == [[0.0, 1.0, 0.0, 0.0, 0.0, 0.0]]
+    assert CACHE_REQUESTS.value(cache="embedding", result="hit") - hits == 1
+    cached.close()
+
+    # Another worker (or a restart) sharing the file embeds nothing again.
+    reopened = CachedEmbeddings(inner, model="words", cache=SqliteEmbeddingCache(path))
+    assert asyncio.run(reopened.aembed_documents(["wind grid"])) == [[0, 0, 1, 0, 0, 1]]
+    assert reopened.embed_documents(["battery chemistry"]) == [[1, 0, 0, 0, 0, 0]]
+    assert len(calls) == 1
+    # Queries are keyed apart from documents; a full batch doesn't wait.
+    queries = EMBEDDING_CALLS.value(kind="query")
+    assert reopened.embed_query("solar farms") == [0, 1, 0, 0, 0, 0]
+    assert EMBEDDING_CALLS.value(kind="query") - queries == 1
+    reopened.close()
+    batched = CachedEmbeddings(inner, window=60, max_batch=2)
+    notes = ["solar", "wind", "grid", "table"]
+    asyncio.run(save_concurrently(batched))
+    assert calls[1:] == [["solar", "wind"], ["grid", "table"]]
+
+    # Trimmed by id range once a tenth over size, without counting rows.
+    small = SqliteEmbeddingCache(str(tmp_path / "small.sqlite"), size=10)
+    for i in range(11):
+        small.put_many({bytes([i]): [float(i)]})
+    assert len(small) == 11
+    small.put_many({bytes([11]): [11.0]})
+    assert len(small) == 10 and small.get_many([bytes([1]), bytes([2])]) == {bytes([2]): [2.0]}
+    small.close()
+
+
+def test_write_behind_store_batches_retries_and_reads_its_writes():
+    import asyncio
+
+    from langgraph.store.memory import InMemoryStore
+
+    from write_behind import WRITE_BEHIND_WRITES, WriteBehindStore
+
+    class FlakyStore(InMemoryStore):
+        def __init__(self):
+            super().__init__()
+            self.batches, self.failures = [], 0
+
+        async def abatch(self, ops):
+            ops = list(ops)
+            if any(getattr(op, "value", None) == {"text": "poison"} for op in ops):
+                raise ValueError("bad value")
+            if any(type(op).__name__ == "PutOp" for op in ops):
+                if self.failures:
+                    self.failures -= 1
+                    raise ConnectionError("store unavailable")
+                self.batches.append(len(ops))
+            return await super().abatch(ops)
+
+    inner = FlakyStore()
+    store = WriteBehindStore(inner, linger=0.01, backoff=0, max_pending=3)
+    dropped = WRITE_BEHIND_WRITES.value(result="dropped")
+
+    async def scenario():
+        for i in range(3):
+            await store.aput(("memories", "ada"), f"n{i}", {"text": f"note {i}"})
+        await store.aput(("memories", "ada"), "n0", {"text": "note 0, edited"})
+        assert inner.batches == []  # queued, not written
+        # Reading the user's memory waits for their queued writes.
+        hits = await store.asearch(("memories", "ada"))
+        assert inner.batches == [3]  # one batch; the edit replaced the queued n0
+        assert sorted(h.value["text"] for h in hits) == ["note 0, edited", "note 1", "note 2"]
+
+        # A full queue makes the next put wait for room instead of growing.
+        inner.failures = 2
+        for i in range(5):
+            await store.aput(("memories", "bob"), f"m{i}", {"text": "x"})
+        await store.aput(("memories", "bob"), "bad", {"text": "poison"})
+        await store.stop()  # flushes: retried through the failures, poison dropped alone
+        assert await store.aget(("memories", "bob"), "bad") is None
+        assert len(await store.asearch(("memories", "bob"), limit=10)) == 5
+        assert store.pending == 0
+
+    asyncio.run(scenario())
+    assert WRITE_BEHIND_WRITES.value(result="dropped") - dropped == 1
+
+
+def test_recall_cache_serves_repeats_until_the_user_writes(monkeypatch):
+    import asyncio
+
+    from langgraph.store.memory import InMemoryStore
+
+    import recall_cache
+    from memory import load_user_memory, save_user_memory
+    from metrics import CACHE_REQUESTS
+    from recall_cache import RecallCacheStore
+    from write_behind import WriteBehindStore
+
+    class SpyStore(InMemoryStore):
+        searches = 0
+        gate = None  # holds searches back while set
+
+        async def abatch(self, ops):
+            ops = list(ops)
+            found = sum(type(op).__name__ == "SearchOp" for op in ops)
+            SpyStore.searches += found
+            if found and SpyStore.gate is not None:
+                await SpyStore.gate.wait()
+            return await super().abatch(ops)
+
+    cache = RecallCacheStore(SpyStore(), size=2, ttl=60)
+    store = WriteBehindStore(cache, linger=0.01)
+    hits = CACHE_REQUESTS.value(cache="recall", result="hit")
+
+    async def scenario():
+        await save_user_memory(store, "ada", "Asked about: solar panels")
+        assert await load_user_memory(store, "ada", query="Solar  panels") == (
+            "- Asked about: solar panels"
+        )
+        await load_user_memory(store, "ada", query="solar panels")  # same normalised key
+        assert SpyStore.searches == 1
+        await load_user_memory(store, "ada", query="solar panels", limit=2)  # other limit
+        await load_user_memory(store, "bob", query="solar panels")
+        assert SpyStore.searches == 3 and cache.entries == 2  # bounded: LRU entry dropped
+
+        # A write to ada's namespace (here through the write-behind queue)
+        # drops ada's entries; bob's stay.
+        await save_user_memory(store, "ada", "Asked about: heat pumps")
+        memory = await load_user_memory(store, "ada", query="solar panels", limit=2)
+        assert "heat pumps" in memory and SpyStore.searches == 4
+        await load_user_memory(store, "bob", query="solar panels")
+        assert SpyStore.searches == 4
+
+        # Entries expire after the TTL.
+        now = recall_cache.time.monotonic()
+        monkeypatch.setattr(recall_cache.time, "monotonic", lambda: now + 61)
+        await load_user_memory(store, "bob", query="solar panels")
+        assert SpyStore.searches == 5
+
+        # A search that a write overlaps isn't cached; once no search of a
+        # namespace is in flight, nothing is kept for it.
+        SpyStore.gate = asyncio.Event()
+        search = asyncio.create_task(load_user_memory(cache, "cy", query="tides"))
+        while SpyStore.searches < 6:  # the clock is frozen above: no sleeping
+            await asyncio.sleep(0)
+        assert set(cache._generations) == {("memories", "cy")}
+        await cache.aput(("memories", "cy"), "n1", {"text": "Asked about: tides"})
+        SpyStore.gate.set()
+        await search
+        assert not cache._generations and not cache._reading
+        await load_user_memory(cache, "cy", query="tides")
+        assert SpyStore.searches == 7  # the overlapped result wasn't cached
+        await store.stop()
+
+    asyncio.run(scenario())
+    assert CACHE_REQUESTS.value(cache="recall", result="hit") - hits == 2
+    monkeypatch.setenv("MEMORY_RECALL_CACHE_SIZE", "0")
+    assert isinstance(recall_cache.from_env(InMemoryStore()), InMemoryStore)
+
+def test_consolidation_dedupes_caps_and_summarises_incrementally():
+    import asyncio
+
+    from langgraph.store.memory import InMemoryStore
+
+    from consolidation import ConsolidationPolicy, MemoryConsolidator
+    from memory import add_save_hook, load_user_memory, remove_save_hook, save_user_memory
+
+    searches = []
+
+    class SpyStore(InMemoryStore):
+        async def abatch(self, ops):
+            ops = list(ops)
+            searches.extend(op for op in ops if type(op).__name__ == "SearchOp")
+            return await super().abatch(ops)
+
+    store = SpyStore()
+    consolidator = MemoryConsolidator(store, ConsolidationPolicy(max_notes=3))
+
+    async def scenario():
+        # Saved before consolidation was on: picked up by a one-time scan.
+        await store.aput(("memories", "ada"), "old", {"text": "Asked about: wind turbines"})
+        await store.aput(("memories", "ada"), "pref", {"text": "Likes tables", "kind": "pref"})
+        add_save_hook(consolidator.saved)
+        try:
+            for topic in ("solar panels", "Solar panels?", "grid storage"):
+                await save_user_memory(store, "ada", f"Asked about: {topic}")
+            report = await consolidator.run_once()
+            assert (report.kept, report.deduplicated, report.folded) == (3, 1, 0)
+            assert len(searches) == 1
+
+            for topic in ("tidal power (preferred format: executive)", "heat pumps"):
+                await save_user_memory(store, "ada", f"Asked about: {topic}")
+            report = await consolidator.run_once()
+        finally:
+            remove_save_hook(consolidator.saved)
+        assert (report.kept, report.deduplicated, report.folded) == (2, 0, 2)
+        assert len(searches) == 1  # incremental: no rescan of ada's history
+        items = await store.asearch(("memories", "ada"), limit=20)
+        texts = sorted(i.value["text"] for i in items)
+        assert texts == [
+            "Asked about: grid storage",
+            "Asked about: heat pumps",
+            "Asked about: tidal power (preferred format: executive)",
+            "Earlier topics: wind turbines; Solar panels?.",
+            "Likes tables",
+        ]
+        # The next fold extends the same summary memory.
+        await consolidator.consolidate(
+            "ada", [("n9", "Asked about: fusion"), ("n10", "Asked about: geothermal")]
+        )
+        summary = await store.aget(("memories", "ada"), "summary")
+        assert summary.value["text"] == (
+            "Earlier topics: wind turbines; Solar panels?; grid storage; tidal power. "
+            "Preferred formats: executive (1)."
+        )
+        assert "Earlier topics" in await load_user_memory(store, "ada", limit=10)
+
+    asyncio.run(scenario())
+
+
+def test_consolidation_endpoint_reports_a_pass(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    headers = {"Authorization": "Bearer s3cret"}
+    with TestClient(app) as client:
+        for _ in range(2):
+            thread_id = client.post(
+                "/start", json={"message": "tidal power", "user_id": "tide-user"}
+            ).json()["thread_id"]
+            for choice in ["proceed", "technical", "executive"]:
+                _sse(client, "POST", "/stream", json={"thread_id": thread_id, "choice": choice})
+        report = client.post("/debug/memory/consolidate", headers=headers).json()
+        assert report["users"] >= 1 and report["deduplicated"] >= 1
+        assert client.post("/debug/memory/consolidate").status_code == 401
+
+
 # --- Structured output (opt-in) ---------------------------------------------
 def test_structured_agent_builds():
     from agent import ResearchSummary, build_agent
@@ -424,10 +1126,48 @@ def test_agui_capability_and_endpoint(client):
         assert client.get(caps["agui"]["path"]).status_code == 405
 
 
+def test_agui_builds_agent_on_first_run(monkeypatch):
+    import agui
+
+    if not agui.AGUI_AVAILABLE:
+        pytest.skip("ag-ui-langgraph not installed")
+    from fastapi import FastAPI
+
+    built = []
+
+    class FakeAgent:
+        def clone(self):
+            return self
+
+        async def run(self, input_data):
+            for _ in ():
+                yield
+
+    def build(self):
+        built.append(self)
+        return FakeAgent()
+
+    monkeypatch.setattr(agui._LazyAgent, "_build", build)
+    app = FastAPI()
+    assert agui.mount_agui(app) is True
+    with TestClient(app) as c:
+        assert c.get(agui.AGUI_PATH + "/health").status_code == 200
+        assert c.post(agui.AGUI_PATH, json={"bogus": 1}).status_code == 422
+        assert built == []  # mounting, health and a bad request build nothing
+        body = {
+            "threadId": "t", "runId": "r", "state": {}, "messages": [],
+            "tools": [], "context": [], "forwardedProps": {},
+        }
+        for _ in range(2):
+            assert c.post(agui.AGUI_PATH, json=body).status_code == 200
+    assert len(built) == 1
+
+
 def test_agui_graceful_without_package(monkeypatch):
     """The app boots and legacy endpoints work even if ag-ui-langgraph is absent."""
     import builtins
     import importlib
+    import importlib.util
     import sys
 
     real_import = builtins.__import__
@@ -437,7 +1177,15 @@ def test_agui_graceful_without_package(monkeypatch):
             raise ImportError("simulated missing ag-ui-langgraph")
         return real_import(name, *a, **k)
 
+    real_find_spec = importlib.util.find_spec
+
+    def fake_find_spec(name, *a, **k):
+        if name.startswith("ag_ui"):
+            return None
+        return real_find_spec(name, *a, **k)
+
     monkeypatch.setattr(builtins, "__import__", fake_import)
+    monkeypatch.setattr(importlib.util, "find_spec", fake_find_spec)
     for mod in ("agui", "main"):
         sys.modules.pop(mod, None)
     agui = importlib.import_module("agui")
@@ -452,5 +1200,964 @@ def test_agui_graceful_without_package(monkeypatch):
         sys.modules.pop(mod, None)
 
 
+# --- Checkpointer layers ------------------------------------------------------
+def test_cached_saver_serves_polls_and_invalidates_on_write():
+    import asyncio
+
+    from langgraph.checkpoint.memory import MemorySaver
+
+    from checkpointing import CachedSaver, DelegatingSaver
+    from graph import build_research_graph
+
+    class ReadCounter(DelegatingSaver):
+        reads = 0
+
+        async def aget_tuple(self, config):
+            self.reads += 1
+            return await self.inner.aget_tuple(config)
+
+    counting = ReadCounter(MemorySaver())
+    saver = CachedSaver(counting, maxsize=8)
+    graph = build_research_graph(checkpointer=saver)
+    config = {"configurable": {"thread_id": "cache-1"}}
+
+    async def run():
+        await graph.ainvoke({"user_query": "cache", "messages": []}, config)
+        before = counting.reads
+        states = [await graph.aget_state(config) for _ in range(10)]
+        assert counting.reads - before == 1  # one miss, then served from memory
+        assert all(s.next == states[0].next for s in states)
+
+        from langgraph.types import Command
+
+        await graph.ainvoke(Command(resume="proceed"), config)
+        after = await graph.aget_state(config)
+        assert after.next != states[0].next  # the write invalidated the entry
+
+    asyncio.run(run())
+
+
+def test_compact_serializer_compresses_and_reads_old_checkpoints(monkeypatch, caplog):
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+    from benchmarks.serializer import research_checkpoint
+    from serialization import CompactSerializer
+
+    checkpoint = research_checkpoint(turns=20)
+    plain = JsonPlusSerializer().dumps_typed(checkpoint)
+    compact = CompactSerializer("zlib", min_bytes=1024)
+
+    type_, data = compact.dumps_typed(checkpoint)
+    assert type_ == "msgpack.zlib" and len(data) * 2 < len(plain[1])
+    assert compact.loads_typed((type_, data)) == checkpoint
+    # Checkpoints written before compression was enabled still load.
+    assert compact.loads_typed(plain) == checkpoint
+    # Small writes skip compression; codec=None still reads compressed data.
+    assert compact.dumps_typed("short")[0] == "msgpack"
+    assert CompactSerializer(None).loads_typed((type_, data)) == checkpoint
+    # Savers can still derive a strict msgpack allowlist from it.
+    assert isinstance(compact.with_msgpack_allowlist([("graph", "X")]), CompactSerializer)
+    # A malformed level falls back to the codec's default instead of failing startup.
+    monkeypatch.setenv("CHECKPOINT_COMPRESSION", "zlib")
+    monkeypatch.setenv("CHECKPOINT_COMPRESS_LEVEL", "fast")
+    assert CompactSerializer.from_env().dumps_typed(checkpoint) == (type_, data)
+    assert "Invalid CHECKPOINT_COMPRESS_LEVEL 'fast'" in caplog.text
+
+
+def test_retention_prunes_sqlite_but_keeps_interrupt_checkpoints(tmp_path, monkeypatch):
+    import sqlite3
+
+    monkeypatch.setenv("CHECKPOINT_DB", str(tmp_path / "checkpoints.sqlite"))
+    monkeypatch.setenv("CHECKPOINT_KEEP_LAST", "2")
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    headers = {"Authorization": "Bearer s3cret"}
+    with TestClient(app) as client:
+        thread_id = client.post("/start", json={"message": "prune"}).json()["thread_id"]
+        _sse(client, "POST", "/stream", json={"thread_id": thread_id, "choice": "proceed"})
+        before = client.get(f"/history/{thread_id}").json()["checkpoints"]
+        # Checkpoints a run actually paused at (interrupt() writes against them).
+        with sqlite3.connect(tmp_path / "checkpoints.sqlite") as db:
+            interrupts = {
+                row[0]
+                for row in db.execute(
+                    "SELECT checkpoint_id FROM writes WHERE channel = '__interrupt__'"
+                )
+            }
+        assert len(interrupts) == 2  # the clarification and the format choice
+
+        report = client.post("/debug/retention", headers=headers).json()
+        assert report["threads_scanned"] >= 1 and report["threads_expired"] == 0
+        assert report["checkpoints_deleted"] > 0 and report["bytes_reclaimed"] >= 0
+
+        after = client.get(f"/history/{thread_id}").json()["checkpoints"]
+        assert len(after) < len(before)
+        assert interrupts <= {c["checkpoint_id"] for c in after}
+        # The thread still resumes, and pruned history can still be forked.
+        events = _sse(
+            client,
+            "POST",
+            "/fork",
+            json={"thread_id": thread_id, "checkpoint_id": min(interrupts), "choice": "simplified"},
+        )
+        assert any(e.get("type") == "state" for e in events)
+
+
+def test_retention_expires_idle_threads_through_the_saver_stack(tmp_path):
+    import asyncio
+    import time
+
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    from checkpointing import CachedSaver
+    from graph import build_research_graph
+    from retention import RetentionPolicy, SqliteRetention, checkpoint_time
+
+    async def run():
+        async with AsyncSqliteSaver.from_conn_string(str(tmp_path / "ttl.sqlite")) as sqlite:
+            saver = CachedSaver(sqlite, maxsize=8)
+            graph = build_research_graph(checkpointer=saver)
+            config = {"configurable": {"thread_id": "idle"}}
+            await graph.ainvoke({"user_query": "ttl", "messages": []}, config)
+            state = await graph.aget_state(config)  # now cached
+            stamp = checkpoint_time(state.config["configurable"]["checkpoint_id"])
+            assert abs(stamp - time.time()) < 60
+
+            retention = SqliteRetention(saver, RetentionPolicy(ttl_seconds=3600))
+            assert (await retention.run_once()).threads_expired == 0
+            report = await retention.run_once(now=time.time() + 7200)
+            assert report.expired == ["idle"]
+            assert (await graph.aget_state(config)).values == {}
+
+            # An older file is only rewritten by VACUUM when that is opted into.
+            async with sqlite.conn.execute("PRAGMA auto_vacuum") as cur:
+                assert (await cur.fetchone())[0] == 0
+            await SqliteRetention(saver, RetentionPolicy(ttl_seconds=3600, vacuum=True)).run_once()
+            async with sqlite.conn.execute("PRAGMA auto_vacuum") as cur:
+                assert (await cur.fetchone())[0] == 2
+
+    asyncio.run(run())
+
+
+def _long_thread(graph, config, turns):
+    from langgraph.types import Command
+
+    async def run():
+        for turn in range(turns):
+            query = f"question {turn}"
+            await graph.ainvoke({"user_query": query, "messages": [("user", query)]}, config)
+            for choice in ["proceed", "technical", "executive"]:
+                await graph.ainvoke(Command(resume=choice), config)
+        return await graph.aget_state(config)
+
+    return run()
+
+
+def test_delta_checkpoints_rebuild_state_and_survive_retention(tmp_path):
+    import asyncio
+
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    from langgraph.types import Command
+
+    from graph import build_research_graph
+    from retention import RetentionPolicy, SqliteRetention
+
+    def comparable(values):
+        return [m.content for m in values["messages"]], values["research_results"]
+
+    async def run():
+        async with aiosqlite.connect(tmp_path / "delta.sqlite") as conn:
+            saver = AsyncSqliteSaver(conn)
+            full = build_research_graph(checkpointer=saver)
+            delta = build_research_graph(checkpointer=saver, delta_snapshot_every=3)
+            full_cfg = {"configurable": {"thread_id": "full"}}
+            delta_cfg = {"configurable": {"thread_id": "delta"}}
+            expected = await _long_thread(full, full_cfg, turns=3)
+            state = await _long_thread(delta, delta_cfg, turns=3)
+            assert comparable(state.values) == comparable(expected.values)
+
+            async with conn.execute(
+                "SELECT thread_id, SUM(LENGTH(checkpoint)) FROM checkpoints GROUP BY thread_id"
+            ) as cur:
+                sizes = dict(await cur.fetchall())
+            assert sizes["delta"] < sizes["full"]
+
+            # Prune hard: the latest state and the interrupt checkpoints must
+            # still rebuild from what is left, and forking still works.
+            retention = SqliteRetention(saver, RetentionPolicy(keep_last=1))
+            assert (await retention.run_once()).checkpoints_deleted > 0
+            after = await delta.aget_state(delta_cfg)
+            assert comparable(after.values) == comparable(expected.values)
+            paused = [s async for s in delta.aget_state_history(delta_cfg) if s.interrupts]
+            assert len(paused) == 9  # three interrupts per turn
+            earliest = paused[-1]
+            assert [m.content for m in earliest.values["messages"]] == ["question 0"]
+            forked = await delta.ainvoke(Command(resume="simplified"), earliest.config)
+            assert forked["__interrupt__"]
+
+    asyncio.run(run())
+
+
+def test_blob_offload_dedups_forks_and_keeps_history_lazy(tmp_path):
+    import asyncio
+
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    from langgraph.types import Command
+
+    from blobs import BlobOffloadSaver, is_blob_ref
+    from graph import build_research_graph
+    from retention import RetentionPolicy, SqliteRetention
+
+    async def run():
+        async with aiosqlite.connect(tmp_path / "blobs.sqlite") as conn:
+            saver = BlobOffloadSaver(AsyncSqliteSaver(conn), min_bytes=128)
+            graph = build_research_graph(checkpointer=saver)
+            config = {"configurable": {"thread_id": "blobby"}}
+            await graph.ainvoke({"user_query": "blobs", "messages": []}, config)
+            for choice in ["proceed", "technical", "executive"]:
+                await graph.ainvoke(Command(resume=choice), config)
+
+            # Reads resolve references; listing history leaves them in place.
+            state = await graph.aget_state(config)
+            assert state.values["final_response"].startswith("Here is a clear")
+            history = [s async for s in graph.aget_state_history(config)]
+            assert is_blob_ref(history[0].values["final_response"])
+            resolved = await saver.aresolve(history[0].values)
+            assert resolved["final_response"] == state.values["final_response"]
+
+            # Forks share ancestry: their big values point at the same blobs.
+            paused = [s for s in history if s.interrupts]
+            before = await saver.store.astats()
+            await graph.ainvoke(Command(resume="simplified"), paused[0].config)
+            after = await saver.store.astats()
+            assert after["references"] > before["references"]
+            assert after["blobs"] == before["blobs"] and after["dedup_ratio"] > 1
+
+            # Deleting the thread lets retention collect the orphaned bodies.
+            await saver.adelete_thread("blobby")
+            report = await SqliteRetention(saver, RetentionPolicy(keep_last=5)).run_once()
+            assert report.blobs_deleted == after["blobs"]
+
+    asyncio.run(run())
+
+
+def test_blob_offload_covers_pending_writes_and_frees_dropped_threads(monkeypatch):
+    import asyncio
+
+    from langgraph.types import Command
+
+    from blobs import BlobOffloadSaver, references
+    from bounded_memory import BoundedMemorySaver
+    from checkpointing import find_layer, wrap_saver
+    from graph import build_research_graph
+
+    monkeypatch.setenv("CHECKPOINT_BLOB_MIN_BYTES", "128")
+    backing = BoundedMemorySaver(max_threads=1)
+    saver = wrap_saver(backing)
+    store = find_layer(saver, BlobOffloadSaver).store
+    graph = build_research_graph(checkpointer=saver)
+
+    async def run(thread_id):
+        config = {"configurable": {"thread_id": thread_id}}
+        await graph.ainvoke({"user_query": thread_id, "messages": []}, config)
+        for choice in ["proceed", "technical", "executive"]:
+            await graph.ainvoke(Command(resume=choice), config)
+        return (await graph.aget_state(config)).values
+
+    assert asyncio.run(run("big"))["final_response"].startswith("Here is a clear")
+    written = [
+        backing.serde.loads_typed(typed)
+        for entries in backing.writes.values()
+        for _task, _channel, typed, _path in entries.values()
+    ]
+    assert any(references(value) for value in written)  # node outputs offloaded too
+    assert store.stats()["blobs"] > 0
+
+    asyncio.run(run("other"))  # evicts "big" (max_threads=1, no spill file)
+    saver.delete_thread("other")
+    assert store.stats()["blobs"] == 0  # both threads' bodies freed, no collect()
+
+
+def test_blob_offload_through_the_app(monkeypatch):
+    monkeypatch.setenv("CHECKPOINT_BLOB_MIN_BYTES", "128")
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    with TestClient(app) as client:
+        thread_id = client.post("/start", json={"message": "offload"}).json()["thread_id"]
+        for choice in ["proceed", "technical", "executive"]:
+            _sse(client, "POST", "/stream", json={"thread_id": thread_id, "choice": choice})
+        state = client.get(f"/get_state/{thread_id}").json()["state"]
+        assert state["final_response"].startswith("Here is a clear")
+        assert client.get(f"/history/{thread_id}").json()["checkpoints"]
+        usage = client.get(
+            "/debug/memory", headers={"Authorization": "Bearer s3cret"}
+        ).json()["checkpoints"]
+        assert usage["offloaded_blobs"]["references"] > usage["offloaded_blobs"]["blobs"] > 0
+
+
+def test_durability_policy_resolves_engine_and_endpoint_overrides(monkeypatch):
+    from durability import DurabilityPolicy
+
+    monkeypatch.setenv("CHECKPOINT_DURABILITY", "sync")
+    monkeypatch.setenv("CHECKPOINT_DURABILITY_WORKFLOW", "exit")
+    monkeypatch.setenv("CHECKPOINT_DURABILITY_AGENT", "bogus")
+    monkeypatch.setenv("CHECKPOINT_DURABILITY_ENDPOINTS", "/fork=async, /x=nope")
+    policy = DurabilityPolicy.from_env()
+    assert policy.mode("workflow", "/start") == "exit"
+    assert policy.mode("workflow", "/fork") == "async"
+    assert policy.mode("agent", "/agent/start") == "sync"  # invalid value ignored
+
+
+def test_exit_durability_coalesces_checkpoints_to_interrupts(monkeypatch):
+    monkeypatch.setenv("CHECKPOINT_DURABILITY_WORKFLOW", "exit")
+    with TestClient(app) as client:
+        thread_id = client.post("/start", json={"message": "coalesce"}).json()["thread_id"]
+        for choice in ["proceed", "technical", "executive"]:
+            client.post("/resume", json={"thread_id": thread_id, "choice": choice})
+        state = client.get(f"/get_state/{thread_id}").json()["state"]
+        assert state["final_response"].startswith("Here is a clear")
+
+        # One checkpoint per pause plus the final one, and forking still works.
+        history = client.get(f"/history/{thread_id}").json()["checkpoints"]
+        assert len(history) == 4
+        events = _sse(
+            client,
+            "POST",
+            "/fork",
+            json={
+                "thread_id": thread_id,
+                "checkpoint_id": history[-1]["checkpoint_id"],
+                "choice": "simplified",
+            },
+        )
+        assert any(e.get("type") == "state" for e in events)
+
+
+@pytest.mark.parametrize("mode", ["sync", "async", "exit"])
+def test_thread_recovers_after_crash_mid_run(mode, monkeypatch):
+    import asyncio
+
+    from langgraph.checkpoint.memory import MemorySaver
+    from langgraph.types import Command
+
+    import graph as graph_module
+    from checkpointing import DelegatingSaver
+
+    class PowerCut(DelegatingSaver):
+        """Stops persisting once ``cut`` is set, like a process killed mid-run."""
+
+        cut = False
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            if self.cut:
+                return config
+            return await self.inner.aput(config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes, task_id, task_path=""):
+            if not self.cut:
+                await self.inner.aput_writes(config, writes, task_id, task_path)
+
+    disk = MemorySaver()
+    saver = PowerCut(disk)
+    format_node = graph_module.format_selection_interrupt
+
+    async def crashing_node(state):
+        saver.cut = True
+        raise RuntimeError("killed")
+
+    config = {"configurable": {"thread_id": "crashy"}}
+
+    async def run():
+        monkeypatch.setattr(graph_module, "format_selection_interrupt", crashing_node)
+        crashing = graph_module.build_research_graph(checkpointer=saver)
+        await crashing.ainvoke({"user_query": "crash", "messages": []}, config, durability=mode)
+        await crashing.ainvoke(Command(resume="proceed"), config, durability=mode)
+        paused = await crashing.aget_state(config)
+        with pytest.raises(RuntimeError):
+            await crashing.ainvoke(Command(resume="technical"), config, durability=mode)
+
+        # "Restart": a fresh graph over whatever reached the disk.
+        monkeypatch.setattr(graph_module, "format_selection_interrupt", format_node)
+        restarted = graph_module.build_research_graph(checkpointer=disk)
+        recovered = await restarted.aget_state(config)
+        if mode == "exit":
+            assert recovered.config == paused.config
+        elif mode == "sync":
+            assert recovered.next == ("format_selection_interrupt",)
+        await restarted.ainvoke(
+            Command(resume="technical") if recovered.interrupts else None, config, durability=mode
+        )
+        await restarted.ainvoke(Command(resume="executive"), config, durability=mode)
+        final = await restarted.aget_state(config)
+        assert final.values["final_response"].startswith("Here is a clear")
+
+    asyncio.run(run())
+
+
+def test_sharded_blob_store_copies_threads_across_shards(tmp_path, monkeypatch):
+    import asyncio
+
+    from langgraph.types import Command
+
+    from blobs import BlobOffloadSaver, ShardedBlobStore
+    from checkpointing import find_layer, open_checkpointer
+    from graph import build_research_graph
+    from sharding import ShardedSqliteSaver, shard_index
+
+    async def run():
+        async with ShardedSqliteSaver.open(str(tmp_path / "cp.sqlite"), 3) as saver:
+            store = ShardedBlobStore(saver)
+            target = next(
+                f"t{i}" for i in range(100) if shard_index(f"t{i}", 3) != shard_index("src", 3)
+            )
+            await store.aput("src", "", "c1", {"h1": "x" * 300, "h2": "y" * 300})
+            await store.acopy_thread("src", target)
+
+            # The target's shard holds its own copy, so the source can go.
+            await store.adelete_thread("src")
+            assert await store.acollect() == 2
+            into = store._store(target)
+            assert sorted(await into.athread_refs(target)) == [("", "c1", "h1"), ("", "c1", "h2")]
+            assert (await store.aget(["h1"]))["h1"] == "x" * 300
+
+        # Through the whole saver stack: checkpoints, writes and blobs move shards.
+        monkeypatch.setenv("CHECKPOINT_DB", str(tmp_path / "stack.sqlite"))
+        monkeypatch.setenv("CHECKPOINT_SHARDS", "3")
+        monkeypatch.setenv("CHECKPOINT_BLOB_MIN_BYTES", "64")
+        async with open_checkpointer() as saver:
+            graph = build_research_graph(checkpointer=saver)
+            source = {"configurable": {"thread_id": "src"}}
+            await graph.ainvoke({"user_query": "copy me " * 20, "messages": []}, source)
+            before = await graph.aget_state(source)
+            offloaded = find_layer(saver, BlobOffloadSaver).store
+            assert await offloaded._store("src").athread_refs("src")
+            target_id = next(
+                f"t{i}" for i in range(100) if shard_index(f"t{i}", 3) != shard_index("src", 3)
+            )
+            target = {"configurable": {"thread_id": target_id}}
+            await saver.acopy_thread("src", target_id)
+            await saver.adelete_thread("src")
+            await offloaded.acollect()
+            copied = await graph.aget_state(target)
+            assert copied.values == before.values and copied.next == before.next
+            assert copied.interrupts[0].value == before.interrupts[0].value
+            resumed = await graph.ainvoke(Command(resume="proceed"), target)
+            assert "__interrupt__" in resumed
+
+    asyncio.run(run())
+
+
+def test_sharded_sqlite_checkpointer_routes_threads_by_hash(tmp_path, monkeypatch):
+    import sqlite3
+
+    from sharding import shard_index, shard_paths
+
+    base = str(tmp_path / "checkpoints.sqlite")
+    monkeypatch.setenv("CHECKPOINT_DB", base)
+    monkeypatch.setenv("CHECKPOINT_SHARDS", "3")
+    monkeypatch.setenv("CHECKPOINT_KEEP_LAST", "2")
+    monkeypatch.setenv("CHECKPOINT_BLOB_MIN_BYTES", "128")
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    headers = {"Authorization": "Bearer s3cret"}
+    with TestClient(app) as client:
+        threads = []
+        for i in range(6):
+            thread_id = client.post("/start", json={"message": f"shard {i}"}).json()["thread_id"]
+            for choice in ["proceed", "technical", "executive"]:
+                client.post("/resume", json={"thread_id": thread_id, "choice": choice})
+            threads.append(thread_id)
+        # Reads (through the reader pool and the blob store) see every thread.
+        for thread_id in threads:
+            state = client.get(f"/get_state/{thread_id}").json()["state"]
+            assert state["final_response"].startswith("Here is a clear")
+        assert client.get(f"/history/{threads[0]}").json()["checkpoints"]
+
+        usage = client.get("/debug/memory", headers=headers).json()["checkpoints"]
+        assert usage["backend"] == "sqlite (3 shards)"
+        report = client.post("/debug/retention", headers=headers).json()
+        assert report["threads_scanned"] == 6 and report["checkpoints_deleted"] > 0
+
+    paths = shard_paths(base, 3)
+    for thread_id in threads:
+        home = paths[shard_index(thread_id, 3)]
+        for path in paths:
+            with sqlite3.connect(path) as db:
+                (rows,) = db.execute(
+                    "SELECT COUNT(*) FROM checkpoints WHERE thread_id = ?", (thread_id,)
+                ).fetchone()
+                assert bool(rows) == (path == home)
+    with sqlite3.connect(paths[0]) as db:
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_bounded_memory_saver_spills_evicted_threads(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHECKPOINT_MEMORY_MAX_THREADS", "2")
+    monkeypatch.setenv("CHECKPOINT_SPILL_PATH", str(tmp_path / "spill.sqlite"))
+    with TestClient(app) as client:
+        saver = client.app.state.checkpointer
+        threads = [
+            client.post("/start", json={"message": f"evict {i}"}).json()["thread_id"]
+            for i in range(4)
+        ]
+        from checkpointing import unwrap
+
+        bounded = unwrap(saver)
+        assert set(bounded.storage) == set(threads[2:])
+        assert bounded.spill.count() == 2
+
+        # A late resume of an evicted thread loads it back and carries on.
+        for choice in ["proceed", "technical", "executive"]:
+            response = client.post("/resume", json={"thread_id": threads[0], "choice": choice})
+            assert response.status_code == 200
+        assert response.json()["state"]["final_response"].startswith("Here is a clear")
+        assert len(client.get(f"/history/{threads[0]}").json()["checkpoints"]) > 4
+        text = client.get("/metrics").text
+    assert 'checkpoint_memory_evictions_total{reason="lru",action="spilled"}' in text
+    assert 'checkpoint_memory_threads{state="resident"} 2' in text
+    assert "checkpoint_memory_restores_total 1" in text
+
+
+def test_bounded_memory_saver_drops_idle_threads_without_spill():
+    import asyncio
+
+    from bounded_memory import BoundedMemorySaver
+    from graph import build_research_graph
+
+    saver = BoundedMemorySaver(idle_seconds=0.05)
+    graph = build_research_graph(checkpointer=saver)
+    old, new = ({"configurable": {"thread_id": t}} for t in ("old", "new"))
+
+    async def run():
+        await graph.ainvoke({"user_query": "idle", "messages": []}, old)
+        await asyncio.sleep(0.1)
+        await graph.ainvoke({"user_query": "fresh", "messages": []}, new)
+        assert (await graph.aget_state(old)).values == {}
+        assert (await graph.aget_state(new)).next
+        assert set(saver.storage) == {"new"}
+        assert set(saver._write_keys) == set(saver._blob_keys) == {"new"}
+
+        # With no writes at all, the sweep still drops the idle thread.
+        sweep = asyncio.create_task(saver.sweep_idle(interval=0.02))
+        await asyncio.sleep(0.15)
+        sweep.cancel()
+        assert not saver.storage and not saver.writes and not saver.blobs
+
+    asyncio.run(run())
+
+
+# --- Interrupt expiry ---------------------------------------------------------
+def _wait_for(predicate, timeout: float = 10.0) -> None:
+    import time
+
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_expired_interrupts_resume_with_defaults_or_expire(monkeypatch):
+    from expiry import EXPIRY_FIRED
+
+    before = dict(EXPIRY_FIRED._values)
+
+    def fired(interrupt, outcome):
+        key = (interrupt, outcome)
+        return EXPIRY_FIRED.value(interrupt=interrupt, outcome=outcome) - before.get(key, 0)
+
+    monkeypatch.setenv("INTERRUPT_EXPIRY_SECONDS", "0.2")
+    monkeypatch.setenv("INTERRUPT_EXPIRY", "format_selection_interrupt=0.2:executive")
+    with TestClient(app) as client:
+        workflow = client.post("/start", json={"message": "expire me"}).json()["thread_id"]
+        manual = client.post("/start", json={"message": "answered"}).json()["thread_id"]
+        approval = client.post("/approval/start", json={"task": "Write a note"}).json()
+        agent = next(
+            e["thread_id"]
+            for e in _sse(client, "POST", "/agent/start", json={"message": "research tides"})
+            if e["type"] == "thread"
+        )
+        # A user answering in time disarms that thread's deadline.
+        resumed = client.post("/resume", json={"thread_id": manual, "choice": "proceed"})
+        assert resumed.json()["requires_input"] is True
+
+        # Paused at each of the three interrupts in turn, the workflow is walked
+        # to completion with the defaults (executive for the format).
+        def finished(thread_id):
+            state = client.get(f"/get_state/{thread_id}").json()
+            return not state["requires_input"]
+
+        _wait_for(lambda: finished(workflow) and finished(manual))
+        state = client.get(f"/get_state/{workflow}").json()["state"]
+        assert state["user_choice"] == "proceed" and state["format_choice"] == "executive"
+
+        # human_review defaults to expire: the thread is deleted and gone.
+        _wait_for(lambda: client.app.state.expiry.is_expired(approval["thread_id"]))
+        late = client.post(
+            "/approval/decide", json={"thread_id": approval["thread_id"], "action": "approve"}
+        )
+        assert late.status_code == 410
+
+        # The agent's tool call is rejected, and the run finishes without it.
+        _wait_for(lambda: fired("tool_approval", "resumed") == 1)
+        graph = client.portal.call(client.app.state.engines.get, "agent")
+        config = {"configurable": {"thread_id": agent}}
+        _wait_for(lambda: not client.portal.call(graph.aget_state, config).next)
+        assert not client.app.state.expiry.is_expired(agent)
+        assert fired("format_selection_interrupt", "resumed") == 2
+        assert fired("human_review", "expired") == 1
+        assert client.app.state.expiry.pending() == 0
+        assert "interrupt_expirations_total{" in client.get("/metrics").text
+
+
+def test_expiry_scheduler_cancels_rearms_and_skips_stale_deadlines():
+    import asyncio
+
+    from expiry import ExpiryPolicy, ExpiryRule, ExpiryScheduler, resume_value
+
+    policy = ExpiryPolicy({"research_planner_interrupt": ExpiryRule(0.05, "proceed")})
+    assert policy.rule("human_review") is None  # no default: never expires
+    fired = []
+
+    async def handler(deadline):
+        fired.append(deadline.thread_id)
+        return "resumed", ()
+
+    async def run():
+        scheduler = ExpiryScheduler(policy, handler)
+        for i in range(500):
+            assert scheduler.schedule(f"t{i}", "workflow", ["research_planner_interrupt"])
+        assert not scheduler.schedule("other", "workflow", ["format_selection_interrupt"])
+        for i in range(0, 500, 2):
+            scheduler.cancel(f"t{i}")
+        scheduler.schedule("t1", "workflow", ["research_planner_interrupt"])  # re-armed
+        scheduler.start()
+        await asyncio.sleep(0.3)
+        await scheduler.stop()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert sorted(fired) == sorted(f"t{i}" for i in range(1, 500, 2))  # once each
+    assert scheduler.pending() == 0 and len(scheduler._heap) == 0
+
+    pending = [{"action_requests": [{"name": "web_search"}, {"name": "web_search"}]}]
+    decisions = resume_value("tool_approval", "reject", pending)["decisions"]
+    assert len(decisions) == 2 and decisions[0]["type"] == "reject"
+    assert resume_value("human_review", "approve") == {"action": "approve"}
+
+
+# --- Thread export / import ----------------------------------------------------
+def test_archive_moves_threads_from_memory_to_sharded_sqlite(tmp_path, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    monkeypatch.setenv("CHECKPOINT_BLOB_MIN_BYTES", "128")  # source only
+    headers = {"Authorization": "Bearer s3cret"}
+    with TestClient(app) as client:
+        paused = client.post("/start", json={"message": "paused", "user_id": "u-arc"})
+        paused = paused.json()["thread_id"]
+        done = client.post("/start", json={"message": "done", "user_id": "u-arc"})
+        done = done.json()["thread_id"]
+        for choice in ["proceed", "technical", "executive"]:
+            client.post("/resume", json={"thread_id": done, "choice": choice})
+        history = client.get(f"/history/{done}").json()["checkpoints"]
+        exported = client.get("/debug/threads/export", headers=headers)
+        assert exported.status_code == 200
+        data = exported.content
+    assert data.startswith(b"LGARCHIVE1 ")
+
+    monkeypatch.delenv("CHECKPOINT_BLOB_MIN_BYTES")
+    monkeypatch.setenv("CHECKPOINT_DB", str(tmp_path / "archive.sqlite"))
+    monkeypatch.setenv("CHECKPOINT_SHARDS", "2")
+    with TestClient(app) as client:
+        report = client.post("/debug/threads/import", headers=headers, content=data).json()
+        # The paused thread has 2 checkpoints: the input and the first interrupt.
+        assert report["threads"] == 2 and report["checkpoints"] == len(history) + 2
+        assert report["store_items"] == 1
+        # Full history (blob references resolved), and the paused thread resumes.
+        assert client.get(f"/history/{done}").json()["checkpoints"] == history
+        state = client.get(f"/get_state/{done}").json()["state"]
+        assert state["final_response"].startswith("Here is a clear")
+        resumed = client.post("/resume", json={"thread_id": paused, "choice": "proceed"})
+        assert resumed.status_code == 200 and resumed.json()["requires_input"] is True
+        assert client.app.state.store.search(("memories", "u-arc"))
+
+        again = client.post("/debug/threads/import", headers=headers, content=data).json()
+        assert sorted(again["skipped"]) == sorted([paused, done]) and again["threads"] == 0
+        truncated = client.post(
+            "/debug/threads/import", headers=headers, content=data[: len(data) // 2]
+        )
+        assert truncated.status_code == 400
+
+
+@pytest.mark.parametrize("bulk", [True, False])
+def test_archive_import_never_leaves_a_thread_half_written(bulk, tmp_path):
+    import asyncio
+
+    import aiosqlite
+    from langgraph.checkpoint.memory import MemorySaver
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    from langgraph.types import Command
+
+    from archive import ArchiveError, export_threads, import_threads
+    from graph import build_research_graph
+
+    async def run():
+        source = MemorySaver()
+        graph = build_research_graph(checkpointer=source)
+        for i in range(4):
+            config = {"configurable": {"thread_id": f"t{i}"}}
+            await graph.ainvoke({"user_query": f"q{i}", "messages": []}, config)
+            await graph.ainvoke(Command(resume="proceed"), config)
+        expected = {
+            thread_id: len(list(source.list({"configurable": {"thread_id": thread_id}})))
+            for thread_id in (f"t{i}" for i in range(4))
+        }
+        data = b"".join([chunk async for chunk in export_threads(source, chunk_bytes=256)])
+
+        async with aiosqlite.connect(str(tmp_path / f"target-{bulk}.sqlite")) as conn:
+            target = AsyncSqliteSaver(conn)
+            with pytest.raises(ArchiveError):
+                await import_threads(
+                    target, [data[: len(data) * 2 // 3]], bulk=bulk, batch_size=1
+                )
+            counts = {}
+            for thread_id in expected:
+                config = {"configurable": {"thread_id": thread_id}}
+                counts[thread_id] = len([item async for item in target.alist(config)])
+            # Each thread is either complete or absent, and the whole archive loads.
+            assert all(counts[t] in (0, expected[t]) for t in expected)
+            assert 0 < sum(bool(n) for n in counts.values()) < 4
+            report = await import_threads(target, [data], replace=True, bulk=bulk)
+            assert report.threads == 4 and report.checkpoints == sum(expected.values())
+            # A failed replace keeps the threads it had not finished replacing.
+            with pytest.raises(ArchiveError):
+                await import_threads(
+                    target, [data[: len(data) * 2 // 3]], replace=True, bulk=bulk, batch_size=1
+                )
+            for thread_id in expected:
+                config = {"configurable": {"thread_id": thread_id}}
+                assert len([item async for item in target.alist(config)]) == expected[thread_id]
+            # Pending writes come back with their task paths, in the source's order.
+            config = {"configurable": {"thread_id": "t3"}}
+            writes = (await target.aget_tuple(config)).pending_writes
+            assert writes == (await source.aget_tuple(config)).pending_writes
+            paths = {
+                (checkpoint_id, task_id, path)
+                for (thread_id, _ns, checkpoint_id), stored in source.writes.items()
+                if thread_id == "t3"
+                for task_id, _channel, _value, path in stored.values()
+            }
+            async with conn.execute(
+                "SELECT checkpoint_id, task_id, task_path FROM writes WHERE thread_id = 't3'"
+            ) as cur:
+                assert set(await cur.fetchall()) == paths and any(p for *_, p in paths)
+            resumed = build_research_graph(checkpointer=target)
+            state = await resumed.aget_state({"configurable": {"thread_id": "t3"}})
+            assert state.next == ("research_direction_interrupt",)
+
+    asyncio.run(run())
+
+
+def test_archive_resolves_offloaded_pending_writes(monkeypatch):
+    import asyncio
+
+    from langgraph.checkpoint.memory import InMemorySaver
+    from langgraph.types import Command
+
+    from archive import export_threads, import_threads
+    from checkpointing import wrap_saver
+    from graph import build_research_graph
+
+    monkeypatch.setenv("CHECKPOINT_BLOB_MIN_BYTES", "16")
+
+    async def run():
+        source = wrap_saver(InMemorySaver())
+        config = {"configurable": {"thread_id": "paused"}}
+        await build_research_graph(checkpointer=source).ainvoke(
+            {"user_query": "q", "messages": []}, config
+        )
+        # A sibling task that finished before the interrupt left a large write.
+        latest = await source.aget_tuple(config)
+        long = "a long result from a task that finished before the interrupt"
+        await source.aput_writes(latest.config, [("search_results", [long])], "sibling")
+        expected = (await source.aget_tuple(config)).pending_writes
+        assert ("sibling", "search_results", [long]) in expected
+
+        data = b"".join([chunk async for chunk in export_threads(source)])
+        target = InMemorySaver()  # no offload: references would point at nothing
+        report = await import_threads(target, [data])
+        assert report.threads == 1
+        assert (await target.aget_tuple(config)).pending_writes == expected
+        state = await build_research_graph(checkpointer=target).ainvoke(
+            Command(resume="proceed"), config
+        )
+        assert "__interrupt__" in state
+
+    asyncio.run(run())
+
+
+# --- Lazy engines / cold start -----------------------------------------------
+def test_import_main_defers_heavy_optional_packages():
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, main; "
+        "print('loaded=' + ','.join(m for m in ('deepagents', 'ag_ui_langgraph') if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()
+    assert out[-1] == "loaded="  # neither imported just by importing the app
+
+
+def test_engines_build_on_first_use(client):
+    engines = client.app.state.engines
+    assert "workflow" in engines and "approval" in engines
+    assert "workflow" not in engines.built  # nothing compiled at startup
+    client.post("/start", json={"message": "lazy"})
+    assert engines.built == ["workflow"]
+    assert engines.build_seconds["workflow"] > 0
+
+
+def test_module_level_graphs_are_lazy():
+    import graph as g
+
+    g.__dict__.pop("research_graph", None)
+    assert "research_graph" not in vars(g)
+    compiled = g.research_graph  # PEP 562: compiled on first access, then cached
+    assert compiled is g.research_graph
+    assert "research_graph" in vars(g)
+
+
+# --- Metrics (/metrics, Prometheus text format) -----------------------------
+def test_metrics_histogram_renders_prometheus_text():
+    from metrics import Registry
+
+    registry = Registry()
+    hist = registry.histogram("demo_seconds", "Demo latency.", ("node",), buckets=(0.1, 1.0))
+    hist.observe(0.05, node="a")
+    hist.observe(0.5, node="a")
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{node="a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{node="a",le="+Inf"} 2' in text
+    assert 'demo_seconds_count{node="a"} 2' in text
+
+
+def test_metrics_endpoint_records_nodes_sse_and_checkpoints(client):
+    thread_id = client.post("/start", json={"message": "metrics"}).json()["thread_id"]
+    _sse(client, "POST", "/stream", json={"thread_id": thread_id, "choice": "proceed"})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'graph_node_duration_seconds_count{engine="workflow",node="sub_researcher"}' in text
+    assert 'llm_calls_total{engine="workflow",status="ok"}' in text
+    assert 'sse_frames_total{endpoint="/stream",type="progress"}' in text
+    assert 'interrupt_wait_seconds_count{engine="workflow"}' in text
+    assert 'checkpoint_operation_duration_seconds_count{op="put"}' in text
+    assert 'graph_runs_in_flight{engine="workflow"} 0' in text
+
+
+# --- Event-loop lag monitor -------------------------------------------------
+def test_loop_monitor_exports_lag(monkeypatch):
+    import time
+
+    monkeypatch.setenv("LOOP_LAG_INTERVAL_MS", "10")
+    with TestClient(app) as test_client:
+        time.sleep(0.1)
+        text = test_client.get("/metrics").text
+    assert "event_loop_lag_seconds_count" in text
+    assert "event_loop_lag_last_seconds" in text
+
+
+def test_loop_monitor_attributes_block_to_node():
+    import asyncio
+    import time
+    from typing import TypedDict
+
+    from langgraph.graph import END, START, StateGraph
+
+    import loop_monitor
+    from metrics import instrument, running_nodes
+
+    class S(TypedDict):
+        n: int
+
+    async def blocker(state: S) -> dict:
+        time.sleep(0.15)  # deliberately sync: stalls the loop
+        return {"n": state["n"] + 1}
+
+    builder = StateGraph(S)
+    builder.add_node("blocker", blocker)
+    builder.add_edge(START, "blocker")
+    builder.add_edge("blocker", END)
+    graph = instrument(builder.compile(), "test")
+
+    async def run() -> None:
+        monitor = loop_monitor.LoopMonitor(interval=0.01, threshold=0.05)
+        monitor.start()
+        await asyncio.sleep(0.03)
+        await graph.ainvoke({"n": 0})
+        await asyncio.sleep(0.03)
+        await monitor.stop()
+
+    mark = loop_monitor.last_seq()
+    asyncio.run(run())
+    blocks = loop_monitor.blocks_since(mark)
+    assert blocks, "the stall was not detected"
+    assert any(b.node == "blocker" and b.engine == "test" for b in blocks)
+    assert any("blocker" in b.stack for b in blocks)
+    assert ("test", "blocker") not in running_nodes()  # forgotten when it ends
+
+
+# --- Admin diagnostics --------------------------------------------------------
+def test_debug_endpoints_require_admin_token(client, monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert client.get("/debug/profile?seconds=0.1").status_code == 404  # disabled
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    assert client.get("/debug/profile?seconds=0.1").status_code == 401
+    wrong = {"Authorization": "Bearer nope"}
+    assert client.get("/debug/profile?seconds=0.1", headers=wrong).status_code == 401
+
+
+def test_debug_profile_samples_threads_and_tasks(client, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    headers = {"Authorization": "Bearer s3cret"}
+    data = client.get("/debug/profile?seconds=0.2&top=5", headers=headers).json()
+    assert data["samples"] > 0
+    assert 0 < len(data["top"]) <= 5
+    assert {"function", "self", "total"} <= set(data["top"][0])
+    # The endpoint's own coroutine is pending while it profiles.
+    assert "task:" in data["collapsed"]
+
+    text = client.get(
+        "/debug/profile?seconds=0.1&format=collapsed", headers=headers
+    ).text
+    line = text.splitlines()[0]
+    assert ";" in line and line.rsplit(" ", 1)[1].isdigit()  # "a;b;c N"
+
+
+def test_debug_memory_reports_threads_users_and_heap_diff(client, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    headers = {"Authorization": "Bearer s3cret"}
+    start = client.post("/start", json={"message": "memory", "user_id": "mem-user"})
+    thread_id = start.json()["thread_id"]
+    for choice in ["proceed", "technical", "executive"]:
+        _sse(client, "POST", "/stream", json={"thread_id": thread_id, "choice": choice})
+
+    data = client.get("/debug/memory?tracemalloc=start", headers=headers).json()
+    assert data["process"]["rss_bytes"] is None or data["process"]["rss_bytes"] > 0
+    threads = {t["thread_id"]: t for t in data["checkpoints"]["top_threads"]}
+    assert threads[thread_id]["checkpoints"] > 0 and threads[thread_id]["bytes"] > 0
+    assert {"user_id": "mem-user", "items": 1} in data["store"]["top_users"]
+    assert data["tracemalloc"]["baseline"] is True
+
+    again = client.get("/debug/memory?top=3", headers=headers).json()
+    assert again["tracemalloc"]["baseline"] is False
+    assert len(again["tracemalloc"]["top"]) <= 3
+    stopped = client.get("/debug/memory?tracemalloc=stop", headers=headers).json()
+    assert stopped["tracemalloc"] == {"tracing": False}
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -1,17 +1,23 @@
 """Tools available to the agent.
 
-The example ``web_search`` tool uses Tavily when ``TAVILY_API_KEY`` is set and
-``langchain-tavily`` is installed; otherwise it returns deterministic mock
-results so the template still runs offline. Add your own tools here.
+The example ``web_search`` tool asks a pluggable backend (``search_backends``)
+for its results: Tavily when ``TAVILY_API_KEY`` is set and ``langchain-tavily``
+is installed, a local BM25 document corpus when ``SEARCH_CORPUS_DIR`` is set,
+and otherwise deterministic mock results so the template still runs offline.
+Live results are cached (``search_cache``), so repeated queries skip the
+backend. Add your own tools here.
 """
 
 from __future__ import annotations
 
 import logging
-import os
+import time
 
 from langchain_core.tools import tool
 
+import search_cache
+from search_backends import SEARCH_DURATION, MockSearchBackend, format_results, get_backend
+
 logger = logging.getLogger(__name__)
 
 
@@ -43,28 +49,24 @@ def web_search(query: str) -> str:
     preview = query if len(query) <= 60 else query[:57] + "…"
     _emit(f"🔎 Searching the web for “{preview}”…")
 
-    if os.getenv("TAVILY_API_KEY"):
+    backend = search_cache.from_env(get_backend())
+    if backend.name != "mock":
+        start = time.perf_counter()
         try:
-            from langchain_tavily import TavilySearch
-
-            response = TavilySearch(max_results=5).invoke({"query": query})
-            results = response.get("results", []) if isinstance(response, dict) else []
+            results = backend.search(query, k=5)
+        except Exception as exc:  # pragma: no cover - network/credential issues
+            logger.warning("%s search failed (%s); using mock results.", backend.name, exc)
+        else:
+            SEARCH_DURATION.observe(time.perf_counter() - start, backend=backend.name)
             if results:
                 _emit(f"📄 Found {len(results)} source{'s' if len(results) != 1 else ''}")
-                return "\n\n".join(
-                    f"- {item.get('title', 'Result')}\n  {item.get('content', '')}\n  {item.get('url', '')}"
-                    for item in results
-                )
-        except Exception as exc:  # pragma: no cover - network/credential issues
-            logger.warning("Tavily search failed (%s); using mock results.", exc)
+                return format_results(results)
+            if backend.name == "local":
+                _emit("📄 No matching documents in the local corpus")
+                return f"No documents in the local corpus match '{query}'."
 
     _emit("📄 Using offline sample results (set TAVILY_API_KEY for live search)")
-    return (
-        f"[mock search results for '{query}']\n"
-        "- Overview: a concise, relevant summary of the topic.\n"
-        "- Key points: the most important facts a reader should know.\n"
-        "- Note: install 'langchain-tavily' and set TAVILY_API_KEY for live web search."
-    )
+    return format_results(MockSearchBackend().search(query))
 
 
 # Convenience list to pass to agents/graphs.
@@ -0,0 +1,459 @@
+"""Vectorised semantic index for long-term memory recall.
+
+``InMemoryStore``'s semantic search keeps every item's embedding as a Python
+list and scores a search item by item over everything under the namespace
+prefix. That is fine for a few memories per user; at tens of thousands per user
+and millions overall it dominates recall. Here each namespace's embeddings are
+one contiguous, unit-normalised float32 matrix, so a search is a single
+matrix-vector product plus an ``argpartition`` top-k.
+
+- :class:`VectorIndex` — one namespace. Appends land at the end of the matrix
+  (capacity doubles). Re-putting or deleting a key tombstones its old rows, and
+  the matrix is compacted once tombstones pass ``compact_ratio`` of the rows.
+  With ``path`` the rows live in ``<path>.f32``, memory-mapped, and the row
+  owners in an append-only log ``<path>.keys``. Every process that maps the
+  same files shares one copy through the page cache. Appends and compaction
+  hold an ``flock``, and readers pick up other processes' appends (or a
+  compaction) on their next search.
+- :class:`VectorIndexSet` — a store's indexes by namespace, optionally in a
+  directory (one file pair per namespace).
+- :class:`VectorMemoryStore` — ``InMemoryStore`` with its per-item vectors
+  replaced by a :class:`VectorIndexSet`; ``memory.build_store`` uses it when
+  ``EMBEDDINGS_MODEL`` is set and NumPy is installed. ``SqliteMemoryStore``
+  keeps its set on disk next to ``MEMORY_DB``.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+from collections import defaultdict
+from contextlib import contextmanager
+from importlib.util import find_spec
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+
+from langgraph.store.base import IndexConfig, Item, SearchItem, SearchOp
+from langgraph.store.memory import InMemoryStore, _compare_values
+
+from metrics import REGISTRY
+
+NUMPY_AVAILABLE = find_spec("numpy") is not None
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTOR_COMPACTIONS = REGISTRY.counter(
+    "memory_vector_compactions_total",
+    "Memory vector index compactions (tombstoned rows dropped).",
+)
+
+
+def _normalise(vectors: Any, dims: int) -> "np.ndarray":
+    rows = np.asarray(vectors, dtype=np.float32).reshape(-1, dims)
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return rows / norms
+
+
+class VectorIndex:
+    """Unit-normalised float32 rows of one namespace, with tombstones.
+
+    A key owns one row per embedded field. ``search`` returns keys by their
+    best row (max pooling, as ``InMemoryStore`` does).
+    """
+
+    def __init__(
+        self,
+        dims: int,
+        *,
+        path: Optional[str] = None,
+        compact_ratio: float = 0.25,
+        min_compact: int = 256,
+    ) -> None:
+        self.dims = dims
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.min_compact = min_compact
+        self._reset()
+        if path is not None:
+            self._sync()
+
+    def _reset(self) -> None:
+        self._matrix = np.empty((0 if self.path else 64, self.dims), dtype=np.float32)
+        self._alive = np.zeros(64, dtype=bool)
+        self._keys: list[Optional[str]] = []  # row -> owner
+        self._rows: dict[str, range] = {}  # live key -> its rows
+        self._size = 0  # rows in use (live, tombstoned, or orphaned on disk)
+        self._live = 0
+        self._log_offset = 0
+        self._log_inode: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def dead(self) -> int:
+        return self._size - self._live
+
+    # -- records ---------------------------------------------------------------
+
+    def _apply(self, record: list) -> None:
+        """``["+", key, start, n]`` gives ``key`` rows ``start..start+n``;
+        ``["-", key]`` tombstones them. A ``+`` replaces the key's old rows."""
+        key = record[1]
+        old = self._rows.pop(key, None)
+        if old is not None:
+            self._alive[old.start : old.stop] = False
+            self._live -= len(old)
+        if record[0] != "+":
+            return
+        start, n = record[2], record[3]
+        end = start + n
+        if end > len(self._alive):
+            grown = np.zeros(max(end, 2 * len(self._alive)), dtype=bool)
+            grown[: self._size] = self._alive[: self._size]
+            self._alive = grown
+        if end > len(self._keys):
+            self._keys.extend([None] * (end - len(self._keys)))
+        self._keys[start:end] = [key] * n
+        self._alive[start:end] = True
+        self._rows[key] = range(start, end)
+        self._size = max(self._size, end)
+        self._live += n
+
+    # -- writes ------------------------------------------------------------------
+
+    def add(self, key: str, vectors: Sequence[Sequence[float]]) -> None:
+        """Set ``key``'s rows to ``vectors`` (one per embedded field)."""
+        self.update([(key, vectors)])
+
+    def remove(self, key: str) -> None:
+        self.update([(key, None)])
+
+    def update(self, changes: Sequence[tuple[str, Optional[Sequence[Sequence[float]]]]]) -> None:
+        """Apply ``(key, vectors)`` changes in order; ``None`` removes the key.
+
+        The batch is normalised in one pass and, on disk, written under one
+        lock with one append to each file.
+        """
+        if self.path is not None:
+            with self._locked():
+                with open(self.path + ".f32", "ab") as f:
+                    rows, records = self._records(changes, f.tell() // (4 * self.dims))
+                    f.write(rows.tobytes())
+                if records:
+                    self._log(records)
+            return
+        start = self._size
+        rows, records = self._records(changes, start)
+        if start + len(rows) > len(self._matrix):
+            capacity = max(start + len(rows), 2 * len(self._matrix))
+            grown = np.empty((capacity, self.dims), np.float32)
+            grown[:start] = self._matrix[:start]
+            self._matrix = grown
+        self._matrix[start : start + len(rows)] = rows
+        for record in records:
+            self._apply(record)
+        self._maybe_compact()
+
+    def _records(self, changes: Sequence[tuple[str, Any]], start: int) -> tuple["np.ndarray", list]:
+        """Normalised rows to append from ``start`` and the log records for them."""
+        flat: list = []
+        records: list[list] = []
+        present = set(self._rows)
+        for key, vectors in changes:
+            if vectors is None:
+                if key in present:
+                    records.append(["-", key])
+                    present.discard(key)
+                continue
+            records.append(["+", key, start + len(flat), len(vectors)])
+            flat.extend(vectors)
+            present.add(key)
+        if not flat:
+            return np.empty((0, self.dims), np.float32), records
+        return _normalise(flat, self.dims), records
+
+    def _maybe_compact(self) -> None:
+        dead = self.dead
+        if dead >= self.min_compact and dead > self.compact_ratio * self._size:
+            self.compact()
+
+    def compact(self) -> None:
+        """Drop tombstoned rows, keeping live keys in their current order."""
+        if self.path is not None:
+            with self._locked(compacting=True):
+                self._compact_file()
+            return
+        order = np.flatnonzero(self._alive[: self._size])
+        owners = [self._keys[i] for i in order]
+        matrix = self._matrix[order]
+        self._reset()
+        self._matrix = matrix if len(matrix) else self._matrix
+        start = 0
+        for key, n in _runs(owners):
+            self._apply(["+", key, start, n])
+            start += n
+        VECTOR_COMPACTIONS.inc()
+
+    # -- on-disk mode --------------------------------------------------------------
+
+    @contextmanager
+    def _locked(self, compacting: bool = False) -> Iterator[None]:
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._sync()  # other processes may have appended or compacted
+                yield
+                self._sync()
+                if not compacting and self.dead >= self.min_compact:
+                    if self.dead > self.compact_ratio * self._size:
+                        self._compact_file()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _log(self, records: list[list]) -> None:
+        with open(self.path + ".keys", "a") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+
+    def _sync(self) -> None:
+        """Catch up with the log (and re-map the rows) if it changed."""
+        try:
+            stat = os.stat(self.path + ".keys")
+        except FileNotFoundError:
+            return
+        if stat.st_ino != self._log_inode:
+            self._reset()
+            self._log_inode = stat.st_ino
+        if stat.st_size <= self._log_offset:
+            return
+        with open(self.path + ".keys", "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read(stat.st_size - self._log_offset)
+        end = data.rfind(b"\n") + 1  # a writer may be mid-line
+        for line in data[:end].splitlines():
+            self._apply(json.loads(line))
+        self._log_offset += end
+        rows = os.path.getsize(self.path + ".f32") // (4 * self.dims)
+        if rows != len(self._matrix):
+            self._matrix = (
+                np.memmap(self.path + ".f32", dtype=np.float32, mode="r", shape=(rows, self.dims))
+                if rows
+                else np.empty((0, self.dims), dtype=np.float32)
+            )
+
+    def _compact_file(self) -> None:
+        order = np.flatnonzero(self._alive[: self._size])
+        owners = [self._keys[i] for i in order]
+        with open(self.path + ".f32.tmp", "wb") as f:
+            for i in range(0, len(order), 65536):
+                f.write(np.ascontiguousarray(self._matrix[order[i : i + 65536]]).tobytes())
+        with open(self.path + ".keys.tmp", "w") as f:
+            start = 0
+            for key, n in _runs(owners):
+                f.write(json.dumps(["+", key, start, n]) + "\n")
+                start += n
+        # Rows first: a reader only re-maps after it sees the new log.
+        os.replace(self.path + ".f32.tmp", self.path + ".f32")
+        os.replace(self.path + ".keys.tmp", self.path + ".keys")
+        self._sync()
+        VECTOR_COMPACTIONS.inc()
+
+    # -- reads ---------------------------------------------------------------------
+
+    def search(self, query: "np.ndarray", k: int) -> list[tuple[str, float]]:
+        """The ``k`` best keys for a unit-normalised ``query``, best first."""
+        if self.path is not None:
+            self._sync()
+        n = min(self._size, len(self._matrix))
+        if not self._rows or k <= 0 or n == 0:
+            return []
+        scores = self._matrix[:n] @ query
+        if self._live < n:
+            scores = np.where(self._alive[:n], scores, -np.inf)
+        want = k
+        while True:
+            top = min(n, want)
+            idx = np.argpartition(-scores, top - 1)[:top] if top < n else np.arange(n)
+            idx = idx[np.argsort(-scores[idx], kind="stable")]
+            best: dict[str, float] = {}
+            for i in idx:
+                score = float(scores[i])
+                if score == -np.inf:
+                    break
+                key = self._keys[i]
+                if key not in best:
+                    best[key] = score
+                    if len(best) == k:
+                        break
+            # More rows than keys (several fields per key): widen and retry.
+            if len(best) >= k or top >= n:
+                return list(best.items())
+            want *= 2
+
+
+def _runs(owners: list) -> Iterator[tuple[str, int]]:
+    """``(key, count)`` for each run of equal consecutive owners."""
+    i = 0
+    while i < len(owners):
+        j = i
+        while j < len(owners) and owners[j] == owners[i]:
+            j += 1
+        yield owners[i], j - i
+        i = j
+
+
+class VectorIndexSet:
+    """:class:`VectorIndex` per namespace; on disk under ``directory`` if given."""
+
+    def __init__(self, dims: int, *, directory: Optional[str] = None, **options: Any) -> None:
+        self.dims = dims
+        self.directory = directory
+        self.options = options
+        self._indexes: dict[tuple[str, ...], VectorIndex] = {}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, namespace: tuple[str, ...]) -> Optional[str]:
+        if not self.directory:
+            return None
+        name = hashlib.blake2b("\x1f".join(namespace).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.directory, name)
+
+    def get(self, namespace: tuple[str, ...], create: bool = False) -> Optional[VectorIndex]:
+        index = self._indexes.get(namespace)
+        if index is None:
+            path = self._path(namespace)
+            if create or (path and os.path.exists(path + ".keys")):
+                index = VectorIndex(self.dims, path=path, **self.options)
+                self._indexes[namespace] = index
+        return index
+
+    def update(self, namespace: tuple[str, ...], changes: Sequence[tuple[str, Any]]) -> None:
+        """``VectorIndex.update`` on ``namespace``'s index (created on first add)."""
+        adds = any(vectors is not None for _, vectors in changes)
+        index = self.get(namespace, create=adds)
+        if index is not None:
+            index.update(changes)
+
+    def remove(self, namespace: tuple[str, ...], key: str) -> None:
+        self.update(namespace, [(key, None)])
+
+    def search(
+        self, namespaces: Iterable[tuple[str, ...]], query: Sequence[float], k: int
+    ) -> list[tuple[float, tuple[str, ...], str]]:
+        """The ``k`` best ``(score, namespace, key)`` across ``namespaces``."""
+        q = _normalise(query, self.dims)[0]
+        hits = [
+            (score, namespace, key)
+            for namespace in namespaces
+            if (index := self.get(namespace)) is not None
+            for key, score in index.search(q, k)
+        ]
+        hits.sort(key=lambda hit: hit[0], reverse=True)
+        return hits[:k]
+
+
+def search_items(
+    vectors: VectorIndexSet,
+    namespaces: list[tuple[str, ...]],
+    query: Sequence[float],
+    op: SearchOp,
+    lookup: Callable[[tuple[str, ...], str], Optional[Item]],
+) -> list[SearchItem]:
+    """Answer a semantic ``SearchOp`` from ``vectors``, reading items via ``lookup``.
+
+    With a ``filter`` the candidate list is widened until a page survives it.
+    """
+    want = op.offset + op.limit
+    while True:
+        hits = vectors.search(namespaces, query, want)
+        kept: list[tuple[float, Item]] = []
+        for score, namespace, key in hits:
+            item = lookup(namespace, key)
+            if item is None:
+                continue
+            if op.filter and not all(
+                _compare_values(item.value.get(k), v) for k, v in op.filter.items()
+            ):
+                continue
+            kept.append((score, item))
+        if len(kept) >= op.offset + op.limit or len(hits) < want:
+            break
+        want *= 2
+    return [
+        SearchItem(
+            namespace=item.namespace,
+            key=item.key,
+            value=item.value,
+            created_at=item.created_at,
+            updated_at=item.updated_at,
+            score=score,
+        )
+        for score, item in kept[op.offset : op.offset + op.limit]
+    ]
+
+
+class VectorMemoryStore(InMemoryStore):
+    """``InMemoryStore`` whose semantic search runs on a :class:`VectorIndexSet`.
+
+    Items stay in ``InMemoryStore``'s dicts; only the vectors move. Keys
+    without an embedding are not returned by a semantic search.
+    """
+
+    def __init__(self, *, index: IndexConfig, **options: Any) -> None:
+        super().__init__(index=index)
+        self.vectors = VectorIndexSet(index["dims"], **options)
+
+    def _insertinmem_store(
+        self,
+        to_embed: dict[str, list[tuple[tuple[str, ...], str, str]]],
+        embeddings: list[list[float]],
+    ) -> None:
+        indices = [index for indices in to_embed.values() for index in indices]
+        if len(indices) != len(embeddings):
+            raise ValueError(
+                f"Number of embeddings ({len(embeddings)}) does not"
+                f" match number of indices ({len(indices)})"
+            )
+        by_key: dict[tuple[tuple[str, ...], str], list[list[float]]] = defaultdict(list)
+        for embedding, (namespace, key, _path) in zip(embeddings, indices):
+            by_key[(namespace, key)].append(embedding)
+        by_namespace: dict[tuple[str, ...], list] = defaultdict(list)
+        for (namespace, key), vectors in by_key.items():
+            by_namespace[namespace].append((key, vectors))
+        for namespace, changes in by_namespace.items():
+            self.vectors.update(namespace, changes)
+
+    def _apply_put_ops(self, put_ops: dict) -> None:
+        super()._apply_put_ops(put_ops)
+        for (namespace, key), op in put_ops.items():
+            if op.value is None or op.index is False:
+                self.vectors.remove(namespace, key)
+
+    def _filter_items(self, op: SearchOp) -> list:
+        if op.query and self.embeddings:
+            return []  # scored from the index in _batch_search
+        return super()._filter_items(op)
+
+    def _batch_search(self, ops: dict, queryinmem_store: dict, results: list) -> None:
+        rest = {}
+        for i, (op, candidates) in ops.items():
+            if op.query and op.query in queryinmem_store:
+                prefix = op.namespace_prefix
+                namespaces = [ns for ns in list(self._data) if ns[: len(prefix)] == prefix]
+                results[i] = search_items(
+                    self.vectors,
+                    namespaces,
+                    queryinmem_store[op.query],
+                    op,
+                    lambda ns, key: self._data[ns].get(key),
+                )
+            else:
+                rest[i] = (op, candidates)
+        if rest:
+            super()._batch_search(rest, queryinmem_store, results)
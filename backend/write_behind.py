@@ -0,0 +1,257 @@
+"""Write-behind for long-term memory: store writes off the request path.
+
+``/agent/start`` and ``/deep/start`` await ``save_user_memory`` at the end of
+their SSE stream, and the workflow's ``persist_memory`` node awaits
+``store.aput``. Each write pays for embedding the note (when semantic) and a
+store transaction before the run can finish. :class:`WriteBehindStore` wraps
+the app's store so that a put only queues the write and returns; one
+background task writes the queue in batches:
+
+- **batching** — writes that arrive within ``linger`` seconds of each other
+  (up to ``batch_size``) go to the store as one ``abatch``, i.e. one embedding
+  call and one transaction. A newer put to a key still queued replaces the
+  older one;
+- **bounded** — at most ``max_pending`` keys wait. Beyond that, a put waits
+  for room (backpressure) instead of growing memory or dropping data;
+- **retries** — a failed batch is retried ``retries`` times with exponential
+  backoff, then written op by op so one bad write doesn't lose the rest. Ops
+  that still fail are dropped and logged;
+- **read your writes** — a read (``get``, ``search``, ``list_namespaces``)
+  first waits for the queued writes under the namespaces it reads. A user
+  reading their own memory sees their pending notes; other users' reads don't
+  wait;
+- **flush on shutdown** — :meth:`WriteBehindStore.stop` writes out whatever
+  is queued. The app calls it when the lifespan ends.
+
+Only the async API is queued. Sync ``batch`` calls go straight to the wrapped
+store and don't see queued writes. Configured by :func:`from_env`::
+
+    MEMORY_WRITE_BEHIND=false              # write inline, as before
+    MEMORY_WRITE_BEHIND_MAX_PENDING=10000
+    MEMORY_WRITE_BEHIND_BATCH=100
+    MEMORY_WRITE_BEHIND_LINGER_MS=20
+    MEMORY_WRITE_BEHIND_RETRIES=3
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+from langgraph.store.base import BaseStore, GetOp, ListNamespacesOp, Op, PutOp, Result, SearchOp
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_PENDING = REGISTRY.gauge(
+    "memory_write_behind_pending",
+    "Memory writes queued (or being written) by the write-behind store.",
+)
+WRITE_BEHIND_WRITES = REGISTRY.counter(
+    "memory_write_behind_writes_total",
+    "Queued memory writes, by result (written, coalesced, retried, dropped).",
+    ("result",),
+)
+WRITE_BEHIND_BATCH = REGISTRY.histogram(
+    "memory_write_behind_batch_size",
+    "Writes per store batch issued by the write-behind store.",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+
+_Key = tuple[tuple[str, ...], str]
+
+
+def _int_env(name: str, default: int) -> int:
+    return int(os.getenv(name, "").strip() or default)
+
+
+def _reads(ops: Iterable[Op]) -> Optional[Callable[[tuple[str, ...]], bool]]:
+    """A predicate for the namespaces ``ops`` read (None: they read nothing)."""
+    exact: set[tuple[str, ...]] = set()
+    prefixes: list[tuple[str, ...]] = []
+    for op in ops:
+        if isinstance(op, GetOp):
+            exact.add(op.namespace)
+        elif isinstance(op, SearchOp):
+            prefixes.append(op.namespace_prefix)
+        elif isinstance(op, (ListNamespacesOp, PutOp)):
+            # Listing can match anything; a put mixed with reads must follow
+            # the queued writes to the same keys.
+            return lambda namespace: True
+    if not exact and not prefixes:
+        return None
+    return lambda namespace: namespace in exact or any(
+        namespace[: len(p)] == p for p in prefixes
+    )
+
+
+class WriteBehindStore(BaseStore):
+    """Queue ``store``'s async puts and write them in background batches."""
+
+    def __init__(
+        self,
+        store: BaseStore,
+        *,
+        max_pending: int = 10_000,
+        batch_size: int = 100,
+        linger: float = 0.02,
+        retries: int = 3,
+        backoff: float = 0.5,
+    ) -> None:
+        self.store = store
+        self.max_pending = max(1, max_pending)
+        self.batch_size = max(1, batch_size)
+        self.linger = linger
+        self.retries = retries
+        self.backoff = backoff
+        # Mirrors the wrapped store (``/capabilities`` reads it).
+        self.index_config = getattr(store, "index_config", None)
+        self._pending: OrderedDict[_Key, PutOp] = OrderedDict()
+        self._inflight: dict[_Key, PutOp] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake = self._room = self._progress = None  # asyncio.Events, per loop
+        self._urgent = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending) + len(self._inflight)
+
+    # --- BaseStore ----------------------------------------------------------------
+    def batch(self, ops: Iterable[Op]) -> list[Result]:
+        return self.store.batch(ops)
+
+    async def abatch(self, ops: Iterable[Op]) -> list[Result]:
+        ops = list(ops)
+        if ops and all(isinstance(op, PutOp) for op in ops):
+            for op in ops:
+                await self._enqueue(op)
+            return [None] * len(ops)
+        reads = _reads(ops)
+        if reads is not None:
+            await self._settle(reads)
+        return await self.store.abatch(ops)
+
+    # --- lifecycle ------------------------------------------------------------------
+    async def flush(self) -> None:
+        """Wait until every queued write has been written (or dropped)."""
+        await self._settle(lambda namespace: True)
+
+    async def stop(self) -> None:
+        """Flush the queue and stop the writer task."""
+        if self._task is None:
+            return
+        if self._loop is asyncio.get_running_loop():
+            await self.flush()
+        self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
+        self._task = None
+
+    def close(self) -> None:
+        close = getattr(self.store, "close", None)
+        if close is not None:
+            close()
+
+    # --- queue ------------------------------------------------------------------------
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            # First use, or a new loop: events are loop-bound, the queue isn't.
+            self._loop = loop
+            self._wake, self._room, self._progress = (
+                asyncio.Event(),
+                asyncio.Event(),
+                asyncio.Event(),
+            )
+            self._pending.update(self._inflight)
+            self._inflight = {}
+            self._task = loop.create_task(self._run(), name="memory-write-behind")
+            if self._pending:
+                self._wake.set()
+
+    async def _enqueue(self, op: PutOp) -> None:
+        self._ensure_worker()
+        key = (op.namespace, op.key)
+        while key not in self._pending and len(self._pending) >= self.max_pending:
+            self._room.clear()
+            self._urgent = True
+            self._wake.set()
+            await self._room.wait()
+        if key in self._pending:
+            WRITE_BEHIND_WRITES.inc(result="coalesced")
+        self._pending[key] = op
+        self._pending.move_to_end(key)
+        WRITE_BEHIND_PENDING.set(self.pending)
+        self._wake.set()
+
+    async def _settle(self, reads: Callable[[tuple[str, ...]], bool]) -> None:
+        while any(reads(ns) for ns, _ in (*self._pending, *self._inflight)):
+            self._ensure_worker()
+            self._urgent = True
+            self._wake.set()
+            await self._progress.wait()
+
+    async def _run(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            if not self._urgent and len(self._pending) < self.batch_size:
+                # Let a burst of writes gather into one batch.
+                await asyncio.sleep(self.linger)
+            self._urgent = False
+            while self._pending:
+                batch = []
+                while self._pending and len(batch) < self.batch_size:
+                    key, op = self._pending.popitem(last=False)
+                    self._inflight[key] = op
+                    batch.append(op)
+                self._room.set()
+                try:
+                    await self._write(batch)
+                finally:
+                    self._inflight = {}
+                    WRITE_BEHIND_PENDING.set(self.pending)
+                    progress, self._progress = self._progress, asyncio.Event()
+                    progress.set()
+
+    async def _write(self, batch: list[PutOp]) -> None:
+        WRITE_BEHIND_BATCH.observe(len(batch))
+        for attempt in range(self.retries + 1):
+            try:
+                await self.store.abatch(batch)
+                WRITE_BEHIND_WRITES.inc(len(batch), result="written")
+                return
+            except Exception as exc:
+                if attempt == self.retries:
+                    logger.warning("Memory write batch of %d failed: %s", len(batch), exc)
+                    break
+                WRITE_BEHIND_WRITES.inc(len(batch), result="retried")
+                await asyncio.sleep(self.backoff * 2**attempt)
+        # Isolate the failing writes instead of losing the whole batch.
+        for op in batch:
+            try:
+                await self.store.abatch([op])
+                WRITE_BEHIND_WRITES.inc(result="written")
+            except Exception as exc:
+                WRITE_BEHIND_WRITES.inc(result="dropped")
+                logger.error("Dropping memory write %s/%s: %s", op.namespace, op.key, exc)
+
+
+def from_env(store: BaseStore) -> BaseStore:
+    """``store`` behind a :class:`WriteBehindStore`, unless ``MEMORY_WRITE_BEHIND`` is off."""
+    if os.getenv("MEMORY_WRITE_BEHIND", "true").strip().lower() in {"0", "false", "no", "off"}:
+        return store
+    return WriteBehindStore(
+        store,
+        max_pending=_int_env("MEMORY_WRITE_BEHIND_MAX_PENDING", 10_000),
+        batch_size=_int_env("MEMORY_WRITE_BEHIND_BATCH", 100),
+        linger=_int_env("MEMORY_WRITE_BEHIND_LINGER_MS", 20) / 1000.0,
+        retries=_int_env("MEMORY_WRITE_BEHIND_RETRIES", 3),
+    )